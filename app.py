@@ -7,13 +7,29 @@ by extracting keywords, generating career profiles, and identifying core compete
 
 import os
 import io
+import json
+import time
+import functools
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file, make_response
+from flask import Flask, current_app, render_template, request, jsonify, send_file, make_response, Response, stream_with_context
 from dotenv import load_dotenv
 
 # Import services
 from services.keyword_service import extract_keywords, highlight_keywords
-from services.resume_service import generate_career_profile, generate_core_competencies
+from services.resume_service import (
+    generate_career_profile,
+    generate_core_competencies,
+    agenerate_career_profile,
+    agenerate_core_competencies,
+    stream_career_profile,
+    stream_core_competencies
+)
+from services.openai_service import aclose_async_client
+from services.document_store import UnknownDocumentError, store_document, load_document
+from services.job_queue import get_job_queue
+from services.tailoring_pipeline import tailor, tailoring_node_names
+from services.idempotency import DONE, MISMATCH, PENDING, get_idempotency_store, request_fingerprint
+from services.admission import AdmissionRejected, get_admission_controller
 from utils.text_processing import parse_keywords_data
 
 # Load environment variables from .env file
@@ -27,14 +43,252 @@ def index():
     """Render the main application page."""
     return render_template('index.html')
 
+def wants_spans(form):
+    """
+    Check whether the client asked for span annotations instead of highlighted HTML.
+    
+    Spans are [start, end, keyword, priority, citation_number] lists with
+    character (code point) offsets into the submitted text.
+    """
+    return form.get('format', 'html') == 'spans'
+
+def normalize_newlines(text):
+    """Normalize line endings so span offsets match the text in the browser."""
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+# Document fields and the form fields that can reference an uploaded copy instead
+DOCUMENT_REFS = {
+    'master_resume': 'resume_ref',
+    'resume_text': 'resume_ref',
+    'job_description': 'jd_ref'
+}
+
+def form_document(form, field):
+    """
+    Read a resume or job description from a form: the raw text field, or the
+    uploaded document named by its reference field (resume_ref or jd_ref).
+    
+    Args:
+        form (ImmutableMultiDict): The request form
+        field (str): The text field name
+        
+    Returns:
+        str: The document text ('' if neither field is given)
+        
+    Raises:
+        UnknownDocumentError: If the reference names no stored document
+    """
+    text = form.get(field, '')
+    ref = form.get(DOCUMENT_REFS[field], '')
+    if text or not ref:
+        return text
+    return load_document(ref)
+
+@app.errorhandler(UnknownDocumentError)
+def unknown_document(error):
+    """Ask the client to upload a referenced document again (it was evicted or never uploaded)."""
+    return jsonify({
+        'success': False,
+        'message': 'Referenced document not found. Upload it again or send the text.',
+        'unknown_ref': error.ref
+    }), 404
+
+# Seconds a duplicate request waits for the original to finish before giving up with 409
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", 5))
+# Seconds between checks while waiting
+IDEMPOTENCY_POLL_INTERVAL = 0.25
+
+def idempotent(view):
+    """
+    Honor the Idempotency-Key header on an endpoint.
+    
+    The first request with a key runs and its response (unless a server error)
+    is stored; later requests with the same key get it replayed. A request that
+    arrives while it runs waits up to IDEMPOTENCY_WAIT seconds for it, then gets
+    409 with Retry-After. Requests without the header run as usual.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key', '').strip()
+        store = get_idempotency_store()
+        if not key or store is None:
+            return current_app.ensure_sync(view)(*args, **kwargs)
+        
+        if len(key) > 255:
+            return jsonify({
+                'success': False,
+                'message': 'Idempotency-Key must be at most 255 characters.'
+            }), 400
+        
+        # Keys are scoped to the endpoint
+        scoped_key = f"{request.path}:{key}"
+        fingerprint = request_fingerprint(
+            request.method,
+            request.path,
+            list(request.form.items(multi=True)) + list(request.args.items(multi=True))
+        )
+        
+        try:
+            outcome, stored = store.claim(scoped_key, fingerprint)
+            # The original request is still running: wait briefly for it, polling with
+            # reads, and claim the key only if the original gives it up
+            deadline = time.time() + IDEMPOTENCY_WAIT
+            while outcome == PENDING and time.time() < deadline:
+                time.sleep(min(IDEMPOTENCY_POLL_INTERVAL, max(0, deadline - time.time())))
+                outcome, stored = store.peek(scoped_key, fingerprint)
+                if outcome is None:
+                    outcome, stored = store.claim(scoped_key, fingerprint)
+        except Exception as e:
+            # The store being unavailable must not take the endpoint down with it
+            print(f"Error claiming idempotency key: {str(e)}")
+            return current_app.ensure_sync(view)(*args, **kwargs)
+        
+        if outcome == DONE:
+            response = Response(stored['body'], status=stored['status'], mimetype=stored['mimetype'])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if outcome == MISMATCH:
+            return jsonify({
+                'success': False,
+                'message': 'Idempotency-Key was already used for a different request.'
+            }), 422
+        if outcome == PENDING:
+            response = jsonify({
+                'success': False,
+                'message': 'A request with this Idempotency-Key is still in progress.'
+            })
+            response.headers['Retry-After'] = str(max(1, round(IDEMPOTENCY_WAIT)))
+            return response, 409
+        
+        try:
+            response = make_response(current_app.ensure_sync(view)(*args, **kwargs))
+        except Exception:
+            store.release(scoped_key)
+            raise
+        
+        try:
+            if response.status_code >= 500 or response.is_streamed:
+                store.release(scoped_key)
+            else:
+                store.complete(scoped_key, {
+                    'status': response.status_code,
+                    'body': response.get_data(as_text=True),
+                    'mimetype': response.mimetype
+                })
+        except Exception as e:
+            print(f"Error storing idempotent response: {str(e)}")
+        
+        return response
+    
+    return wrapper
+
+def admitted(lane):
+    """
+    Run an endpoint under admission control in the given lane (interactive,
+    generation or bulk). A request that can't be admitted in time gets 503
+    with Retry-After. A streamed response keeps its slot until the stream ends.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            controller = get_admission_controller()
+            if controller is None:
+                return current_app.ensure_sync(view)(*args, **kwargs)
+            
+            try:
+                controller.acquire(lane)
+            except AdmissionRejected as e:
+                print(f"Shedding {request.path}: {str(e)}")
+                response = jsonify({
+                    'success': False,
+                    'message': f'The server is busy. Please retry in {e.retry_after} seconds.',
+                    'shed': e.reason
+                })
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response, 503
+            
+            start_time = time.time()
+            try:
+                response = make_response(current_app.ensure_sync(view)(*args, **kwargs))
+            except Exception:
+                controller.release(lane, time.time() - start_time)
+                raise
+            
+            if response.is_streamed:
+                response.call_on_close(lambda: controller.release(lane, time.time() - start_time))
+            else:
+                controller.release(lane, time.time() - start_time)
+            return response
+        
+        return wrapper
+    
+    return decorator
+
+def closes_async_client(view):
+    """
+    Close the AsyncOpenAI client an async view used when it returns.
+    
+    Under a WSGI server Flask runs each async view in a new event loop on the
+    request's worker thread, so the client (and its connection pool) can't
+    outlive the request.
+    """
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await view(*args, **kwargs)
+        finally:
+            await aclose_async_client()
+    
+    return wrapper
+
+@app.route('/upload', methods=['POST'])
+def upload():
+    """
+    Store a resume and/or job description under their content hashes and
+    return the references other endpoints accept in place of the text.
+    """
+    refs = {}
+    try:
+        for field, ref_field in [('master_resume', 'resume_ref'), ('job_description', 'jd_ref')]:
+            text = request.form.get(field, '')
+            if text:
+                refs[ref_field] = store_document(text)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 413
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error storing document: {str(e)}'
+        }), 503
+    
+    if not refs:
+        return jsonify({
+            'success': False,
+            'message': 'Master resume or job description is required.'
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'message': 'Documents stored successfully!',
+        **refs
+    })
+
 @app.route('/extract-keywords', methods=['POST'])
+@idempotent
+@admitted('interactive')
 def extract_keywords_endpoint():
     """Extract keywords from job description with enhanced prioritization."""
     # Get form data
-    job_description = request.form.get('job_description', '')
+    job_description = form_document(request.form, 'job_description')
     job_title = request.form.get('job_title', '')
     company_name = request.form.get('company_name', '')
     industry = request.form.get('industry', '')
+    spans_mode = wants_spans(request.form)
+    if spans_mode:
+        job_description = normalize_newlines(job_description)
     
     # Check if required fields are provided
     if not job_description:
@@ -45,7 +299,7 @@ def extract_keywords_endpoint():
     
     try:
         # Extract keywords using the keyword service (job description only)
-        from services.keyword_service import extract_keywords_only, highlight_job_description
+        from services.keyword_service import extract_keywords_only, highlight_job_description, annotate_job_description
         keywords_data, all_keywords = extract_keywords_only(
             job_description, 
             job_title, 
@@ -53,16 +307,20 @@ def extract_keywords_endpoint():
             industry
         )
         
-        # Highlight keywords in the job description
-        highlighted_job_description = highlight_job_description(job_description, keywords_data)
-        
-        return jsonify({
+        response = {
             'success': True,
             'message': 'Keywords extracted successfully!',
             'keywords': all_keywords,  # For backward compatibility
-            'keywords_data': keywords_data,  # Enhanced data structure
-            'highlighted_job_description': highlighted_job_description  # Highlighted job description
-        })
+            'keywords_data': keywords_data  # Enhanced data structure
+        }
+        
+        # Highlight keywords in the job description, or just locate them in spans mode
+        if spans_mode:
+            response['job_description_spans'] = annotate_job_description(job_description, keywords_data)
+        else:
+            response['highlighted_job_description'] = highlight_job_description(job_description, keywords_data)
+        
+        return jsonify(response)
     
     except Exception as e:
         # Handle any errors
@@ -71,18 +329,79 @@ def extract_keywords_endpoint():
             'message': f'Error extracting keywords: {str(e)}'
         }), 500
 
-@app.route('/generate', methods=['POST'])
-def generate():
-    """Generate a tailored career profile based on job description and master resume."""
-    # Get form data
-    job_description = request.form.get('job_description', '')
-    master_resume = request.form.get('master_resume', '')
-    keywords_json = request.form.get('keywords', '')
-    keywords_data_json = request.form.get('keywords_data', '')
-    citations_json = request.form.get('citations_json', '')
+@app.route('/extract-keywords-stream', methods=['POST'])
+@admitted('interactive')
+def extract_keywords_stream():
+    """
+    Stream extracted keywords as Server-Sent Events: a local first pass
+    immediately, then each keyword as soon as the model has written it.
+    """
+    job_description = form_document(request.form, 'job_description')
     job_title = request.form.get('job_title', '')
     company_name = request.form.get('company_name', '')
     industry = request.form.get('industry', '')
+    spans_mode = wants_spans(request.form)
+    if spans_mode:
+        job_description = normalize_newlines(job_description)
+    
+    if not job_description:
+        return jsonify({
+            'success': False,
+            'message': 'Job description is required.'
+        }), 400
+    
+    from services.keyword_service import stream_keywords_only, highlight_job_description, annotate_job_description
+    
+    # In spans mode the client renders the highlights itself
+    if spans_mode:
+        highlight_event, highlight = 'job_description_spans', annotate_job_description
+    else:
+        highlight_event, highlight = 'highlighted_job_description', highlight_job_description
+    
+    def keyword_events():
+        high_priority = []
+        high_priority_done = False
+        for event, data in stream_keywords_only(job_description, job_title, company_name, industry):
+            if event == 'preview':
+                keywords_data, all_keywords = data
+                yield 'preview', {'keywords': all_keywords, 'keywords_data': keywords_data}
+                yield highlight_event, highlight(job_description, keywords_data)
+            elif event == 'keyword':
+                yield 'keyword', data
+                if data['priority'] == 'high':
+                    high_priority.append(data)
+                elif high_priority and not high_priority_done:
+                    # The high-priority keywords are all in; highlight them before the rest arrive
+                    high_priority_done = True
+                    yield highlight_event, highlight(job_description, {'high_priority': high_priority})
+            else:
+                keywords_data, all_keywords = data
+                yield 'keywords', {
+                    'success': True,
+                    'message': 'Keywords extracted successfully!',
+                    'keywords': all_keywords,
+                    'keywords_data': keywords_data,
+                    highlight_event: highlight(job_description, keywords_data)
+                }
+    
+    return sse_response(keyword_events(), 'Error extracting keywords')
+
+def parse_generation_form(form):
+    """
+    Parse the form fields shared by the profile and competencies endpoints.
+    
+    Args:
+        form (ImmutableMultiDict): The request form
+        
+    Returns:
+        dict: Keyword arguments for generate_career_profile / generate_core_competencies
+    """
+    # Get form data
+    job_description = form_document(form, 'job_description')
+    master_resume = form_document(form, 'master_resume')
+    keywords_json = form.get('keywords', '')
+    keywords_data_json = form.get('keywords_data', '')
+    citations_json = form.get('citations_json', '')
     
     # Parse keywords and related data
     provided_keywords, _ = parse_keywords_data(keywords_json)
@@ -92,13 +411,30 @@ def generate():
     existing_citations = None
     if citations_json:
         try:
-            import json
             existing_citations = json.loads(citations_json)
         except Exception as e:
             print(f"Error parsing citations JSON: {str(e)}")
     
+    return {
+        'job_description': job_description,
+        'master_resume': master_resume,
+        'keywords': provided_keywords,
+        'existing_citations': existing_citations,
+        'job_title': form.get('job_title', ''),
+        'company_name': form.get('company_name', ''),
+        'industry': form.get('industry', ''),
+        'keywords_data': keywords_data
+    }
+
+@app.route('/generate', methods=['POST'])
+@idempotent
+@admitted('generation')
+def generate():
+    """Generate a tailored career profile based on job description and master resume."""
+    params = parse_generation_form(request.form)
+    
     # Check if required fields are provided
-    if not job_description or not master_resume:
+    if not params['job_description'] or not params['master_resume']:
         return jsonify({
             'success': False,
             'message': 'Job description and master resume are required.'
@@ -106,16 +442,8 @@ def generate():
     
     try:
         # Generate career profile using the resume service
-        profile, marked_profile, keywords, citations = generate_career_profile(
-            job_description, 
-            master_resume, 
-            provided_keywords, 
-            existing_citations,
-            job_title,
-            company_name,
-            industry,
-            keywords_data
-        )
+        stage_timings = {}
+        profile, marked_profile, keywords, citations = generate_career_profile(**params, stage_timings=stage_timings)
         
         return jsonify({
             'success': True,
@@ -123,7 +451,8 @@ def generate():
             'career_profile': profile,
             'marked_profile': marked_profile,
             'keywords': keywords,  # Limited to top 20 keywords
-            'citations': citations
+            'citations': citations,
+            'timings': stage_timings
         })
     
     except Exception as e:
@@ -133,34 +462,49 @@ def generate():
             'message': f'Error generating career profile: {str(e)}'
         }), 500
 
+@app.route('/generate-async', methods=['POST'])
+@idempotent
+@admitted('generation')
+@closes_async_client
+async def generate_async():
+    """Async variant of /generate that awaits its LLM calls concurrently."""
+    params = parse_generation_form(request.form)
+    
+    if not params['job_description'] or not params['master_resume']:
+        return jsonify({
+            'success': False,
+            'message': 'Job description and master resume are required.'
+        }), 400
+    
+    try:
+        stage_timings = {}
+        profile, marked_profile, keywords, citations = await agenerate_career_profile(**params, stage_timings=stage_timings)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Career profile generated successfully!',
+            'career_profile': profile,
+            'marked_profile': marked_profile,
+            'keywords': keywords,  # Limited to top 20 keywords
+            'citations': citations,
+            'timings': stage_timings
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error generating career profile: {str(e)}'
+        }), 500
+
 @app.route('/generate-competencies', methods=['POST'])
+@idempotent
+@admitted('generation')
 def generate_competencies():
     """Generate core competencies based on job description and master resume."""
-    # Get form data
-    job_description = request.form.get('job_description', '')
-    master_resume = request.form.get('master_resume', '')
-    keywords_json = request.form.get('keywords', '')
-    keywords_data_json = request.form.get('keywords_data', '')
-    citations_json = request.form.get('citations_json', '')
-    job_title = request.form.get('job_title', '')
-    company_name = request.form.get('company_name', '')
-    industry = request.form.get('industry', '')
-    
-    # Parse keywords and related data
-    provided_keywords, _ = parse_keywords_data(keywords_json)
-    keywords_data, _ = parse_keywords_data(keywords_data_json)
-    
-    # Parse citations if provided
-    existing_citations = None
-    if citations_json:
-        try:
-            import json
-            existing_citations = json.loads(citations_json)
-        except Exception as e:
-            print(f"Error parsing citations JSON: {str(e)}")
+    params = parse_generation_form(request.form)
     
     # Check if required fields are provided
-    if not job_description or not master_resume:
+    if not params['job_description'] or not params['master_resume']:
         return jsonify({
             'success': False,
             'message': 'Job description and master resume are required.'
@@ -168,23 +512,16 @@ def generate_competencies():
     
     try:
         # Generate core competencies using the resume service
-        competencies, keywords, citations = generate_core_competencies(
-            job_description, 
-            master_resume, 
-            provided_keywords, 
-            existing_citations,
-            job_title,
-            company_name,
-            industry,
-            keywords_data
-        )
+        stage_timings = {}
+        competencies, keywords, citations = generate_core_competencies(**params, stage_timings=stage_timings)
         
         return jsonify({
             'success': True,
             'message': 'Core competencies generated successfully!',
             'competencies': competencies,
             'keywords': keywords,  # Limited to top 15 keywords
-            'citations': citations
+            'citations': citations,
+            'timings': stage_timings
         })
     
     except Exception as e:
@@ -194,6 +531,105 @@ def generate_competencies():
             'message': f'Error generating core competencies: {str(e)}'
         }), 500
 
+@app.route('/generate-competencies-async', methods=['POST'])
+@idempotent
+@admitted('generation')
+@closes_async_client
+async def generate_competencies_async():
+    """Async variant of /generate-competencies."""
+    params = parse_generation_form(request.form)
+    
+    if not params['job_description'] or not params['master_resume']:
+        return jsonify({
+            'success': False,
+            'message': 'Job description and master resume are required.'
+        }), 400
+    
+    try:
+        stage_timings = {}
+        competencies, keywords, citations = await agenerate_core_competencies(**params, stage_timings=stage_timings)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Core competencies generated successfully!',
+            'competencies': competencies,
+            'keywords': keywords,  # Limited to top 15 keywords
+            'citations': citations,
+            'timings': stage_timings
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error generating core competencies: {str(e)}'
+        }), 500
+
+def format_sse(event, data):
+    """
+    Format a Server-Sent Events message with a JSON payload.
+    
+    Args:
+        event (str): The event name
+        data: JSON-serializable event data
+        
+    Returns:
+        str: The SSE message
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events, error_message):
+    """
+    Stream (event, data) pairs to the client as Server-Sent Events.
+    
+    Args:
+        events (iterator): Yields (event, data) tuples
+        error_message (str): Prefix for the error event if the stream fails
+        
+    Returns:
+        Response: A text/event-stream response
+    """
+    def generate_events():
+        try:
+            for event, data in events:
+                yield format_sse(event, data)
+        except Exception as e:
+            print(f"{error_message}: {str(e)}")
+            yield format_sse('error', {'message': f'{error_message}: {str(e)}'})
+    
+    return Response(
+        stream_with_context(generate_events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/generate-stream', methods=['POST'])
+@admitted('generation')
+def generate_stream():
+    """Stream a career profile as Server-Sent Events (tokens first, then marked profile and citations)."""
+    params = parse_generation_form(request.form)
+    
+    if not params['job_description'] or not params['master_resume']:
+        return jsonify({
+            'success': False,
+            'message': 'Job description and master resume are required.'
+        }), 400
+    
+    return sse_response(stream_career_profile(**params), 'Error generating career profile')
+
+@app.route('/generate-competencies-stream', methods=['POST'])
+@admitted('generation')
+def generate_competencies_stream():
+    """Stream core competencies as Server-Sent Events (tokens first, then citations)."""
+    params = parse_generation_form(request.form)
+    
+    if not params['job_description'] or not params['master_resume']:
+        return jsonify({
+            'success': False,
+            'message': 'Job description and master resume are required.'
+        }), 400
+    
+    return sse_response(stream_core_competencies(**params), 'Error generating core competencies')
+
 @app.route('/save-profile', methods=['POST'])
 def save_profile():
     """Save the career profile to a text file and send it as a download."""
@@ -308,11 +744,122 @@ def save_resume():
             'message': f'Error saving resume: {str(e)}'
         }), 500
 
+def parse_keyword_search_form(form):
+    """
+    Parse the form fields of /find-keywords-in-resume.
+    
+    Args:
+        form (ImmutableMultiDict): The request form
+        
+    Returns:
+        dict: Keyword arguments for find_keywords_result
+    """
+    master_resume = form_document(form, 'master_resume')
+    spans_mode = wants_spans(form)
+    if spans_mode:
+        master_resume = normalize_newlines(master_resume)
+    
+    # Parse keywords data
+    keywords_data, keywords = parse_keywords_data(form.get('keywords', ''))
+    
+    return {
+        'master_resume': master_resume,
+        'keywords': keywords,
+        'keywords_data': keywords_data,
+        'job_title': form.get('job_title', ''),
+        'company_name': form.get('company_name', ''),
+        'industry': form.get('industry', ''),
+        'spans_mode': spans_mode
+    }
+
+def find_keywords_result(master_resume, keywords, keywords_data, job_title, company_name, industry, spans_mode, stage_timings=None):
+    """
+    Find keywords in the master resume and highlight them.
+    
+    Args:
+        master_resume (str): The master resume text
+        keywords (list): The keywords to look for
+        keywords_data (dict): Structured keywords data with priorities
+        job_title (str): The job title
+        company_name (str): The company name
+        industry (str): The industry
+        spans_mode (bool): Return span annotations instead of highlighted HTML
+        stage_timings (dict, optional): Receives the duration of each stage in seconds
+        
+    Returns:
+        dict: The /find-keywords-in-resume response
+    """
+    timings = stage_timings if stage_timings is not None else {}
+    
+    # Skip the exact keyword matching step and go directly to semantic search
+    # Find citations for the keywords
+    from services.keyword_service import find_keyword_citations
+    start_time = time.time()
+    citations = find_keyword_citations(keywords, master_resume, job_title, company_name, industry)
+    timings['citations'] = round(time.time() - start_time, 3)
+    
+    # Create a dictionary of found keywords based on the citations
+    found_keywords = {}
+    for priority_level in ["high_priority", "medium_priority", "low_priority", "fallback_extraction"]:
+        if priority_level in citations:
+            for keyword in citations[priority_level]:
+                if keyword != "error":  # Skip error messages
+                    found_keywords[keyword] = True
+    
+    # For any keywords not found in citations, mark them as not found
+    for keyword in keywords:
+        if keyword not in found_keywords:
+            found_keywords[keyword] = False
+    
+    response = {
+        'success': True,
+        'message': 'Keywords found successfully!',
+        'found_keywords': found_keywords,
+        'citations': citations  # Include citations in the response
+    }
+    
+    # Highlight the keywords in the resume using the citations, or just locate them in spans mode
+    from services.keyword.keyword_highlighting import highlight_keywords_in_resume, annotate_resume
+    start_time = time.time()
+    if spans_mode:
+        response['resume_spans'] = annotate_resume(master_resume, found_keywords, keywords_data, citations)
+    else:
+        response['highlighted_resume'] = highlight_keywords_in_resume(master_resume, found_keywords, keywords_data, citations)
+    timings['highlight'] = round(time.time() - start_time, 3)
+    
+    return response
+
 @app.route('/find-keywords-in-resume', methods=['POST'])
+@idempotent
+@admitted('bulk')
 def find_keywords_in_resume():
     """Find keywords in the master resume and highlight them."""
+    params = parse_keyword_search_form(request.form)
+    
+    # Check if required fields are provided
+    if not params['master_resume'] or not params['keywords']:
+        return jsonify({
+            'success': False,
+            'message': 'Master resume and keywords are required.'
+        }), 400
+    
+    try:
+        return jsonify(find_keywords_result(**params))
+    
+    except Exception as e:
+        # Handle any errors
+        return jsonify({
+            'success': False,
+            'message': f'Error finding keywords in resume: {str(e)}'
+        }), 500
+
+@app.route('/find-citations', methods=['POST'])
+@idempotent
+@admitted('bulk')
+def find_citations():
+    """Find citations for keywords in the master resume."""
     # Get form data
-    master_resume = request.form.get('master_resume', '')
+    master_resume = form_document(request.form, 'master_resume')
     keywords_json = request.form.get('keywords', '')
     job_title = request.form.get('job_title', '')
     company_name = request.form.get('company_name', '')
@@ -329,57 +876,37 @@ def find_keywords_in_resume():
         }), 400
     
     try:
-        # Skip the exact keyword matching step and go directly to semantic search
         # Find citations for the keywords
         from services.keyword_service import find_keyword_citations
         citations = find_keyword_citations(keywords, master_resume, job_title, company_name, industry)
         
-        # Create a dictionary of found keywords based on the citations
-        found_keywords = {}
-        for priority_level in ["high_priority", "medium_priority", "low_priority", "fallback_extraction"]:
-            if priority_level in citations:
-                for keyword in citations[priority_level]:
-                    if keyword != "error":  # Skip error messages
-                        found_keywords[keyword] = True
-        
-        # For any keywords not found in citations, mark them as not found
-        for keyword in keywords:
-            if keyword not in found_keywords:
-                found_keywords[keyword] = False
-        
-        # Highlight the keywords in the resume using the citations
-        from services.keyword.keyword_highlighting import highlight_keywords_in_resume
-        highlighted_resume = highlight_keywords_in_resume(master_resume, found_keywords, keywords_data, citations)
-        
         return jsonify({
             'success': True,
-            'message': 'Keywords found successfully!',
-            'found_keywords': found_keywords,
-            'highlighted_resume': highlighted_resume,
-            'citations': citations  # Include citations in the response
+            'message': 'Citations found successfully!',
+            'citations': citations
         })
     
     except Exception as e:
         # Handle any errors
         return jsonify({
             'success': False,
-            'message': f'Error finding keywords in resume: {str(e)}'
+            'message': f'Error finding citations: {str(e)}'
         }), 500
 
-@app.route('/find-citations', methods=['POST'])
-def find_citations():
-    """Find citations for keywords in the master resume."""
-    # Get form data
-    master_resume = request.form.get('master_resume', '')
+@app.route('/find-citations-async', methods=['POST'])
+@idempotent
+@admitted('bulk')
+@closes_async_client
+async def find_citations_async():
+    """Async variant of /find-citations."""
+    master_resume = form_document(request.form, 'master_resume')
     keywords_json = request.form.get('keywords', '')
     job_title = request.form.get('job_title', '')
     company_name = request.form.get('company_name', '')
     industry = request.form.get('industry', '')
     
-    # Parse keywords data
     keywords_data, keywords = parse_keywords_data(keywords_json)
     
-    # Check if required fields are provided
     if not master_resume or not keywords:
         return jsonify({
             'success': False,
@@ -387,9 +914,8 @@ def find_citations():
         }), 400
     
     try:
-        # Find citations for the keywords
-        from services.keyword_service import find_keyword_citations
-        citations = find_keyword_citations(keywords, master_resume, job_title, company_name, industry)
+        from services.keyword.keyword_matching import afind_keyword_citations
+        citations = await afind_keyword_citations(keywords, master_resume, job_title, company_name, industry)
         
         return jsonify({
             'success': True,
@@ -398,12 +924,47 @@ def find_citations():
         })
     
     except Exception as e:
-        # Handle any errors
         return jsonify({
             'success': False,
             'message': f'Error finding citations: {str(e)}'
         }), 500
 
+@app.route('/find-citations-stream', methods=['POST'])
+@admitted('bulk')
+def find_citations_stream():
+    """
+    Stream citations as Server-Sent Events: stored evidence first, then each
+    keyword batch (high priority first) as soon as it finishes.
+    """
+    master_resume = form_document(request.form, 'master_resume')
+    keywords_json = request.form.get('keywords', '')
+    job_title = request.form.get('job_title', '')
+    company_name = request.form.get('company_name', '')
+    industry = request.form.get('industry', '')
+    
+    keywords_data, keywords = parse_keywords_data(keywords_json)
+    
+    if not master_resume or not keywords:
+        return jsonify({
+            'success': False,
+            'message': 'Master resume and keywords are required.'
+        }), 400
+    
+    from services.keyword.keyword_matching import stream_keyword_citations
+    
+    def citation_events():
+        for event, data in stream_keyword_citations(keywords, master_resume, job_title, company_name, industry):
+            if event == 'citations':
+                yield 'citations', {
+                    'success': True,
+                    'message': 'Citations found successfully!',
+                    'citations': data
+                }
+            else:
+                yield event, data
+    
+    return sse_response(citation_events(), 'Error finding citations')
+
 @app.route('/save-citations', methods=['POST'])
 def save_citations():
     """Save the citations to a text file and send it as a download."""
@@ -443,11 +1004,13 @@ def save_citations():
         }), 500
 
 @app.route('/find-keyword-citation', methods=['POST'])
+@idempotent
+@admitted('bulk')
 def find_keyword_citation():
-    """Find citation for a single keyword in the resume."""
+    """Find citation for a single keyword in the resume (micro-batched with concurrent requests)."""
     # Get form data
     keyword = request.form.get('keyword', '')
-    resume_text = request.form.get('resume_text', '')
+    resume_text = form_document(request.form, 'resume_text')
     
     # Check if required fields are provided
     if not keyword or not resume_text:
@@ -457,41 +1020,26 @@ def find_keyword_citation():
         }), 400
     
     try:
-        # Use OpenAI to find a citation for this keyword
-        from services.openai_service import get_text_response
-        
-        # Create a prompt to find evidence for this keyword
-        prompt = f"""
-        Find the strongest evidence in the resume that demonstrates the person has experience with "{keyword}".
-        Return only the relevant excerpt from the resume (1-2 sentences) that best supports this skill or competency.
-        If you can't find clear evidence, respond with "No clear evidence found."
-        
-        Resume:
-        {resume_text}
-        """
-        
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes."},
-            {"role": "user", "content": prompt}
-        ]
-        
-        # Get the citation
-        citation = get_text_response(messages, max_tokens=200, temperature=0.3)
-        
-        # Clean up the citation
-        citation = citation.strip()
-        if citation.lower() == "no clear evidence found." or "no clear evidence" in citation.lower():
+        # Concurrent requests for the same resume share one multi-keyword prompt
+        from services.keyword.citation_batcher import find_single_citation
+        citation = find_single_citation(resume_text, keyword, timeout=120)
+        
+        if not citation:
             return jsonify({
                 'success': False,
                 'message': 'No citation found for this keyword.'
             })
         
-        return jsonify({
+        response = {
             'success': True,
             'message': 'Citation found successfully!',
             'citation': citation,
             'keyword': keyword
-        })
+        }
+        if isinstance(citation, dict):
+            response['citation'] = citation.get('citation', '')
+            response['exact_phrase'] = citation.get('exact_phrase', '')
+        return jsonify(response)
     
     except Exception as e:
         # Handle any errors
@@ -500,6 +1048,394 @@ def find_keyword_citation():
             'message': f'Error finding citation: {str(e)}'
         }), 500
 
+def parse_tailor_form(form):
+    """
+    Parse the form fields of /tailor.
+    
+    Besides the usual fields, a client may send stage outputs it already has or
+    has edited (keywords_data, career_profile, competencies); those stages are
+    not run and only the stages that depend on them are. regenerate names
+    stages to run again rather than answer from the memo (e.g. "profile" for a
+    new career profile).
+    
+    Args:
+        form (ImmutableMultiDict): The request form
+        
+    Returns:
+        dict: Keyword arguments for tailor
+    """
+    spans_mode = wants_spans(form)
+    inputs = {
+        'job_description': form_document(form, 'job_description'),
+        'master_resume': form_document(form, 'master_resume'),
+        'job_title': form.get('job_title', ''),
+        'company_name': form.get('company_name', ''),
+        'industry': form.get('industry', ''),
+        'format': 'spans' if spans_mode else 'html'
+    }
+    if spans_mode:
+        inputs['job_description'] = normalize_newlines(inputs['job_description'])
+        inputs['master_resume'] = normalize_newlines(inputs['master_resume'])
+    
+    keywords_data, keywords = parse_keywords_data(form.get('keywords_data', ''))
+    if keywords:
+        inputs['keywords'] = {'keywords_data': keywords_data, 'keywords': keywords}
+    if form.get('career_profile'):
+        inputs['profile'] = form.get('career_profile')
+    if form.get('competencies'):
+        inputs['competencies'] = form.get('competencies')
+    
+    targets = [target.strip() for target in form.get('targets', '').split(',') if target.strip()]
+    regenerate = [name.strip() for name in form.get('regenerate', '').split(',') if name.strip()]
+    return {'inputs': inputs, 'targets': targets or None, 'regenerate': regenerate or None}
+
+def tailor_result(inputs, targets=None, stage_timings=None, regenerate=None):
+    """
+    Run the tailoring pipeline and build the /tailor response.
+    
+    Args:
+        inputs (dict): Pipeline inputs from parse_tailor_form
+        targets (list, optional): Stages to compute (default: all)
+        stage_timings (dict, optional): Receives each stage's finishing time as it finishes
+        regenerate (list, optional): Stages to run again instead of answering from the memo
+        
+    Returns:
+        dict: The /tailor response
+    """
+    outputs, errors, report = tailor(inputs, targets, stage_timings, regenerate)
+    
+    keywords = outputs.get('keywords') or {}
+    response = {
+        'success': not errors,
+        'message': 'Resume tailored successfully!' if not errors else f'Some stages failed: {", ".join(errors)}',
+        'keywords': keywords.get('keywords'),
+        'keywords_data': keywords.get('keywords_data'),
+        'citations': outputs.get('citations'),
+        'found_keywords': outputs.get('found_keywords'),
+        'career_profile': outputs.get('profile'),
+        'marked_profile': outputs.get('marked_profile'),
+        'profile_keywords': outputs.get('profile_keywords'),
+        'profile_citations': outputs.get('profile_citations'),
+        'competencies': outputs.get('competencies'),
+        'competencies_keywords': outputs.get('competencies_keywords'),
+        'competencies_citations': outputs.get('competencies_citations'),
+        'errors': errors,
+        'stages': report
+    }
+    
+    # Highlights of both documents, as HTML or spans like the single-step endpoints
+    if inputs.get('format') == 'spans':
+        response['job_description_spans'] = outputs.get('job_description_highlights')
+        response['resume_spans'] = outputs.get('resume_highlights')
+    else:
+        response['highlighted_job_description'] = outputs.get('job_description_highlights')
+        response['highlighted_resume'] = outputs.get('resume_highlights')
+    
+    return response
+
+@app.route('/tailor', methods=['POST'])
+@idempotent
+@admitted('generation')
+def tailor_endpoint():
+    """
+    Run the whole tailoring session in one call: keywords, citations, career
+    profile and competencies, with unchanged stages answered from the memo.
+    """
+    params = parse_tailor_form(request.form)
+    
+    if not params['inputs']['job_description'] or not params['inputs']['master_resume']:
+        return jsonify({
+            'success': False,
+            'message': 'Job description and master resume are required.'
+        }), 400
+    
+    unknown = [name for name in (params['targets'] or []) + (params['regenerate'] or []) if name not in tailoring_node_names()]
+    if unknown:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown stages: {", ".join(unknown)}. Expected any of: {", ".join(tailoring_node_names())}.'
+        }), 400
+    
+    try:
+        return jsonify(tailor_result(**params))
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error tailoring resume: {str(e)}'
+        }), 500
+
+def run_profile_job(params, progress):
+    """Background job for /jobs/generate; returns the /generate response."""
+    profile, marked_profile, keywords, citations = generate_career_profile(**params, stage_timings=progress)
+    return {
+        'success': True,
+        'message': 'Career profile generated successfully!',
+        'career_profile': profile,
+        'marked_profile': marked_profile,
+        'keywords': keywords,
+        'citations': citations,
+        'timings': dict(progress)
+    }
+
+def run_competencies_job(params, progress):
+    """Background job for /jobs/generate-competencies; returns the /generate-competencies response."""
+    competencies, keywords, citations = generate_core_competencies(**params, stage_timings=progress)
+    return {
+        'success': True,
+        'message': 'Core competencies generated successfully!',
+        'competencies': competencies,
+        'keywords': keywords,
+        'citations': citations,
+        'timings': dict(progress)
+    }
+
+def run_keyword_search_job(params, progress):
+    """Background job for /jobs/find-keywords-in-resume; returns the /find-keywords-in-resume response."""
+    return find_keywords_result(**params, stage_timings=progress)
+
+def run_tailor_job(params, progress):
+    """Background job for /jobs/tailor; returns the /tailor response."""
+    return tailor_result(**params, stage_timings=progress)
+
+# Longest a job that couldn't be admitted waits before trying again
+JOB_ADMISSION_RETRY_MAX = 5
+
+def admitted_job(lane, handler):
+    """
+    Run a job handler under admission control in the given lane, so background
+    jobs count against the same lane and overall limits as requests. A job is
+    not shed: when it can't be admitted it waits for the lane's Retry-After (at
+    most JOB_ADMISSION_RETRY_MAX seconds) and tries again, unless it has been
+    cancelled meanwhile.
+    """
+    @functools.wraps(handler)
+    def wrapper(params, progress):
+        controller = get_admission_controller()
+        if controller is None:
+            return handler(params, progress)
+        
+        while True:
+            try:
+                controller.acquire(lane)
+                break
+            except AdmissionRejected as e:
+                print(f"Job waiting for the {lane} lane: {str(e)}")
+                progress.check_cancelled()
+                time.sleep(min(e.retry_after, JOB_ADMISSION_RETRY_MAX))
+        
+        start_time = time.time()
+        try:
+            return handler(params, progress)
+        finally:
+            controller.release(lane, time.time() - start_time)
+    
+    return wrapper
+
+# Job kind -> (form parser, check that the required fields are there, message when they aren't)
+JOB_FORMS = {
+    'generate': (
+        parse_generation_form,
+        lambda params: params['job_description'] and params['master_resume'],
+        'Job description and master resume are required.'
+    ),
+    'generate-competencies': (
+        parse_generation_form,
+        lambda params: params['job_description'] and params['master_resume'],
+        'Job description and master resume are required.'
+    ),
+    'find-keywords-in-resume': (
+        parse_keyword_search_form,
+        lambda params: params['master_resume'] and params['keywords'],
+        'Master resume and keywords are required.'
+    ),
+    'tailor': (
+        parse_tailor_form,
+        lambda params: params['inputs']['job_description'] and params['inputs']['master_resume'],
+        'Job description and master resume are required.'
+    )
+}
+
+job_queue = get_job_queue()
+if job_queue is not None:
+    # Same lanes as the synchronous endpoints
+    job_queue.register('generate', admitted_job('generation', run_profile_job))
+    job_queue.register('generate-competencies', admitted_job('generation', run_competencies_job))
+    job_queue.register('find-keywords-in-resume', admitted_job('bulk', run_keyword_search_job))
+    job_queue.register('tailor', admitted_job('generation', run_tailor_job))
+
+def start_job_workers():
+    """
+    Start this process's job worker threads, if they aren't running yet.
+
+    Not done at import, so processes that import the app without serving it (the
+    debug reloader's parent, a gunicorn --preload master, scripts and benchmarks)
+    don't run jobs. It runs on the first request and from the __main__ entrypoint;
+    a server can also call it when a worker starts (gunicorn's post_fork hook) to
+    pick up jobs queued before a restart without waiting for a request.
+    """
+    if job_queue is not None:
+        job_queue.start()
+
+@app.before_request
+def ensure_job_workers():
+    """Start the job workers in the process serving this request."""
+    start_job_workers()
+
+def jobs_disabled():
+    """Response for job endpoints when the job queue is disabled."""
+    return jsonify({
+        'success': False,
+        'message': 'Background jobs are disabled.'
+    }), 503
+
+@app.route('/jobs/<kind>', methods=['POST'])
+@idempotent
+def submit_job(kind):
+    """Queue a profile, competencies, keyword search or tailoring job and return its id at once."""
+    if job_queue is None:
+        return jobs_disabled()
+    if kind not in JOB_FORMS:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown job kind: {kind}. Expected one of: {", ".join(JOB_FORMS)}.'
+        }), 404
+    
+    parse_form, has_required, missing_message = JOB_FORMS[kind]
+    params = parse_form(request.form)
+    if not has_required(params):
+        return jsonify({
+            'success': False,
+            'message': missing_message
+        }), 400
+    
+    try:
+        job_id = job_queue.submit(kind, params)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error queueing job: {str(e)}'
+        }), 503
+    
+    return jsonify({
+        'success': True,
+        'message': 'Job queued.',
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/jobs/{job_id}',
+        'result_url': f'/jobs/{job_id}/result'
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report a job's status and the pipeline stages it has finished."""
+    if job_queue is None:
+        return jobs_disabled()
+    
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found.'
+        }), 404
+    
+    return jsonify({'success': True, **job})
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Return a finished job's result: the response of the matching synchronous endpoint."""
+    if job_queue is None:
+        return jobs_disabled()
+    
+    job = job_queue.get(job_id, include_result=True)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found.'
+        }), 404
+    
+    if job['status'] == 'succeeded':
+        return jsonify(job['result'])
+    if job['status'] == 'failed':
+        return jsonify({
+            'success': False,
+            'status': job['status'],
+            'message': f'Job failed: {job["error"]}'
+        }), 500
+    if job['status'] == 'cancelled':
+        return jsonify({
+            'success': False,
+            'status': job['status'],
+            'message': 'Job was cancelled.'
+        }), 409
+    
+    # Still queued or running: poll again later
+    response = jsonify({
+        'success': False,
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': 'Job is not finished yet.'
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 202
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running one at its next stage."""
+    if job_queue is None:
+        return jobs_disabled()
+    
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found.'
+        }), 404
+    
+    if status == 'cancelled':
+        message = 'Job cancelled.'
+    elif status == 'running':
+        message = 'Cancellation requested; the job stops after its current stage.'
+    else:
+        message = f'Job already {status}.'
+    
+    return jsonify({
+        'success': True,
+        'message': message,
+        'status': status
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Report counters for the LLM response cache, request coalescing, upstream API calls, hedging, resume indexes, the evidence store, local evidence resolution, citation batching, uploaded documents, background jobs, the tailoring pipeline, idempotency keys and admission control."""
+    from services.openai_service import get_cache_stats, get_coalescing_stats, get_upstream_stats, get_hedging_stats
+    from services.resume_index import get_resume_index_stats
+    from services.evidence_store import get_evidence_store_stats
+    from services.keyword.citation_batcher import get_citation_batching_stats
+    from services.evidence_resolver import get_resolver_stats
+    from services.document_store import get_document_store_stats
+    from services.job_queue import get_job_queue_stats
+    from services.tailoring_pipeline import get_tailoring_stats
+    from services.idempotency import get_idempotency_stats
+    from services.admission import get_admission_stats
+    
+    return jsonify({
+        'success': True,
+        'cache': get_cache_stats(),
+        'coalescing': get_coalescing_stats(),
+        'upstream': get_upstream_stats(),
+        'hedging': get_hedging_stats(),
+        'resume_index': get_resume_index_stats(),
+        'evidence': get_evidence_store_stats(),
+        'citation_batching': get_citation_batching_stats(),
+        'evidence_resolution': get_resolver_stats(),
+        'documents': get_document_store_stats(),
+        'jobs': get_job_queue_stats(),
+        'tailoring': get_tailoring_stats(),
+        'idempotency': get_idempotency_stats(),
+        'admission': get_admission_stats()
+    })
+
 if __name__ == '__main__':
     import sys
     
@@ -510,4 +1446,9 @@ if __name__ == '__main__':
     if len(sys.argv) > 1 and sys.argv[1].isdigit():
         port = int(sys.argv[1])
     
+    # The debug reloader's parent only watches files; its child (WERKZEUG_RUN_MAIN set)
+    # serves requests and picks up jobs queued before a restart
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_job_workers()
+    
     app.run(debug=True, port=port)
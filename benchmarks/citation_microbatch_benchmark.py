@@ -0,0 +1,159 @@
+"""
+Citation Micro-batching Benchmark
+
+Measures how many upstream calls and prompt tokens /find-keyword-citation
+needs when the frontend fires one request per keyword, with and without the
+micro-batcher (services.keyword.citation_batcher).
+
+The model is simulated: each call sleeps for a latency that grows with the
+number of keywords it answers and returns a KEYWORD / CITATION / EXACT_PHRASE
+block for each one. The baseline sends the previous single-keyword prompt with
+the whole resume for every request. Requests for one session arrive from
+concurrent threads within a few milliseconds of each other, as they do when
+the frontend loops over a keyword list. The evidence store, local resolution and
+the LLM response cache are disabled so only batching is measured.
+
+Micro-batched citation prompts go through run_speculatively, so their cost
+depends on LLM_SPECULATIVE_FALLBACK. The shipped default (off) is measured, as
+well as speculation on with its delay (the fallback only starts if the main
+prompt is slower than LLM_SPECULATIVE_DELAY, which the simulated model never
+is) and on with no delay, where the fallback prompt is sent with every batch.
+
+Prompt tokens are estimated at four characters per token.
+
+Usage:
+    python benchmarks/citation_microbatch_benchmark.py [--sessions 20] [--keywords 15] [--wait-ms 20]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ["LLM_CACHE_BACKEND"] = "none"
+os.environ["EVIDENCE_STORE_BACKEND"] = "none"
+os.environ["EVIDENCE_LOCAL_RESOLUTION"] = "off"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from citation_retrieval_benchmark import SKILLS, build_resume
+import services.concurrency as concurrency
+import services.keyword.keyword_matching as keyword_matching
+from services.keyword.citation_batcher import MICROBATCH_MAX_SIZE, CitationBatcher
+
+class SimulatedModel:
+    """Counts calls and prompt characters and answers citation prompts."""
+
+    def __init__(self, base_latency, per_keyword_latency):
+        self.base_latency = base_latency
+        self.per_keyword_latency = per_keyword_latency
+        self.calls = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, messages, **kwargs):
+        prompt = "".join(message["content"] for message in messages)
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+
+        if "Keywords:" in prompt:
+            keywords = prompt.split("Keywords:")[1].strip().split("\n")[0].split(", ")
+        else:
+            keywords = [prompt.split('experience with "')[1].split('"')[0]]
+        time.sleep(self.base_latency + self.per_keyword_latency * len(keywords))
+        if kwargs.get("completion_info") is not None:
+            kwargs["completion_info"]["finish_reason"] = "stop"
+        return "\n\n".join(f"KEYWORD: {keyword}\nCITATION: Evidence for {keyword}.\nEXACT_PHRASE: {keyword}"
+                           for keyword in keywords)
+
+def single_keyword_prompt(keyword, resume_text):
+    # The prompt /find-keyword-citation sent for each keyword before batching
+    prompt = f"""
+        Find the strongest evidence in the resume that demonstrates the person has experience with "{keyword}".
+        Return only the relevant excerpt from the resume (1-2 sentences) that best supports this skill or competency.
+        If you can't find clear evidence, respond with "No clear evidence found."
+
+        Resume:
+        {resume_text}
+        """
+    return [
+        {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes."},
+        {"role": "user", "content": prompt}
+    ]
+
+def run_sessions(sessions, ask, jitter_ms, rng):
+    """Fire every session's keyword requests concurrently; returns per-request latencies."""
+    latencies = []
+    lock = threading.Lock()
+
+    def request(resume_text, keyword, delay):
+        time.sleep(delay)
+        start = time.perf_counter()
+        ask(resume_text, keyword)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        for resume_text, keywords in sessions:
+            list(pool.map(lambda keyword: request(resume_text, keyword, rng.uniform(0, jitter_ms) / 1000), keywords))
+    return sorted(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=20, help="Resumes, each with its own burst of requests")
+    parser.add_argument("--keywords", type=int, default=15, help="Single-keyword requests per session")
+    parser.add_argument("--batch-size", type=int, default=MICROBATCH_MAX_SIZE, help="Maximum keywords per batch")
+    parser.add_argument("--wait-ms", type=float, default=20, help="Maximum wait for a batch to fill")
+    parser.add_argument("--jitter-ms", type=float, default=10, help="Spread of request arrival times in a burst")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sessions = []
+    for _ in range(args.sessions):
+        text, _ = build_resume(rng)
+        sessions.append((text, rng.sample(list(SKILLS), min(args.keywords, len(SKILLS)))))
+    requests = sum(len(keywords) for _, keywords in sessions)
+
+    print(f"{args.sessions} sessions x {args.keywords} single-keyword requests, arrivals spread over {args.jitter_ms:g} ms; "
+          f"batches of up to {args.batch_size}, max wait {args.wait_ms:g} ms\n")
+    # (mode, speculative fallback, speculative delay) for the micro-batched runs
+    speculation = [
+        ("micro-batched", concurrency.SPECULATIVE_FALLBACK, concurrency.SPECULATIVE_DELAY),
+        ("speculative", True, concurrency.SPECULATIVE_DELAY),
+        ("speculative/0s", True, 0.0)
+    ]
+    print(f"{'mode':<16}  {'upstream calls':>14}  {'calls/request':>13}  {'prompt tokens':>13}  {'p50 latency':>11}  {'p95 latency':>11}")
+
+    results = {}
+    for mode, speculative, delay in [("per-keyword", False, None)] + speculation:
+        model = SimulatedModel(base_latency=0.05, per_keyword_latency=0.005)
+        if mode == "per-keyword":
+            ask = lambda resume_text, keyword: model(single_keyword_prompt(keyword, resume_text))
+        else:
+            concurrency.SPECULATIVE_FALLBACK = speculative
+            concurrency.SPECULATIVE_DELAY = delay
+            keyword_matching.get_text_response = model
+            batcher = CitationBatcher(args.batch_size, args.wait_ms)
+            ask = batcher.find
+
+        latencies = run_sessions(sessions, ask, args.jitter_ms, random.Random(args.seed))
+        tokens = model.prompt_chars / 4
+        results[mode] = (model.calls, tokens)
+        print(f"{mode:<16}  {model.calls:>14}  {model.calls / requests:>13.2f}  {tokens:>13.0f}  "
+              f"{latencies[len(latencies) // 2] * 1000:>9.0f}ms  {latencies[int(len(latencies) * 0.95)] * 1000:>9.0f}ms")
+
+    print(f"\nmicro-batched: LLM_SPECULATIVE_FALLBACK={'on' if speculation[0][1] else 'off'} (the configured setting); "
+          f"speculative: on with a {speculation[1][2]:g}s delay; speculative/0s: on with no delay")
+    base_calls, base_tokens = results["per-keyword"]
+    for mode, _, _ in speculation:
+        calls, tokens = results[mode]
+        print(f"{mode}: upstream calls {base_calls / max(calls, 1):.1f}x fewer, prompt tokens {base_tokens / max(tokens, 1):.1f}x fewer")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Citation Retrieval Benchmark
+
+Measures how much BM25 evidence retrieval (services.resume_retrieval) shrinks
+the resume part of citation prompts, what it costs, and how often the evidence
+the model needs is still in the prompt, against the full-resume baseline.
+
+Each synthetic resume has several jobs with bullet points, a skills section and
+education. Each job description's keywords are a mix of skills the resume shows
+verbatim, skills it shows in another inflection ("managed stakeholders" for
+"stakeholder management"), skills it only shows through a synonym ("customer"
+for "client"), and skills it lacks. A keyword counts as recalled when a bullet
+planted as its evidence is in the pool sent to the model; the full resume
+always recalls everything.
+
+Prompt tokens are estimated at four characters per token. Retrieval latency is
+per citation call with the resume index already cached (it is parsed once per
+resume and reused across calls); the one-off index build is reported separately.
+
+Usage:
+    python benchmarks/citation_retrieval_benchmark.py [--resumes 200] [--keywords 15]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.resume_index import ResumeIndex
+from services.resume_retrieval import select_evidence
+from utils.text_processing import sanitize_text
+
+# keyword -> (verbatim bullet, inflected bullet, synonym bullet)
+SKILLS = {
+    "stakeholder management": (
+        "Led stakeholder management for a {n}-team platform migration",
+        "Managed stakeholders across {n} business units during a platform migration",
+        "Kept executives and partner teams aligned through a {n}-month platform migration"),
+    "data analysis": (
+        "Performed data analysis on {n}M customer records to find churn drivers",
+        "Analyzed data from {n}M customer records to find churn drivers",
+        "Dug into {n}M customer records to uncover why accounts were leaving"),
+    "python": (
+        "Built Python services processing {n}K events per second",
+        "Wrote Python tooling that cut deployment time by {n}%",
+        "Built backend services in a dynamically typed scripting language handling {n}K events per second"),
+    "client relationships": (
+        "Owned client relationships for {n} enterprise accounts",
+        "Built relationships with {n} enterprise clients",
+        "Owned customer partnerships for {n} enterprise accounts"),
+    "budget forecasting": (
+        "Ran budget forecasting for a ${n}M cost center",
+        "Forecasted budgets for a ${n}M cost center",
+        "Projected annual spend for a ${n}M cost center"),
+    "team leadership": (
+        "Provided team leadership to {n} engineers across two time zones",
+        "Led a team of {n} engineers across two time zones",
+        "Managed and mentored {n} engineers across two time zones"),
+    "process improvement": (
+        "Drove process improvement that reduced cycle time by {n}%",
+        "Improved the release process, reducing cycle time by {n}%",
+        "Streamlined release workflows, reducing cycle time by {n}%"),
+    "sql": (
+        "Wrote SQL reports used by {n} regional managers",
+        "Tuned SQL queries, cutting report runtime by {n}%",
+        "Wrote relational database queries used by {n} regional managers"),
+    "product roadmap": (
+        "Owned the product roadmap for a {n}-person product line",
+        "Planned product roadmaps for {n} quarterly releases",
+        "Set the feature plan and release sequence for a {n}-person product line"),
+    "vendor negotiation": (
+        "Handled vendor negotiation for ${n}M in annual contracts",
+        "Negotiated with vendors on ${n}M in annual contracts",
+        "Renegotiated supplier contracts worth ${n}M a year"),
+    "machine learning": (
+        "Shipped machine learning models that lifted conversion {n}%",
+        "Trained learning models with machine features lifting conversion {n}%",
+        "Shipped predictive models that lifted conversion {n}%"),
+    "customer onboarding": (
+        "Redesigned customer onboarding for {n} new accounts a month",
+        "Onboarded {n} new customers a month",
+        "Redesigned how {n} new accounts a month got set up and trained"),
+    "risk assessment": (
+        "Led risk assessment for {n} vendor integrations",
+        "Assessed risks across {n} vendor integrations",
+        "Evaluated exposure across {n} vendor integrations"),
+    "cloud infrastructure": (
+        "Migrated cloud infrastructure for {n} services to AWS",
+        "Moved {n} services onto infrastructure in the cloud",
+        "Migrated {n} services from on-prem servers to AWS"),
+    "agile": (
+        "Ran agile ceremonies for {n} squads",
+        "Coached {n} squads on agile delivery",
+        "Ran sprint planning and retrospectives for {n} squads"),
+    "hiring": (
+        "Owned hiring for {n} engineering roles",
+        "Hired {n} engineers in twelve months",
+        "Grew the engineering org by {n} people in twelve months"),
+    "financial reporting": (
+        "Prepared financial reporting for a ${n}M business unit",
+        "Reported financials monthly for a ${n}M business unit",
+        "Prepared monthly P&L packs for a ${n}M business unit"),
+    "a/b testing": (
+        "Ran A/B testing on pricing pages, lifting revenue {n}%",
+        "Designed A/B tests on pricing pages, lifting revenue {n}%",
+        "Ran controlled pricing experiments that lifted revenue {n}%"),
+}
+
+FILLER = [
+    "Presented quarterly results to the leadership team",
+    "Partnered with design on a refreshed onboarding flow",
+    "Documented runbooks for the on-call rotation",
+    "Represented the team at two industry conferences",
+    "Maintained internal wiki pages and team rituals",
+    "Coordinated a cross-office volunteering program",
+    "Supported the transition to a new ticketing system",
+    "Organized weekly knowledge-sharing sessions",
+    "Reviewed pull requests and wrote technical design notes",
+    "Handled escalations from the support team",
+    "Tracked weekly metrics in a shared dashboard",
+    "Contributed to the annual planning process",
+]
+
+COMPANIES = ["Northwind Labs", "Acme Analytics", "Globex", "Initech", "Umbrella Health", "Stark Logistics", "Wayne Retail"]
+TITLES = ["Senior Engineer", "Product Manager", "Data Analyst", "Operations Lead", "Account Director", "Program Manager"]
+
+def build_resume(rng, jobs=5, bullets=9):
+    """Assemble one resume; returns (text, {keyword: (form, evidence bullet)})."""
+    lines = ["Alex Morgan", "alex.morgan@example.com | Chicago, IL", "", "Experience"]
+    planted = {}
+    skills = list(SKILLS)
+    rng.shuffle(skills)
+    skill_iter = iter(skills)
+    for job in range(jobs):
+        lines += ["", f"{rng.choice(TITLES)}", f"{rng.choice(COMPANIES)} | {2023 - 3 * job - 3} - {2023 - 3 * job}"]
+        job_bullets = rng.sample(FILLER, bullets - 3)
+        for _ in range(3):
+            skill = next(skill_iter, None)
+            if skill is None:
+                break
+            form = rng.choices([0, 1, 2], weights=[4, 3, 3])[0]
+            bullet = SKILLS[skill][form].format(n=rng.randint(2, 40))
+            planted[skill] = (("verbatim", "inflected", "synonym")[form], bullet)
+            job_bullets.insert(rng.randrange(len(job_bullets) + 1), bullet)
+        lines += ["- " + bullet for bullet in job_bullets]
+    lines += ["", "Skills", "Communication, Presentation, Mentoring, Jira, Confluence, Excel, Google Workspace",
+              "", "Education", "B.S. Economics, University of Illinois"]
+    return "\n".join(lines), planted
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--resumes", type=int, default=200, help="Number of resumes")
+    parser.add_argument("--keywords", type=int, default=15, help="Keywords per job description")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = []
+    for _ in range(args.resumes):
+        text, planted = build_resume(rng)
+        keywords = rng.sample(list(SKILLS), min(args.keywords, len(SKILLS)))
+        cases.append((text, planted, keywords))
+
+    start = time.perf_counter()
+    indexes = [ResumeIndex(text) for text, _, _ in cases]
+    build_ms = (time.perf_counter() - start) / len(cases) * 1000
+    for index in indexes:
+        index.retriever()
+
+    full_tokens = sum(len(index.normalized_text) / 4 for index in indexes) / len(cases)
+    words = sum(len(index.normalized_text.split()) for index in indexes) / len(cases)
+    print(f"{len(cases)} resumes, {words:.0f} words and ~{full_tokens:.0f} prompt tokens on average; "
+          f"{args.keywords} keywords per job description")
+    print(f"Index build (segmentation, inverted index, BM25 weights): {build_ms:.2f} ms per resume, once per resume\n")
+    print(f"{'top-k':>5}  {'resume tokens':>13}  {'reduction':>9}  {'latency':>9}  "
+          f"{'recall':>6}  {'verbatim':>8}  {'inflected':>9}  {'synonym':>7}")
+    print(f"{'full':>5}  {full_tokens:>13.0f}  {'-':>9}  {'-':>9}  {1:>6.0%}  {1:>8.0%}  {1:>9.0%}  {1:>7.0%}")
+
+    for top_k in (1, 2, 3, 5):
+        tokens = elapsed = 0
+        recalled = {"verbatim": [0, 0], "inflected": [0, 0], "synonym": [0, 0]}
+        for (text, planted, keywords), index in zip(cases, indexes):
+            start = time.perf_counter()
+            segment_ids = select_evidence(index, keywords, top_k)
+            pool = index.normalized_text if segment_ids is None else \
+                sanitize_text("\n".join(index.segments[segment_id].text for segment_id in segment_ids))
+            elapsed += time.perf_counter() - start
+            tokens += len(pool) / 4
+
+            for keyword in keywords:
+                if keyword in planted:
+                    form, bullet = planted[keyword]
+                    recalled[form][1] += 1
+                    recalled[form][0] += sanitize_text(bullet) in pool
+
+        found = sum(hit for hit, _ in recalled.values())
+        total = sum(count for _, count in recalled.values())
+        rates = {form: hit / max(count, 1) for form, (hit, count) in recalled.items()}
+        tokens /= len(cases)
+        print(f"{top_k:>5}  {tokens:>13.0f}  {1 - tokens / full_tokens:>9.0%}  {elapsed / len(cases) * 1000:>7.2f}ms  "
+              f"{found / total:>6.0%}  {rates['verbatim']:>8.0%}  {rates['inflected']:>9.0%}  {rates['synonym']:>7.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Local Evidence Resolver Benchmark
+
+Measures how many citation keywords services.evidence_resolver answers without
+the model, how often those answers point at the right evidence, and how long
+resolution takes, on the synthetic resumes of citation_retrieval_benchmark.py.
+
+Each job description asks for skills the resume shows verbatim, in another
+inflection, only through a synonym, or not at all. A local answer is correct
+when its citation is the bullet planted as evidence for the keyword (or, for a
+verbatim skill, any segment containing it); an answer for a skill the resume
+lacks is a false positive.
+
+Every resume also gets bullets where a single-word skill appears only as an
+ordinary word or part of another term ("go to market", "R&D", "C-suite",
+"excel at", "Spring intern program"), and every job description asks for those
+skills ("look-alike"). None of them may be resolved locally; "Excel" is also
+listed in the resume's Skills line, but as a common word it is left to the model.
+
+Latency saved is estimated per citation request: a request whose keywords are
+all resolved locally skips its model call, and the model call latency is a
+parameter (/metrics reports the measured average as
+evidence_resolution.average_model_seconds).
+
+Usage:
+    python benchmarks/evidence_resolver_benchmark.py [--resumes 200] [--keywords 15] [--model-seconds 6]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from citation_retrieval_benchmark import SKILLS, build_resume
+from services.resume_index import ResumeIndex, get_resume_index
+from services.evidence_resolver import resolve_locally
+
+# Bullets where a single-word skill only appears as an ordinary word or inside another term
+LOOK_ALIKES = {
+    "Go": "Owned go to market planning for {n} product launches",
+    "R": "Partnered with R&D on {n} platform releases",
+    "C": "Presented quarterly results to the C-suite for {n} quarters",
+    "Excel": "I excel at mentoring groups of {n} or more",
+    "Spring": "Ran the Spring intern program for {n} students"
+}
+
+def add_look_alikes(rng, text):
+    """Append the look-alike bullets to a resume, before its Skills section."""
+    bullets = "\n".join("- " + bullet.format(n=rng.randint(2, 40)) for bullet in LOOK_ALIKES.values())
+    return text.replace("\n\nSkills\n", f"\n\nActivities\n{bullets}\n\nSkills\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--resumes", type=int, default=200, help="Number of resumes")
+    parser.add_argument("--keywords", type=int, default=15, help="Keywords per job description")
+    parser.add_argument("--model-seconds", type=float, default=6.0, help="Assumed latency of one citation model call")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = []
+    for _ in range(args.resumes):
+        text, planted = build_resume(rng)
+        text = add_look_alikes(rng, text)
+        planted.update({keyword: ("look-alike", None) for keyword in LOOK_ALIKES})
+        keywords = rng.sample(list(SKILLS), min(args.keywords, len(SKILLS))) + list(LOOK_ALIKES)
+        cases.append((text, planted, keywords))
+
+    # Warm the shared index cache so only resolution is timed
+    for text, _, _ in cases:
+        get_resume_index(text).stemmed_tokens()
+
+    counts = {form: [0, 0, 0] for form in ("verbatim", "inflected", "synonym", "absent", "look-alike")}  # resolved, correct, total
+    elapsed = 0.0
+    sent_to_model = 0
+    single_keyword_avoided = 0
+    for text, planted, keywords in cases:
+        start = time.perf_counter()
+        resolved, unresolved = resolve_locally(text, keywords)
+        elapsed += time.perf_counter() - start
+        sent_to_model += len(unresolved)
+
+        for keyword in keywords:
+            form, bullet = planted.get(keyword, ("absent", None))
+            counts[form][2] += 1
+            if keyword in resolved:
+                counts[form][0] += 1
+                single_keyword_avoided += 1
+                citation = resolved[keyword]["citation"]
+                counts[form][1] += bullet is not None and (citation == bullet or
+                                                           (form == "verbatim" and keyword in citation.lower()))
+
+    total = sum(total for _, _, total in counts.values())
+    resolved_total = sum(resolved for resolved, _, _ in counts.values())
+    correct_total = sum(correct for _, correct, _ in counts.values())
+    words = sum(len(ResumeIndex(text).normalized_text.split()) for text, _, _ in cases[:20]) / min(20, len(cases))
+
+    print(f"{len(cases)} resumes (~{words:.0f} words), {args.keywords} keywords plus {len(LOOK_ALIKES)} look-alikes per job description\n")
+    print(f"{'skill in resume':<16}  {'keywords':>8}  {'resolved locally':>16}  {'correct evidence':>16}")
+    for form, (resolved, correct, count) in counts.items():
+        print(f"{form:<16}  {count:>8}  {resolved / max(count, 1):>16.0%}  "
+              f"{(correct / resolved if resolved else 1):>16.0%}")
+    print(f"{'all':<16}  {total:>8}  {resolved_total / total:>16.0%}  {correct_total / max(resolved_total, 1):>16.0%}")
+    false_positives = sum(counts[form][0] for form in ("synonym", "absent", "look-alike"))
+    print(f"\nFalse positives (synonym-only, absent or look-alike skills resolved locally): {false_positives}")
+
+    print(f"\nLocal resolution: {elapsed / len(cases) * 1000:.2f} ms per job description "
+          f"({total / max(elapsed, 1e-9):,.0f} keywords/s)")
+    print(f"Keywords sent to the model: {sent_to_model} of {total} ({1 - sent_to_model / total:.0%} fewer)")
+    print(f"/find-keyword-citation (one keyword per request): {single_keyword_avoided} of {total} model calls avoided, "
+          f"~{single_keyword_avoided * args.model_seconds / len(cases):.1f} s of model time saved per job description "
+          f"at {args.model_seconds:g} s per call")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Keyword Extraction Benchmark
+
+Compares the local TF-IDF extractor (extract_keywords_local) against the regex
+fallback (extract_keywords_regex) on synthetic job descriptions.
+
+Each job description is assembled from a company blurb, responsibilities,
+requirements, nice-to-haves and benefits boilerplate, with required and
+preferred skills drawn at random from a skill list. Extractors are scored on
+throughput (job descriptions per second on one core), how many of the planted
+required skills land in the high-priority tier, how many planted skills are
+found at all, and how many returned keywords are boilerplate words.
+
+Usage:
+    python benchmarks/keyword_extraction_benchmark.py [--documents 2000] [--repeat 3]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.keyword.keyword_local import extract_keywords_local, BackgroundCorpus
+from services.keyword.keyword_utils import extract_keywords_regex
+
+SKILLS = [
+    "Python", "SQL", "Java", "Go", "TypeScript", "React", "Node.js", "Kubernetes", "Docker",
+    "Terraform", "AWS", "GCP", "Azure", "Kafka", "Spark", "Airflow", "Snowflake", "dbt",
+    "PostgreSQL", "Redis", "GraphQL", "CI/CD", "Tableau", "Salesforce", "machine learning",
+    "data modeling", "financial modeling", "stakeholder management", "account management",
+    "product roadmaps", "A/B testing", "user research", "Figma", "SEO", "Google Analytics",
+    "contract negotiation", "budget forecasting", "supply chain", "HIPAA compliance", "PMP"
+]
+
+BOILERPLATE = {
+    "experience", "team", "work", "skills", "ability", "company", "role", "years", "benefits",
+    "opportunity", "employer", "equal", "salary", "health", "insurance", "culture", "mission",
+    "competitive", "join", "looking"
+}
+
+BLURBS = [
+    "{company} is a fast-growing company on a mission to transform how people work. We're looking for a {title} to join our growing team.",
+    "At {company}, we believe great products start with great people. Join us as a {title} and help shape the future of our platform.",
+    "{company} builds tools used by thousands of businesses every day. Our culture values ownership, curiosity and collaboration."
+]
+
+RESPONSIBILITIES = [
+    "Design and deliver {skill} solutions for our customers",
+    "Partner with cross-functional teams to improve {skill} practices",
+    "Own the roadmap for {skill} initiatives across the organization",
+    "Mentor teammates and lead reviews of {skill} work",
+    "Build and maintain reliable systems using {skill}"
+]
+
+REQUIREMENTS = [
+    "{years}+ years of experience with {skill}",
+    "Strong working knowledge of {skill}",
+    "Hands-on experience with {skill} in a production environment",
+    "Expert in {skill} and {other}",
+    "Proven track record applying {skill}"
+]
+
+PREFERRED = [
+    "Experience with {skill}",
+    "Familiarity with {skill} is a plus",
+    "Background in {skill}"
+]
+
+BENEFITS = """Benefits:
+- Competitive salary and equity
+- Comprehensive health insurance and unlimited PTO
+- Remote-friendly culture with annual team offsites
+{company} is an equal opportunity employer and values diversity. All qualified applicants will receive consideration for employment without regard to race, religion, gender, sexual orientation, national origin, disability or veteran status."""
+
+def build_job_description(rng):
+    """Assemble one synthetic job description; returns (text, required, preferred, company)."""
+    company = rng.choice(["Northwind Labs", "Acme Analytics", "Globex", "Initech", "Umbrella Health"])
+    title = rng.choice(["Senior Engineer", "Product Manager", "Data Analyst", "Account Executive"])
+    skills = rng.sample(SKILLS, 10)
+    required, preferred, duties = skills[:4], skills[4:6], skills[6:]
+
+    lines = [f"About {company}", rng.choice(BLURBS).format(company=company, title=title), "", "What you'll do:"]
+    lines += ["- " + rng.choice(RESPONSIBILITIES).format(skill=skill) for skill in duties]
+    lines += ["", "Requirements:"]
+    for index, skill in enumerate(required):
+        template = rng.choice(REQUIREMENTS)
+        other = required[(index + 1) % len(required)]
+        lines.append("- " + template.format(skill=skill, other=other, years=rng.randint(2, 8)))
+    lines += ["", "Nice to have:"]
+    lines += ["- " + rng.choice(PREFERRED).format(skill=skill) for skill in preferred]
+    lines += ["", BENEFITS.format(company=company)]
+    return "\n".join(lines), required, preferred, company
+
+def found(skill, keywords):
+    skill = skill.lower()
+    return any(skill == keyword.lower() or f" {skill} " in f" {keyword.lower()} " for keyword in keywords)
+
+def run(name, extract, corpus, repeat):
+    # Throughput: best of several passes
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text, _, _, company in corpus:
+            extract(text, company)
+        best = min(best, time.perf_counter() - start)
+
+    required_high = required_total = planted_found = planted_total = boilerplate = returned = 0
+    for text, required, preferred, company in corpus:
+        keywords_data, all_keywords = extract(text, company)
+        high = [item["keyword"] for item in keywords_data["high_priority"]]
+        required_high += sum(found(skill, high) for skill in required)
+        required_total += len(required)
+        planted_found += sum(found(skill, all_keywords) for skill in required + preferred)
+        planted_total += len(required) + len(preferred)
+        boilerplate += sum(keyword.lower() in BOILERPLATE for keyword in all_keywords)
+        returned += len(all_keywords)
+
+    print(f"\n{name}")
+    print(f"  throughput:               {len(corpus) / best:,.0f} job descriptions/s ({best / len(corpus) * 1000:.3f} ms each)")
+    print(f"  required skills in high:  {required_high / required_total:.0%}")
+    print(f"  planted skills found:     {planted_found / planted_total:.0%}")
+    print(f"  boilerplate keywords:     {boilerplate / max(returned, 1):.1%} of {returned / len(corpus):.0f} per job description")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--documents", type=int, default=2000, help="Number of job descriptions")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing passes over the corpus")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for the corpus")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [build_job_description(rng) for _ in range(args.documents)]
+    average_size = sum(len(text) for text, _, _, _ in corpus) / len(corpus)
+    print(f"{len(corpus)} job descriptions, {average_size:.0f} characters on average")
+
+    # A private corpus so the benchmark doesn't depend on (or change) the shared one;
+    # it learns the boilerplate during the first timing pass, as it would in production
+    background = BackgroundCorpus()
+    regex_time = run("regex fallback", lambda text, company: extract_keywords_regex(text), corpus, args.repeat)
+    local_time = run("local TF-IDF", lambda text, company: extract_keywords_local(text, exclude=[company], corpus=background),
+                     corpus, args.repeat)
+    print(f"\nLocal extractor relative time: {local_time / regex_time:.2f}x the regex fallback")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Admission Control Module
+
+This module decides which LLM-bound requests run now, which wait and which
+are turned away. Without it every request goes straight to OpenAI during a
+spike, latency climbs for everyone and rate limits eventually turn into 500s.
+
+Each route belongs to a lane (interactive, generation or bulk) with its own
+concurrency limit, a bounded wait queue and a deadline for time spent in the
+queue. All lanes also share one overall concurrency limit, and when a slot
+frees up the waiting request from the highest-priority lane gets it, so a
+burst of citation lookups can't hold back keyword extraction. A request that
+finds its lane's queue full, or waits past the deadline, is shed: the caller
+answers 503 with a Retry-After estimated from the lane's recent service time.
+"""
+
+import os
+import math
+import time
+import itertools
+import threading
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, lane, reason, retry_after):
+        super().__init__(f"{lane} lane {reason.replace('_', ' ')}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+class Lane:
+    """
+    Limits of one class of routes.
+    """
+
+    def __init__(self, name, priority, max_concurrency, max_queue, max_wait):
+        """
+        Args:
+            name (str): The lane name
+            priority (int): Lower runs first when lanes compete for a slot
+            max_concurrency (int): Requests of this lane running at once
+            max_queue (int): Requests of this lane waiting at once; more are shed
+            max_wait (float): Seconds a request may wait in the queue before it is shed
+        """
+        self.name = name
+        self.priority = priority
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiting = []  # sequence numbers, oldest first
+        self.average_seconds = None  # moving average of time spent admitted
+        self.counters = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_deadline": 0,
+                         "queue_seconds": 0.0, "max_queue_seconds": 0.0}
+
+class AdmissionController:
+    """
+    Per-lane concurrency limits with bounded priority queues and queue-time deadlines.
+    """
+
+    def __init__(self, lanes, max_concurrency=16):
+        """
+        Args:
+            lanes (list): The lanes
+            max_concurrency (int): Requests running at once across all lanes
+        """
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.max_concurrency = max(1, max_concurrency)
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _has_room(self, lane):
+        """Whether a request of the lane may start: room in the lane and overall, and no higher-priority request ready to take it."""
+        if self._in_flight >= self.max_concurrency or lane.in_flight >= lane.max_concurrency:
+            return False
+        return not any(
+            other.waiting and other.in_flight < other.max_concurrency
+            for other in self.lanes.values() if other.priority < lane.priority
+        )
+
+    def acquire(self, lane_name):
+        """
+        Wait for a slot in a lane.
+
+        Args:
+            lane_name (str): The lane
+
+        Returns:
+            float: Seconds spent in the queue
+
+        Raises:
+            AdmissionRejected: If the lane's queue is full or the queue deadline passes
+        """
+        lane = self.lanes[lane_name]
+        start_time = time.time()
+        with self._condition:
+            # Nobody waiting and room to run: admit without queueing
+            if not lane.waiting and self._has_room(lane):
+                self._admit(lane, 0.0)
+                return 0.0
+
+            if len(lane.waiting) >= lane.max_queue:
+                lane.counters["shed_queue_full"] += 1
+                raise AdmissionRejected(lane.name, "queue_full", self._retry_after(lane))
+
+            sequence = next(self._sequence)
+            lane.waiting.append(sequence)
+            lane.counters["queued"] += 1
+            deadline = start_time + lane.max_wait
+            try:
+                while lane.waiting[0] != sequence or not self._has_room(lane):
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        lane.counters["shed_deadline"] += 1
+                        raise AdmissionRejected(lane.name, "deadline", self._retry_after(lane))
+                    self._condition.wait(remaining)
+            finally:
+                lane.waiting.remove(sequence)
+                # Whoever is next in this or a lower-priority lane may be able to run now
+                self._condition.notify_all()
+
+            waited = time.time() - start_time
+            self._admit(lane, waited)
+            return waited
+
+    def _admit(self, lane, waited):
+        self._in_flight += 1
+        lane.in_flight += 1
+        lane.counters["admitted"] += 1
+        lane.counters["queue_seconds"] += waited
+        lane.counters["max_queue_seconds"] = max(lane.counters["max_queue_seconds"], waited)
+
+    def release(self, lane_name, seconds=None):
+        """
+        Give a slot back.
+
+        Args:
+            lane_name (str): The lane
+            seconds (float, optional): How long the request held the slot, for Retry-After estimates
+        """
+        lane = self.lanes[lane_name]
+        with self._condition:
+            self._in_flight -= 1
+            lane.in_flight -= 1
+            if seconds is not None:
+                lane.average_seconds = seconds if lane.average_seconds is None else 0.8 * lane.average_seconds + 0.2 * seconds
+            self._condition.notify_all()
+
+    def _retry_after(self, lane):
+        """Seconds until the lane's current queue should have drained, at least 1."""
+        if lane.average_seconds is None:
+            return max(1, math.ceil(lane.max_wait))
+        rounds = (len(lane.waiting) + lane.in_flight) / lane.max_concurrency
+        return max(1, math.ceil(rounds * lane.average_seconds))
+
+    def stats(self):
+        """
+        Report queue depths and shed counts.
+
+        Returns:
+            dict: Requests running overall and, per lane, requests running and waiting, admitted,
+                  shed (queue full or deadline) and queue times
+        """
+        with self._condition:
+            lanes = {}
+            for lane in self.lanes.values():
+                counters = dict(lane.counters)
+                lanes[lane.name] = {
+                    **counters,
+                    "priority": lane.priority,
+                    "in_flight": lane.in_flight,
+                    "queue_depth": len(lane.waiting),
+                    "max_concurrency": lane.max_concurrency,
+                    "max_queue": lane.max_queue,
+                    "max_wait": lane.max_wait,
+                    "shed": counters["shed_queue_full"] + counters["shed_deadline"],
+                    "average_queue_seconds": round(counters["queue_seconds"] / counters["admitted"], 3) if counters["admitted"] else 0.0,
+                    "queue_seconds": round(counters["queue_seconds"], 3),
+                    "max_queue_seconds": round(counters["max_queue_seconds"], 3),
+                    "average_service_seconds": None if lane.average_seconds is None else round(lane.average_seconds, 3)
+                }
+            return {
+                "enabled": True,
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "shed": sum(lane["shed"] for lane in lanes.values()),
+                "lanes": lanes
+            }
+
+# Lane name -> (priority, concurrency, queue size, queue deadline in seconds) defaults
+DEFAULT_LANES = {
+    "interactive": (0, 16, 32, 10),
+    "generation": (1, 8, 16, 20),
+    "bulk": (2, 4, 16, 30)
+}
+
+def create_admission_controller():
+    """
+    Create the admission controller from environment variables.
+
+    Environment variables:
+        ADMISSION_CONTROL: "on" (default) or "off"
+        ADMISSION_MAX_CONCURRENCY: Requests running at once across all lanes (default 16)
+        ADMISSION_<LANE>_CONCURRENCY, ADMISSION_<LANE>_QUEUE, ADMISSION_<LANE>_WAIT: A lane's
+            concurrency limit, queue size and queue deadline in seconds, for the
+            INTERACTIVE, GENERATION and BULK lanes
+
+    Returns:
+        AdmissionController: The controller, or None if admission control is off
+    """
+    if os.getenv("ADMISSION_CONTROL", "on").lower() == "off":
+        return None
+
+    lanes = []
+    for name, (priority, concurrency, queue, wait) in DEFAULT_LANES.items():
+        prefix = f"ADMISSION_{name.upper()}"
+        lanes.append(Lane(
+            name,
+            priority,
+            int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+            int(os.getenv(f"{prefix}_QUEUE", queue)),
+            float(os.getenv(f"{prefix}_WAIT", wait))
+        ))
+    return AdmissionController(lanes, int(os.getenv("ADMISSION_MAX_CONCURRENCY", 16)))
+
+_controller = create_admission_controller()
+
+def get_admission_controller():
+    """
+    Get the process-wide admission controller.
+
+    Returns:
+        AdmissionController: The controller, or None if admission control is off
+    """
+    return _controller
+
+def get_admission_stats():
+    """
+    Report admission counters.
+
+    Returns:
+        dict: Queue depths and shed counts per lane, or {"enabled": False}
+    """
+    if _controller is None:
+        return {"enabled": False}
+    return _controller.stats()
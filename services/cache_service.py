@@ -0,0 +1,416 @@
+"""
+Cache Service Module
+
+This module provides the cache backends used to store OpenAI API responses.
+The SQLite backend is shared by every worker process on the host, bounded by
+total byte size with LRU eviction, and honours a time-to-live.
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Directory for on-disk state shared between worker processes
+DATA_DIR = os.getenv(
+    "DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+)
+
+# Thread-local storage for SQLite connections (connections can't be shared across threads)
+_local = threading.local()
+
+def get_connection(path):
+    """
+    Get a SQLite connection for the current thread, creating it if needed.
+
+    Connections use WAL journaling so that readers in one process never block
+    writers in another, and a busy timeout so concurrent writers wait instead of failing.
+
+    Args:
+        path (str): Path to the SQLite database file
+
+    Returns:
+        sqlite3.Connection: A connection in autocommit mode
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    connection = connections.get(path)
+    if connection is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=30000")
+        connections[path] = connection
+
+    return connection
+
+class CacheBackend:
+    """
+    Interface for response cache backends.
+
+    Values are strings. get() returns None on a miss.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+class MemoryCache(CacheBackend):
+    """
+    Per-process LRU cache bounded by total byte size.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=0):
+        """
+        Args:
+            max_bytes (int): Maximum total size of cached keys and values in bytes
+            ttl (float): Seconds before an entry expires (0 disables expiry)
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, created_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "sets": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+
+            value, size, created_at = entry
+            if self.ttl and time.time() - created_at > self.ttl:
+                del self._entries[key]
+                self._bytes -= size
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def set(self, key, value):
+        size = len(key.encode("utf-8")) + len(value.encode("utf-8"))
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+
+            self._entries[key] = (value, size, time.time())
+            self._bytes += size
+            self._counters["sets"] += 1
+
+            # Evict least recently used entries until we're back under budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._counters["evictions"] += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl
+            })
+            return stats
+
+class SQLiteCache(CacheBackend):
+    """
+    Disk-backed LRU cache bounded by total byte size, shared across processes.
+
+    Entries, the running byte total and the eviction counters live in the
+    database, so every worker process sees the same cache. Hit and miss
+    counters are kept in process memory and added to the database every
+    COUNTER_FLUSH_INTERVAL seconds, so a read only takes the write lock when it
+    expires an entry or refreshes its recency.
+    """
+
+    # Only refresh an entry's recency if it is older than this (avoids a write per hit)
+    TOUCH_INTERVAL = 1.0
+
+    # Seconds between flushes of the in-process hit/miss counters
+    COUNTER_FLUSH_INTERVAL = 5.0
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, ttl=0):
+        """
+        Args:
+            path (str): Path to the SQLite database file
+            max_bytes (int): Maximum total size of cached keys and values in bytes
+            ttl (float): Seconds before an entry expires (0 disables expiry)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._pending = {"hits": 0, "misses": 0}
+        self._pending_lock = threading.Lock()
+        self._flushed_at = time.time()
+        self._initialize()
+        atexit.register(self.flush_counters)
+
+    def _connection(self):
+        return get_connection(self.path)
+
+    def _initialize(self):
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed_at)")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS cache_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def _increment(connection, name, amount=1):
+        connection.execute(
+            "INSERT INTO cache_counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def _count(self, name):
+        """Count a hit or miss in process memory, flushing to the database when the interval has passed."""
+        with self._pending_lock:
+            self._pending[name] += 1
+            due = time.time() - self._flushed_at >= self.COUNTER_FLUSH_INTERVAL
+        if due:
+            self.flush_counters()
+
+    def _take_pending(self):
+        with self._pending_lock:
+            pending = {name: amount for name, amount in self._pending.items() if amount}
+            self._pending = {name: 0 for name in self._pending}
+            self._flushed_at = time.time()
+            return pending
+
+    def _restore_pending(self, pending):
+        with self._pending_lock:
+            for name, amount in pending.items():
+                self._pending[name] += amount
+
+    def flush_counters(self):
+        """
+        Add this process's pending hit/miss counts to the shared counters.
+        """
+        pending = self._take_pending()
+        if not pending:
+            return
+
+        connection = self._connection()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for name, amount in pending.items():
+                    self._increment(connection, name, amount)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            # Keep the counts for the next flush rather than losing them
+            self._restore_pending(pending)
+            print(f"Error flushing cache counters: {str(e)}")
+
+    def get(self, key):
+        connection = self._connection()
+        now = time.time()
+        # A single SELECT reads one consistent snapshot without taking the write lock
+        row = connection.execute(
+            "SELECT value, size, created_at, accessed_at FROM response_cache WHERE key = ?",
+            (key,)
+        ).fetchone()
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        value, size, created_at, accessed_at = row
+        if self.ttl and now - created_at > self.ttl:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Only delete the entry we read: another worker may have replaced it meanwhile
+                deleted = connection.execute(
+                    "DELETE FROM response_cache WHERE key = ? AND created_at = ?",
+                    (key, created_at)
+                ).rowcount
+                if deleted:
+                    self._increment(connection, "bytes", -size)
+                    self._increment(connection, "expirations")
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            self._count("misses")
+            return None
+
+        if now - accessed_at > self.TOUCH_INTERVAL:
+            # One conditional statement, so the touch is skipped if the row changed since the read
+            connection.execute(
+                "UPDATE response_cache SET accessed_at = ? WHERE key = ? AND created_at = ? AND accessed_at < ?",
+                (now, key, created_at, now - self.TOUCH_INTERVAL)
+            )
+        self._count("hits")
+        return value
+
+    def set(self, key, value):
+        connection = self._connection()
+        now = time.time()
+        size = len(key.encode("utf-8")) + len(value.encode("utf-8"))
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT size FROM response_cache WHERE key = ?", (key,)).fetchone()
+            previous_size = row[0] if row else 0
+            connection.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._increment(connection, "bytes", size - previous_size)
+            self._increment(connection, "sets")
+
+            # Evict least recently used entries until we're back under budget
+            total = connection.execute("SELECT value FROM cache_counters WHERE name = 'bytes'").fetchone()[0]
+            evicted_count = 0
+            evicted_bytes = 0
+            while total - evicted_bytes > self.max_bytes:
+                victims = connection.execute(
+                    "SELECT key, size FROM response_cache WHERE key != ? ORDER BY accessed_at LIMIT 32",
+                    (key,)
+                ).fetchall()
+                if not victims:
+                    break
+                for victim_key, victim_size in victims:
+                    connection.execute("DELETE FROM response_cache WHERE key = ?", (victim_key,))
+                    evicted_count += 1
+                    evicted_bytes += victim_size
+                    if total - evicted_bytes <= self.max_bytes:
+                        break
+
+            if evicted_count:
+                self._increment(connection, "bytes", -evicted_bytes)
+                self._increment(connection, "evictions", evicted_count)
+
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def delete(self, key):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT size FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                connection.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._increment(connection, "bytes", -row[0])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM response_cache")
+            connection.execute("UPDATE cache_counters SET value = 0 WHERE name = 'bytes'")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def stats(self):
+        self.flush_counters()
+        connection = self._connection()
+        counters = dict(connection.execute("SELECT name, value FROM cache_counters").fetchall())
+        entries = connection.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        stats = {name: counters.get(name, 0) for name in ["hits", "misses", "evictions", "expirations", "sets"]}
+        stats.update({
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "bytes": counters.get("bytes", 0),
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl
+        })
+        return stats
+
+def create_cache_backend(backend=None, path=None, max_bytes=None, ttl=None):
+    """
+    Create a response cache backend from arguments or environment variables.
+
+    Environment variables:
+        LLM_CACHE_BACKEND: "sqlite" (default), "memory" or "none"
+        LLM_CACHE_PATH: Path of the SQLite database file
+        LLM_CACHE_MAX_BYTES: Maximum cache size in bytes (default 64 MB)
+        LLM_CACHE_TTL: Entry lifetime in seconds, 0 for no expiry (default 7 days)
+
+    Args:
+        backend (str, optional): Backend name, overrides LLM_CACHE_BACKEND
+        path (str, optional): SQLite path, overrides LLM_CACHE_PATH
+        max_bytes (int, optional): Size bound, overrides LLM_CACHE_MAX_BYTES
+        ttl (float, optional): Entry lifetime, overrides LLM_CACHE_TTL
+
+    Returns:
+        CacheBackend: The cache backend, or None if caching is disabled
+    """
+    backend = (backend or os.getenv("LLM_CACHE_BACKEND", "sqlite")).lower()
+    path = path or os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_cache.sqlite3"))
+    max_bytes = max_bytes if max_bytes is not None else int(os.getenv("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+
+    if backend == "none":
+        return None
+
+    if backend == "sqlite":
+        try:
+            return SQLiteCache(path, max_bytes=max_bytes, ttl=ttl)
+        except Exception as e:
+            print(f"Error opening SQLite cache at {path}, falling back to memory cache: {str(e)}")
+
+    return MemoryCache(max_bytes=max_bytes, ttl=ttl)
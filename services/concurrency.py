@@ -0,0 +1,348 @@
+"""
+Concurrency Module
+
+This module provides the bounded thread pool used to run independent
+pipeline stages (mostly LLM calls) concurrently, and speculative execution
+of alternative strategies (e.g. a prompt and its simpler fallback).
+"""
+
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from services.hedging import Cancellation
+
+# Maximum number of stages running at once across the process
+MAX_STAGE_WORKERS = int(os.getenv("LLM_STAGE_WORKERS", 8))
+
+# Start fallback strategies before the primary one has failed ("on") or only after it fails ("off").
+# Speculating costs a second paid call whenever the fallback starts, so it is off by default.
+SPECULATIVE_FALLBACK = os.getenv("LLM_SPECULATIVE_FALLBACK", "off").lower() != "off"
+
+# With speculation on, seconds the preferred strategy may run before its fallback starts
+SPECULATIVE_DELAY = float(os.getenv("LLM_SPECULATIVE_DELAY", 5))
+
+_executor = None
+_speculative_executor = None
+_executor_lock = threading.Lock()
+
+# Marks threads that belong to the stage pool or the speculative pool
+_worker_state = threading.local()
+
+def _mark_worker():
+    _worker_state.is_worker = True
+
+def _mark_speculative_worker():
+    _worker_state.is_speculative = True
+
+def current_cancellation():
+    """
+    Get the cancellation of the speculative strategy running on this thread.
+
+    Upstream calls made by a strategy register with it, so a strategy that lost
+    can close its connection instead of running to completion.
+
+    Returns:
+        Cancellation: The strategy's cancellation, or None outside a speculative strategy
+    """
+    return getattr(_worker_state, "cancellation", None)
+
+def _run_strategy(fn, cancellation):
+    _worker_state.cancellation = cancellation
+    try:
+        return fn()
+    finally:
+        _worker_state.cancellation = None
+
+def get_executor():
+    """
+    Get the shared bounded executor for pipeline stages.
+
+    Returns:
+        ThreadPoolExecutor: The executor, created on first use
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=MAX_STAGE_WORKERS,
+                    thread_name_prefix="llm-stage",
+                    initializer=_mark_worker
+                )
+    return _executor
+
+def in_worker_thread():
+    """
+    Check whether the current thread belongs to the stage pool.
+
+    Returns:
+        bool: True if called from a stage worker
+    """
+    return getattr(_worker_state, "is_worker", False)
+
+def timed(fn, *args, **kwargs):
+    """
+    Call fn and measure how long it took.
+
+    Returns:
+        tuple: (result, seconds)
+    """
+    start_time = time.time()
+    result = fn(*args, **kwargs)
+    return result, time.time() - start_time
+
+def run_concurrently(stages, timings=None):
+    """
+    Run independent stages concurrently and wait for all of them.
+
+    Stages submitted from inside a stage worker run inline, so nested use can
+    never exhaust the bounded pool and deadlock.
+
+    Args:
+        stages (dict): Mapping of stage name to a zero-argument callable
+        timings (dict, optional): Receives the duration of each stage in seconds
+
+    Returns:
+        dict: Mapping of stage name to its result
+
+    Raises:
+        Exception: The first failing stage's exception (in stage order), after all stages finish
+    """
+    results = {}
+    errors = {}
+
+    if len(stages) <= 1 or in_worker_thread():
+        for name, fn in stages.items():
+            try:
+                results[name], duration = timed(fn)
+                if timings is not None:
+                    timings[name] = round(duration, 3)
+            except Exception as e:
+                errors[name] = e
+    else:
+        futures = {name: get_executor().submit(timed, fn) for name, fn in stages.items()}
+        for name, future in futures.items():
+            try:
+                results[name], duration = future.result()
+                if timings is not None:
+                    timings[name] = round(duration, 3)
+            except Exception as e:
+                errors[name] = e
+
+    for name in stages:
+        if name in errors:
+            raise errors[name]
+
+    return results
+
+def iter_concurrently(stages, max_workers=None):
+    """
+    Run independent stages concurrently and yield each one as it finishes.
+
+    Stages start in the given order with at most max_workers running at once,
+    so earlier stages (e.g. high-priority work) are never queued behind later ones.
+    Stages submitted from inside a stage worker run inline, in order.
+
+    Args:
+        stages (dict): Ordered mapping of stage name to a zero-argument callable
+        max_workers (int, optional): Maximum stages running at once (default: the pool size)
+
+    Yields:
+        tuple: (name, result, error) in completion order; error is the stage's
+               exception (result is then None) or None
+    """
+    if len(stages) <= 1 or in_worker_thread():
+        for name, fn in stages.items():
+            try:
+                yield name, fn(), None
+            except Exception as e:
+                yield name, None, e
+        return
+
+    max_workers = max(1, min(max_workers or MAX_STAGE_WORKERS, MAX_STAGE_WORKERS))
+    pending = iter(stages.items())
+    running = {}
+    try:
+        while True:
+            while len(running) < max_workers:
+                item = next(pending, None)
+                if item is None:
+                    break
+                running[get_executor().submit(item[1])] = item[0]
+            if not running:
+                return
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in [future for future in running if future in done]:
+                name = running.pop(future)
+                try:
+                    yield name, future.result(), None
+                except Exception as e:
+                    yield name, None, e
+    finally:
+        # The consumer stopped early: don't start what is still queued
+        for future in running:
+            future.cancel()
+
+async def aiter_concurrently(stages, max_workers=None):
+    """
+    Async version of iter_concurrently(); stages return awaitables.
+
+    Yields:
+        tuple: (name, result, error) in completion order
+    """
+    semaphore = asyncio.Semaphore(max(1, max_workers or MAX_STAGE_WORKERS))
+
+    async def run(name, fn):
+        async with semaphore:
+            try:
+                return name, await fn(), None
+            except Exception as e:
+                return name, None, e
+
+    tasks = [asyncio.ensure_future(run(name, fn)) for name, fn in stages.items()]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+def _get_speculative_executor():
+    # Separate from the stage pool, so stages can speculate without running inline
+    global _speculative_executor
+    if _speculative_executor is None:
+        with _executor_lock:
+            if _speculative_executor is None:
+                _speculative_executor = ThreadPoolExecutor(
+                    max_workers=MAX_STAGE_WORKERS * 2,
+                    thread_name_prefix="llm-speculative",
+                    initializer=_mark_speculative_worker
+                )
+    return _speculative_executor
+
+def _check_result(name, result, validators):
+    try:
+        return bool(validators.get(name, bool)(result))
+    except Exception as e:
+        print(f"Validator for strategy '{name}' failed: {str(e)}")
+        return False
+
+def run_speculatively(strategies, validators=None, outcomes=None):
+    """
+    Run alternative strategies in order of preference and return the first usable result.
+
+    By default each strategy starts only after the previous one failed or gave an
+    unusable result. With LLM_SPECULATIVE_FALLBACK=on, the next strategy also
+    starts once the current one has run for LLM_SPECULATIVE_DELAY seconds, so a
+    slow primary doesn't have to fail before its fallback begins; that costs an
+    extra paid call whenever it happens. A strategy's result is still only used
+    once every preferred strategy has finished without a usable one. When the
+    choice is made, strategies that are no longer needed are cancelled: queued
+    ones never start and running ones have their upstream connection closed.
+
+    Called from a speculative worker, strategies always run one after another.
+
+    Args:
+        strategies (dict): Ordered mapping of strategy name to a zero-argument callable
+        validators (dict, optional): Mapping of strategy name to a callable that
+            takes the result and returns True if it is usable (default: truthiness)
+        outcomes (dict, optional): Receives the result or exception of each strategy
+            that finished before the choice was made
+
+    Returns:
+        tuple: (name, result) of the chosen strategy, or (None, None) if none was usable
+    """
+    validators = validators or {}
+    outcomes = outcomes if outcomes is not None else {}
+
+    if not SPECULATIVE_FALLBACK or len(strategies) <= 1 or getattr(_worker_state, "is_speculative", False):
+        for name, fn in strategies.items():
+            try:
+                outcomes[name] = fn()
+            except Exception as e:
+                print(f"Strategy '{name}' failed: {str(e)}")
+                outcomes[name] = e
+                continue
+            if _check_result(name, outcomes[name], validators):
+                return name, outcomes[name]
+        return None, None
+
+    executor = _get_speculative_executor()
+    names = list(strategies)
+    cancellations = {name: Cancellation() for name in names}
+    futures = {}
+
+    def start(name):
+        futures[name] = executor.submit(_run_strategy, strategies[name], cancellations[name])
+
+    try:
+        for index, name in enumerate(names):
+            if name not in futures:
+                # Every preferred strategy failed before its fallback was due
+                start(name)
+            future = futures[name]
+
+            following = names[index + 1] if index + 1 < len(names) else None
+            if following is not None and following not in futures:
+                done, _ = wait([future], timeout=SPECULATIVE_DELAY)
+                if not done:
+                    print(f"Strategy '{name}' still running after {SPECULATIVE_DELAY:.1f}s, starting '{following}'")
+                    start(following)
+
+            try:
+                outcomes[name] = future.result()
+            except Exception as e:
+                print(f"Strategy '{name}' failed: {str(e)}")
+                outcomes[name] = e
+                continue
+            if _check_result(name, outcomes[name], validators):
+                return name, outcomes[name]
+        return None, None
+    finally:
+        for name, future in futures.items():
+            future.cancel()
+            cancellations[name].set()
+
+async def arun_speculatively(strategies, validators=None, outcomes=None):
+    """
+    Async version of run_speculatively(); strategies return awaitables and the
+    ones that are no longer needed are cancelled.
+
+    Returns:
+        tuple: (name, result) of the chosen strategy, or (None, None) if none was usable
+    """
+    validators = validators or {}
+    outcomes = outcomes if outcomes is not None else {}
+
+    names = list(strategies)
+    tasks = {}
+    try:
+        for index, name in enumerate(names):
+            if name not in tasks:
+                tasks[name] = asyncio.ensure_future(strategies[name]())
+            task = tasks[name]
+
+            following = names[index + 1] if index + 1 < len(names) else None
+            if SPECULATIVE_FALLBACK and following is not None and following not in tasks:
+                done, _ = await asyncio.wait([task], timeout=SPECULATIVE_DELAY)
+                if not done:
+                    print(f"Strategy '{name}' still running after {SPECULATIVE_DELAY:.1f}s, starting '{following}'")
+                    tasks[following] = asyncio.ensure_future(strategies[following]())
+
+            try:
+                outcomes[name] = await task
+            except Exception as e:
+                print(f"Strategy '{name}' failed: {str(e)}")
+                outcomes[name] = e
+                continue
+            if _check_result(name, outcomes[name], validators):
+                return name, outcomes[name]
+        return None, None
+    finally:
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
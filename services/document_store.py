@@ -0,0 +1,129 @@
+"""
+Document Store Module
+
+This module keeps uploaded resumes and job descriptions under their content
+hash, so the frontend can send a short reference (resume_ref / jd_ref) instead
+of re-posting the same tens of kilobytes with every call in a session.
+
+Documents are stored in a cache backend (SQLite by default, shared by every
+worker process), bounded by total size with least recently used documents
+evicted first. A reference to an evicted document raises UnknownDocumentError
+and the client uploads the document again. The reference is the same SHA-256
+hex digest the resume index uses, so per-document caches line up with it.
+"""
+
+import os
+import re
+import hashlib
+from services.cache_service import DATA_DIR, create_cache_backend
+from services.resume_index import cached_resume_text
+
+# Largest document accepted by /upload, in bytes
+DOCUMENT_MAX_BYTES = int(os.getenv("DOCUMENT_MAX_BYTES", 1024 * 1024))
+
+_REF = re.compile(r"^[0-9a-f]{64}$")
+
+class UnknownDocumentError(Exception):
+    """Raised when a document reference is malformed or its document is not (or no longer) stored."""
+
+    def __init__(self, ref):
+        super().__init__(f"Unknown document reference: {ref}")
+        self.ref = ref
+
+def document_hash(text):
+    """
+    Hash a document's content.
+
+    Args:
+        text (str): The document text
+
+    Returns:
+        str: Hex SHA-256 digest, used as the document's reference
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def create_document_store():
+    """
+    Create the document store from environment variables.
+
+    Environment variables:
+        DOCUMENT_STORE_BACKEND: "sqlite" (default), "memory" or "none"
+        DOCUMENT_STORE_PATH: Path of the SQLite database file
+        DOCUMENT_STORE_MAX_BYTES: Maximum total size of stored documents (default 64 MB)
+        DOCUMENT_STORE_TTL: Seconds a document is kept, 0 for no expiry (default 30 days)
+
+    Returns:
+        CacheBackend: The store, or None if uploads are disabled
+    """
+    return create_cache_backend(
+        backend=os.getenv("DOCUMENT_STORE_BACKEND", "sqlite"),
+        path=os.getenv("DOCUMENT_STORE_PATH", os.path.join(DATA_DIR, "documents.sqlite3")),
+        max_bytes=int(os.getenv("DOCUMENT_STORE_MAX_BYTES", 64 * 1024 * 1024)),
+        ttl=float(os.getenv("DOCUMENT_STORE_TTL", 30 * 24 * 3600))
+    )
+
+_store = create_document_store()
+
+def store_document(text):
+    """
+    Store a document under its content hash.
+
+    Args:
+        text (str): The document text
+
+    Returns:
+        str: The document's reference
+
+    Raises:
+        RuntimeError: If uploads are disabled
+        ValueError: If the document is larger than DOCUMENT_MAX_BYTES
+    """
+    if _store is None:
+        raise RuntimeError("Document uploads are disabled")
+    if len(text.encode("utf-8")) > DOCUMENT_MAX_BYTES:
+        raise ValueError(f"Document is larger than {DOCUMENT_MAX_BYTES} bytes")
+
+    ref = document_hash(text)
+    # Uploading the same document again only refreshes it
+    if _store.get(ref) is None:
+        _store.set(ref, text)
+    return ref
+
+def load_document(ref):
+    """
+    Get a stored document by reference.
+
+    Args:
+        ref (str): The document's reference
+
+    Returns:
+        str: The document text
+
+    Raises:
+        UnknownDocumentError: If the reference is malformed or the document is not stored
+    """
+    ref = (ref or "").strip().lower()
+    if not _REF.match(ref):
+        raise UnknownDocumentError(ref)
+
+    # A resume parsed recently is still in memory with its text
+    text = cached_resume_text(ref)
+    if text is None and _store is not None:
+        text = _store.get(ref)
+    if text is None:
+        raise UnknownDocumentError(ref)
+    return text
+
+def get_document_store_stats():
+    """
+    Report document store counters.
+
+    Returns:
+        dict: Store counters, or {"backend": "none"} if uploads are disabled
+    """
+    if _store is None:
+        return {"backend": "none"}
+    try:
+        return _store.stats()
+    except Exception as e:
+        return {"error": str(e)}
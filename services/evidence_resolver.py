@@ -0,0 +1,210 @@
+"""
+Evidence Resolver Module
+
+This module finds evidence for keywords in the resume without the model when
+the match is unambiguous. Many keywords ("SQL", "Salesforce", "stakeholder
+management") appear in the resume verbatim or in another inflection, and a
+round-trip to the model only confirms what a scan of the resume already shows.
+
+A keyword is resolved locally when it occurs as whole words in a bullet,
+sentence or heading (exact match), or when every content word of a multi-word
+keyword occurs stemmed within a short window of one bullet or sentence
+("Managed stakeholders" for "stakeholder management"; fuzzy match). The
+keyword's own words in another order ("leadership team") don't count. The
+citation is that bullet or sentence and the exact phrase is the matched text.
+Everything else, including synonyms and single words that only match after
+stemming, is left for the model.
+"""
+
+import os
+import re
+import time
+import threading
+from services.resume_index import get_resume_index
+from services.resume_retrieval import query_terms
+
+# Resolve verbatim and inflected keyword matches without the model (on or off)
+LOCAL_RESOLUTION = os.getenv("EVIDENCE_LOCAL_RESOLUTION", "on").lower() != "off"
+
+# Extra words allowed between the words of a fuzzy match
+FUZZY_GAP = int(os.getenv("EVIDENCE_FUZZY_GAP", 2))
+
+_WORD = re.compile(r"\w+")
+
+# Preferred kinds of segment for a citation, best first
+_KIND_RANK = {"bullet": 0, "sentence": 1, "heading": 2}
+
+# Single-word skills that are also everyday words ("excel at", "Spring hiring drive")
+_COMMON_WORD_SKILLS = {
+    "access", "ant", "bash", "chef", "dart", "elm", "excel", "express", "go", "hive",
+    "julia", "lean", "make", "notion", "oracle", "outlook", "pig", "puppet", "react",
+    "ruby", "rust", "salt", "shell", "sketch", "slack", "spark", "spring", "swift",
+    "teams", "word", "zoom"
+}
+
+# Characters that join a word into a larger term ("R&D", "C-suite")
+_JOINERS = "&-"
+
+_lock = threading.Lock()
+_stats = {
+    "keywords": 0,
+    "exact": 0,
+    "fuzzy": 0,
+    "calls": 0,
+    "calls_avoided": 0,
+    "local_seconds": 0.0,
+    "model_calls": 0,
+    "model_seconds": 0.0
+}
+
+def resolve_locally(resume_text, keywords):
+    """
+    Find evidence for the keywords in the resume without calling the model.
+
+    Args:
+        resume_text (str): The resume text
+        keywords (list): The keywords to find evidence for
+
+    Returns:
+        tuple: (resolved, unresolved) - A dictionary mapping each resolved keyword to a
+               citation object with citation and exact_phrase, and the list of
+               keywords that still need the model
+    """
+    keywords = [keyword for keyword in keywords if isinstance(keyword, str) and keyword.strip()]
+    if not LOCAL_RESOLUTION or not keywords:
+        return {}, keywords
+
+    start_time = time.perf_counter()
+    index = get_resume_index(resume_text)
+    resolved = {}
+    kinds = {}
+
+    # Exact whole-word matches, preferring a bullet over a sentence over a heading
+    best = {}
+    for start, end, keyword in index.matches(keywords):
+        segment = index.segment_at(start)
+        if segment is None or end > segment.end or not _is_unambiguous(keyword, index.text, start, end):
+            continue
+        rank = (_KIND_RANK.get(segment.kind, 3), start)
+        if keyword not in best or rank < best[keyword][0]:
+            best[keyword] = (rank, segment, index.text[start:end])
+    for keyword, (_, segment, phrase) in best.items():
+        resolved[keyword] = {"citation": segment.text, "exact_phrase": phrase}
+        kinds[keyword] = "exact"
+
+    # Stemmed, any-order matches of multi-word keywords
+    for keyword in keywords:
+        if keyword in resolved:
+            continue
+        match = _fuzzy_match(index, keyword)
+        if match is not None:
+            segment, start, end = match
+            resolved[keyword] = {"citation": segment.text, "exact_phrase": index.text[start:end]}
+            kinds[keyword] = "fuzzy"
+
+    unresolved = [keyword for keyword in keywords if keyword not in resolved]
+    with _lock:
+        _stats["keywords"] += len(keywords)
+        _stats["exact"] += sum(1 for kind in kinds.values() if kind == "exact")
+        _stats["fuzzy"] += sum(1 for kind in kinds.values() if kind == "fuzzy")
+        _stats["calls"] += 1
+        _stats["calls_avoided"] += not unresolved
+        _stats["local_seconds"] += time.perf_counter() - start_time
+    return resolved, unresolved
+
+def _is_unambiguous(keyword, text, start, end):
+    """Check that an exact match of a single-word keyword is the skill and not an ordinary word."""
+    words = _WORD.findall(keyword)
+    if len(words) != 1:
+        return True
+    word = words[0]
+    if word.lower() in _COMMON_WORD_SKILLS:
+        return False
+    if (start > 0 and text[start - 1] in _JOINERS) or (end < len(text) and text[end] in _JOINERS):
+        return False
+    if len(word) <= 3 or word.isupper() or word.istitle():
+        # An acronym written in capitals in the resume still counts for a lowercase keyword
+        matched = text[start:end]
+        return matched == keyword or (matched.isupper() and not keyword.isupper())
+    return True
+
+def _fuzzy_match(index, keyword):
+    """Find the shortest window of a bullet or sentence holding every content stem of the keyword."""
+    ordered_stems = query_terms(keyword)
+    stems = set(ordered_stems)
+    if len(stems) < 2:
+        return None
+    words = {word.lower() for word in _WORD.findall(keyword)}
+
+    best = None
+    for segment, tokens in zip(index.segments, index.stemmed_tokens()):
+        if segment.kind == "heading":
+            continue
+        positions = [position for position, (token_stem, _, _) in enumerate(tokens) if token_stem in stems]
+        if len({tokens[position][0] for position in positions}) < len(stems):
+            continue
+
+        # Shortest run of tokens that covers every stem
+        for first_index, first in enumerate(positions):
+            needed = set(stems)
+            for position in positions[first_index:]:
+                needed.discard(tokens[position][0])
+                if not needed:
+                    width = position - first + 1
+                    if (width <= len(stems) + FUZZY_GAP and (best is None or width < best[0])
+                            and not _is_swapped_compound(index, tokens[first:position + 1], ordered_stems, words)):
+                        best = (width, segment, tokens[first][1], tokens[position][2])
+                    break
+        if best is not None and best[0] == len(stems):
+            break
+
+    return None if best is None else best[1:]
+
+def _is_swapped_compound(index, window, ordered_stems, words):
+    """
+    Check for the keyword's own words in another order ("leadership team" for
+    "team leadership"), which names something else. A reordering is only
+    accepted with an inflection ("Managed stakeholders" for "stakeholder management").
+    """
+    matched = [(token_stem, index.text[start:end].lower()) for token_stem, start, end in window if token_stem in ordered_stems]
+    in_order = [token_stem for token_stem in ordered_stems if token_stem in {stem for stem, _ in matched}]
+    if [stem for stem, _ in matched][:len(in_order)] == in_order:
+        return False
+    return all(word in words for _, word in matched)
+
+def record_model_call(seconds):
+    """
+    Record the duration of a model call made for keywords that could not be resolved locally.
+
+    Args:
+        seconds (float): Duration of the call
+    """
+    with _lock:
+        _stats["model_calls"] += 1
+        _stats["model_seconds"] += seconds
+
+def get_resolver_stats():
+    """
+    Report local resolution counters.
+
+    The latency saved is estimated as the calls that needed no model round-trip
+    times the average duration of the model calls that were still made.
+
+    Returns:
+        dict: Keywords seen, exact and fuzzy resolutions, the local-resolution rate,
+              model calls avoided and the estimated latency saved
+    """
+    with _lock:
+        stats = dict(_stats)
+    resolved = stats["exact"] + stats["fuzzy"]
+    average_model_seconds = stats["model_seconds"] / stats["model_calls"] if stats["model_calls"] else 0.0
+    stats.update({
+        "enabled": LOCAL_RESOLUTION,
+        "resolved": resolved,
+        "local_resolution_rate": round(resolved / stats["keywords"], 3) if stats["keywords"] else 0.0,
+        "local_seconds": round(stats["local_seconds"], 4),
+        "model_seconds": round(stats["model_seconds"], 3),
+        "average_model_seconds": round(average_model_seconds, 3),
+        "estimated_seconds_saved": round(stats["calls_avoided"] * average_model_seconds, 3)
+    })
+    return stats
@@ -0,0 +1,285 @@
+"""
+Evidence Store Module
+
+This module remembers the citation found for each (resume, keyword) pair.
+A citation depends only on the resume and the keyword, not on the job title,
+company or the other keywords in the prompt, so evidence found for one job
+description is reused for every later job description that asks for the same
+keyword against the same resume. Only keywords the store has never seen for a
+resume are sent to the model.
+
+Keywords the model checked against the whole resume and found no evidence
+for are stored too (as a miss), so they are not asked about again until the
+miss expires. A prompt that only saw retrieved excerpts stores no misses.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from services.cache_service import DATA_DIR, get_connection
+
+def normalize_keyword(keyword):
+    """
+    Normalize a keyword for evidence lookups ("Project  Management" -> "project management").
+
+    Args:
+        keyword (str): The keyword
+
+    Returns:
+        str: Lowercase keyword with collapsed whitespace and no surrounding quotes
+    """
+    return re.sub(r"\s+", " ", keyword.strip().strip("\"'`").strip()).lower()
+
+class EvidenceStore:
+    """
+    Interface for evidence stores.
+
+    lookup() returns {keyword: citation} for the keywords the store knows,
+    where citation is None for a stored miss; unknown keywords are left out.
+    """
+
+    def lookup(self, resume_hash, keywords):
+        raise NotImplementedError
+
+    def save(self, resume_hash, evidence):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+class MemoryEvidenceStore(EvidenceStore):
+    """
+    Per-process evidence store bounded by entry count, least recently used evicted first.
+    """
+
+    def __init__(self, max_entries=100000, miss_ttl=0):
+        """
+        Args:
+            max_entries (int): Maximum number of stored (resume, keyword) pairs
+            miss_ttl (float): Seconds before a stored miss expires (0 disables expiry)
+        """
+        self.max_entries = max_entries
+        self.miss_ttl = miss_ttl
+        self._entries = OrderedDict()  # (resume_hash, keyword) -> (citation, created_at)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "saved": 0}
+
+    def lookup(self, resume_hash, keywords):
+        now = time.time()
+        found = {}
+        with self._lock:
+            for keyword in keywords:
+                key = (resume_hash, normalize_keyword(keyword))
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] is None and self.miss_ttl and now - entry[1] > self.miss_ttl:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    self._counters["misses"] += 1
+                    continue
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                found[keyword] = entry[0]
+        return found
+
+    def save(self, resume_hash, evidence):
+        now = time.time()
+        with self._lock:
+            for keyword, citation in evidence.items():
+                key = (resume_hash, normalize_keyword(keyword))
+                self._entries.pop(key, None)
+                self._entries[key] = (citation, now)
+                self._counters["saved"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "backend": "memory",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "miss_ttl": self.miss_ttl
+            })
+            return stats
+
+class SQLiteEvidenceStore(EvidenceStore):
+    """
+    Disk-backed evidence store shared by every worker process and kept across restarts.
+    """
+
+    def __init__(self, path, max_entries=100000, miss_ttl=0):
+        """
+        Args:
+            path (str): Path to the SQLite database file
+            max_entries (int): Maximum number of stored (resume, keyword) pairs
+            miss_ttl (float): Seconds before a stored miss expires (0 disables expiry)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "saved": 0}
+        self._initialize()
+
+    def _connection(self):
+        return get_connection(self.path)
+
+    def _initialize(self):
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_evidence (
+                resume_hash TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                citation TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (resume_hash, keyword)
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS keyword_evidence_created ON keyword_evidence (created_at)")
+
+    def lookup(self, resume_hash, keywords):
+        normalized = {}
+        for keyword in keywords:
+            normalized.setdefault(normalize_keyword(keyword), []).append(keyword)
+        if not normalized:
+            return {}
+
+        connection = self._connection()
+        names = list(normalized)
+        rows = []
+        # Stay under SQLite's bound parameter limit
+        for offset in range(0, len(names), 500):
+            chunk = names[offset:offset + 500]
+            rows += connection.execute(
+                f"SELECT keyword, citation, created_at FROM keyword_evidence "
+                f"WHERE resume_hash = ? AND keyword IN ({', '.join('?' * len(chunk))})",
+                [resume_hash] + chunk
+            ).fetchall()
+
+        now = time.time()
+        found = {}
+        for name, citation, created_at in rows:
+            if citation is None and self.miss_ttl and now - created_at > self.miss_ttl:
+                continue
+            value = None if citation is None else json.loads(citation)
+            for keyword in normalized[name]:
+                found[keyword] = value
+
+        with self._lock:
+            self._counters["hits"] += len(found)
+            self._counters["misses"] += len(keywords) - len(found)
+        return found
+
+    def save(self, resume_hash, evidence):
+        if not evidence:
+            return
+        connection = self._connection()
+        now = time.time()
+        rows = [
+            (resume_hash, normalize_keyword(keyword), None if citation is None else json.dumps(citation), now)
+            for keyword, citation in evidence.items()
+        ]
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO keyword_evidence (resume_hash, keyword, citation, created_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            # Drop the oldest entries once over the bound
+            excess = connection.execute("SELECT COUNT(*) FROM keyword_evidence").fetchone()[0] - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM keyword_evidence WHERE rowid IN "
+                    "(SELECT rowid FROM keyword_evidence ORDER BY created_at LIMIT ?)",
+                    (excess,)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            self._counters["saved"] += len(rows)
+
+    def stats(self):
+        connection = self._connection()
+        entries, stored_misses = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(citation IS NULL), 0) FROM keyword_evidence"
+        ).fetchone()
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update({
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "stored_misses": stored_misses,
+            "max_entries": self.max_entries,
+            "miss_ttl": self.miss_ttl
+        })
+        return stats
+
+def create_evidence_store(backend=None, path=None, max_entries=None, miss_ttl=None):
+    """
+    Create an evidence store from arguments or environment variables.
+
+    Environment variables:
+        EVIDENCE_STORE_BACKEND: "sqlite" (default), "memory" or "none"
+        EVIDENCE_STORE_PATH: Path of the SQLite database file
+        EVIDENCE_STORE_MAX_ENTRIES: Maximum stored (resume, keyword) pairs (default 100000)
+        EVIDENCE_STORE_MISS_TTL: Seconds before a "no evidence" answer is asked again (default 7 days)
+
+    Args:
+        backend (str, optional): Backend name, overrides EVIDENCE_STORE_BACKEND
+        path (str, optional): SQLite path, overrides EVIDENCE_STORE_PATH
+        max_entries (int, optional): Size bound, overrides EVIDENCE_STORE_MAX_ENTRIES
+        miss_ttl (float, optional): Miss lifetime, overrides EVIDENCE_STORE_MISS_TTL
+
+    Returns:
+        EvidenceStore: The evidence store, or None if it is disabled
+    """
+    backend = (backend or os.getenv("EVIDENCE_STORE_BACKEND", "sqlite")).lower()
+    path = path or os.getenv("EVIDENCE_STORE_PATH", os.path.join(DATA_DIR, "evidence.sqlite3"))
+    max_entries = max_entries if max_entries is not None else int(os.getenv("EVIDENCE_STORE_MAX_ENTRIES", 100000))
+    miss_ttl = miss_ttl if miss_ttl is not None else float(os.getenv("EVIDENCE_STORE_MISS_TTL", 7 * 24 * 3600))
+
+    if backend == "none":
+        return None
+
+    if backend == "sqlite":
+        try:
+            return SQLiteEvidenceStore(path, max_entries=max_entries, miss_ttl=miss_ttl)
+        except Exception as e:
+            print(f"Error opening SQLite evidence store at {path}, falling back to memory: {str(e)}")
+
+    return MemoryEvidenceStore(max_entries=max_entries, miss_ttl=miss_ttl)
+
+_store = create_evidence_store()
+
+def get_evidence_store():
+    """
+    Get the process-wide evidence store.
+
+    Returns:
+        EvidenceStore: The store, or None if it is disabled
+    """
+    return _store
+
+def get_evidence_store_stats():
+    """
+    Report evidence store counters.
+
+    Returns:
+        dict: Store counters, or {"backend": "none"} if it is disabled
+    """
+    if _store is None:
+        return {"backend": "none"}
+    try:
+        return _store.stats()
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,448 @@
+"""
+Hedging Module
+
+This module implements hedged requests for slow LLM call sites. If the first
+attempt hasn't answered within a percentile of the site's recent latency, a
+duplicate is sent and whichever finishes first wins; the other is cancelled.
+Both attempts share the caller's latency budget: the hedge only gets the time
+the first attempt left, so a hedged call never runs longer than an unhedged one.
+
+The first attempt runs on the caller's thread and only the hedge goes to a
+thread pool. The hedge delay is counted from when the first attempt's request
+actually starts, so time spent waiting for an upstream slot doesn't trigger
+hedges.
+
+A small random control group of calls is never hedged, so the p99 with and
+without hedging can be compared on live traffic.
+"""
+
+import os
+import math
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def percentile(samples, p):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    Args:
+        samples (list): The samples
+        p (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or None if there are no samples
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class Cancellation:
+    """
+    Cancel signal for one hedged attempt.
+
+    Works like a threading.Event for polling (is_set), and also runs callbacks
+    registered with on_cancel as soon as it is set, so an attempt can close its
+    connection instead of noticing the cancel at its next chunk.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def on_cancel(self, callback):
+        """Call callback() when the attempt is cancelled (immediately if it already is)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error cancelling hedged attempt: {str(e)}")
+
+class HedgeAttempt(Cancellation):
+    """
+    One attempt of a hedged call: its cancel signal, plus when its request started.
+
+    An attempt that first waits for a slot under the upstream concurrency limit
+    calls mark_started() once it has one, so the wait neither triggers a hedge
+    nor counts as the site's latency.
+    """
+
+    def __init__(self, on_started=None):
+        super().__init__()
+        self.started_at = None
+        self._on_started = on_started
+
+    def mark_started(self):
+        """Record that the request is being sent (only the first call counts)."""
+        if self.started_at is not None:
+            return
+        self.started_at = time.time()
+        if self._on_started is not None:
+            self._on_started(self.started_at)
+
+class _Scheduler:
+    """Runs callbacks at given times on one background thread."""
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, when, callback):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="llm-hedge-timer", daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, (when, next(self._sequence), callback))
+            self._condition.notify()
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.time():
+                    self._condition.wait(self._heap[0][0] - time.time() if self._heap else None)
+                _, _, callback = heapq.heappop(self._heap)
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error starting hedged attempt: {str(e)}")
+
+class _Site:
+    """Latency history and counters for one call site."""
+
+    def __init__(self, window):
+        # Durations of individual attempts, used to pick the hedge delay. A cancelled
+        # attempt contributes the time it had run, so slow requests aren't forgotten.
+        self.attempts = deque(maxlen=window)
+        # Latency the caller saw, for hedge-eligible calls and for the control group
+        self.observed = deque(maxlen=window)
+        self.control = deque(maxlen=window)
+        self.counters = {"calls": 0, "control_calls": 0, "hedges_sent": 0, "hedge_wins": 0, "primary_wins": 0}
+
+class Hedger:
+    """
+    Sends a backup request when the first one is slower than usual.
+    """
+
+    def __init__(self, percentile=95, window=200, min_samples=20, min_delay=1.0, control_rate=0.05, enabled=True,
+                 max_workers=16):
+        """
+        Args:
+            percentile (float): Hedge once the first attempt has been running longer
+                than this percentile of the site's recent attempt latencies
+            window (int): Number of recent latencies kept per site
+            min_samples (int): Latencies needed before a site starts hedging
+            min_delay (float): Never hedge sooner than this many seconds
+            control_rate (float): Fraction of calls left unhedged as a control group
+            enabled (bool): If False, calls run unhedged (latencies are still recorded)
+            max_workers (int): Hedges running at once; the upstream concurrency limit is enough
+        """
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.control_rate = control_rate
+        self.enabled = enabled
+        self.max_workers = max(1, max_workers)
+        self._sites = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._scheduler = _Scheduler()
+
+    def _site(self, name):
+        with self._lock:
+            site = self._sites.get(name)
+            if site is None:
+                site = self._sites[name] = _Site(self.window)
+            return site
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-hedge")
+        return self._executor
+
+    def hedge_delay(self, name):
+        """
+        Seconds to wait for the first attempt before sending a hedge.
+
+        Args:
+            name (str): The call site
+
+        Returns:
+            float: The delay, or None if the site shouldn't hedge (yet)
+        """
+        if not self.enabled:
+            return None
+        site = self._site(name)
+        with self._lock:
+            if len(site.attempts) < self.min_samples:
+                return None
+            delay = percentile(list(site.attempts), self.percentile)
+        return max(delay, self.min_delay)
+
+    def _plan(self, name):
+        """Pick the hedge delay for a call; returns (site, delay, is_control)."""
+        site = self._site(name)
+        delay = self.hedge_delay(name)
+        if delay is not None and random.random() < self.control_rate:
+            return site, None, True
+        return site, delay, False
+
+    def _record(self, site, attempt_durations, observed, is_control=False, hedged=False, hedge_won=False):
+        with self._lock:
+            site.attempts.extend(attempt_durations)
+            site.counters["calls"] += 1
+            if is_control:
+                site.counters["control_calls"] += 1
+                site.control.append(observed)
+            else:
+                site.observed.append(observed)
+            if hedged:
+                site.counters["hedges_sent"] += 1
+                site.counters["hedge_wins" if hedge_won else "primary_wins"] += 1
+
+    def _record_winner(self, site, call_start, started, winner):
+        """Record a hedged call won by attempt number winner; started holds each attempt's start time."""
+        finished = time.time()
+        # Every attempt ran until the winner finished; the winner's duration is exact,
+        # the others' are how long they had run when cancelled (a hedge that never got
+        # to send its request has no start time and isn't recorded)
+        durations = [finished - attempt_start for attempt_start in started if attempt_start is not None]
+        self._record(site, durations, finished - call_start, hedged=len(started) > 1, hedge_won=winner > 0)
+
+    def run(self, name, attempt_fn, timeout=None):
+        """
+        Call attempt_fn, hedging with a second call if the first is slow.
+
+        The first attempt runs on the calling thread. If it is still running
+        hedge_delay seconds after its request started, a second attempt is
+        started on the hedging thread pool.
+
+        Args:
+            name (str): The call site, which has its own latency history
+            attempt_fn (callable): attempt_fn(attempt, remaining) makes one request
+                within remaining seconds (None for no limit). attempt is a HedgeAttempt:
+                attempt_fn calls attempt.mark_started() when it sends its request (an
+                attempt that never does is never hedged), should stop early (returning
+                anything) once attempt is set, and can register a callback with
+                attempt.on_cancel to close its connection.
+            timeout (float, optional): Latency budget in seconds shared by all attempts
+
+        Returns:
+            The result of whichever attempt finished first
+
+        Raises:
+            Exception: The primary attempt's error if every attempt failed
+        """
+        site, delay, is_control = self._plan(name)
+        call_start = time.time()
+        deadline = call_start + timeout if timeout is not None else None
+
+        if delay is None or (deadline is not None and delay >= timeout):
+            attempt = HedgeAttempt()
+            result = attempt_fn(attempt, timeout)
+            finished = time.time()
+            self._record(site, [finished - (attempt.started_at or call_start)], finished - call_start, is_control=is_control)
+            return result
+
+        lock = threading.Lock()
+        state = {"finished": False, "winner": None, "result": None, "hedge": None}
+        hedge_done = threading.Event()
+        hedge_attempt = HedgeAttempt()
+
+        def run_hedge(remaining):
+            try:
+                result = attempt_fn(hedge_attempt, remaining)
+            except Exception as e:
+                print(f"Hedged attempt for {name} failed: {str(e)}")
+            else:
+                with lock:
+                    won = state["winner"] is None
+                    if won:
+                        state["winner"], state["result"] = 1, result
+                if won:
+                    # Cancel (and close) the first attempt; the caller returns this result
+                    primary.set()
+            finally:
+                hedge_done.set()
+
+        def start_hedge():
+            with lock:
+                if state["finished"] or state["winner"] is not None:
+                    return
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return
+                print(f"Hedging {name} after {delay:.2f}s")
+                state["hedge"] = self._get_executor().submit(run_hedge, remaining)
+
+        primary = HedgeAttempt(on_started=lambda started_at: self._scheduler.schedule(started_at + delay, start_hedge))
+
+        try:
+            result = attempt_fn(primary, timeout)
+        except Exception as e:
+            with lock:
+                state["finished"] = True
+                hedged = state["hedge"] is not None
+            if hedged:
+                hedge_done.wait()
+            if state["winner"] != 1:
+                raise
+            primary_error = e
+            result = None
+        else:
+            primary_error = None
+            with lock:
+                state["finished"] = True
+                if state["winner"] is None:
+                    state["winner"], state["result"] = 0, result
+                hedged = state["hedge"] is not None
+
+        if state["winner"] == 0:
+            hedge_attempt.set()
+        elif primary_error is None:
+            # The hedge won and cancelled this attempt; its result is the one to return
+            hedge_done.wait()
+        started = [primary.started_at or call_start] + ([hedge_attempt.started_at] if hedged else [])
+        self._record_winner(site, call_start, started, state["winner"])
+        return state["result"]
+
+    async def arun(self, name, coroutine_fn, timeout=None):
+        """
+        Async version of run(): the losing attempt's task is cancelled.
+
+        Args:
+            name (str): The call site
+            coroutine_fn (callable): coroutine_fn(remaining) returns an awaitable that
+                makes one request within remaining seconds (None for no limit)
+            timeout (float, optional): Latency budget in seconds shared by all attempts
+
+        Returns:
+            The result of whichever attempt finished first
+        """
+        site, delay, is_control = self._plan(name)
+        start_time = time.time()
+        deadline = start_time + timeout if timeout is not None else None
+
+        if delay is None or (deadline is not None and delay >= timeout):
+            result = await coroutine_fn(timeout)
+            duration = time.time() - start_time
+            self._record(site, [duration], duration, is_control=is_control)
+            return result
+
+        started = [start_time]
+        tasks = [asyncio.ensure_future(coroutine_fn(timeout))]
+
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            print(f"Hedging {name} after {delay:.2f}s")
+            started.append(time.time())
+            remaining = deadline - started[-1] if deadline is not None else None
+            tasks.append(asyncio.ensure_future(coroutine_fn(remaining)))
+
+        pending = set(tasks)
+        errors = [None] * len(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = tasks.index(task)
+                    if task.exception() is not None:
+                        errors[index] = task.exception()
+                        continue
+
+                    self._record_winner(site, started[0], started, index)
+                    return task.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        raise errors[0] or errors[-1]
+
+    def stats(self):
+        """
+        Get hedging counters and latency percentiles per call site.
+
+        p99 is measured on hedge-eligible calls and p99_unhedged on the control
+        group; p99_improvement is the difference (None until both have samples).
+
+        Returns:
+            dict: Mapping of call site to its statistics
+        """
+        stats = {}
+        with self._lock:
+            sites = {name: (dict(site.counters), list(site.observed), list(site.control), len(site.attempts))
+                     for name, site in self._sites.items()}
+
+        for name, (counters, observed, control, samples) in sites.items():
+            p99 = percentile(observed, 99)
+            p99_unhedged = percentile(control, 99)
+            hedged_calls = counters["calls"] - counters["control_calls"]
+            counters.update({
+                "hedge_rate": round(counters["hedges_sent"] / hedged_calls, 3) if hedged_calls else 0,
+                "hedge_win_rate": round(counters["hedge_wins"] / counters["hedges_sent"], 3) if counters["hedges_sent"] else 0,
+                "p50": percentile(observed, 50),
+                "p99": p99,
+                "p99_unhedged": p99_unhedged,
+                "p99_improvement": p99_unhedged - p99 if p99 is not None and p99_unhedged is not None else None,
+                "hedge_delay": self.hedge_delay(name),
+                "latency_samples": samples
+            })
+            for key in ["p50", "p99", "p99_unhedged", "p99_improvement", "hedge_delay"]:
+                if counters[key] is not None:
+                    counters[key] = round(counters[key], 3)
+            stats[name] = counters
+        return stats
+
+def create_hedger():
+    """
+    Create a Hedger configured from environment variables.
+
+    Environment variables:
+        LLM_HEDGING: "on" (default) or "off"
+        LLM_HEDGE_PERCENTILE: Latency percentile after which to hedge (default 95)
+        LLM_HEDGE_WINDOW: Recent latencies kept per call site (default 200)
+        LLM_HEDGE_MIN_SAMPLES: Latencies needed before a site hedges (default 20)
+        LLM_HEDGE_MIN_DELAY: Minimum seconds before hedging (default 1)
+        LLM_HEDGE_CONTROL_RATE: Fraction of calls left unhedged for comparison (default 0.05)
+        LLM_MAX_CONCURRENCY: Hedges running at once, like upstream calls (default 16)
+
+    Returns:
+        Hedger: The configured hedger
+    """
+    return Hedger(
+        percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", 95)),
+        window=int(os.getenv("LLM_HEDGE_WINDOW", 200)),
+        min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20)),
+        min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", 1)),
+        control_rate=float(os.getenv("LLM_HEDGE_CONTROL_RATE", 0.05)),
+        enabled=os.getenv("LLM_HEDGING", "on").lower() != "off",
+        max_workers=int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+    )
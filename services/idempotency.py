@@ -0,0 +1,342 @@
+"""
+Idempotency Module
+
+This module lets the LLM-backed POST endpoints honor an Idempotency-Key
+header. Browser retries, proxy replays and double-submits of the same request
+would each start a fresh round of upstream calls, and the response cache
+doesn't catch them all (a temperature 0.7 prompt is worth calling again, but
+not for the same click). The first request with a key claims it and its
+response is stored; a duplicate that arrives while it is still running waits
+for it, and one that arrives later gets the stored response replayed.
+
+A key is bound to the request it was first used with: reusing it for a
+different request is rejected. Server errors (5xx) are not stored, so a retry
+after one runs again. A claim whose request never finished (its worker died)
+can be taken over after IDEMPOTENCY_PENDING_TIMEOUT.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from services.cache_service import DATA_DIR, get_connection
+
+# Outcomes of claiming a key
+CLAIMED = "claimed"
+PENDING = "pending"
+DONE = "done"
+MISMATCH = "mismatch"
+
+def request_fingerprint(method, path, fields):
+    """
+    Hash what identifies a request, to check that a reused key belongs to the same request.
+
+    Args:
+        method (str): The HTTP method
+        path (str): The request path
+        fields (list): (name, value) pairs of the request's form and query fields
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps([method, path, sorted(fields)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class IdempotencyStore:
+    """
+    Interface for idempotency stores.
+
+    claim() returns (outcome, response): CLAIMED if the caller now owns the key,
+    PENDING if another request holds it, DONE with the stored response, or
+    MISMATCH if the key was used for a different request. Responses are
+    dictionaries with status, body and mimetype.
+
+    peek() reports the same outcomes without writing, for a duplicate polling
+    while the original runs; its outcome is None when nobody holds the key
+    (the original was released or its claim expired) and claim() may take it.
+    """
+
+    def claim(self, key, fingerprint):
+        raise NotImplementedError
+
+    def peek(self, key, fingerprint):
+        raise NotImplementedError
+
+    def complete(self, key, response):
+        raise NotImplementedError
+
+    def release(self, key):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    Per-process idempotency store.
+    """
+
+    def __init__(self, ttl=24 * 3600, pending_timeout=300, max_entries=10000):
+        """
+        Args:
+            ttl (float): Seconds a stored response is replayed
+            pending_timeout (float): Seconds before an unfinished claim can be taken over
+            max_entries (int): Maximum stored keys; the oldest are dropped first
+        """
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (fingerprint, response or None, created_at)
+        self._lock = threading.Lock()
+        self._counters = {"claimed": 0, "replayed": 0, "pending_checks": 0, "mismatched": 0, "stored": 0}
+
+    def claim(self, key, fingerprint):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_fingerprint, response, created_at = entry
+                expired = now - created_at > (self.ttl if response is not None else self.pending_timeout)
+                if not expired:
+                    if stored_fingerprint != fingerprint:
+                        self._counters["mismatched"] += 1
+                        return MISMATCH, None
+                    if response is None:
+                        self._counters["pending_checks"] += 1
+                        return PENDING, None
+                    self._counters["replayed"] += 1
+                    return DONE, response
+
+            # Re-inserted at the end, so the dictionary stays in claim order
+            self._entries.pop(key, None)
+            self._entries[key] = (fingerprint, None, now)
+            self._counters["claimed"] += 1
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            return CLAIMED, None
+
+    def peek(self, key, fingerprint):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            stored_fingerprint, response, created_at = entry
+            if now - created_at > (self.ttl if response is not None else self.pending_timeout):
+                return None, None
+            if stored_fingerprint != fingerprint:
+                self._counters["mismatched"] += 1
+                return MISMATCH, None
+            if response is None:
+                return PENDING, None
+            self._counters["replayed"] += 1
+            return DONE, response
+
+    def complete(self, key, response):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], response, time.time())
+                self._counters["stored"] += 1
+
+    def release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is None:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "backend": "memory",
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "pending_timeout": self.pending_timeout
+            })
+            return stats
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """
+    Disk-backed idempotency store shared by every worker process, so a
+    duplicate is recognized whichever process it lands on.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, pending_timeout=300):
+        """
+        Args:
+            path (str): Path to the SQLite database file
+            ttl (float): Seconds a stored response is replayed
+            pending_timeout (float): Seconds before an unfinished claim can be taken over
+        """
+        self.path = path
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        self._lock = threading.Lock()
+        self._counters = {"claimed": 0, "replayed": 0, "pending_checks": 0, "mismatched": 0, "stored": 0}
+        self._initialize()
+
+    def _connection(self):
+        return get_connection(self.path)
+
+    def _initialize(self):
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                response TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS idempotency_keys_created ON idempotency_keys (created_at)")
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def claim(self, key, fingerprint):
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT fingerprint, response, created_at FROM idempotency_keys WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is not None:
+                stored_fingerprint, response, created_at = row
+                expired = now - created_at > (self.ttl if response is not None else self.pending_timeout)
+                if not expired:
+                    connection.execute("COMMIT")
+                    if stored_fingerprint != fingerprint:
+                        self._count("mismatched")
+                        return MISMATCH, None
+                    if response is None:
+                        self._count("pending_checks")
+                        return PENDING, None
+                    self._count("replayed")
+                    return DONE, json.loads(response)
+
+            connection.execute(
+                "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, response, created_at) VALUES (?, ?, NULL, ?)",
+                (key, fingerprint, now)
+            )
+            # Drop responses past their replay window
+            connection.execute(
+                "DELETE FROM idempotency_keys WHERE created_at < ?",
+                (now - max(self.ttl, self.pending_timeout),)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        self._count("claimed")
+        return CLAIMED, None
+
+    def peek(self, key, fingerprint):
+        # A plain read: polling must not queue behind (or hold up) claims for the write lock
+        row = self._connection().execute(
+            "SELECT fingerprint, response, created_at FROM idempotency_keys WHERE key = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        stored_fingerprint, response, created_at = row
+        if time.time() - created_at > (self.ttl if response is not None else self.pending_timeout):
+            return None, None
+        if stored_fingerprint != fingerprint:
+            self._count("mismatched")
+            return MISMATCH, None
+        if response is None:
+            return PENDING, None
+        self._count("replayed")
+        return DONE, json.loads(response)
+
+    def complete(self, key, response):
+        self._connection().execute(
+            "UPDATE idempotency_keys SET response = ?, created_at = ? WHERE key = ?",
+            (json.dumps(response), time.time(), key)
+        )
+        self._count("stored")
+
+    def release(self, key):
+        self._connection().execute("DELETE FROM idempotency_keys WHERE key = ? AND response IS NULL", (key,))
+
+    def stats(self):
+        entries, pending = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(response IS NULL), 0) FROM idempotency_keys"
+        ).fetchone()
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update({
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "pending": pending,
+            "ttl": self.ttl,
+            "pending_timeout": self.pending_timeout
+        })
+        return stats
+
+def create_idempotency_store(backend=None, path=None, ttl=None, pending_timeout=None):
+    """
+    Create an idempotency store from arguments or environment variables.
+
+    Environment variables:
+        IDEMPOTENCY_BACKEND: "sqlite" (default), "memory" or "none"
+        IDEMPOTENCY_PATH: Path of the SQLite database file
+        IDEMPOTENCY_TTL: Seconds a response is replayed to duplicates (default 1 day)
+        IDEMPOTENCY_PENDING_TIMEOUT: Seconds before an unfinished request's key can be reused (default 300)
+
+    Args:
+        backend (str, optional): Backend name, overrides IDEMPOTENCY_BACKEND
+        path (str, optional): SQLite path, overrides IDEMPOTENCY_PATH
+        ttl (float, optional): Replay window, overrides IDEMPOTENCY_TTL
+        pending_timeout (float, optional): Claim lifetime, overrides IDEMPOTENCY_PENDING_TIMEOUT
+
+    Returns:
+        IdempotencyStore: The store, or None if idempotency keys are ignored
+    """
+    backend = (backend or os.getenv("IDEMPOTENCY_BACKEND", "sqlite")).lower()
+    path = path or os.getenv("IDEMPOTENCY_PATH", os.path.join(DATA_DIR, "idempotency.sqlite3"))
+    ttl = ttl if ttl is not None else float(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))
+    pending_timeout = pending_timeout if pending_timeout is not None else float(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", 300))
+
+    if backend == "none":
+        return None
+
+    if backend == "sqlite":
+        try:
+            return SQLiteIdempotencyStore(path, ttl=ttl, pending_timeout=pending_timeout)
+        except Exception as e:
+            print(f"Error opening SQLite idempotency store at {path}, falling back to memory: {str(e)}")
+
+    return MemoryIdempotencyStore(ttl=ttl, pending_timeout=pending_timeout)
+
+_store = create_idempotency_store()
+
+def get_idempotency_store():
+    """
+    Get the process-wide idempotency store.
+
+    Returns:
+        IdempotencyStore: The store, or None if idempotency keys are ignored
+    """
+    return _store
+
+def get_idempotency_stats():
+    """
+    Report idempotency counters.
+
+    Returns:
+        dict: Store counters, or {"backend": "none"} if idempotency keys are ignored
+    """
+    if _store is None:
+        return {"backend": "none"}
+    try:
+        return _store.stats()
+    except Exception as e:
+        return {"error": str(e)}
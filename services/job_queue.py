@@ -0,0 +1,481 @@
+"""
+Job Queue Module
+
+This module runs long LLM pipelines (career profile, core competencies,
+keyword search in the resume) in the background, so the request that starts
+one returns at once and no web worker is held while the model answers. The
+client polls the job's status, which lists the pipeline stages finished so far,
+and fetches the result when it is done.
+
+Jobs live in a SQLite table shared by every worker process. A job is claimed
+by one background worker thread in any process, and its result stays in the
+table after it finishes, so it can be fetched from another process or after a
+restart. A job whose worker died (no heartbeat for JOB_STALE_SECONDS) is put
+back in the queue, up to JOB_MAX_ATTEMPTS runs.
+
+Cancelling a queued job removes it from the queue. A running job stops at the
+next stage boundary, since an LLM call in flight can't be interrupted.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from services.cache_service import DATA_DIR, get_connection
+
+# Job states; succeeded, failed and cancelled are final
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+class UnknownJobKindError(ValueError):
+    """Raised when a job is submitted for a kind that has no registered handler."""
+
+class JobCancelled(Exception):
+    """Raised inside a running job when it has been cancelled."""
+
+    def __init__(self, job_id):
+        super().__init__(f"Job {job_id} was cancelled")
+        self.job_id = job_id
+
+class JobProgress(dict):
+    """
+    Stage timings of a running job, saved to the job table as each stage finishes.
+
+    The pipelines already report finished stages through a stage_timings dict,
+    so passing this in its place makes their progress visible to pollers.
+    Setting a stage checks for cancellation and raises JobCancelled.
+    """
+
+    def __init__(self, queue, job_id):
+        super().__init__()
+        self._queue = queue
+        self._job_id = job_id
+
+    def __setitem__(self, stage, value):
+        super().__setitem__(stage, value)
+        if self._queue.save_progress(self._job_id, dict(self)):
+            raise JobCancelled(self._job_id)
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job has been cancelled, for handlers waiting between stages."""
+        if self._queue._cancel_requested(self._job_id):
+            raise JobCancelled(self._job_id)
+
+class JobQueue:
+    """
+    SQLite-backed job queue with a pool of background worker threads.
+    """
+
+    def __init__(self, path, workers=2, result_ttl=24 * 3600, stale_seconds=60, max_attempts=2, poll_interval=0.5):
+        """
+        Args:
+            path (str): Path to the SQLite database file
+            workers (int): Worker threads in this process
+            result_ttl (float): Seconds a finished job is kept (0 keeps it forever)
+            stale_seconds (float): Seconds without a heartbeat before a running job is presumed dead
+            max_attempts (int): Runs allowed for a job whose worker died
+            poll_interval (float): Seconds between idle workers' checks for jobs queued by other processes
+        """
+        self.path = path
+        self.workers = max(1, workers)
+        self.result_ttl = result_ttl
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers = {}
+        self._running = set()  # ids of jobs run by this process
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._counters = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0, "requeued": 0}
+        self._initialize()
+
+    def _connection(self):
+        return get_connection(self.path)
+
+    def _initialize(self):
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '{}',
+                result TEXT,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def register(self, kind, handler):
+        """
+        Register the function that runs jobs of a kind.
+
+        Args:
+            kind (str): The job kind
+            handler (callable): Called with (params, progress) in a worker thread; returns a
+                                JSON-serializable result and may record finished stages in progress
+        """
+        self._handlers[kind] = handler
+
+    def kinds(self):
+        """
+        List the registered job kinds.
+
+        Returns:
+            list: The job kinds
+        """
+        return list(self._handlers)
+
+    def start(self):
+        """Start the worker threads and the heartbeat thread, if not running yet."""
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind, params):
+        """
+        Queue a job.
+
+        Args:
+            kind (str): The job kind
+            params (dict): JSON-serializable arguments for the handler
+
+        Returns:
+            str: The job id
+
+        Raises:
+            UnknownJobKindError: If no handler is registered for the kind
+        """
+        if kind not in self._handlers:
+            raise UnknownJobKindError(f"Unknown job kind: {kind}")
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT INTO jobs (id, kind, status, params, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(params), now)
+        )
+        self._prune(connection, now)
+
+        with self._lock:
+            self._counters["submitted"] += 1
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id, include_result=False):
+        """
+        Get a job's status.
+
+        Args:
+            job_id (str): The job id
+            include_result (bool): Include the result (or error) of a finished job
+
+        Returns:
+            dict: id, kind, status, progress (finished stages and their seconds), attempts and
+                  timestamps, plus result and error if asked for; None if the job is unknown
+        """
+        row = self._connection().execute(
+            "SELECT id, kind, status, progress, result, error, attempts, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        job = {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "progress": json.loads(row[3]),
+            "attempts": row[6],
+            "created_at": row[7],
+            "started_at": row[8],
+            "finished_at": row[9]
+        }
+        if include_result:
+            job["result"] = None if row[4] is None else json.loads(row[4])
+            job["error"] = row[5]
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: a queued job at once, a running one at its next stage boundary.
+
+        Args:
+            job_id (str): The job id
+
+        Returns:
+            str: The job's status after the request, or None if the job is unknown
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            status = row[0]
+            if status == QUEUED:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ?",
+                    (CANCELLED, time.time(), job_id)
+                )
+                status = CANCELLED
+            elif status == RUNNING:
+                connection.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        if row[0] == QUEUED:
+            with self._lock:
+                self._counters["cancelled"] += 1
+        return status
+
+    def save_progress(self, job_id, progress):
+        """
+        Save a running job's progress and refresh its heartbeat.
+
+        Args:
+            job_id (str): The job id
+            progress (dict): Finished stages and their durations
+
+        Returns:
+            bool: True if the job has been cancelled
+        """
+        self._connection().execute(
+            "UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ?",
+            (json.dumps(progress), time.time(), job_id)
+        )
+        return self._cancel_requested(job_id)
+
+    def _cancel_requested(self, job_id):
+        row = self._connection().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def _claim(self):
+        """Take the oldest queued job, first putting back (or failing) jobs whose worker died."""
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            stale = connection.execute(
+                "SELECT id, attempts FROM jobs WHERE status = ? AND heartbeat_at < ?",
+                (RUNNING, now - self.stale_seconds)
+            ).fetchall()
+            for job_id, attempts in stale:
+                if attempts < self.max_attempts:
+                    connection.execute("UPDATE jobs SET status = ?, worker = NULL WHERE id = ?", (QUEUED, job_id))
+                else:
+                    connection.execute(
+                        "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                        (FAILED, f"Worker stopped responding after {attempts} attempts", now, job_id)
+                    )
+
+            row = connection.execute(
+                "SELECT id, kind, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, progress = '{}', "
+                    "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (RUNNING, self.worker_id, now, now, row[0])
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        if stale:
+            with self._lock:
+                self._counters["requeued"] += len(stale)
+        return row
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"Error claiming a job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            job_id, kind, params = job
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                self._run(job_id, kind, json.loads(params))
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    def _run(self, job_id, kind, params):
+        start_time = time.time()
+        status, result, error = SUCCEEDED, None, None
+        try:
+            handler = self._handlers.get(kind)
+            if handler is None:
+                raise UnknownJobKindError(f"Unknown job kind: {kind}")
+            result = handler(params, JobProgress(self, job_id))
+            # Cancelled during its last stage: the result is not wanted any more
+            if self._cancel_requested(job_id):
+                raise JobCancelled(job_id)
+        except JobCancelled:
+            status, result = CANCELLED, None
+        except Exception as e:
+            print(f"Error running {kind} job {job_id}: {str(e)}")
+            status, error = FAILED, str(e)
+
+        try:
+            # A job presumed dead and handed to another worker belongs to that worker now
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (status, None if result is None else json.dumps(result), error, time.time(), job_id, RUNNING, self.worker_id)
+            )
+        except Exception as e:
+            print(f"Error saving the result of job {job_id}: {str(e)}")
+            status = FAILED
+
+        with self._lock:
+            self._counters[status] += 1
+        print(f"{kind} job {job_id} {status} in {time.time() - start_time:.2f}s")
+
+    def _heartbeat(self):
+        # Keep running jobs from looking dead while a single stage takes long
+        while True:
+            time.sleep(max(1.0, self.stale_seconds / 4))
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                self._connection().executemany(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                    [(time.time(), job_id, RUNNING) for job_id in running]
+                )
+            except Exception as e:
+                print(f"Error updating job heartbeats: {str(e)}")
+
+    def _prune(self, connection, now):
+        if self.result_ttl:
+            connection.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINAL_STATES))}) AND finished_at < ?",
+                list(FINAL_STATES) + [now - self.result_ttl]
+            )
+
+    def stats(self):
+        """
+        Report job counters.
+
+        Returns:
+            dict: Jobs per status in the table, this process's counters and worker settings
+        """
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        with self._lock:
+            stats = dict(self._counters)
+            stats["running_here"] = len(self._running)
+        stats.update({
+            "backend": "sqlite",
+            "path": self.path,
+            "jobs": dict(rows),
+            "workers": self.workers,
+            "result_ttl": self.result_ttl,
+            "stale_seconds": self.stale_seconds,
+            "max_attempts": self.max_attempts
+        })
+        return stats
+
+def create_job_queue(backend=None, path=None):
+    """
+    Create the job queue from arguments or environment variables.
+
+    Environment variables:
+        JOB_QUEUE_BACKEND: "sqlite" (default) or "none" (background jobs disabled)
+        JOB_QUEUE_PATH: Path of the SQLite database file
+        JOB_WORKERS: Worker threads per process (default 2)
+        JOB_RESULT_TTL: Seconds a finished job and its result are kept (default 1 day)
+        JOB_STALE_SECONDS: Seconds without a heartbeat before a running job is run again (default 60)
+        JOB_MAX_ATTEMPTS: Runs allowed for a job whose worker died (default 2)
+
+    Args:
+        backend (str, optional): Backend name, overrides JOB_QUEUE_BACKEND
+        path (str, optional): SQLite path, overrides JOB_QUEUE_PATH
+
+    Returns:
+        JobQueue: The job queue, or None if it is disabled or can't be opened
+    """
+    backend = (backend or os.getenv("JOB_QUEUE_BACKEND", "sqlite")).lower()
+    path = path or os.getenv("JOB_QUEUE_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+
+    if backend == "none":
+        return None
+
+    try:
+        return JobQueue(
+            path,
+            workers=int(os.getenv("JOB_WORKERS", 2)),
+            result_ttl=float(os.getenv("JOB_RESULT_TTL", 24 * 3600)),
+            stale_seconds=float(os.getenv("JOB_STALE_SECONDS", 60)),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 2))
+        )
+    except Exception as e:
+        # Results must outlive the process, so there is no in-memory fallback
+        print(f"Error opening job queue at {path}, background jobs disabled: {str(e)}")
+        return None
+
+_queue = create_job_queue()
+
+def get_job_queue():
+    """
+    Get the shared job queue.
+
+    Returns:
+        JobQueue: The job queue, or None if background jobs are disabled
+    """
+    return _queue
+
+def get_job_queue_stats():
+    """
+    Report job queue counters.
+
+    Returns:
+        dict: Queue counters, or {"backend": "none"} if background jobs are disabled
+    """
+    if _queue is None:
+        return {"backend": "none"}
+    try:
+        return _queue.stats()
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,192 @@
+"""
+Citation Batcher Module
+
+This module folds single-keyword citation requests into multi-keyword prompts.
+The frontend asks /find-keyword-citation for one keyword at a time as the user
+adds keywords, and each request used to make its own LLM call with the whole
+resume. The batcher holds requests for the same resume for a few milliseconds,
+sends every keyword collected in that window in one citation prompt, and hands
+each waiting request its own answer.
+
+A batch is sent when it reaches the maximum size or when the oldest request in
+it has waited the maximum time, whichever comes first. Keywords already in the
+evidence store, or that the resume shows verbatim, are answered without
+joining a batch.
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+from services.evidence_store import normalize_keyword
+from services.evidence_resolver import resolve_locally
+from services.keyword.keyword_matching import CITATION_BATCH_SIZE, stored_citations, find_batch_citations
+
+# Keywords per batched citation prompt, never more than a regular citation batch
+# (a longer answer is more likely to be cut off at max_tokens)
+MICROBATCH_MAX_SIZE = int(os.getenv("CITATION_MICROBATCH_MAX_SIZE", 10))
+if CITATION_BATCH_SIZE > 0:
+    MICROBATCH_MAX_SIZE = min(MICROBATCH_MAX_SIZE, CITATION_BATCH_SIZE)
+
+# Milliseconds a request waits for others to join its batch (0 sends each request on its own)
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("CITATION_MICROBATCH_MAX_WAIT_MS", 20))
+
+class _Batch:
+    """Keywords waiting to be sent for one resume."""
+
+    def __init__(self, resume_text, resume_hash):
+        self.resume_text = resume_text
+        self.resume_hash = resume_hash
+        self.waiters = {}  # normalized keyword -> (keyword, [futures])
+        self.timer = None
+
+class CitationBatcher:
+    """
+    Collects single-keyword citation requests per resume and answers them with one prompt per batch.
+    """
+
+    def __init__(self, max_batch_size=16, max_wait_ms=20):
+        """
+        Args:
+            max_batch_size (int): Keywords per prompt
+            max_wait_ms (float): Milliseconds a request waits for others to join its batch
+        """
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._pending = {}  # resume hash -> _Batch
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "stored": 0, "local": 0, "batches": 0, "batched_keywords": 0, "failed_batches": 0}
+
+    def submit(self, resume_text, keyword):
+        """
+        Queue a keyword for a citation.
+
+        Args:
+            resume_text (str): The resume text
+            keyword (str): The keyword
+
+        Returns:
+            Future: Resolves to the citation (dict or str), or None if the model found no evidence
+        """
+        future = Future()
+        resume_hash, stored, missing = stored_citations(resume_text, [keyword])
+        local = resolve_locally(resume_text, missing)[0] if missing else {}
+
+        with self._lock:
+            self._counters["requests"] += 1
+            if keyword in stored:
+                self._counters["stored"] += 1
+                future.set_result(stored[keyword])
+                return future
+            if keyword in local:
+                self._counters["local"] += 1
+                future.set_result(local[keyword])
+                return future
+
+            batch = self._pending.get(resume_hash)
+            if batch is None:
+                batch = self._pending[resume_hash] = _Batch(resume_text, resume_hash)
+                if self.max_wait:
+                    batch.timer = threading.Timer(self.max_wait, self._flush, (batch,))
+                    batch.timer.daemon = True
+                    batch.timer.start()
+            batch.waiters.setdefault(normalize_keyword(keyword), (keyword, []))[1].append(future)
+            full = len(batch.waiters) >= self.max_batch_size or not self.max_wait
+
+        # The request that fills the batch sends it; the others wait on their futures
+        if full:
+            self._flush(batch)
+        return future
+
+    def find(self, resume_text, keyword, timeout=None):
+        """
+        Find the citation for one keyword, sharing a prompt with concurrent requests.
+
+        Args:
+            resume_text (str): The resume text
+            keyword (str): The keyword
+            timeout (float, optional): Seconds to wait for the answer
+
+        Returns:
+            dict or str: The citation, or None if the model found no evidence
+        """
+        return self.submit(resume_text, keyword).result(timeout)
+
+    def _flush(self, batch):
+        with self._lock:
+            # Already sent by the other trigger (size or timer)
+            if self._pending.get(batch.resume_hash) is not batch:
+                return
+            del self._pending[batch.resume_hash]
+            self._counters["batches"] += 1
+            self._counters["batched_keywords"] += len(batch.waiters)
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        keywords = [keyword for keyword, _ in batch.waiters.values()]
+        try:
+            organized_citations = find_batch_citations(keywords, batch.resume_text, {}, batch.resume_hash)
+            error = organized_citations.get("fallback_extraction", {}).get("error")
+            if error and len(organized_citations["fallback_extraction"]) == 1:
+                raise RuntimeError(error)
+        except Exception as e:
+            print(f"Error finding batched citations for {len(keywords)} keywords: {str(e)}")
+            with self._lock:
+                self._counters["failed_batches"] += 1
+            for _, futures in batch.waiters.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        # The model may echo a keyword with different casing or in its sanitized form
+        found = {}
+        for citations in organized_citations.values():
+            for keyword, citation in citations.items():
+                if keyword != "error":
+                    found.setdefault(normalize_keyword(keyword), citation)
+
+        for name, (_, futures) in batch.waiters.items():
+            for future in futures:
+                future.set_result(found.get(name))
+
+    def stats(self):
+        """
+        Report batching counters.
+
+        Returns:
+            dict: Requests, answers from the evidence store and local resolution, batches sent
+                  and average batch size
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "pending": len(self._pending),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "average_batch_size": round(stats["batched_keywords"] / stats["batches"], 2) if stats["batches"] else 0
+            })
+            return stats
+
+_batcher = CitationBatcher(MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS)
+
+def find_single_citation(resume_text, keyword, timeout=None):
+    """
+    Find the citation for one keyword through the shared batcher.
+
+    Args:
+        resume_text (str): The resume text
+        keyword (str): The keyword
+        timeout (float, optional): Seconds to wait for the answer
+
+    Returns:
+        dict or str: The citation, or None if the model found no evidence
+    """
+    return _batcher.find(resume_text, keyword, timeout)
+
+def get_citation_batching_stats():
+    """
+    Report citation batching counters.
+
+    Returns:
+        dict: Counters of the shared batcher
+    """
+    return _batcher.stats()
@@ -0,0 +1,204 @@
+"""
+Keyword Automaton Module
+
+This module finds many keywords in a text in one linear scan with an
+Aho-Corasick automaton, instead of compiling and running one regex per keyword.
+
+Matching is case-insensitive and respects word boundaries: the automaton runs
+over word, punctuation and whitespace tokens, so "Java" never matches inside
+"JavaScript", "C++" matches before a space, and any run of whitespace
+(including a line break) matches the space inside "machine learning".
+Compiled automata are cached by a hash of their keyword set.
+"""
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict, deque
+
+# Words, single punctuation characters and runs of whitespace
+_TOKEN = re.compile(r"\w+|\s+|[^\w\s]")
+
+# Compiled matchers kept in memory
+MATCHER_CACHE_SIZE = 128
+
+def keyword_tokens(keyword):
+    """
+    Split a keyword into the tokens the automaton matches.
+
+    Args:
+        keyword (str): The keyword
+
+    Returns:
+        tuple: Lowercase tokens, with whitespace runs collapsed to a single space
+    """
+    return tuple(" " if token[0].isspace() else token for token in _TOKEN.findall(keyword.strip().lower()))
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over tokens for a fixed set of keywords.
+
+    Example:
+        matcher = get_keyword_matcher(["Python", "machine learning"])
+        for start, end, keyword in matcher.find_all(text):
+            ...
+    """
+
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords (iterable): The keywords to match (empty ones are ignored)
+        """
+        self.keywords = []
+        # goto[state] maps a token to the next state; outputs[state] lists the
+        # (keyword, token_count) pairs that end in that state
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+
+        for keyword in keywords:
+            if not isinstance(keyword, str):
+                continue
+            tokens = keyword_tokens(keyword)
+            if not tokens:
+                continue
+            self.keywords.append(keyword)
+
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][token] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append((keyword, len(tokens)))
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        # Breadth-first, so a state's failure target is finished before the state itself
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # Keywords that are suffixes of this path also end here
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def find_all(self, text):
+        """
+        Find every occurrence of every keyword, including overlapping ones.
+
+        Args:
+            text (str): The text to search
+
+        Returns:
+            list: (start, end, keyword) tuples with character offsets into text,
+                ordered by end offset
+        """
+        if not text or not self.keywords:
+            return []
+
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        matches = []
+        starts = []
+        state = 0
+
+        for match in _TOKEN.finditer(text):
+            token = match.group()
+            token = " " if token[0].isspace() else token.lower()
+            starts.append(match.start())
+
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+
+            if outputs[state]:
+                end = match.end()
+                for keyword, token_count in outputs[state]:
+                    matches.append((starts[-token_count], end, keyword))
+
+        return matches
+
+    def find_longest(self, text):
+        """
+        Find non-overlapping occurrences, preferring the leftmost and then the longest.
+
+        Args:
+            text (str): The text to search
+
+        Returns:
+            list: (start, end, keyword) tuples ordered by start offset
+        """
+        spans = []
+        last_end = 0
+        for start, end, keyword in sorted(self.find_all(text), key=lambda match: (match[0], -match[1])):
+            if start >= last_end:
+                spans.append((start, end, keyword))
+                last_end = end
+        return spans
+
+    def found(self, text):
+        """
+        Find which keywords occur in the text.
+
+        Args:
+            text (str): The text to search
+
+        Returns:
+            set: The keywords with at least one occurrence
+        """
+        return {keyword for _, _, keyword in self.find_all(text)}
+
+_matchers = OrderedDict()
+_matchers_lock = threading.Lock()
+
+def keyword_set_hash(keywords):
+    """
+    Hash a set of keywords, independent of their order and duplicates.
+
+    Args:
+        keywords (iterable): The keywords
+
+    Returns:
+        str: Hex digest identifying the keyword set
+    """
+    unique = sorted({keyword for keyword in keywords if isinstance(keyword, str)})
+    return hashlib.sha256("\x1f".join(unique).encode("utf-8")).hexdigest()
+
+def get_keyword_matcher(keywords):
+    """
+    Get the compiled matcher for a set of keywords, building it on first use.
+
+    Args:
+        keywords (iterable): The keywords to match
+
+    Returns:
+        KeywordMatcher: The cached matcher
+    """
+    keywords = [keyword for keyword in keywords if isinstance(keyword, str)]
+    key = keyword_set_hash(keywords)
+
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is not None:
+            _matchers.move_to_end(key)
+            return matcher
+
+    matcher = KeywordMatcher(sorted(set(keywords)))
+
+    with _matchers_lock:
+        _matchers[key] = matcher
+        while len(_matchers) > MATCHER_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    return matcher
@@ -4,39 +4,32 @@ Keyword Extraction Module
 This module handles extracting keywords from job descriptions.
 """
 
+import os
 import time
-from services.openai_service import get_json_response
-from services.keyword.keyword_utils import log_debug, extract_keywords_regex
+from services.openai_service import get_json_response, stream_json_response
+from services.concurrency import run_speculatively
+from services.keyword.keyword_utils import log_debug, KeywordList
+from services.keyword.keyword_local import extract_keywords_local
 
-def extract_keywords_only(job_description, job_title=None, company_name=None, industry=None):
+# "llm" extracts keywords with the OpenAI API (falling back to the local extractor);
+# "local" uses only the local TF-IDF extractor
+KEYWORD_EXTRACTOR = os.getenv("KEYWORD_EXTRACTOR", "llm").lower()
+
+def build_keyword_extraction_messages(job_description, job_title_value, company_name_value, industry_value):
     """
-    Extract explicit keywords from the job description only, without checking the resume.
-    Ranked by priority based on placement, frequency, and context.
+    Build the messages for extracting prioritized keywords from a job description.
     
     Args:
         job_description (str): The job description text
-        job_title (str, optional): The job title (optional)
-        company_name (str, optional): The company name (optional)
-        industry (str, optional): The industry (optional)
+        job_title_value (str): The job title, or an empty string
+        company_name_value (str): The company name, or an empty string
+        industry_value (str): The industry, or an empty string
         
     Returns:
-        tuple: (keywords_data, all_keywords)
+        list: Message dictionaries for the OpenAI API
     """
-    try:
-        log_debug("Starting keyword extraction process (job description only)...")
-        start_time = time.time()
-        
-        # Get job title, company name, and industry if provided
-        job_title_value = job_title if job_title else ""
-        company_name_value = company_name if company_name else ""
-        industry_value = industry if industry else ""
-        
-        log_debug(f"Job Title: {job_title_value}")
-        log_debug(f"Company Name: {company_name_value}")
-        log_debug(f"Industry: {industry_value}")
-        
-        # Enhanced instructions for better keyword extraction from all types of job descriptions
-        prompt = f"""
+    # Enhanced instructions for better keyword extraction from all types of job descriptions
+    prompt = f"""
         You are an AI assistant specialized in extracting keywords and phrases from job descriptions for Applicant Tracking System (ATS) optimization. Your goal is to identify ALL skills, competencies, qualifications, and important concepts from the ENTIRE job description, including introductory paragraphs, responsibilities, requirements, and any other sections.
 
         IMPORTANT INSTRUCTIONS:
@@ -95,38 +88,44 @@ def extract_keywords_only(job_description, job_title=None, company_name=None, in
         {job_description}
         """
 
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant that extracts exact keywords from job descriptions for ATS."},
-            {"role": "user", "content": prompt}
-        ]
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that extracts exact keywords from job descriptions for ATS."},
+        {"role": "user", "content": prompt}
+    ]
+    
+    return messages
+
+def flatten_keywords(keywords_data):
+    """
+    Create a flat list of all keywords from each priority category.
+    
+    Args:
+        keywords_data (dict): Keywords data with high/medium/low_priority arrays
         
-        try:
-            log_debug("Calling OpenAI API to extract keywords...")
-            api_start_time = time.time()
-            
-            # Get the JSON response using the existing function
-            keywords_data = get_json_response(messages, max_tokens=1000, temperature=0.3)
-            
-            api_duration = time.time() - api_start_time
-            log_debug(f"OpenAI API call completed in {api_duration:.2f} seconds")
-            
-            # Create a flat list of all keywords from each priority category
-            all_keywords = []
-            if isinstance(keywords_data, dict):
-                for priority_field in ["high_priority", "medium_priority", "low_priority"]:
-                    if priority_field in keywords_data:
-                        # keywords_data[priority_field] should be a list of objects with "keyword" and "score"
-                        for item in keywords_data[priority_field]:
-                            if isinstance(item, dict) and "keyword" in item:
-                                all_keywords.append(item["keyword"])
-            
-            # Check if we have a valid structure with keywords
-            if not all_keywords or "error" in keywords_data:
-                # Instead of falling back to regex extraction, try to extract keywords from the raw response
-                log_debug("No keywords found in structured response, attempting to extract from raw response")
-                
-                # Make another API call with a simpler prompt
-                simplified_prompt = f"""
+    Returns:
+        list: The keyword strings in priority order
+    """
+    all_keywords = []
+    if isinstance(keywords_data, dict):
+        for priority_field in ["high_priority", "medium_priority", "low_priority"]:
+            if priority_field in keywords_data:
+                # keywords_data[priority_field] should be a list of objects with "keyword" and "score"
+                for item in keywords_data[priority_field]:
+                    if isinstance(item, dict) and "keyword" in item:
+                        all_keywords.append(item["keyword"])
+    return all_keywords
+
+def build_simplified_keyword_messages(job_description):
+    """
+    Build the messages for the simpler fallback keyword extraction prompt.
+    
+    Args:
+        job_description (str): The job description text
+        
+    Returns:
+        list: Message dictionaries for the OpenAI API
+    """
+    simplified_prompt = f"""
                 Extract the most important skills, qualifications, and requirements from this job description.
                 Return them as a simple JSON with high_priority, medium_priority, and low_priority arrays.
                 Each array should contain objects with 'keyword' and 'score' properties.
@@ -134,40 +133,177 @@ def extract_keywords_only(job_description, job_title=None, company_name=None, in
                 Job Description:
                 {job_description}
                 """
-                
-                simplified_messages = [
-                    {"role": "system", "content": "You are a helpful assistant that extracts keywords from job descriptions."},
-                    {"role": "user", "content": simplified_prompt}
-                ]
-                
-                # Try with a different temperature
-                retry_keywords_data = get_json_response(simplified_messages, max_tokens=1000, temperature=0.2)
-                
-                # Check if we got a valid response
-                retry_all_keywords = []
-                if isinstance(retry_keywords_data, dict):
-                    for priority_field in ["high_priority", "medium_priority", "low_priority"]:
-                        if priority_field in retry_keywords_data:
-                            for item in retry_keywords_data[priority_field]:
-                                if isinstance(item, dict) and "keyword" in item:
-                                    retry_all_keywords.append(item["keyword"])
-                
-                if retry_all_keywords:
-                    log_debug(f"Successfully extracted {len(retry_all_keywords)} keywords with simplified prompt")
-                    keywords_data = retry_keywords_data
-                    all_keywords = retry_all_keywords
-                else:
-                    # Only as a last resort, fall back to regex extraction
-                    log_debug("Still no keywords found, falling back to regex extraction as last resort")
-                    keywords_data, all_keywords = extract_keywords_regex(job_description)
+    
+    simplified_messages = [
+        {"role": "system", "content": "You are a helpful assistant that extracts keywords from job descriptions."},
+        {"role": "user", "content": simplified_prompt}
+    ]
+    
+    return simplified_messages
+
+def keywords_usable(keywords_data):
+    """
+    Check whether a keyword extraction response contains any keywords.
+    
+    Args:
+        keywords_data (dict): Keywords data parsed from the model's response
+        
+    Returns:
+        bool: True if the response has no error and at least one keyword
+    """
+    return isinstance(keywords_data, dict) and "error" not in keywords_data and bool(flatten_keywords(keywords_data))
+
+def add_keywords_structure(keywords_data):
+    """
+    Add the nested "keywords" structure (priority -> items) expected by the frontend.
+    
+    Args:
+        keywords_data (dict): Keywords data with high/medium/low_priority arrays
+        
+    Returns:
+        dict: The same keywords data
+    """
+    # Initialize keywords structure if needed
+    if "keywords" not in keywords_data:
+        keywords_data["keywords"] = {}
+        
+    for priority in ["high_priority", "medium_priority", "low_priority"]:
+        if priority in keywords_data:
+            keywords_data["keywords"][priority] = keywords_data[priority]
+    
+    return keywords_data
+
+def local_keywords(job_description, company_name=None):
+    """
+    Extract keywords with the local TF-IDF extractor, without calling the API.
+    
+    Args:
+        job_description (str): The job description text
+        company_name (str, optional): The company name, which is never a keyword
+        
+    Returns:
+        tuple: (keywords_data, all_keywords) with the nested keywords structure
+    """
+    keywords_data, all_keywords = extract_keywords_local(job_description, exclude=[company_name])
+    return add_keywords_structure(keywords_data), all_keywords
+
+def complete_keyword_extraction(keywords_data, all_keywords, job_description, company_name=None):
+    """
+    Retry or fall back if the model returned no keywords, then add the nested keywords structure.
+    
+    Args:
+        keywords_data (dict): Keywords data parsed from the model's response
+        all_keywords (list): Flat list of the keywords in keywords_data
+        job_description (str): The job description text
+        company_name (str, optional): The company name, for the local fallback
+        
+    Returns:
+        tuple: (keywords_data, all_keywords)
+    """
+    # Check if we have a valid structure with keywords
+    if not all_keywords or "error" in keywords_data:
+        # Instead of falling back to local extraction, try to extract keywords from the raw response
+        log_debug("No keywords found in structured response, attempting to extract from raw response")
+        
+        # Make another API call with a simpler prompt, with a different temperature
+        retry_keywords_data = get_json_response(build_simplified_keyword_messages(job_description), max_tokens=1000, temperature=0.2, timeout=45)
+        
+        # Check if we got a valid response
+        retry_all_keywords = flatten_keywords(retry_keywords_data)
+        
+        if retry_all_keywords:
+            log_debug(f"Successfully extracted {len(retry_all_keywords)} keywords with simplified prompt")
+            keywords_data = retry_keywords_data
+            all_keywords = retry_all_keywords
+        else:
+            # Only as a last resort, fall back to local extraction
+            log_debug("Still no keywords found, falling back to local extraction as last resort")
+            return local_keywords(job_description, company_name)
+    
+    return add_keywords_structure(keywords_data), all_keywords
+
+def extract_keywords_speculatively(messages, job_description, hedge=None, company_name=None):
+    """
+    Run the main extraction prompt, falling back to the simplified prompt.
+    
+    The main prompt's keywords are used whenever it returns any; otherwise the
+    simplified prompt's result is used (started early if the main prompt is slow
+    and LLM_SPECULATIVE_FALLBACK is on), and local extraction is the last resort.
+    
+    Args:
+        messages (list): Messages for the main extraction prompt
+        job_description (str): The job description text
+        hedge (str, optional): Call site name for hedging the main prompt
+        company_name (str, optional): The company name, for the local fallback
+        
+    Returns:
+        tuple: (keywords_data, all_keywords)
+    """
+    strategy, keywords_data = run_speculatively(
+        {
+            "main": lambda: get_json_response(messages, max_tokens=1000, temperature=0.3, timeout=60, hedge=hedge),
+            # Different prompt and temperature
+            "simplified": lambda: get_json_response(build_simplified_keyword_messages(job_description), max_tokens=1000, temperature=0.2, timeout=45)
+        },
+        validators={"main": keywords_usable, "simplified": keywords_usable}
+    )
+    
+    if strategy is None:
+        # Only as a last resort, fall back to local extraction
+        log_debug("No keywords found with either prompt, falling back to local extraction as last resort")
+        return local_keywords(job_description, company_name)
+    else:
+        all_keywords = flatten_keywords(keywords_data)
+        if strategy != "main":
+            log_debug(f"No keywords found in structured response; extracted {len(all_keywords)} keywords with {strategy} prompt")
+    
+    return add_keywords_structure(keywords_data), all_keywords
+
+def extract_keywords_only(job_description, job_title=None, company_name=None, industry=None):
+    """
+    Extract explicit keywords from the job description only, without checking the resume.
+    Ranked by priority based on placement, frequency, and context.
+    
+    Args:
+        job_description (str): The job description text
+        job_title (str, optional): The job title (optional)
+        company_name (str, optional): The company name (optional)
+        industry (str, optional): The industry (optional)
+        
+    Returns:
+        tuple: (keywords_data, all_keywords)
+    """
+    try:
+        log_debug("Starting keyword extraction process (job description only)...")
+        start_time = time.time()
+        
+        # Get job title, company name, and industry if provided
+        job_title_value = job_title if job_title else ""
+        company_name_value = company_name if company_name else ""
+        industry_value = industry if industry else ""
+        
+        log_debug(f"Job Title: {job_title_value}")
+        log_debug(f"Company Name: {company_name_value}")
+        log_debug(f"Industry: {industry_value}")
+        
+        if KEYWORD_EXTRACTOR == "local":
+            keywords_data, all_keywords = local_keywords(job_description, company_name)
+            log_debug(f"Local keyword extraction completed in {time.time() - start_time:.3f} seconds")
+            return keywords_data, all_keywords
+        
+        messages = build_keyword_extraction_messages(job_description, job_title_value, company_name_value, industry_value)
+        
+        try:
+            log_debug("Calling OpenAI API to extract keywords...")
+            api_start_time = time.time()
             
-            # Initialize keywords structure if needed
-            if "keywords" not in keywords_data:
-                keywords_data["keywords"] = {}
-                
-            for priority in ["high_priority", "medium_priority", "low_priority"]:
-                if priority in keywords_data:
-                    keywords_data["keywords"][priority] = keywords_data[priority]
+            # The main prompt is hedged because this call has a long latency tail
+            keywords_data, all_keywords = extract_keywords_speculatively(
+                messages, job_description, hedge="extract_keywords_only", company_name=company_name
+            )
+            
+            api_duration = time.time() - api_start_time
+            log_debug(f"OpenAI API calls completed in {api_duration:.2f} seconds")
             
             # Calculate total processing time
             total_duration = time.time() - start_time
@@ -177,13 +313,81 @@ def extract_keywords_only(job_description, job_title=None, company_name=None, in
             
         except Exception as e:
             print(f"Error in OpenAI keyword extraction: {str(e)}")
-            # Fallback to regex-based extraction if OpenAI fails
-            return extract_keywords_regex(job_description)
+            # Fallback to local extraction if OpenAI fails
+            return local_keywords(job_description, company_name)
             
     except Exception as e:
         print(f"Error extracting keywords: {str(e)}")
-        # Fallback to regex-based extraction if any error occurs
-        return extract_keywords_regex(job_description)
+        # Fallback to local extraction if any error occurs
+        return local_keywords(job_description, company_name)
+
+def stream_keywords_only(job_description, job_title=None, company_name=None, industry=None):
+    """
+    Streaming version of extract_keywords_only().
+    
+    A local first pass is yielded before the model is called. The model's
+    response is then parsed as it arrives, so each keyword is yielded as soon as
+    its object is complete, in the order the model writes them (high priority first).
+    
+    Args:
+        job_description (str): The job description text
+        job_title (str, optional): The job title (optional)
+        company_name (str, optional): The company name (optional)
+        industry (str, optional): The industry (optional)
+        
+    Yields:
+        tuple: ("preview", (keywords_data, all_keywords)) from the local extractor;
+            ("keyword", item) for each keyword as it completes, where item has
+            "keyword", "score" and "priority" ("high", "medium" or "low"); then
+            ("keywords", (keywords_data, all_keywords)) with the same result as
+            extract_keywords_only()
+    """
+    log_debug("Starting streaming keyword extraction (job description only)...")
+    start_time = time.time()
+    
+    # Fast first pass: a millisecond of local extraction, shown while the model works
+    try:
+        preview = local_keywords(job_description, company_name)
+    except Exception as e:
+        print(f"Error in local keyword extraction: {str(e)}")
+        preview = ({}, [])
+    yield "preview", preview
+    
+    if KEYWORD_EXTRACTOR == "local":
+        yield "keywords", preview
+        return
+    
+    messages = build_keyword_extraction_messages(
+        job_description,
+        job_title if job_title else "",
+        company_name if company_name else "",
+        industry if industry else ""
+    )
+    
+    try:
+        keywords_data = {}
+        streamed_count = 0
+        for path, value in stream_json_response(messages, max_tokens=1000, temperature=0.3, timeout=60):
+            if path == ():
+                keywords_data = value
+            elif path[0] in ("high_priority", "medium_priority", "low_priority") and isinstance(value, dict) and "keyword" in value:
+                if streamed_count == 0:
+                    log_debug(f"First keyword streamed after {time.time() - start_time:.2f} seconds")
+                streamed_count += 1
+                item = dict(value)
+                item["priority"] = path[0].split("_")[0]
+                yield "keyword", item
+        
+        if not isinstance(keywords_data, dict):
+            keywords_data = {}
+        result = complete_keyword_extraction(keywords_data, flatten_keywords(keywords_data), job_description, company_name)
+    except Exception as e:
+        print(f"Error in streaming keyword extraction: {str(e)}")
+        # Fall back to the local first pass if OpenAI fails
+        result = preview
+    
+    log_debug(f"Streaming keyword extraction completed in {time.time() - start_time:.2f} seconds")
+    yield "keywords", result
 
 def extract_keywords(job_description, master_resume=None, job_title=None, company_name=None, industry=None):
     """
@@ -288,62 +492,13 @@ def extract_keywords(job_description, master_resume=None, job_title=None, compan
             log_debug("Calling OpenAI API to extract keywords...")
             api_start_time = time.time()
             
-            # Get the JSON response using the existing function
-            keywords_data = get_json_response(messages, max_tokens=1000, temperature=0.3)
+            if KEYWORD_EXTRACTOR == "local":
+                keywords_data, all_keywords = local_keywords(job_description, company_name)
+            else:
+                keywords_data, all_keywords = extract_keywords_speculatively(messages, job_description, company_name=company_name)
             
             api_duration = time.time() - api_start_time
-            log_debug(f"OpenAI API call completed in {api_duration:.2f} seconds")
-            
-            # Create a flat list of all keywords from each priority category
-            all_keywords = []
-            if isinstance(keywords_data, dict):
-                for priority_field in ["high_priority", "medium_priority", "low_priority"]:
-                    if priority_field in keywords_data:
-                        # keywords_data[priority_field] should be a list of objects with "keyword" and "score"
-                        for item in keywords_data[priority_field]:
-                            if isinstance(item, dict) and "keyword" in item:
-                                all_keywords.append(item["keyword"])
-            
-            # Check if we have a valid structure with keywords
-            if not all_keywords or "error" in keywords_data:
-                # Instead of falling back to regex extraction, try to extract keywords from the raw response
-                log_debug("No keywords found in structured response, attempting to extract from raw response")
-                
-                # Make another API call with a simpler prompt
-                simplified_prompt = f"""
-                Extract the most important skills, qualifications, and requirements from this job description.
-                Return them as a simple JSON with high_priority, medium_priority, and low_priority arrays.
-                Each array should contain objects with 'keyword' and 'score' properties.
-                
-                Job Description:
-                {job_description}
-                """
-                
-                simplified_messages = [
-                    {"role": "system", "content": "You are a helpful assistant that extracts keywords from job descriptions."},
-                    {"role": "user", "content": simplified_prompt}
-                ]
-                
-                # Try with a different temperature
-                retry_keywords_data = get_json_response(simplified_messages, max_tokens=1000, temperature=0.2)
-                
-                # Check if we got a valid response
-                retry_all_keywords = []
-                if isinstance(retry_keywords_data, dict):
-                    for priority_field in ["high_priority", "medium_priority", "low_priority"]:
-                        if priority_field in retry_keywords_data:
-                            for item in retry_keywords_data[priority_field]:
-                                if isinstance(item, dict) and "keyword" in item:
-                                    retry_all_keywords.append(item["keyword"])
-                
-                if retry_all_keywords:
-                    log_debug(f"Successfully extracted {len(retry_all_keywords)} keywords with simplified prompt")
-                    keywords_data = retry_keywords_data
-                    all_keywords = retry_all_keywords
-                else:
-                    # Only as a last resort, fall back to regex extraction
-                    log_debug("Still no keywords found, falling back to regex extraction as last resort")
-                    keywords_data, all_keywords = extract_keywords_regex(job_description)
+            log_debug(f"OpenAI API calls completed in {api_duration:.2f} seconds")
             
             # If we have a master resume, find citations for the keywords
             if resume_text and all_keywords:
@@ -408,6 +563,7 @@ def extract_keywords(job_description, master_resume=None, job_title=None, compan
             # Attach the original keywords structure to the all_keywords list for reference
             # This will help preserve priority information when passing to other functions
             if isinstance(all_keywords, list) and len(all_keywords) > 0:
+                all_keywords = KeywordList(all_keywords)
                 all_keywords.original_keywords = keywords_data
                 log_debug("Attached original keywords structure to all_keywords list")
             
@@ -415,10 +571,10 @@ def extract_keywords(job_description, master_resume=None, job_title=None, compan
             
         except Exception as e:
             print(f"Error in OpenAI keyword extraction: {str(e)}")
-            # Fallback to regex-based extraction if OpenAI fails
-            return extract_keywords_regex(job_description)
+            # Fallback to local extraction if OpenAI fails
+            return local_keywords(job_description, company_name) + ({},)
             
     except Exception as e:
         print(f"Error extracting keywords: {str(e)}")
-        # Fallback to regex-based extraction if any error occurs
-        return extract_keywords_regex(job_description)
+        # Fallback to local extraction if any error occurs
+        return local_keywords(job_description, company_name) + ({},)
@@ -5,8 +5,117 @@ This module handles highlighting keywords in text.
 """
 
 import re
-from services.openai_service import get_text_response
-from services.keyword.keyword_utils import log_debug, extract_keywords_regex
+from services.openai_service import get_text_response, aget_text_response
+from services.keyword.keyword_utils import log_debug
+from services.keyword.keyword_local import extract_keywords_local
+from services.keyword.keyword_automaton import get_keyword_matcher
+from services.resume_index import get_resume_index
+
+# CSS classes for each priority level
+PRIORITY_CLASSES = {
+    "high": "high-priority-keyword",
+    "medium": "medium-priority-keyword",
+    "low": "low-priority-keyword"
+}
+
+# Order in which priorities win ties between equally long matches
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+def select_spans(matches, rank):
+    """
+    Choose non-overlapping highlight spans from keyword matches.
+    
+    The longest match wins; matches of the same length are ordered by rank
+    (lower first), then by position.
+    
+    Args:
+        matches (list): (start, end, keyword) tuples from a KeywordMatcher
+        rank (dict): Maps each keyword to its rank; keywords missing from it are skipped
+        
+    Returns:
+        list: The chosen (start, end, keyword) tuples ordered by start offset
+    """
+    candidates = sorted(
+        (match for match in matches if match[2] in rank),
+        key=lambda match: (match[0] - match[1], rank[match[2]], match[0])
+    )
+    
+    taken = bytearray(max((end for _, end, _ in candidates), default=0))
+    spans = []
+    for start, end, keyword in candidates:
+        if taken.find(1, start, end) == -1:
+            taken[start:end] = b"\x01" * (end - start)
+            spans.append((start, end, keyword))
+    
+    spans.sort()
+    return spans
+
+def render_spans(text, annotations, render_mark):
+    """
+    Build highlighted HTML from the original text and its annotations in a single join.
+    
+    Args:
+        text (str): The original text
+        annotations (list): Non-overlapping [start, end, keyword, priority, citation_number]
+            lists ordered by start offset
+        render_mark (callable): Called with (annotation, matched_html) and returns the marked-up span
+        
+    Returns:
+        str: The text with spans marked up and newlines converted to <br> tags
+    """
+    parts = []
+    last_end = 0
+    for annotation in annotations:
+        start, end = annotation[0], annotation[1]
+        parts.append(text[last_end:start].replace('\n', '<br>'))
+        parts.append(render_mark(annotation, text[start:end].replace('\n', '<br>')))
+        last_end = end
+    parts.append(text[last_end:].replace('\n', '<br>'))
+    return "".join(parts)
+
+def annotate_resume(resume_text, found_keywords, keywords_data=None, citations=None):
+    """
+    Find the spans to highlight in the resume text, without rendering them.
+    
+    Args:
+        resume_text (str): The resume text
+        found_keywords (dict): Dictionary mapping keywords to boolean (found or not)
+        keywords_data (dict, optional): Keywords data structure with priority information
+        citations (dict, optional): Citations data with exact phrases to highlight
+        
+    Returns:
+        list: [start, end, keyword, priority, citation_number] lists ordered by start offset,
+            with character offsets into resume_text; citation_number is None without citations
+    """
+    # Create a map of keywords to their priority if keywords_data is provided
+    keyword_priority_map = build_priority_map(keywords_data)
+    
+    # If we have citations data with exact phrases, use that for highlighting
+    if citations:
+        # Each phrase keeps its first (lowest-numbered) citation
+        phrase_data = {}
+        for data in collect_citation_phrases(citations, keyword_priority_map):
+            phrase_data.setdefault(data["phrase"], data)
+        rank = {
+            phrase: (PRIORITY_RANK.get(data["priority"], 1), data["citation_number"])
+            for phrase, data in phrase_data.items()
+        }
+        
+        matches = get_resume_index(resume_text).matches(phrase_data)
+        return [
+            [start, end, phrase_data[phrase]["keyword"], phrase_data[phrase]["priority"], phrase_data[phrase]["citation_number"]]
+            for start, end, phrase in select_spans(matches, rank)
+        ]
+    
+    # If we don't have citations data, highlight the found keywords themselves
+    found = [keyword for keyword, is_found in found_keywords.items() if is_found and isinstance(keyword, str)]
+    rank = {keyword: PRIORITY_RANK.get(keyword_priority_map.get(keyword, "medium"), 1) for keyword in found}
+    
+    matches = get_resume_index(resume_text).matches(found)
+    return [
+        [start, end, keyword, keyword_priority_map.get(keyword, "medium"), None]
+        for start, end, keyword in select_spans(matches, rank)
+    ]
 
 def highlight_keywords_in_resume(resume_text, found_keywords, keywords_data=None, citations=None):
     """
@@ -23,152 +132,166 @@ def highlight_keywords_in_resume(resume_text, found_keywords, keywords_data=None
     """
     log_debug("Highlighting keywords in resume...")
     
-    # Create a copy of the resume text to work with
-    highlighted_text = resume_text
+    annotations = annotate_resume(resume_text, found_keywords, keywords_data, citations)
     
-    # Replace newlines with <br> tags for proper HTML display
-    highlighted_text = highlighted_text.replace('\n', '<br>')
+    def render_mark(annotation, matched_html):
+        _, _, _, priority, number = annotation
+        css_class = PRIORITY_CLASSES.get(priority, "")
+        if number is None:
+            return f'<mark class="{css_class}">{matched_html}</mark>'
+        return f'<mark class="{css_class}" data-citation="{number}">{matched_html}<sup>{number}</sup></mark>'
     
-    # Create a map of keywords to their priority if keywords_data is provided
+    log_debug(f"Highlighted {len({annotation[2] for annotation in annotations})} keywords in resume")
+    
+    return render_spans(resume_text, annotations, render_mark)
+
+def build_priority_map(keywords_data):
+    """
+    Map each keyword to its priority level.
+    
+    Args:
+        keywords_data (dict): Keywords data, either wrapped in a "keywords" key or flat
+        
+    Returns:
+        dict: Keyword to 'high', 'medium' or 'low'
+    """
     keyword_priority_map = {}
+    if not isinstance(keywords_data, dict):
+        return keyword_priority_map
     
-    if keywords_data:
-        # Handle different structures of keywords_data
-        if "keywords" in keywords_data:
-            # Map keywords to their priority from the keywords structure
-            for priority in ["high_priority", "medium_priority", "low_priority"]:
-                if priority in keywords_data["keywords"]:
-                    for item in keywords_data["keywords"][priority]:
-                        if isinstance(item, dict) and "keyword" in item:
-                            keyword_priority_map[item["keyword"]] = priority.split("_")[0]  # Extract 'high', 'medium', 'low'
-                        elif isinstance(item, str):
-                            keyword_priority_map[item] = priority.split("_")[0]
-        elif isinstance(keywords_data, dict):
-            # Direct mapping if keywords_data is a flat dictionary
-            for priority in ["high_priority", "medium_priority", "low_priority"]:
-                if priority in keywords_data:
-                    for item in keywords_data[priority]:
-                        if isinstance(item, dict) and "keyword" in item:
-                            keyword_priority_map[item["keyword"]] = priority.split("_")[0]
-                        elif isinstance(item, str):
-                            keyword_priority_map[item] = priority.split("_")[0]
+    # Handle different structures of keywords_data
+    levels = keywords_data["keywords"] if "keywords" in keywords_data else keywords_data
+    for priority in ["high_priority", "medium_priority", "low_priority"]:
+        if priority in levels:
+            for item in levels[priority]:
+                if isinstance(item, dict) and "keyword" in item:
+                    keyword_priority_map[item["keyword"]] = priority.split("_")[0]  # Extract 'high', 'medium', 'low'
+                elif isinstance(item, str):
+                    keyword_priority_map[item] = priority.split("_")[0]
+    return keyword_priority_map
+
+def collect_citation_phrases(citations, keyword_priority_map):
+    """
+    List the exact phrases to highlight from citations data, numbering them in order.
     
-    # If we have citations data with exact phrases, use that for highlighting
-    if citations:
-        # Create a list to store all phrases to highlight with their priority and citation number
-        phrases_to_highlight = []
-        citation_number = 1
+    Args:
+        citations (dict): Citations data organized by priority level
+        keyword_priority_map (dict): Keyword to priority level
         
-        # Process each priority level in the citations
-        for priority_level in ["high_priority", "medium_priority", "low_priority", "fallback_extraction"]:
-            if priority_level in citations:
-                for keyword, citation_data in citations[priority_level].items():
-                    # Skip error messages
-                    if keyword == "error":
-                        continue
-                    
-                    # Extract the exact phrase if available
-                    exact_phrase = None
+    Returns:
+        list: Dictionaries with phrase, priority, citation_number and keyword
+    """
+    phrases_to_highlight = []
+    citation_number = 1
+    
+    # Process each priority level in the citations
+    for priority_level in ["high_priority", "medium_priority", "low_priority", "fallback_extraction"]:
+        if priority_level in citations:
+            for keyword, citation_data in citations[priority_level].items():
+                # Skip error messages
+                if keyword == "error":
+                    continue
+                
+                # Extract the exact phrase if available
+                exact_phrase = None
+                
+                # Check if citation_data is a string or a dictionary
+                if isinstance(citation_data, str):
+                    # Old format - just use the keyword itself
+                    exact_phrase = keyword
+                elif isinstance(citation_data, dict) and "exact_phrase" in citation_data:
+                    # New format with exact phrase
+                    exact_phrase = citation_data["exact_phrase"]
+                
+                # If we have an exact phrase, add it to the list
+                if exact_phrase and isinstance(exact_phrase, str):
+                    # Determine the priority
+                    priority = "medium"  # Default priority
+                    if keyword in keyword_priority_map:
+                        priority = keyword_priority_map[keyword]
+                    elif priority_level.startswith("high"):
+                        priority = "high"
+                    elif priority_level.startswith("medium"):
+                        priority = "medium"
+                    elif priority_level.startswith("low"):
+                        priority = "low"
                     
-                    # Check if citation_data is a string or a dictionary
-                    if isinstance(citation_data, str):
-                        # Old format - just use the keyword itself
-                        exact_phrase = keyword
-                    elif isinstance(citation_data, dict) and "exact_phrase" in citation_data:
-                        # New format with exact phrase
-                        exact_phrase = citation_data["exact_phrase"]
+                    phrases_to_highlight.append({
+                        "phrase": exact_phrase,
+                        "priority": priority,
+                        "citation_number": citation_number,
+                        "keyword": keyword
+                    })
                     
-                    # If we have an exact phrase, add it to the list
-                    if exact_phrase:
-                        # Determine the priority
-                        priority = "medium"  # Default priority
-                        if keyword in keyword_priority_map:
-                            priority = keyword_priority_map[keyword]
-                        elif priority_level.startswith("high"):
-                            priority = "high"
-                        elif priority_level.startswith("medium"):
-                            priority = "medium"
-                        elif priority_level.startswith("low"):
-                            priority = "low"
-                        
-                        phrases_to_highlight.append({
-                            "phrase": exact_phrase,
-                            "priority": priority,
-                            "citation_number": citation_number,
-                            "keyword": keyword
-                        })
-                        
-                        # Increment the citation number for the next keyword
-                        citation_number += 1
-        
-        # Sort phrases by length (longest first) to ensure we match the most specific phrases first
-        phrases_to_highlight.sort(key=lambda x: len(x["phrase"]), reverse=True)
-        
-        # Highlight each phrase
-        for phrase_data in phrases_to_highlight:
-            phrase = phrase_data["phrase"]
-            priority = phrase_data["priority"]
-            citation_number = phrase_data["citation_number"]
-            
-            # Define the CSS class based on priority
-            css_class = ""
-            if priority == "high":
-                css_class = "high-priority-keyword"
-            elif priority == "medium":
-                css_class = "medium-priority-keyword"
-            elif priority == "low":
-                css_class = "low-priority-keyword"
-            
-            # Escape the phrase for regex
-            escaped_phrase = re.escape(phrase)
-            
-            # Use word boundaries to match whole words only, with case insensitivity
-            pattern = re.compile(r'\b' + escaped_phrase + r'\b', re.IGNORECASE)
-            
-            # Replace with marked version including the priority class and citation number
-            replacement = f'<mark class="{css_class}" data-citation="{citation_number}">{phrase}<sup>{citation_number}</sup></mark>'
-            highlighted_text = pattern.sub(replacement, highlighted_text)
+                    # Increment the citation number for the next keyword
+                    citation_number += 1
+    
+    return phrases_to_highlight
+
+def first_keyword_items(keywords_data):
+    """
+    Map each keyword in the prioritized structure to its first (highest-priority) item.
+    
+    Args:
+        keywords_data (dict): The keywords data structure with priority information
         
-        log_debug(f"Highlighted {len(phrases_to_highlight)} phrases with citation numbers in resume")
+    Returns:
+        dict: Keyword to (priority_field, item)
+    """
+    keyword_items = {}
+    for priority_field in ["high_priority", "medium_priority", "low_priority"]:
+        for item in keywords_data.get(priority_field, []):
+            if isinstance(item, dict) and isinstance(item.get("keyword"), str) and item["keyword"].strip():
+                keyword_items.setdefault(item["keyword"], (priority_field, item))
+    return keyword_items
+
+def annotate_job_description(job_description, keywords_data):
+    """
+    Find the spans to highlight in the job description, without rendering them.
+    
+    Also records the keywords that occur in the text under keywords_data["found_keywords"].
+    
+    Args:
+        job_description (str): The job description text
+        keywords_data (dict): The keywords data structure with priority information
         
-        return highlighted_text
-    
-    # If we don't have citations data, fall back to the original method
-    # Count how many keywords were actually found
-    found_count = 0
-    
-    # Highlight each found keyword based on priority
-    for keyword, found in found_keywords.items():
-        if found:
-            found_count += 1
-            
-            # Determine the priority class for this keyword
-            priority = "medium"  # Default priority
-            if keyword in keyword_priority_map:
-                priority = keyword_priority_map[keyword]
-            
-            # Define the CSS class based on priority
-            css_class = ""
-            if priority == "high":
-                css_class = "high-priority-keyword"
-            elif priority == "medium":
-                css_class = "medium-priority-keyword"
-            elif priority == "low":
-                css_class = "low-priority-keyword"
-            
-            # Escape the keyword for regex
-            escaped_keyword = re.escape(keyword)
-            
-            # Use word boundaries to match whole words only, with case insensitivity
-            pattern = re.compile(r'\b' + escaped_keyword + r'\b', re.IGNORECASE)
-            
-            # Replace with marked version including the priority class
-            replacement = f'<mark class="{css_class}">{keyword}</mark>'
-            highlighted_text = pattern.sub(replacement, highlighted_text)
-    
-    log_debug(f"Found and highlighted {found_count} keywords in resume")
+    Returns:
+        list: [start, end, keyword, priority, None] lists ordered by start offset, with
+            character offsets into job_description; priority is None for the flat
+            missing_keywords fallback
+    """
+    # Within a priority, higher scores win ties
+    keyword_items = first_keyword_items(keywords_data)
+    rank = {
+        keyword: (PRIORITY_RANK[priority_field.split("_")[0]], -_score(item))
+        for keyword, (priority_field, item) in keyword_items.items()
+    }
     
-    return highlighted_text
+    matches = get_keyword_matcher(keyword_items).find_all(job_description)
+    present = {keyword for _, _, keyword in matches}
+    
+    # Track which keywords were actually found in the text
+    found_keywords = {}
+    for priority_field in ["high_priority", "medium_priority", "low_priority"]:
+        found_keywords[priority_field] = [
+            item for item in keywords_data.get(priority_field, [])
+            if isinstance(item, dict) and item.get("keyword") in present
+        ]
+        log_debug(f"Highlighted {len(found_keywords[priority_field])} {priority_field} keywords in job description")
+    
+    # Add information about found keywords to the keywords_data
+    keywords_data["found_keywords"] = found_keywords
+    
+    # If we don't have the enhanced structure, fall back to the flat list
+    if not any(found_keywords.values()) and "missing_keywords" in keywords_data:
+        missing = [keyword for keyword in keywords_data.get("missing_keywords", []) if isinstance(keyword, str) and keyword.strip()]
+        matches = get_keyword_matcher(missing).find_all(job_description)
+        return [[start, end, keyword, None, None] for start, end, keyword in select_spans(matches, dict.fromkeys(missing, 0))]
+    
+    return [
+        [start, end, keyword, keyword_items[keyword][0].split("_")[0], None]
+        for start, end, keyword in select_spans(matches, rank)
+    ]
 
 def highlight_job_description(job_description, keywords_data):
     """
@@ -184,101 +307,43 @@ def highlight_job_description(job_description, keywords_data):
     try:
         log_debug("Highlighting keywords in job description...")
         
-        # Create a copy of the job description to work with
-        highlighted_text = job_description
+        annotations = annotate_job_description(job_description, keywords_data)
+        keyword_items = first_keyword_items(keywords_data)
         
-        # Define CSS classes for different priority levels
-        priority_classes = {
-            "high_priority": "high-priority-keyword",
-            "medium_priority": "medium-priority-keyword",
-            "low_priority": "low-priority-keyword"
-        }
+        def render_mark(annotation, matched_html):
+            keyword, priority = annotation[2], annotation[3]
+            if priority is None:
+                return f'<mark>{matched_html}</mark>'
+            score = keyword_items[keyword][1].get("score", 0)
+            return f'<mark class="{PRIORITY_CLASSES[priority]}" data-score="{score}">{matched_html}</mark>'
         
-        # Track which keywords were actually found in the text
-        found_keywords = {
-            "high_priority": [],
-            "medium_priority": [],
-            "low_priority": []
-        }
-        
-        # Process keywords by priority with the new structure
-        for priority_field in ["high_priority", "medium_priority", "low_priority"]:
-            if priority_field in keywords_data:
-                css_class = priority_classes.get(priority_field, "")
-                
-                # Sort items by score (highest first)
-                sorted_items = sorted(
-                    keywords_data[priority_field], 
-                    key=lambda x: x.get("score", 0) if isinstance(x, dict) else 0, 
-                    reverse=True
-                )
-                
-                # Sort by length as well (longest first) to ensure we match the most specific terms first
-                sorted_items = sorted(
-                    sorted_items,
-                    key=lambda x: len(x.get("keyword", "")) if isinstance(x, dict) and "keyword" in x else 0,
-                    reverse=True
-                )
-                
-                for item in sorted_items:
-                    if isinstance(item, dict) and "keyword" in item:
-                        keyword = item["keyword"]
-                        
-                        # Skip empty keywords
-                        if not keyword.strip():
-                            continue
-                            
-                        # Escape the keyword for regex
-                        escaped_keyword = re.escape(keyword)
-                        
-                        # Use word boundaries to match whole words only, with case insensitivity
-                        pattern = re.compile(r'\b' + escaped_keyword + r'\b', re.IGNORECASE)
-                        
-                        # Check if the keyword exists in the text
-                        if pattern.search(highlighted_text):
-                            # Replace with marked version including the priority class
-                            replacement = f'<mark class="{css_class}" data-score="{item.get("score", 0)}">{keyword}</mark>'
-                            highlighted_text = pattern.sub(replacement, highlighted_text)
-                            found_keywords[priority_field].append(item)
-                
-                log_debug(f"Highlighted {len(found_keywords[priority_field])} {priority_field} keywords in job description")
-        
-        # If we don't have the enhanced structure, fall back to the flat list
-        if not any(found_keywords.values()) and "missing_keywords" in keywords_data:
-            for keyword in keywords_data.get("missing_keywords", []):
-                if not keyword.strip():
-                    continue
-                pattern = re.compile(r'\b' + re.escape(keyword) + r'\b', re.IGNORECASE)
-                if pattern.search(highlighted_text):
-                    highlighted_text = pattern.sub(f'<mark>{keyword}</mark>', highlighted_text)
-        
-        # Add information about found keywords to the keywords_data
-        keywords_data["found_keywords"] = found_keywords
-        
-        # Convert newlines to <br> tags for proper HTML display
-        highlighted_text = highlighted_text.replace('\n', '<br>')
-        
-        return highlighted_text
+        # Mark the chosen spans and convert newlines to <br> tags in one pass
+        return render_spans(job_description, annotations, render_mark)
     
     except Exception as e:
         log_debug(f"Error highlighting job description: {str(e)}")
         # Return the original text if there's an error
         return job_description.replace('\n', '<br>')
 
-def highlight_keywords(profile_text, job_description):
+def _score(item):
+    try:
+        return float(item.get("score", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def build_highlight_messages(profile_text, job_description):
     """
-    Identify and highlight keywords from the job description in the profile text.
+    Build the chat messages for highlighting job description keywords in a profile.
     
     Args:
         profile_text (str): The profile text to highlight keywords in
         job_description (str): The job description to extract keywords from
         
     Returns:
-        str: The profile text with keywords highlighted using HTML mark tags
+        list: Message dictionaries for the OpenAI API
     """
-    try:
-        # Prepare the prompt for OpenAI
-        prompt = f"""
+    # Prepare the prompt for OpenAI
+    prompt = f"""
         I have a career profile and a job description. I need you to identify keywords and phrases from the job description 
         that appear in the career profile, including semantically similar terms (not just exact matches).
         
@@ -297,28 +362,74 @@ def highlight_keywords(profile_text, job_description):
         Job Description:
         {job_description}
         """
+    
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that identifies and highlights keywords."},
+        {"role": "user", "content": prompt}
+    ]
+    return messages
+
+def clean_highlighted_text(highlighted_text):
+    """
+    Strip any extra text the model added around the marked-up profile.
+    
+    Args:
+        highlighted_text (str): The model's marked-up response
         
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant that identifies and highlights keywords."},
-            {"role": "user", "content": prompt}
-        ]
+    Returns:
+        str: The marked-up profile
+    """
+    if "<mark>" in highlighted_text:
+        # Extract just the part with the marks
+        pattern = re.compile(r'(?:.*?)(?=<mark>|$)((?:<mark>.*?</mark>|.)*)', re.DOTALL)
+        match = pattern.search(highlighted_text)
+        if match:
+            highlighted_text = match.group(1)
+    
+    return highlighted_text
+
+def highlight_keywords(profile_text, job_description):
+    """
+    Identify and highlight keywords from the job description in the profile text.
+    
+    Args:
+        profile_text (str): The profile text to highlight keywords in
+        job_description (str): The job description to extract keywords from
+        
+    Returns:
+        str: The profile text with keywords highlighted using HTML mark tags
+    """
+    try:
+        messages = build_highlight_messages(profile_text, job_description)
         
         # Get the text response
-        highlighted_text = get_text_response(messages, max_tokens=500, temperature=0.3)
+        highlighted_text = get_text_response(messages, max_tokens=500, temperature=0.3, timeout=30)
         
         # Clean up any extra text the model might have added
-        if "<mark>" in highlighted_text:
-            # Extract just the part with the marks
-            pattern = re.compile(r'(?:.*?)(?=<mark>|$)((?:<mark>.*?</mark>|.)*)', re.DOTALL)
-            match = pattern.search(highlighted_text)
-            if match:
-                highlighted_text = match.group(1)
-        
-        return highlighted_text
+        return clean_highlighted_text(highlighted_text)
     except Exception as e:
         print(f"Error highlighting keywords: {str(e)}")
         # Fallback to regex-based highlighting if OpenAI fails
-        return mark_keywords_regex(profile_text, extract_keywords_regex(job_description)[1])
+        return mark_keywords_regex(profile_text, extract_keywords_local(job_description)[1])
+
+async def ahighlight_keywords(profile_text, job_description):
+    """
+    Async version of highlight_keywords.
+    
+    Args:
+        profile_text (str): The profile text to highlight keywords in
+        job_description (str): The job description to extract keywords from
+        
+    Returns:
+        str: The profile text with keywords highlighted using HTML mark tags
+    """
+    try:
+        messages = build_highlight_messages(profile_text, job_description)
+        highlighted_text = await aget_text_response(messages, max_tokens=500, temperature=0.3, timeout=30)
+        return clean_highlighted_text(highlighted_text)
+    except Exception as e:
+        print(f"Error highlighting keywords: {str(e)}")
+        return mark_keywords_regex(profile_text, extract_keywords_local(job_description)[1])
 
 def mark_keywords_regex(text, keywords):
     """
@@ -331,17 +442,20 @@ def mark_keywords_regex(text, keywords):
     Returns:
         str: The text with keywords highlighted using HTML mark tags
     """
-    marked_text = text
+    keyword_texts = []
     for keyword in keywords:
         if isinstance(keyword, dict) and "keyword" in keyword:
-            keyword_text = keyword["keyword"]
+            keyword_texts.append(keyword["keyword"])
         elif isinstance(keyword, str):
-            keyword_text = keyword
-        else:
-            continue
-            
-        # Use word boundaries to match whole words only
-        pattern = re.compile(r'\b' + re.escape(keyword_text) + r'\b', re.IGNORECASE)
-        marked_text = pattern.sub(f'<mark>{keyword_text}</mark>', marked_text)
-    
-    return marked_text
+            keyword_texts.append(keyword)
+    
+    # Mark whole-word matches found in one scan, longest first where they overlap
+    parts = []
+    last_end = 0
+    for start, end, _ in get_keyword_matcher(keyword_texts).find_longest(text):
+        parts.append(text[last_end:start])
+        parts.append(f'<mark>{text[start:end]}</mark>')
+        last_end = end
+    parts.append(text[last_end:])
+    
+    return "".join(parts)
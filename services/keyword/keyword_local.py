@@ -0,0 +1,375 @@
+"""
+Local Keyword Extraction Module
+
+This module extracts prioritized keywords from job descriptions without an
+LLM: n-gram candidates are scored by TF-IDF against a background table of
+job-description document frequencies, weighted by the section they appear in
+(requirements, responsibilities, boilerplate, ...) and by position.
+
+It returns the same (keywords_data, all_keywords) structure as the LLM
+extraction, so it can stand in as a fast first pass or when the API is down.
+"""
+
+import re
+import math
+import threading
+from collections import deque
+
+# Never the edge of a candidate phrase
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each either etc few for from
+further had has have having he her here hers him his how i if in into is it its itself just least
+less like ll may me might more most must my no nor not now of off on once one only or other our
+ours out over own per re s same shall she should so some such t than that the their theirs them
+then there these they this those through to too under until up upon us ve very via was we were
+what when where whether which while who whom whose why will with within without would yet you
+your yours able across along among always ensure including include includes using use used
+well new plus ideally strong excellent great good proven demonstrated solid deep highly
+you'll you're you've we're we'll we've it's they're don't won't can't isn't
+expert expertise familiarity familiar background knowledge understanding proficiency proficient
+exposure ability demonstrated working
+""".split())
+
+# Verbs that can be keywords on their own ("design") but never start a phrase ("build data pipelines")
+_NO_LEAD = frozenset("""
+build design develop own partner improve mentor lead drive create manage support work help
+collaborate deliver define maintain implement write establish identify grow scale join apply
+applying experience
+""".split())
+
+# Documents in the seed corpus, and the share of job descriptions each seed term appears in.
+# Generic job-posting vocabulary gets a high document frequency, so it scores low.
+_SEED_DOCUMENTS = 1000
+_SEED_TERMS = {
+    0.9: "experience work team skills ability role job company years working",
+    0.7: """business opportunity support knowledge environment help required requirements
+        qualifications responsibilities preferred candidate candidates position benefits join
+        people time high world best looking based year apply applicants""",
+    0.5: """communication understanding related degree bachelor field equivalent employment
+        opportunities status including following provide skill range level mission culture
+        collaborate collaborative fast paced impact growth make build across drive partner""",
+    0.35: """management development customer customers partners stakeholders solutions team
+        members cross functional product products services industry organization equal
+        employer gender race religion disability veteran national origin sexual orientation
+        identity age applicable law salary pay compensation health insurance pto""",
+    0.2: """leadership project projects data strategy process processes design systems tools
+        teams written verbal problem solving results technical relationships quality operations
+        track record hands-on production practices initiatives reliable scalable roadmap
+        applying reviews solutions teammates"""
+}
+
+# Section headings: (pattern, section, weight). Checked in order, first match wins.
+# Boilerplate sections (company blurb, benefits, EEO statement) are skipped.
+_SECTIONS = [
+    (re.compile(r"\b(preferred|nice[ -]to[ -]haves?|bonus|pluses|desired|ideally)\b"), "preferred", 1.0),
+    (re.compile(r"\b(requirements?|required|qualifications?|must[ -]haves?|what you(?:'ll| will)? (?:need|bring)|"
+                r"who you are|you have|skills|experience|education)\b"), "required", 2.0),
+    (re.compile(r"\b(responsibilities|what you(?:'ll| will)? do|duties|the role|your impact|day[ -]to[ -]day|"
+                r"the opportunity|you will)\b"), "responsibilities", 1.2),
+    (re.compile(r"\b(about (?:us|the company|the team|[a-z]+)|benefits|perks|compensation|salary|equal opportunity|"
+                r"eeo|our values|why join|what we offer|location)\b"), "boilerplate", 0.0)
+]
+
+# Cues inside a line that mark a requirement as required or preferred
+_REQUIRED_CUE = re.compile(r"\b(required|must|mandatory|minimum)\b")
+_PREFERRED_CUE = re.compile(r"\b(preferred|a plus|nice to have|bonus|desired|ideally)\b")
+
+# Phrases never cross punctuation, brackets or bullet markers
+_SEGMENT_SPLIT = re.compile(r"[,;:!?()\[\]{}|\"•·●–—]+|\.(?:\s|$)|\s[-*]\s|^\s*[-*]\s")
+
+# Tokens keep technical punctuation: C++, C#, Node.js, CI/CD, e-commerce
+_TOKEN = re.compile(r"[A-Za-z0-9][A-Za-z0-9+#]*(?:[.\-/'][A-Za-z0-9+#]+)*")
+
+_BULLETS = frozenset("-*•·●–—")
+
+_HAS_LETTER = re.compile(r"[a-z]")
+
+_MAX_NGRAM = 3
+
+class BackgroundCorpus:
+    """
+    Document frequencies of terms across job descriptions.
+
+    Seeded with generic job-posting vocabulary and updated online with every job
+    description extracted, so boilerplate phrases seen across postings fade out.
+    """
+
+    def __init__(self, seed_documents=_SEED_DOCUMENTS, seed_terms=None, max_terms=200000, recent=1000):
+        """
+        Args:
+            seed_documents (int): Size of the notional seed corpus
+            seed_terms (dict, optional): Mapping of document share to space-separated terms
+            max_terms (int): Terms kept before rare ones are pruned
+            recent (int): Recently observed documents remembered, so repeats aren't counted twice
+        """
+        self.documents = seed_documents
+        self.max_terms = max_terms
+        self.df = {}
+        for share, terms in (seed_terms if seed_terms is not None else _SEED_TERMS).items():
+            for term in terms.split():
+                self.df[term] = max(self.df.get(term, 0), int(share * seed_documents))
+        self._recent = deque(maxlen=recent)
+        self._recent_set = set()
+        self._lock = threading.Lock()
+
+    def idf(self, term):
+        """Smoothed inverse document frequency of a term."""
+        return math.log((self.documents + 1) / (self.df.get(term, 0) + 1)) + 1
+
+    def observe(self, document_key, terms):
+        """
+        Count a document's distinct terms.
+
+        Args:
+            document_key: Hashable identity of the document (repeats are ignored)
+            terms (iterable): The document's distinct terms
+        """
+        with self._lock:
+            if document_key in self._recent_set:
+                return
+            if len(self._recent) == self._recent.maxlen:
+                self._recent_set.discard(self._recent[0])
+            self._recent.append(document_key)
+            self._recent_set.add(document_key)
+
+            self.documents += 1
+            df = self.df
+            for term in terms:
+                df[term] = df.get(term, 0) + 1
+            if len(df) > self.max_terms:
+                self.df = {term: count for term, count in df.items() if count > 1}
+
+    def stats(self):
+        return {"documents": self.documents, "terms": len(self.df)}
+
+background_corpus = BackgroundCorpus()
+
+def _line_section(line, lowered):
+    """Return (section, weight) if the line is a section heading, else None."""
+    if lowered.lstrip()[:1] in _BULLETS:
+        return None
+    stripped = lowered.strip(" \t#*=:")
+    if not stripped or len(stripped) > 60:
+        return None
+    if not line.rstrip().endswith(":") and (len(stripped.split()) > 4 or stripped.endswith(".")):
+        return None
+    for pattern, section, weight in _SECTIONS:
+        if pattern.search(stripped):
+            return section, weight
+    return None
+
+def _collect_candidates(text, skip):
+    """
+    Collect n-gram candidates with weighted frequencies.
+
+    Args:
+        text (str): The job description
+        skip (set): Lowercase words that end a phrase (stopwords and excluded words)
+
+    Returns:
+        tuple: (candidates, total_tokens) where candidates maps the lowercase
+            phrase to [weighted_tf, count, first_position, surface, section, tokens,
+            list_item, whole_run, named], where whole_run means the phrase appeared on
+            its own between stopwords or punctuation and named that it looked like a name
+    """
+    candidates = {}
+    position = 0
+    section, section_weight = None, 1.0
+
+    for line in text.splitlines():
+        lowered = line.lower()
+        heading = _line_section(line, lowered)
+        if heading:
+            section, section_weight = heading
+            continue
+
+        if not section_weight:
+            continue
+        line_section = section
+        weight = section_weight
+        if _REQUIRED_CUE.search(lowered):
+            weight *= 1.2
+            line_section = "required"
+        elif _PREFERRED_CUE.search(lowered):
+            line_section = "preferred"
+
+        for segment in _SEGMENT_SPLIT.split(line):
+            words = _TOKEN.findall(segment)
+            if not words:
+                continue
+            # A short segment on its own (list item or bullet) is a strong signal
+            list_item = len(words) <= 4
+
+            # Split the segment into runs of content words
+            runs = []
+            run = []
+            for index, word in enumerate(words):
+                lower = word.lower()
+                if lower in skip or len(lower) < 2 or not (lower.isalpha() or _HAS_LETTER.search(lower)):
+                    if run:
+                        runs.append(run)
+                        run = []
+                    continue
+                # Capitalized mid-sentence or mixed-case/alphanumeric (Python, AWS, S3, CI/CD):
+                # likely a named tool, technology or certification
+                named = word != lower and (index > 0 or word[1:] != lower[1:] or not lower.isalpha())
+                run.append((lower, word, named))
+            if run:
+                runs.append(run)
+
+            for run in runs:
+                length = len(run)
+                for start in range(length):
+                    key, surface, named = run[start]
+                    end = min(start + _MAX_NGRAM, length)
+                    size = 1
+                    while True:
+                        whole_run = size == length
+                        candidate = candidates.get(key)
+                        if candidate is None:
+                            candidates[key] = [weight, 1, position + start, surface, line_section, size,
+                                               list_item and whole_run, whole_run, named]
+                        else:
+                            candidate[0] += weight
+                            candidate[1] += 1
+                            if line_section == "required":
+                                candidate[4] = line_section
+                            if whole_run:
+                                candidate[6] = candidate[6] or list_item
+                                candidate[7] = True
+                            if named:
+                                candidate[8] = True
+
+                        if start + size >= end or (size == 1 and key in _NO_LEAD):
+                            break
+                        token = run[start + size]
+                        key += " " + token[0]
+                        surface += " " + token[1]
+                        named = named or token[2]
+                        size += 1
+                position += length + 1
+
+    return candidates, max(position, 1)
+
+def _overlaps(padded, count, selected):
+    """Check whether a space-padded phrase is part of (or contains) a stronger selected phrase."""
+    for other_padded, other_count in selected:
+        if count <= other_count and (padded in other_padded or other_padded in padded):
+            return True
+    return False
+
+def extract_keywords_local(text, max_keywords=30, exclude=None, corpus=None, learn=True):
+    """
+    Extract prioritized keywords from a job description locally.
+
+    Args:
+        text (str): The job description text
+        max_keywords (int): Maximum number of keywords to return
+        exclude (iterable, optional): Words never used in keywords (e.g. the company name)
+        corpus (BackgroundCorpus, optional): Document frequencies (default: the shared corpus)
+        learn (bool): Add this job description to the corpus's document frequencies
+
+    Returns:
+        tuple: (keywords_data, all_keywords) - The extracted keywords data and a flat list of all keywords
+    """
+    corpus = corpus or background_corpus
+    skip = STOPWORDS
+    for value in exclude or ():
+        if value:
+            skip = skip | {word.lower() for word in _TOKEN.findall(value)}
+
+    candidates, total_tokens = _collect_candidates(text or "", skip)
+
+    # Inverse document frequencies, computed once per word
+    df = corpus.df
+    log_documents = math.log(corpus.documents + 1) + 1
+    word_idf = {}
+    for key, candidate in candidates.items():
+        if candidate[5] == 1:
+            word_idf[key] = log_documents - math.log(df.get(key, 0) + 1)
+
+    log = math.log
+    position_scale = 0.2 / total_tokens
+    scored = []
+    for key, (weighted_tf, count, first_position, surface, section, size, list_item, whole_run, named) in candidates.items():
+        if size == 1:
+            score = word_idf[key]
+            if key in _NO_LEAD:
+                score *= 0.5
+        else:
+            words = key.split(" ")
+            # Unseen phrases score like their words; phrases common across postings score low
+            score = 1.2 * sum([word_idf[word] for word in words]) / size
+            # A phrase starting or ending with a common word ("record applying Go") is a fragment
+            score = min(score, 2.0 * min(word_idf[words[0]], word_idf[words[-1]]))
+            phrase_df = df.get(key)
+            if phrase_df:
+                score = min(score, log_documents - log(phrase_df + 1))
+            # Cohesion: how often the rarest word appears only inside this phrase.
+            # Words that always occur together ("machine learning") form a phrase;
+            # a one-off fragment of a longer run of common words is usually noise.
+            if not whole_run:
+                score *= count / min([candidates[word][1] for word in words])
+            score *= 1.0 + 0.25 * (size - 1)
+        if list_item:
+            score *= 1.3
+        if named:
+            score *= 1.3
+        # Sublinear term frequency, and a small boost for terms that appear early
+        score *= (1.0 + log(weighted_tf)) * (1.2 - first_position * position_scale)
+        scored.append((score, key, count, surface, section))
+
+    scored.sort(reverse=True)
+
+    selected = []
+    selected_keys = []
+    for score, key, count, surface, section in scored[:max_keywords * 4]:
+        if score <= 0:
+            break
+        padded = f" {key} "
+        if _overlaps(padded, count, selected_keys):
+            continue
+        selected.append((score, surface, section))
+        selected_keys.append((padded, count))
+        if len(selected) >= max_keywords:
+            break
+
+    if learn and candidates:
+        corpus.observe(hash(text), candidates.keys())
+
+    return _prioritize(selected)
+
+def _prioritize(selected):
+    """Split ranked (score, keyword, section) tuples into priority buckets."""
+    high_priority = []
+    medium_priority = []
+    low_priority = []
+
+    top_score = selected[0][0] if selected else 1.0
+    high_limit = min(10, max(3, math.ceil(len(selected) * 0.25)))
+    medium_limit = high_limit + max(3, math.ceil(len(selected) * 0.4))
+
+    for rank, (score, keyword, section) in enumerate(selected):
+        relative = score / top_score
+        item = {"keyword": keyword, "score": round(0.1 + 0.89 * relative, 2)}
+        # Explicitly required terms move up a tier, preferred ones can't be high priority
+        if (rank < high_limit and section != "preferred") or (section == "required" and relative >= 0.35 and len(high_priority) < high_limit):
+            high_priority.append(item)
+        elif rank < medium_limit or section == "required":
+            medium_priority.append(item)
+        else:
+            low_priority.append(item)
+
+    for bucket in (high_priority, medium_priority, low_priority):
+        bucket.sort(key=lambda item: item["score"], reverse=True)
+
+    keywords_data = {
+        "high_priority": high_priority,
+        "medium_priority": medium_priority,
+        "low_priority": low_priority,
+        "missing_keywords": []
+    }
+    all_keywords = [item["keyword"] for bucket in (high_priority, medium_priority, low_priority) for item in bucket]
+
+    return keywords_data, all_keywords
@@ -4,13 +4,25 @@ Keyword Matching Module
 This module handles finding keywords in resumes and generating citations.
 """
 
+import os
 import time
 import json
 import re
-from services.openai_service import get_json_response, get_text_response
+from services.openai_service import get_json_response, get_text_response, aget_text_response
+from services.concurrency import run_speculatively, arun_speculatively, iter_concurrently, aiter_concurrently
+from services.evidence_store import get_evidence_store, normalize_keyword
+from services.evidence_resolver import resolve_locally, record_model_call
 from services.keyword.keyword_utils import log_debug, sanitize_text_for_regex
+from services.resume_index import get_resume_index
+from services.resume_retrieval import select_evidence_text
 from utils.text_processing import sanitize_text
 
+# Keywords per citation prompt; longer lists are split into batches by priority (0 sends one prompt)
+CITATION_BATCH_SIZE = int(os.getenv("CITATION_BATCH_SIZE", 10))
+
+# Citation batches running at once for one request
+CITATION_BATCH_CONCURRENCY = int(os.getenv("CITATION_BATCH_CONCURRENCY", 4))
+
 def find_keywords_in_resume(keywords, master_resume, job_title='', company_name='', industry=''):
     """
     Find keywords in the master resume and highlight them based on priority.
@@ -59,12 +71,20 @@ def find_keywords_in_resume(keywords, master_resume, job_title='', company_name=
             # Simple list of keywords
             keyword_list = keywords
         
+        # Keywords the resume shows verbatim or inflected need no model call
+        resolved, unresolved = resolve_locally(master_resume, keyword_list)
+        locally_found = {sanitize_text(keyword): True for keyword in resolved}
+        log_debug(f"Resolved {len(resolved)} of {len(keyword_list)} keywords locally")
+        if not unresolved:
+            from services.keyword.keyword_highlighting import highlight_keywords_in_resume
+            return locally_found, highlight_keywords_in_resume(master_resume, locally_found, keywords)
+        
         # Sanitize the keywords
-        for keyword in keyword_list:
+        for keyword in unresolved:
             sanitized_keywords.append(sanitize_text(keyword))
         
-        # Sanitize resume text
-        sanitized_resume = sanitize_text(master_resume)
+        # Sanitized resume text, parsed once per resume
+        sanitized_resume = get_resume_index(master_resume).normalized_text
         
         # Prepare the prompt for OpenAI with improved instructions for better matching
         prompt = f"""
@@ -101,19 +121,21 @@ def find_keywords_in_resume(keywords, master_resume, job_title='', company_name=
             ]
             
             # Get the JSON response
-            found_keywords = get_json_response(messages, max_tokens=800, temperature=0.3)
+            found_keywords = get_json_response(messages, max_tokens=800, temperature=0.3, timeout=45)
             
             api_duration = time.time() - api_start_time
+            record_model_call(api_duration)
             log_debug(f"OpenAI API call for finding keywords completed in {api_duration:.2f} seconds")
             
             # Verify all keywords are in the response
             for keyword in sanitized_keywords:
                 if keyword not in found_keywords:
                     found_keywords[keyword] = False
+            found_keywords.update(locally_found)
             
             # Count how many keywords were actually found
             found_count = sum(1 for value in found_keywords.values() if value)
-            log_debug(f"Found {found_count} keywords out of {len(sanitized_keywords)} in resume")
+            log_debug(f"Found {found_count} keywords out of {len(keyword_list)} in resume")
             
             # Now highlight the keywords in the resume based on priority
             from services.keyword.keyword_highlighting import highlight_keywords_in_resume
@@ -133,7 +155,7 @@ def find_keywords_in_resume(keywords, master_resume, job_title='', company_name=
 
 def fallback_find_keywords_in_resume(keywords, resume_text):
     """
-    Fallback method to find keywords in resume using regex.
+    Fallback method to find keywords in resume by whole-word matching.
     
     Args:
         keywords (list): List of keywords to find in the resume
@@ -144,9 +166,6 @@ def fallback_find_keywords_in_resume(keywords, resume_text):
     """
     found_keywords = {}
     
-    # Convert resume text to lowercase for case-insensitive matching
-    resume_lower = resume_text.lower()
-    
     # Process keywords list
     keyword_list = []
     if isinstance(keywords, dict) and "keywords" in keywords:
@@ -162,7 +181,8 @@ def fallback_find_keywords_in_resume(keywords, resume_text):
         # Use the list directly
         keyword_list = keywords
     
-    # Check each keyword
+    # Find every keyword in the resume with a single scan (case-insensitive)
+    keyword_texts = []
     for keyword in keyword_list:
         if isinstance(keyword, dict) and "keyword" in keyword:
             keyword_text = keyword["keyword"]
@@ -170,9 +190,11 @@ def fallback_find_keywords_in_resume(keywords, resume_text):
             keyword_text = keyword
         else:
             continue
-            
-        # Check if the keyword exists in the resume (case-insensitive)
-        found_keywords[keyword_text] = keyword_text.lower() in resume_lower
+        keyword_texts.append(keyword_text)
+    
+    present = get_resume_index(resume_text).found(keyword_texts)
+    for keyword_text in keyword_texts:
+        found_keywords[keyword_text] = keyword_text in present
     
     # Highlight the keywords in the resume
     from services.keyword.keyword_highlighting import highlight_keywords_in_resume
@@ -180,108 +202,145 @@ def fallback_find_keywords_in_resume(keywords, resume_text):
     
     return found_keywords, highlighted_resume
 
-def find_keyword_citations(keywords, resume_text, job_title='', company_name='', industry=''):
+def organize_keywords(keywords):
     """
-    Find citations in the resume for each keyword with improved matching.
+    Normalize the keywords input into a flat list and priority buckets.
     
     Args:
-        keywords (list): List of keywords to find citations for
-        resume_text (str): The resume text to search in
-        job_title (str, optional): The job title. Defaults to ''.
-        company_name (str, optional): The company name. Defaults to ''.
-        industry (str, optional): The industry. Defaults to ''.
+        keywords (list or dict): A list of keywords (optionally carrying an
+            original_keywords attribute) or a structured keywords dictionary
         
     Returns:
-        dict: Dictionary mapping keywords to citations organized by priority
+        tuple: (keyword_list, priority_keywords) - The flat keyword list and a dictionary
+               mapping each priority level to its keywords
     """
-    try:
-        log_debug(f"Finding citations for {len(keywords)} keywords...")
-        start_time = time.time()
-        
-        # Process keywords to extract a clean list and organize by priority
-        sanitized_keywords = []
-        keyword_list = []
-        priority_keywords = {
-            "high_priority": [],
-            "medium_priority": [],
-            "low_priority": []
-        }
+    keyword_list = []
+    priority_keywords = {
+        "high_priority": [],
+        "medium_priority": [],
+        "low_priority": []
+    }
+    
+    # Process the keywords input which could be in different formats
+    if isinstance(keywords, dict):
+        if "keywords" in keywords:
+            # Extract from enhanced structure
+            for priority in ["high_priority", "medium_priority", "low_priority"]:
+                if priority in keywords["keywords"]:
+                    for item in keywords["keywords"][priority]:
+                        if isinstance(item, dict) and "keyword" in item:
+                            keyword_list.append(item["keyword"])
+                            priority_keywords[priority].append(item["keyword"])
+                        elif isinstance(item, str):
+                            keyword_list.append(item)
+                            priority_keywords[priority].append(item)
+        else:
+            # Direct dictionary structure
+            for priority in ["high_priority", "medium_priority", "low_priority"]:
+                if priority in keywords:
+                    for item in keywords[priority]:
+                        if isinstance(item, dict) and "keyword" in item:
+                            keyword_list.append(item["keyword"])
+                            priority_keywords[priority].append(item["keyword"])
+                        elif isinstance(item, str):
+                            keyword_list.append(item)
+                            priority_keywords[priority].append(item)
+    elif isinstance(keywords, list):
+        keyword_list = list(keywords)
         
-        # Process the keywords input which could be in different formats
-        if isinstance(keywords, dict):
-            if "keywords" in keywords:
-                # Extract from enhanced structure
+        # For a simple list of keywords, try to extract priority information from the original structure
+        # Check if we have a global keywords structure with priority information
+        if hasattr(keywords, 'original_keywords') and isinstance(keywords.original_keywords, dict):
+            original_keywords = keywords.original_keywords
+            # Process the original keywords structure to extract priority information
+            if "keywords" in original_keywords:
                 for priority in ["high_priority", "medium_priority", "low_priority"]:
-                    if priority in keywords["keywords"]:
-                        for item in keywords["keywords"][priority]:
+                    if priority in original_keywords["keywords"]:
+                        for item in original_keywords["keywords"][priority]:
                             if isinstance(item, dict) and "keyword" in item:
-                                keyword_list.append(item["keyword"])
                                 priority_keywords[priority].append(item["keyword"])
                             elif isinstance(item, str):
-                                keyword_list.append(item)
                                 priority_keywords[priority].append(item)
             else:
-                # Direct dictionary structure
                 for priority in ["high_priority", "medium_priority", "low_priority"]:
-                    if priority in keywords:
-                        for item in keywords[priority]:
+                    if priority in original_keywords:
+                        for item in original_keywords[priority]:
                             if isinstance(item, dict) and "keyword" in item:
-                                keyword_list.append(item["keyword"])
                                 priority_keywords[priority].append(item["keyword"])
                             elif isinstance(item, str):
-                                keyword_list.append(item)
                                 priority_keywords[priority].append(item)
-        elif isinstance(keywords, list):
-            # For a simple list of keywords, try to extract priority information from the original structure
-            # Check if we have a global keywords structure with priority information
-            if hasattr(keywords, 'original_keywords') and isinstance(keywords.original_keywords, dict):
-                original_keywords = keywords.original_keywords
-                # Process the original keywords structure to extract priority information
-                if "keywords" in original_keywords:
-                    for priority in ["high_priority", "medium_priority", "low_priority"]:
-                        if priority in original_keywords["keywords"]:
-                            for item in original_keywords["keywords"][priority]:
-                                if isinstance(item, dict) and "keyword" in item:
-                                    priority_keywords[priority].append(item["keyword"])
-                                elif isinstance(item, str):
-                                    priority_keywords[priority].append(item)
-                else:
-                    for priority in ["high_priority", "medium_priority", "low_priority"]:
-                        if priority in original_keywords:
-                            for item in original_keywords[priority]:
-                                if isinstance(item, dict) and "keyword" in item:
-                                    priority_keywords[priority].append(item["keyword"])
-                                elif isinstance(item, str):
-                                    priority_keywords[priority].append(item)
-            
-            # If we couldn't extract priority information, distribute keywords evenly
-            if all(len(priority_keywords[p]) == 0 for p in ["high_priority", "medium_priority", "low_priority"]):
-                log_debug("No priority information found, distributing keywords evenly")
-                keyword_list = keywords
-                # Distribute keywords evenly across priority buckets
-                total_keywords = len(keyword_list)
-                third = total_keywords // 3
-                
-                # Assign first third to high priority
-                priority_keywords["high_priority"] = keyword_list[:third]
-                # Assign second third to medium priority
-                priority_keywords["medium_priority"] = keyword_list[third:2*third]
-                # Assign last third to low priority
-                priority_keywords["low_priority"] = keyword_list[2*third:]
-                
-                log_debug(f"Distributed {len(priority_keywords['high_priority'])} to high, " +
-                         f"{len(priority_keywords['medium_priority'])} to medium, " +
-                         f"{len(priority_keywords['low_priority'])} to low priority")
         
-        # Sanitize the keywords
-        for keyword in keyword_list:
-            sanitized_keywords.append(sanitize_text(keyword))
+        # If we couldn't extract priority information, distribute keywords evenly
+        if all(len(priority_keywords[p]) == 0 for p in ["high_priority", "medium_priority", "low_priority"]):
+            log_debug("No priority information found, distributing keywords evenly")
+            # Distribute keywords evenly across priority buckets
+            total_keywords = len(keyword_list)
+            third = total_keywords // 3
+            
+            # Assign first third to high priority
+            priority_keywords["high_priority"] = keyword_list[:third]
+            # Assign second third to medium priority
+            priority_keywords["medium_priority"] = keyword_list[third:2*third]
+            # Assign last third to low priority
+            priority_keywords["low_priority"] = keyword_list[2*third:]
+            
+            log_debug(f"Distributed {len(priority_keywords['high_priority'])} to high, " +
+                     f"{len(priority_keywords['medium_priority'])} to medium, " +
+                     f"{len(priority_keywords['low_priority'])} to low priority")
+    
+    return keyword_list, priority_keywords
+
+def empty_citations(error=None):
+    """
+    Create an empty citations structure.
+    
+    Args:
+        error (str, optional): Error message to record in the fallback bucket
         
-        # Sanitize resume text - more aggressive cleaning
-        sanitized_resume = sanitize_text(resume_text)
+    Returns:
+        dict: Citations structure with empty priority buckets
+    """
+    citations = {
+        "high_priority": {},
+        "medium_priority": {},
+        "low_priority": {},
+        "fallback_extraction": {}
+    }
+    if error:
+        citations["fallback_extraction"]["error"] = error
+    return citations
+
+def place_citation(organized_citations, priority_keywords, keyword, citation):
+    """
+    Put a citation into the priority bucket of its keyword (or the fallback bucket).
+    
+    Args:
+        organized_citations (dict): Citations structure to add to
+        priority_keywords (dict): Mapping of priority level to keywords
+        keyword (str): The keyword the citation supports
+        citation (dict or str): The citation object or text
+    """
+    for priority, keywords_list in priority_keywords.items():
+        if keyword in keywords_list:
+            organized_citations[priority][keyword] = citation
+            return
+    
+    # If we couldn't determine the priority, put it in fallback
+    organized_citations["fallback_extraction"][keyword] = citation
+
+def build_citation_messages(sanitized_keywords, sanitized_resume):
+    """
+    Build the chat messages for finding citations for keywords.
+    
+    Args:
+        sanitized_keywords (list): Sanitized keywords
+        sanitized_resume (str): Sanitized resume text
         
-        # Prepare the prompt for OpenAI with improved instructions for text-based response
-        prompt = f"""
+    Returns:
+        list: Message dictionaries for the OpenAI API
+    """
+    # Prepare the prompt for OpenAI with improved instructions for text-based response
+    prompt = f"""
         I have a list of keywords and a resume. I need you to find evidence in the resume that supports each keyword.
         
         IMPORTANT INSTRUCTIONS:
@@ -330,158 +389,97 @@ def find_keyword_citations(keywords, resume_text, job_title='', company_name='',
         Resume:
         {sanitized_resume}
         """
+    
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes and returns structured text. You are strict about only including keywords with genuine matches and omitting those without clear evidence."},
+        {"role": "user", "content": prompt}
+    ]
+    return messages
+
+def parse_citation_response(response_text, priority_keywords):
+    """
+    Parse a KEYWORD / CITATION / EXACT_PHRASE text response into citations by priority.
+    
+    Args:
+        response_text (str): The text response from the model
+        priority_keywords (dict): Mapping of priority level to keywords
         
-        try:
-            log_debug("Calling OpenAI API to find citations (text format)...")
-            api_start_time = time.time()
-            
-            messages = [
-                {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes and returns structured text. You are strict about only including keywords with genuine matches and omitting those without clear evidence."},
-                {"role": "user", "content": prompt}
-            ]
-            
-            # Get the text response
-            response_text = get_text_response(messages, max_tokens=1500, temperature=0.3)
-            
-            api_duration = time.time() - api_start_time
-            log_debug(f"OpenAI API call for citations completed in {api_duration:.2f} seconds")
-            
-            # Parse the text response into a structured format
-            organized_citations = {
-                "high_priority": {},
-                "medium_priority": {},
-                "low_priority": {},
-                "fallback_extraction": {}
-            }
-            
-            # Parse the response text
-            current_keyword = None
-            current_citation = None
-            current_exact_phrase = None
-            
-            # Split the response into lines and process each line
-            lines = response_text.split('\n')
-            for line in lines:
-                line = line.strip()
-                
-                # Skip empty lines
-                if not line:
-                    # If we have a complete keyword-citation pair, add it to the appropriate bucket
-                    if current_keyword and current_citation:
-                        # Create a citation object with citation text and exact phrase
-                        citation_obj = {
-                            "citation": current_citation,
-                            "exact_phrase": current_exact_phrase or current_keyword  # Default to keyword if no exact phrase
-                        }
-                        
-                        # Determine which priority bucket this keyword belongs to
-                        placed = False
-                        for priority, keywords_list in priority_keywords.items():
-                            if current_keyword in keywords_list:
-                                organized_citations[priority][current_keyword] = citation_obj
-                                placed = True
-                                break
-                        
-                        if not placed:
-                            # If we couldn't determine the priority, put it in fallback
-                            organized_citations["fallback_extraction"][current_keyword] = citation_obj
-                        
-                        # Reset for the next keyword-citation pair
-                        current_keyword = None
-                        current_citation = None
-                        current_exact_phrase = None
-                    
-                    continue
-                
-                # Check for keyword line
-                if line.startswith("KEYWORD:"):
-                    # If we already have a keyword but no citation, this is a new keyword
-                    if current_keyword and not current_citation:
-                        # The previous keyword had no citation, so we skip it
-                        current_keyword = line[8:].strip()
-                    # If we have a complete pair, store it and start a new one
-                    elif current_keyword and current_citation:
-                        # Create a citation object with citation text and exact phrase
-                        citation_obj = {
-                            "citation": current_citation,
-                            "exact_phrase": current_exact_phrase or current_keyword  # Default to keyword if no exact phrase
-                        }
-                        
-                        # Determine which priority bucket this keyword belongs to
-                        placed = False
-                        for priority, keywords_list in priority_keywords.items():
-                            if current_keyword in keywords_list:
-                                organized_citations[priority][current_keyword] = citation_obj
-                                placed = True
-                                break
-                        
-                        if not placed:
-                            # If we couldn't determine the priority, put it in fallback
-                            organized_citations["fallback_extraction"][current_keyword] = citation_obj
-                        
-                        # Start a new keyword
-                        current_keyword = line[8:].strip()
-                        current_citation = None
-                        current_exact_phrase = None
-                    else:
-                        # This is the first keyword
-                        current_keyword = line[8:].strip()
-                
-                # Check for citation line
-                elif line.startswith("CITATION:"):
-                    if current_keyword:
-                        current_citation = line[9:].strip()
-                # Check for exact phrase line
-                elif line.startswith("EXACT_PHRASE:"):
-                    if current_keyword:
-                        current_exact_phrase = line[13:].strip()
-                # If it's not a keyword, citation, or exact phrase line, it might be a continuation of the citation
-                elif current_keyword and current_citation and not line.startswith("EXACT_PHRASE:"):
-                    current_citation += " " + line
-            
-            # Don't forget to process the last keyword-citation pair if it exists
+    Returns:
+        dict: Citations organized by priority, each a dict with citation and exact_phrase
+    """
+    # Parse the text response into a structured format
+    organized_citations = empty_citations()
+    
+    # Parse the response text
+    current_keyword = None
+    current_citation = None
+    current_exact_phrase = None
+    
+    def store_current():
+        # Create a citation object with citation text and exact phrase
+        citation_obj = {
+            "citation": current_citation,
+            "exact_phrase": current_exact_phrase or current_keyword  # Default to keyword if no exact phrase
+        }
+        place_citation(organized_citations, priority_keywords, current_keyword, citation_obj)
+    
+    # Split the response into lines and process each line
+    for line in response_text.split('\n'):
+        line = line.strip()
+        
+        # Skip empty lines
+        if not line:
+            # If we have a complete keyword-citation pair, add it to the appropriate bucket
             if current_keyword and current_citation:
-                placed = False
-                for priority, keywords_list in priority_keywords.items():
-                    if current_keyword in keywords_list:
-                        organized_citations[priority][current_keyword] = current_citation
-                        placed = True
-                        break
+                store_current()
                 
-                if not placed:
-                    organized_citations["fallback_extraction"][current_keyword] = current_citation
-            
-            # Count how many citations we found
-            total_citations = sum(len(citations) for citations in organized_citations.values())
-            log_debug(f"Found citations for {total_citations} keywords out of {len(keywords)}")
-            
-            # Log a sample of the citations for debugging
-            for priority in ["high_priority", "medium_priority", "low_priority", "fallback_extraction"]:
-                if organized_citations[priority]:
-                    sample_keys = list(organized_citations[priority].keys())[:1]  # Get up to 1 key
-                    for key in sample_keys:
-                        citation_value = organized_citations[priority][key]
-                        # Check if citation is a string or an object
-                        if isinstance(citation_value, str):
-                            sample_text = citation_value[:50]
-                        elif isinstance(citation_value, dict) and "citation" in citation_value:
-                            sample_text = citation_value["citation"][:50]
-                        else:
-                            sample_text = str(citation_value)[:50]
-                        log_debug(f"Sample citation - '{priority}': '{sample_text}...'")
-            
-            return organized_citations
-            
-        except Exception as api_err:
-            print(f"API error in citation extraction: {str(api_err)}")
-            log_debug(f"API error: {str(api_err)}")
+                # Reset for the next keyword-citation pair
+                current_keyword = None
+                current_citation = None
+                current_exact_phrase = None
             
-            # Try fallback method with even simpler format
-            try:
-                log_debug("API error, trying fallback method with simpler format...")
-                fallback_start_time = time.time()
-                
-                fallback_prompt = f"""
+            continue
+        
+        # Check for keyword line
+        if line.startswith("KEYWORD:"):
+            # If we have a complete pair, store it before starting a new one
+            # (a previous keyword without a citation is simply skipped)
+            if current_keyword and current_citation:
+                store_current()
+            current_keyword = line[8:].strip()
+            current_citation = None
+            current_exact_phrase = None
+        
+        # Check for citation line
+        elif line.startswith("CITATION:"):
+            if current_keyword:
+                current_citation = line[9:].strip()
+        # Check for exact phrase line
+        elif line.startswith("EXACT_PHRASE:"):
+            if current_keyword:
+                current_exact_phrase = line[13:].strip()
+        # If it's not a keyword, citation, or exact phrase line, it might be a continuation of the citation
+        elif current_keyword and current_citation:
+            current_citation += " " + line
+    
+    # Don't forget to process the last keyword-citation pair if it exists
+    if current_keyword and current_citation:
+        store_current()
+    
+    return organized_citations
+
+def build_fallback_citation_messages(sanitized_keywords, sanitized_resume):
+    """
+    Build the chat messages for the simpler fallback citation prompt.
+    
+    Args:
+        sanitized_keywords (list): Sanitized keywords
+        sanitized_resume (str): Sanitized resume text
+        
+    Returns:
+        list: Message dictionaries for the OpenAI API
+    """
+    fallback_prompt = f"""
                 I have a list of keywords and a resume. Find evidence for each keyword.
                 
                 For each keyword, provide a brief excerpt from the resume that demonstrates this skill.
@@ -506,111 +504,533 @@ def find_keyword_citations(keywords, resume_text, job_title='', company_name='',
                 Resume (excerpt):
                 {sanitized_resume[:3000]}  # Limit resume text to avoid token limits
                 """
-                
-                messages = [
-                    {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes."},
-                    {"role": "user", "content": fallback_prompt}
-                ]
-                
-                # Get the text response
-                log_debug("Calling OpenAI API for fallback citation method...")
-                fallback_api_start = time.time()
-                
-                fallback_content = get_text_response(messages, max_tokens=1000, temperature=0.3)
-                
-                fallback_api_duration = time.time() - fallback_api_start
-                log_debug(f"Fallback API call completed in {fallback_api_duration:.2f} seconds")
-                
-                # Parse the fallback response
-                organized_citations = {
-                    "high_priority": {},
-                    "medium_priority": {},
-                    "low_priority": {},
-                    "fallback_extraction": {}
-                }
-                
-                # Parse the response text
+    
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes."},
+        {"role": "user", "content": fallback_prompt}
+    ]
+    return messages
+
+def parse_fallback_citation_response(fallback_content, priority_keywords):
+    """
+    Parse a KEYWORD / CITATION text response from the fallback prompt.
+    
+    Args:
+        fallback_content (str): The text response from the model
+        priority_keywords (dict): Mapping of priority level to keywords
+        
+    Returns:
+        dict: Citations organized by priority, each a citation string
+    """
+    # Parse the fallback response
+    organized_citations = empty_citations()
+    
+    # Parse the response text
+    current_keyword = None
+    current_citation = None
+    
+    # Split the response into lines and process each line
+    for line in fallback_content.split('\n'):
+        line = line.strip()
+        
+        # Skip empty lines
+        if not line:
+            # If we have a complete keyword-citation pair, add it to the fallback bucket
+            if current_keyword and current_citation:
+                organized_citations["fallback_extraction"][current_keyword] = current_citation
                 current_keyword = None
                 current_citation = None
-                
-                # Split the response into lines and process each line
-                lines = fallback_content.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    
-                    # Skip empty lines
-                    if not line:
-                        # If we have a complete keyword-citation pair, add it to the fallback bucket
-                        if current_keyword and current_citation:
-                            organized_citations["fallback_extraction"][current_keyword] = current_citation
-                            current_keyword = None
-                            current_citation = None
-                        continue
-                    
-                    # Check for keyword line
-                    if line.startswith("KEYWORD:"):
-                        # If we already have a keyword but no citation, this is a new keyword
-                        if current_keyword and not current_citation:
-                            # The previous keyword had no citation, so we skip it
-                            current_keyword = line[8:].strip()
-                        # If we have a complete pair, store it and start a new one
-                        elif current_keyword and current_citation:
-                            organized_citations["fallback_extraction"][current_keyword] = current_citation
-                            current_keyword = line[8:].strip()
-                            current_citation = None
-                        else:
-                            # This is the first keyword
-                            current_keyword = line[8:].strip()
-                    
-                    # Check for citation line
-                    elif line.startswith("CITATION:"):
-                        if current_keyword:
-                            current_citation = line[9:].strip()
-                    # If it's not a keyword or citation line, it might be a continuation of the citation
-                    elif current_keyword and current_citation:
-                        current_citation += " " + line
-                
-                # Don't forget to process the last keyword-citation pair if it exists
-                if current_keyword and current_citation:
-                    organized_citations["fallback_extraction"][current_keyword] = current_citation
-                
-                # Try to distribute fallback citations to their priority buckets if possible
-                fallback_citations = organized_citations["fallback_extraction"].copy()
-                for keyword, citation in fallback_citations.items():
-                    for priority, keywords_list in priority_keywords.items():
-                        if keyword in keywords_list:
-                            organized_citations[priority][keyword] = citation
-                            # Remove from fallback since we've placed it in a priority bucket
-                            if keyword in organized_citations["fallback_extraction"]:
-                                del organized_citations["fallback_extraction"][keyword]
-                            break
-                
-                # Count how many citations we found
-                total_citations = sum(len(citations) for citations in organized_citations.values())
-                log_debug(f"Fallback method found citations for {total_citations} keywords")
-                
-                return organized_citations
-                
-            except Exception as fallback_err:
-                print(f"Error in fallback citation method: {str(fallback_err)}")
-                log_debug(f"Error in fallback citation method: {str(fallback_err)}")
-                
-                # Return minimal structure with empty buckets
-                return {
-                    "high_priority": {},
-                    "medium_priority": {},
-                    "low_priority": {},
-                    "fallback_extraction": {"error": "Failed to extract citations"}
-                }
+            continue
+        
+        # Check for keyword line
+        if line.startswith("KEYWORD:"):
+            # If we have a complete pair, store it before starting a new one
+            if current_keyword and current_citation:
+                organized_citations["fallback_extraction"][current_keyword] = current_citation
+            current_keyword = line[8:].strip()
+            current_citation = None
+        
+        # Check for citation line
+        elif line.startswith("CITATION:"):
+            if current_keyword:
+                current_citation = line[9:].strip()
+        # If it's not a keyword or citation line, it might be a continuation of the citation
+        elif current_keyword and current_citation:
+            current_citation += " " + line
+    
+    # Don't forget to process the last keyword-citation pair if it exists
+    if current_keyword and current_citation:
+        organized_citations["fallback_extraction"][current_keyword] = current_citation
+    
+    # Try to distribute fallback citations to their priority buckets if possible
+    fallback_citations = organized_citations["fallback_extraction"].copy()
+    for keyword, citation in fallback_citations.items():
+        for priority, keywords_list in priority_keywords.items():
+            if keyword in keywords_list:
+                organized_citations[priority][keyword] = citation
+                # Remove from fallback since we've placed it in a priority bucket
+                del organized_citations["fallback_extraction"][keyword]
+                break
+    
+    return organized_citations
+
+def log_citation_samples(organized_citations):
+    """
+    Log a sample citation from each priority bucket for debugging.
+    
+    Args:
+        organized_citations (dict): Citations organized by priority
+    """
+    for priority in ["high_priority", "medium_priority", "low_priority", "fallback_extraction"]:
+        if organized_citations[priority]:
+            sample_keys = list(organized_citations[priority].keys())[:1]  # Get up to 1 key
+            for key in sample_keys:
+                citation_value = organized_citations[priority][key]
+                # Check if citation is a string or an object
+                if isinstance(citation_value, str):
+                    sample_text = citation_value[:50]
+                elif isinstance(citation_value, dict) and "citation" in citation_value:
+                    sample_text = citation_value["citation"][:50]
+                else:
+                    sample_text = str(citation_value)[:50]
+                log_debug(f"Sample citation - '{priority}': '{sample_text}...'")
+
+def count_citations(organized_citations):
+    """
+    Count the citations in a citations structure, ignoring an error marker.
+    
+    Args:
+        organized_citations (dict): Citations organized by priority
+        
+    Returns:
+        int: The number of keywords with a citation
+    """
+    return sum(len([key for key in citations if key != "error"]) for citations in organized_citations.values())
+
+def citation_strategies(sanitized_keywords, sanitized_resume, priority_keywords):
+    """
+    Build the main and fallback citation strategies for run_speculatively().
+    
+    Args:
+        sanitized_keywords (list): Sanitized keywords
+        sanitized_resume (str): Sanitized resume text
+        priority_keywords (dict): Mapping of priority level to keywords
+        
+    Returns:
+        tuple: (strategies, async_strategies, validators, main_completion) - main_completion
+               receives the main prompt's finish_reason once it has answered
+    """
+    main_messages = build_citation_messages(sanitized_keywords, sanitized_resume)
+    fallback_messages = build_fallback_citation_messages(sanitized_keywords, sanitized_resume)
+    main_completion = {}
+    
+    # The main prompt is hedged; the simpler fallback prompt runs if it fails (or is slow, when speculating)
+    strategies = {
+        "main": lambda: parse_citation_response(
+            get_text_response(main_messages, max_tokens=1500, temperature=0.3, timeout=90, hedge="find_keyword_citations",
+                              completion_info=main_completion),
+            priority_keywords
+        ),
+        "fallback": lambda: parse_fallback_citation_response(
+            get_text_response(fallback_messages, max_tokens=1000, temperature=0.3, timeout=60),
+            priority_keywords
+        )
+    }
+    
+    async def amain():
+        response_text = await aget_text_response(main_messages, max_tokens=1500, temperature=0.3, timeout=90, hedge="find_keyword_citations",
+                                                 completion_info=main_completion)
+        return parse_citation_response(response_text, priority_keywords)
+    
+    async def afallback():
+        fallback_content = await aget_text_response(fallback_messages, max_tokens=1000, temperature=0.3, timeout=60)
+        return parse_fallback_citation_response(fallback_content, priority_keywords)
+    
+    validators = {
+        "main": lambda citations: count_citations(citations) > 0,
+        "fallback": lambda citations: count_citations(citations) > 0
+    }
+    
+    return strategies, {"main": amain, "fallback": afallback}, validators, main_completion
+
+def choose_citations(strategy, organized_citations, outcomes):
+    """
+    Pick the citations to return after running the citation strategies.
+    
+    Args:
+        strategy (str): The strategy whose result was usable, or None
+        organized_citations (dict): Its result
+        outcomes (dict): Result or exception of each finished strategy
+        
+    Returns:
+        dict: Citations organized by priority
+    """
+    if strategy is not None:
+        if strategy != "main":
+            log_debug(f"Main citation prompt found nothing, using {strategy} citations")
+        return organized_citations
+    
+    # No citations at all: an empty answer is still an answer, unless every call failed
+    for name in ["main", "fallback"]:
+        if isinstance(outcomes.get(name), dict):
+            return outcomes[name]
+    return empty_citations("Failed to extract citations")
+
+def stored_citations(resume_text, keyword_list):
+    """
+    Look up the evidence already stored for this resume and these keywords.
+    
+    Args:
+        resume_text (str): The resume text
+        keyword_list (list): The keywords to find citations for
+        
+    Returns:
+        tuple: (resume_hash, stored, missing) - The resume's content hash, a dictionary
+               of stored citations (None for a stored "no evidence"), and the keywords
+               that still have to be sent to the model
+    """
+    resume_hash = get_resume_index(resume_text).content_hash
+    store = get_evidence_store()
+    stored = {}
+    if store is not None:
+        try:
+            stored = store.lookup(resume_hash, keyword_list)
+        except Exception as e:
+            print(f"Error reading evidence store: {str(e)}")
+    missing = [keyword for keyword in keyword_list if keyword not in stored]
+    return resume_hash, stored, missing
+
+def save_citations(resume_hash, keyword_list, strategy, organized_citations, whole_resume=True, answer_complete=True):
+    """
+    Write the citations the model found back to the evidence store.
+    
+    Keywords the main prompt left out are stored as "no evidence", but only when
+    it saw the whole resume and its answer ended on its own: a prompt given a
+    retrieved excerpt may simply not have been shown the evidence, and an answer
+    cut off at max_tokens never got to the keywords after the cut. The fallback
+    prompt only sees part of the resume and keyword list, so only its hits are kept.
+    
+    Args:
+        resume_hash (str): The resume's content hash
+        keyword_list (list): The keywords that were sent to the model
+        strategy (str): The strategy whose citations were used, or None
+        organized_citations (dict): Citations organized by priority
+        whole_resume (bool): Whether the prompt was given the whole resume
+        answer_complete (bool): Whether the main prompt's answer finished (finish_reason "stop")
+    """
+    store = get_evidence_store()
+    if store is None:
+        return
+    
+    # The model may echo a keyword with different casing or in its sanitized form
+    requested = {}
+    for keyword in keyword_list:
+        requested.setdefault(normalize_keyword(keyword), keyword)
+        requested.setdefault(normalize_keyword(sanitize_text(keyword)), keyword)
+    
+    store_misses = strategy == "main" and whole_resume and answer_complete
+    evidence = {keyword: None for keyword in keyword_list} if store_misses else {}
+    for citations in organized_citations.values():
+        for keyword, citation in citations.items():
+            if keyword != "error" and normalize_keyword(keyword) in requested:
+                evidence[requested[normalize_keyword(keyword)]] = citation
+    
+    try:
+        store.save(resume_hash, evidence)
+    except Exception as e:
+        print(f"Error writing evidence store: {str(e)}")
+
+def merge_stored_citations(organized_citations, stored, priority_keywords):
+    """
+    Add stored citations to a citations structure, in this request's priority buckets.
+    
+    Args:
+        organized_citations (dict): Citations structure to add to
+        stored (dict): Stored citations by keyword (None for no evidence)
+        priority_keywords (dict): Mapping of priority level to keywords
+        
+    Returns:
+        dict: The citations structure
+    """
+    for keyword, citation in stored.items():
+        if citation is not None:
+            place_citation(organized_citations, priority_keywords, keyword, citation)
+    return organized_citations
+
+def citation_batches(keyword_list, priority_keywords, batch_size=None):
+    """
+    Split the keywords into citation prompts, high priority first.
+    
+    A batch never mixes priority levels, so the high-priority citations can be
+    returned as soon as their own prompts finish.
+    
+    Args:
+        keyword_list (list): The keywords to find citations for
+        priority_keywords (dict): Mapping of priority level to keywords
+        batch_size (int, optional): Keywords per prompt, overrides CITATION_BATCH_SIZE
+        
+    Returns:
+        list: (name, priority, keywords) tuples in the order they should start;
+              priority is None for a single prompt holding every keyword
+    """
+    batch_size = CITATION_BATCH_SIZE if batch_size is None else batch_size
+    if batch_size <= 0 or len(keyword_list) <= batch_size:
+        return [("all", None, list(keyword_list))]
+    
+    tiers = {"high_priority": [], "medium_priority": [], "low_priority": [], "fallback_extraction": []}
+    for keyword in keyword_list:
+        tier = next((priority for priority in ["high_priority", "medium_priority", "low_priority"]
+                     if keyword in priority_keywords.get(priority, [])), "fallback_extraction")
+        tiers[tier].append(keyword)
+    
+    batches = []
+    for priority, tier_keywords in tiers.items():
+        for offset in range(0, len(tier_keywords), batch_size):
+            batches.append((f"{priority}_{offset // batch_size + 1}", priority, tier_keywords[offset:offset + batch_size]))
+    return batches
+
+def find_batch_citations(batch_keywords, resume_text, priority_keywords, resume_hash):
+    """
+    Find citations for one batch of keywords and store them.
+    
+    The main prompt and the simpler fallback prompt run speculatively: the
+    fallback's citations are used when the main prompt fails or finds none.
+    
+    Args:
+        batch_keywords (list): The keywords in this batch
+        resume_text (str): The resume text to search in
+        priority_keywords (dict): Mapping of priority level to keywords
+        resume_hash (str): The resume's content hash
+        
+    Returns:
+        dict: Citations organized by priority
+    """
+    sanitized_keywords = [sanitize_text(keyword) for keyword in batch_keywords]
+    
+    # Only the resume segments most relevant to the keywords go into the prompt
+    sanitized_resume, whole_resume = select_evidence_text(resume_text, batch_keywords)
+    
+    strategies, _, validators, main_completion = citation_strategies(sanitized_keywords, sanitized_resume, priority_keywords)
+    outcomes = {}
+    start_time = time.time()
+    strategy, organized_citations = run_speculatively(strategies, validators, outcomes)
+    record_model_call(time.time() - start_time)
+    organized_citations = choose_citations(strategy, organized_citations, outcomes)
+    save_citations(resume_hash, batch_keywords, strategy, organized_citations, whole_resume,
+                   main_completion.get("finish_reason") == "stop")
+    return organized_citations
+
+async def afind_batch_citations(batch_keywords, resume_text, priority_keywords, resume_hash):
+    """
+    Async version of find_batch_citations.
+    
+    Returns:
+        dict: Citations organized by priority
+    """
+    sanitized_keywords = [sanitize_text(keyword) for keyword in batch_keywords]
+    sanitized_resume, whole_resume = select_evidence_text(resume_text, batch_keywords)
+    
+    _, async_strategies, validators, main_completion = citation_strategies(sanitized_keywords, sanitized_resume, priority_keywords)
+    outcomes = {}
+    start_time = time.time()
+    strategy, organized_citations = await arun_speculatively(async_strategies, validators, outcomes)
+    record_model_call(time.time() - start_time)
+    organized_citations = choose_citations(strategy, organized_citations, outcomes)
+    save_citations(resume_hash, batch_keywords, strategy, organized_citations, whole_resume,
+                   main_completion.get("finish_reason") == "stop")
+    return organized_citations
+
+def merge_citations(merged_citations, organized_citations):
+    """
+    Add one batch's citations to the merged citations structure.
+    
+    Args:
+        merged_citations (dict): Citations structure to add to
+        organized_citations (dict): The batch's citations organized by priority
+        
+    Returns:
+        dict: The merged citations structure
+    """
+    for bucket, citations in organized_citations.items():
+        for keyword, citation in citations.items():
+            if keyword != "error":
+                merged_citations.setdefault(bucket, {})[keyword] = citation
+    return merged_citations
+
+def finish_citations(merged_citations, errors):
+    """
+    Mark the merged citations as failed if nothing was found and some batch failed.
+    
+    Args:
+        merged_citations (dict): Citations organized by priority
+        errors (list): Error messages of the failed batches
+        
+    Returns:
+        dict: The citations structure
+    """
+    if errors and count_citations(merged_citations) == 0:
+        merged_citations["fallback_extraction"]["error"] = errors[0]
+    return merged_citations
+
+def batch_error(organized_citations, error):
+    """
+    Describe why a citation batch failed: it raised, or every prompt in it failed.
+    
+    Args:
+        organized_citations (dict): The batch's citations
+        error (Exception): The exception it raised, or None
+        
+    Returns:
+        str: The error message, or None if the batch succeeded
+    """
+    if error is not None:
+        return f"Failed to process citations: {str(error)}"
+    return organized_citations.get("fallback_extraction", {}).get("error")
+
+def stream_keyword_citations(keywords, resume_text, job_title='', company_name='', industry='', batch_size=None, max_concurrency=None):
+    """
+    Find citations for the keywords, yielding each batch's citations as soon as it finishes.
+    
+    Citations already in the evidence store for this resume are yielded first,
+    then the keywords the resume shows verbatim or inflected are cited locally
+    (see resolve_locally), and only the remaining keywords are sent to the model. Long keyword lists are
+    split into batches by priority (see citation_batches) that run concurrently,
+    high priority first, which keeps each prompt's output short enough to finish
+    quickly and not be truncated.
+    
+    Args:
+        keywords (list): List of keywords to find citations for
+        resume_text (str): The resume text to search in
+        job_title (str, optional): The job title. Defaults to ''.
+        company_name (str, optional): The company name. Defaults to ''.
+        industry (str, optional): The industry. Defaults to ''.
+        batch_size (int, optional): Keywords per prompt, overrides CITATION_BATCH_SIZE
+        max_concurrency (int, optional): Batches at once, overrides CITATION_BATCH_CONCURRENCY
+        
+    Yields:
+        tuple: (event, data) where event is "stored" (citations from the evidence store),
+               "local" (citations resolved without the model), "batch" (name, priority, keywords and citations of a finished batch) or
+               "citations" (every citation merged, last)
+    """
+    keyword_list, priority_keywords = organize_keywords(keywords)
+    
+    # Evidence depends only on the resume and the keyword, so reuse what earlier requests found
+    resume_hash, stored, missing = stored_citations(resume_text, keyword_list)
+    log_debug(f"Evidence store: {len(stored)} of {len(keyword_list)} keywords already checked for this resume")
+    stored_found = merge_stored_citations(empty_citations(), stored, priority_keywords)
+    merged_citations = merge_citations(empty_citations(), stored_found)
+    if stored:
+        yield "stored", stored_found
+    
+    # Keywords the resume shows verbatim or inflected are cited without the model
+    local, missing = resolve_locally(resume_text, missing)
+    if local:
+        local_found = merge_stored_citations(empty_citations(), local, priority_keywords)
+        merge_citations(merged_citations, local_found)
+        log_debug(f"Resolved {len(local)} keywords locally")
+        yield "local", local_found
+    
+    batches = citation_batches(missing, priority_keywords, batch_size) if missing else []
+    log_debug(f"Calling OpenAI API to find citations for {len(missing)} keywords in {len(batches)} batches...")
+    
+    stages = {
+        name: (lambda batch_keywords=batch_keywords:
+               find_batch_citations(batch_keywords, resume_text, priority_keywords, resume_hash))
+        for name, _, batch_keywords in batches
+    }
+    details = {name: (priority, batch_keywords) for name, priority, batch_keywords in batches}
+    errors = []
+    for name, organized_citations, error in iter_concurrently(stages, max_concurrency or CITATION_BATCH_CONCURRENCY):
+        message = batch_error(organized_citations or {}, error)
+        if message:
+            print(f"Citation batch '{name}' failed: {message}")
+            errors.append(message)
+        organized_citations = organized_citations or empty_citations(message)
+        merge_citations(merged_citations, organized_citations)
+        priority, batch_keywords = details[name]
+        yield "batch", {"name": name, "priority": priority, "keywords": batch_keywords, "citations": organized_citations}
+    
+    yield "citations", finish_citations(merged_citations, errors)
+
+def find_keyword_citations(keywords, resume_text, job_title='', company_name='', industry=''):
+    """
+    Find citations in the resume for each keyword with improved matching.
+    
+    Stored evidence is reused and the remaining keywords are sent to the model
+    in concurrent batches (see stream_keyword_citations).
+    
+    Args:
+        keywords (list): List of keywords to find citations for
+        resume_text (str): The resume text to search in
+        job_title (str, optional): The job title. Defaults to ''.
+        company_name (str, optional): The company name. Defaults to ''.
+        industry (str, optional): The industry. Defaults to ''.
+        
+    Returns:
+        dict: Dictionary mapping keywords to citations organized by priority
+    """
+    try:
+        log_debug(f"Finding citations for {len(keywords)} keywords...")
+        api_start_time = time.time()
+        
+        organized_citations = empty_citations()
+        for event, data in stream_keyword_citations(keywords, resume_text, job_title, company_name, industry):
+            if event == "citations":
+                organized_citations = data
+        
+        api_duration = time.time() - api_start_time
+        log_debug(f"OpenAI API calls for citations completed in {api_duration:.2f} seconds")
+        
+        # Count how many citations we found
+        log_debug(f"Found citations for {count_citations(organized_citations)} keywords out of {len(keywords)}")
+        
+        log_citation_samples(organized_citations)
+        
+        return organized_citations
                 
     except Exception as e:
         print(f"Error finding keyword citations: {str(e)}")
         log_debug(f"Error finding keyword citations: {str(e)}")
         
         # Return minimal structure with empty buckets
-        return {
-            "high_priority": {},
-            "medium_priority": {},
-            "low_priority": {},
-            "fallback_extraction": {"error": f"Failed to process citations: {str(e)}"}
+        return empty_citations(f"Failed to process citations: {str(e)}")
+
+async def afind_keyword_citations(keywords, resume_text, job_title='', company_name='', industry=''):
+    """
+    Async version of find_keyword_citations.
+    
+    Returns:
+        dict: Dictionary mapping keywords to citations organized by priority
+    """
+    try:
+        log_debug(f"Finding citations for {len(keywords)} keywords...")
+        
+        keyword_list, priority_keywords = organize_keywords(keywords)
+        resume_hash, stored, missing = stored_citations(resume_text, keyword_list)
+        local, missing = resolve_locally(resume_text, missing)
+        merged_citations = merge_stored_citations(empty_citations(), stored, priority_keywords)
+        merge_stored_citations(merged_citations, local, priority_keywords)
+        
+        api_start_time = time.time()
+        batches = citation_batches(missing, priority_keywords) if missing else []
+        stages = {
+            name: (lambda batch_keywords=batch_keywords:
+                   afind_batch_citations(batch_keywords, resume_text, priority_keywords, resume_hash))
+            for name, _, batch_keywords in batches
         }
+        errors = []
+        async for name, organized_citations, error in aiter_concurrently(stages, CITATION_BATCH_CONCURRENCY):
+            message = batch_error(organized_citations or {}, error)
+            if message:
+                print(f"Citation batch '{name}' failed: {message}")
+                errors.append(message)
+            merge_citations(merged_citations, organized_citations or {})
+        organized_citations = finish_citations(merged_citations, errors)
+        log_debug(f"OpenAI API calls for citations completed in {time.time() - api_start_time:.2f} seconds")
+        log_debug(f"Found citations for {count_citations(organized_citations)} keywords out of {len(keywords)}")
+        
+        return organized_citations
+                
+    except Exception as e:
+        print(f"Error finding keyword citations: {str(e)}")
+        return empty_citations(f"Failed to process citations: {str(e)}")
@@ -7,6 +7,14 @@ This module provides utility functions for the keyword service.
 import re
 from datetime import datetime
 
+class KeywordList(list):
+    """
+    A flat list of keywords that also carries the structured keywords data
+    (with priorities) it came from, so priority-aware callers can recover it.
+    Plain lists can't hold the original_keywords attribute.
+    """
+    original_keywords = None
+
 def log_debug(message):
     """
     Log a debug message with timestamp.
@@ -29,9 +37,25 @@ def sanitize_text_for_regex(text):
     """
     return re.escape(text)
 
+# Common words filtered out by extract_keywords_regex
+COMMON_WORDS = frozenset({'and', 'the', 'to', 'of', 'in', 'for', 'with', 'on', 'at', 'from', 'by', 
+                         'about', 'as', 'an', 'are', 'be', 'been', 'being', 'was', 'were', 'is', 
+                         'am', 'has', 'have', 'had', 'do', 'does', 'did', 'but', 'or', 'if', 'then',
+                         'else', 'when', 'up', 'down', 'out', 'off', 'over', 'under', 'again', 'further',
+                         'then', 'once', 'here', 'there', 'all', 'any', 'both', 'each', 'few', 'more',
+                         'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same',
+                         'so', 'than', 'too', 'very', 's', 't', 'can', 'will', 'just', 'should',
+                         'now', 'd', 'll', 'm', 'o', 're', 've', 'y', 'ain', 'aren', 'couldn', 'didn',
+                         'doesn', 'hadn', 'hasn', 'haven', 'isn', 'ma', 'mightn', 'mustn', 'needn',
+                         'shan', 'shouldn', 'wasn', 'weren', 'won', 'wouldn', 'a', 'i', 'you', 'he',
+                         'she', 'it', 'we', 'they', 'this', 'that', 'these', 'those'})
+
 def extract_keywords_regex(text):
     """
-    Extract important keywords from text using regex (fallback method).
+    Extract important keywords from text using regex.
+    
+    The local TF-IDF extractor (keyword_local.extract_keywords_local) has replaced
+    this as the fallback; it is kept for callers of the public API.
     
     Args:
         text (str): The text to extract keywords from
@@ -43,20 +67,7 @@ def extract_keywords_regex(text):
     text = text.lower()
     # Split into words and filter out short words (likely not keywords)
     words = re.findall(r'\b[a-zA-Z0-9][\w\-\.]+[a-zA-Z0-9]\b', text)
-    # Filter out common words
-    common_words = {'and', 'the', 'to', 'of', 'in', 'for', 'with', 'on', 'at', 'from', 'by', 
-                   'about', 'as', 'an', 'are', 'be', 'been', 'being', 'was', 'were', 'is', 
-                   'am', 'has', 'have', 'had', 'do', 'does', 'did', 'but', 'or', 'if', 'then',
-                   'else', 'when', 'up', 'down', 'out', 'off', 'over', 'under', 'again', 'further',
-                   'then', 'once', 'here', 'there', 'all', 'any', 'both', 'each', 'few', 'more',
-                   'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same',
-                   'so', 'than', 'too', 'very', 's', 't', 'can', 'will', 'just', 'should',
-                   'now', 'd', 'll', 'm', 'o', 're', 've', 'y', 'ain', 'aren', 'couldn', 'didn',
-                   'doesn', 'hadn', 'hasn', 'haven', 'isn', 'ma', 'mightn', 'mustn', 'needn',
-                   'shan', 'shouldn', 'wasn', 'weren', 'won', 'wouldn', 'a', 'i', 'you', 'he',
-                   'she', 'it', 'we', 'they', 'this', 'that', 'these', 'those'}
-    
-    keywords = [word for word in words if word not in common_words and len(word) > 2]
+    keywords = [word for word in words if word not in COMMON_WORDS and len(word) > 2]
     
     # Also extract phrases (2-3 word combinations that might be important)
     phrases = re.findall(r'\b[a-zA-Z0-9][\w\-\.]+ [a-zA-Z0-9][\w\-\.]+( [a-zA-Z0-9][\w\-\.]+)?\b', text.lower())
@@ -6,15 +6,40 @@ This module handles all interactions with the OpenAI API.
 
 import os
 import json
+import asyncio
 import hashlib
-from openai import OpenAI
+import weakref
+from openai import OpenAI, AsyncOpenAI
 from functools import lru_cache
+from services.cache_service import create_cache_backend, SQLiteCache
+from services.request_coalescing import SingleFlight, LeaderCancelled
+from services.resilience import create_upstream_guard
+from services.hedging import create_hedger
+from services.concurrency import current_cancellation
+from utils.json_stream import parse_json_stream, repair_json
 
 # Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# (retries are handled by the upstream guard, so the client's own are disabled)
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
 
-# Simple in-memory cache for API responses
-response_cache = {}
+# Async clients, one per event loop (httpx connection pools are bound to the loop that created them).
+# Flask runs each async view in its own short-lived loop, so views close theirs with aclose_async_client.
+_async_clients = weakref.WeakKeyDictionary()
+
+# Response cache shared by all worker processes (backend chosen by LLM_CACHE_BACKEND)
+response_cache = create_cache_backend()
+
+# Deduplicates identical in-flight requests; coalesces across processes when the cache is shared
+single_flight = SingleFlight(
+    lease_path=response_cache.path if isinstance(response_cache, SQLiteCache) else None,
+    lease_ttl=float(os.getenv("LLM_SINGLEFLIGHT_LEASE_TTL", 120))
+)
+
+# Concurrency limit, latency budgets, retries and circuit breaker for OpenAI API calls
+upstream = create_upstream_guard()
+
+# Backup requests for call sites that opt in to hedging
+hedger = create_hedger()
 
 def get_cache_key(messages, model, response_format, max_tokens, temperature):
     """
@@ -42,7 +67,112 @@ def get_cache_key(messages, model, response_format, max_tokens, temperature):
     # Generate a hash of the parameters string
     return hashlib.md5(params_str.encode()).hexdigest()
 
-def call_openai_api(messages, model="gpt-4.5-preview", response_format=None, max_tokens=1000, temperature=0.3, use_cache=True):
+def get_cached_response(cache_key):
+    """
+    Look up a response in the cache, treating cache errors as misses.
+    
+    Args:
+        cache_key (str): The cache key from get_cache_key
+        
+    Returns:
+        str: The cached content, or None if not cached
+    """
+    if response_cache is None:
+        return None
+    try:
+        return response_cache.get(cache_key)
+    except Exception as e:
+        print(f"Error reading response cache: {str(e)}")
+        return None
+
+def store_cached_response(cache_key, content):
+    """
+    Store a response in the cache, ignoring cache errors.
+    
+    Args:
+        cache_key (str): The cache key from get_cache_key
+        content (str): The response content to cache
+    """
+    if response_cache is None:
+        return
+    try:
+        response_cache.set(cache_key, content)
+    except Exception as e:
+        print(f"Error writing response cache: {str(e)}")
+
+def cache_completion(cache_key, completion):
+    """
+    Cache a (content, finish_reason) completion, unless it was cut off at max_tokens.
+    
+    Only complete answers are cached, so a cache hit reports finish_reason "stop".
+    
+    Args:
+        cache_key (str): The cache key from get_cache_key
+        completion (tuple): (content, finish_reason)
+    """
+    content, finish_reason = completion
+    if finish_reason == "length":
+        print(f"Not caching response cut off at max_tokens, key: {cache_key[:8]}...")
+        return
+    store_cached_response(cache_key, content)
+    print(f"Cached response with key: {cache_key[:8]}...")
+
+def get_cached_completion(cache_key):
+    """
+    Look up a cached response as a (content, finish_reason) completion.
+    
+    Args:
+        cache_key (str): The cache key from get_cache_key
+        
+    Returns:
+        tuple: (content, "stop"), or None if not cached
+    """
+    content = get_cached_response(cache_key)
+    return None if content is None else (content, "stop")
+
+def get_cache_stats():
+    """
+    Get statistics for the response cache.
+    
+    Returns:
+        dict: Hit, miss and eviction counters plus size information
+    """
+    if response_cache is None:
+        return {"backend": "none"}
+    try:
+        return response_cache.stats()
+    except Exception as e:
+        print(f"Error reading cache stats: {str(e)}")
+        return {"error": str(e)}
+
+def get_coalescing_stats():
+    """
+    Get statistics for in-flight request deduplication.
+    
+    Returns:
+        dict: Leader calls, coalesced waiters and upstream calls saved
+    """
+    return single_flight.stats()
+
+def get_upstream_stats():
+    """
+    Get statistics for OpenAI API calls: retries, errors, breaker state and concurrency.
+    
+    Returns:
+        dict: Upstream call counters
+    """
+    return upstream.stats()
+
+def get_hedging_stats():
+    """
+    Get hedging statistics per call site.
+    
+    Returns:
+        dict: Hedge rates, hedge wins and latency percentiles by call site
+    """
+    return hedger.stats()
+
+def call_openai_api(messages, model="gpt-4.5-preview", response_format=None, max_tokens=1000, temperature=0.3, use_cache=True, timeout=None, hedge=None, completion_info=None):
     """
     Generic function to call the OpenAI API with error handling.
     
@@ -53,6 +183,11 @@ def call_openai_api(messages, model="gpt-4.5-preview", response_format=None, max
         max_tokens (int): Maximum number of tokens in the response
         temperature (float): Temperature parameter for response generation
         use_cache (bool): Whether to use the cache for this request
+        timeout (float, optional): Latency budget in seconds, including retries (default LLM_TIMEOUT)
+        hedge (str, optional): Call site name; if given, a backup request is sent when
+            the first is slower than the site's recent latency percentile
+        completion_info (dict, optional): Receives the completion's finish_reason ("stop",
+            or "length" if it was cut off at max_tokens; "stop" for a cached response)
     Returns:
         str: The content of the response
         
@@ -63,9 +198,12 @@ def call_openai_api(messages, model="gpt-4.5-preview", response_format=None, max
         # Check cache if enabled
         if use_cache:
             cache_key = get_cache_key(messages, model, response_format, max_tokens, temperature)
-            if cache_key in response_cache:
+            cached_content = get_cached_response(cache_key)
+            if cached_content is not None:
                 print(f"Cache hit for request with key: {cache_key[:8]}...")
-                return response_cache[cache_key]
+                if completion_info is not None:
+                    completion_info["finish_reason"] = "stop"
+                return cached_content
         
         # Prepare the API call parameters
         params = {
@@ -79,24 +217,364 @@ def call_openai_api(messages, model="gpt-4.5-preview", response_format=None, max
         if response_format:
             params["response_format"] = response_format
         
-        # Call the API
-        response = client.chat.completions.create(**params)
+        # A speculative strategy that loses closes its request instead of finishing it
+        cancellation = current_cancellation()
         
-        # Get the content
-        content = response.choices[0].message.content.strip()
+        def fetch():
+            if hedge:
+                return hedged_completion(params, hedge, timeout=timeout, cancellation=cancellation)
+            return create_completion(params, timeout=timeout, cancellation=cancellation)
         
-        # Cache the response if caching is enabled
+        if not use_cache:
+            content, finish_reason = fetch()
+        else:
+            def fetch_and_cache():
+                completion = fetch()
+                cache_completion(cache_key, completion)
+                return completion
+            
+            # Identical requests already in flight share one upstream call
+            content, finish_reason = single_flight.do(cache_key, fetch_and_cache, lookup=get_cached_completion)
+        
+        if completion_info is not None:
+            completion_info["finish_reason"] = finish_reason
+        return content
+    except Exception as e:
+        print(f"Error calling OpenAI API: {str(e)}")
+        raise
+
+def create_completion(params, timeout=None, cancellation=None):
+    """
+    Make a chat completion request to the OpenAI API, retrying rate limits and
+    server errors within the latency budget.
+    
+    Args:
+        params (dict): Keyword arguments for client.chat.completions.create
+        timeout (float, optional): Latency budget in seconds (default LLM_TIMEOUT)
+        cancellation (Cancellation, optional): If given, the request is streamed and
+            closed as soon as it is cancelled
+        
+    Returns:
+        tuple: (content, finish_reason) - the stripped content of the first choice and
+               why it ended ("stop", or "length" if cut off at max_tokens)
+        
+    Raises:
+        LeaderCancelled: If the request was cancelled before it finished
+    """
+    if cancellation is not None:
+        completion = upstream.call(lambda remaining: streamed_completion(params, cancellation, remaining), timeout=timeout)
+        if completion is None:
+            raise LeaderCancelled("OpenAI API call cancelled")
+        return completion
+    
+    def attempt(remaining):
+        response = client.chat.completions.create(**params, timeout=remaining)
+        choice = response.choices[0]
+        return choice.message.content.strip(), choice.finish_reason
+    
+    return upstream.call(attempt, timeout=timeout)
+
+def streamed_completion(params, cancellation, timeout):
+    """
+    Make one streamed chat completion request that stops as soon as it is cancelled.
+    
+    Args:
+        params (dict): Keyword arguments for client.chat.completions.create
+        cancellation (Cancellation): Closes the stream when set
+        timeout (float): Request timeout in seconds
+        
+    Returns:
+        tuple: (content, finish_reason), or None if the request was cancelled
+    """
+    if cancellation.is_set():
+        return None
+    stream = client.chat.completions.create(**params, stream=True, timeout=timeout)
+    # Closing the stream from the cancelling thread aborts this one's read right away
+    cancellation.on_cancel(stream.close)
+    parts = []
+    finish_reason = None
+    try:
+        for chunk in stream:
+            if cancellation.is_set():
+                return None
+            if not chunk.choices:
+                continue
+            if chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+    except Exception:
+        if cancellation.is_set():
+            # The read failed because the stream was closed under it, not upstream
+            return None
+        raise
+    finally:
+        stream.close()
+    return "".join(parts).strip(), finish_reason
+
+def hedged_completion(params, site, timeout=None, cancellation=None):
+    """
+    Make a chat completion request, hedged with a backup request if it is slow.
+    
+    Each attempt is streamed so the losing request's connection can be closed as
+    soon as the other finishes, instead of running to completion. Both attempts
+    share one latency budget.
+    
+    Args:
+        params (dict): Keyword arguments for client.chat.completions.create
+        site (str): Call site name, which has its own latency history
+        timeout (float, optional): Latency budget in seconds for the whole call (default LLM_TIMEOUT)
+        cancellation (Cancellation, optional): Cancels every attempt when set
+        
+    Returns:
+        tuple: (content, finish_reason) of the winning response
+        
+    Raises:
+        LeaderCancelled: If the call was cancelled before it finished
+    """
+    def attempt(hedge_attempt, remaining):
+        if cancellation is not None:
+            cancellation.on_cancel(hedge_attempt.set)
+        
+        def request(request_timeout):
+            # Holding an upstream slot now: the hedge delay counts from here
+            hedge_attempt.mark_started()
+            return streamed_completion(params, hedge_attempt, request_timeout)
+        
+        return upstream.call(request, timeout=remaining)
+    
+    completion = hedger.run(site, attempt, timeout=timeout if timeout is not None else upstream.default_timeout)
+    if completion is None and cancellation is not None and cancellation.is_set():
+        raise LeaderCancelled("OpenAI API call cancelled")
+    return completion
+
+def stream_text_response(messages, model="gpt-4.5-preview", max_tokens=1000, temperature=0.3, use_cache=True, response_format=None, timeout=None):
+    """
+    Call the OpenAI API with stream=True and yield the text as it arrives.
+    
+    A cached response is yielded in one piece. The complete response is
+    cached once the stream finishes.
+    
+    Args:
+        messages (list): List of message dictionaries for the conversation
+        model (str): The OpenAI model to use
+        max_tokens (int): Maximum number of tokens in the response
+        temperature (float): Temperature parameter for response generation
+        use_cache (bool): Whether to use the cache for this request
+        response_format (dict, optional): Format specification for the response
+        timeout (float, optional): Latency budget in seconds, including retries (default LLM_TIMEOUT)
+        
+    Yields:
+        str: Text deltas from the response
+        
+    Raises:
+        Exception: If there's an error calling the API
+    """
+    try:
         if use_cache:
             cache_key = get_cache_key(messages, model, response_format, max_tokens, temperature)
-            response_cache[cache_key] = content
-            print(f"Cached response with key: {cache_key[:8]}...")
+            cached_content = get_cached_response(cache_key)
+            if cached_content is not None:
+                print(f"Cache hit for streamed request with key: {cache_key[:8]}...")
+                yield cached_content
+                return
         
+        params = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True
+        }
+        
+        if response_format:
+            params["response_format"] = response_format
+        
+        # Retries only cover opening the stream; a failure mid-stream is raised
+        stream = upstream.call(
+            lambda remaining: client.chat.completions.create(**params, timeout=remaining),
+            timeout=timeout
+        )
+        
+        parts = []
+        started = False
+        finish_reason = None
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            # Match the non-streaming API, which strips leading whitespace
+            if not started:
+                delta = delta.lstrip()
+                if not delta:
+                    continue
+                started = True
+            parts.append(delta)
+            yield delta
+        
+        # Cache the complete response under the same key as the non-streaming call
+        if use_cache:
+            cache_completion(cache_key, ("".join(parts).strip(), finish_reason))
+    except Exception as e:
+        print(f"Error streaming OpenAI response: {str(e)}")
+        raise
+
+def stream_json_response(messages, max_tokens=1000, temperature=0.3, use_cache=True, emit_depth=2, timeout=None):
+    """
+    Stream a JSON response, yielding nested values as soon as they are complete.
+    
+    Truncated or slightly malformed output is tolerated: unfinished containers are
+    closed and a value cut off mid-way is dropped. The request shares its cache
+    entry with get_json_response.
+    
+    Args:
+        messages (list): List of message dictionaries for the conversation
+        max_tokens (int): Maximum number of tokens in the response
+        temperature (float): Temperature parameter for response generation
+        use_cache (bool): Whether to use the cache for this request
+        emit_depth (int): Depth of the values to yield (2 yields each element of
+            each top-level array, e.g. ("high_priority", 0))
+        timeout (float, optional): Latency budget in seconds, including retries (default LLM_TIMEOUT)
+        
+    Yields:
+        tuple: (path, value) for each completed value at emit_depth, then
+            ((), document) with the whole parsed response ({} if none was found)
+        
+    Raises:
+        Exception: If there's an error calling the API
+    """
+    deltas = stream_text_response(
+        messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        use_cache=use_cache,
+        response_format={"type": "json_object"},
+        timeout=timeout
+    )
+    for path, value in parse_json_stream(deltas, emit_depth=emit_depth):
+        if path == () and value is None:
+            print("No JSON document found in streamed response")
+            value = {}
+        yield path, value
+
+def get_async_client():
+    """
+    Get the AsyncOpenAI client for the running event loop.
+    
+    Returns:
+        AsyncOpenAI: A client whose connection pool belongs to the current loop
+    """
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = _async_clients[loop] = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return async_client
+
+async def aclose_async_client():
+    """
+    Close the running event loop's AsyncOpenAI client, if it has one.
+    
+    Call this before a short-lived loop ends (e.g. at the end of a Flask async
+    view), otherwise its connection pool is never closed.
+    """
+    async_client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if async_client is not None:
+        try:
+            await async_client.close()
+        except Exception as e:
+            print(f"Error closing async OpenAI client: {str(e)}")
+
+async def acreate_completion(params, timeout=None):
+    """
+    Async version of create_completion.
+    
+    Args:
+        params (dict): Keyword arguments for client.chat.completions.create
+        timeout (float, optional): Latency budget in seconds (default LLM_TIMEOUT)
+        
+    Returns:
+        tuple: (content, finish_reason) of the first choice
+    """
+    async def attempt(remaining):
+        response = await get_async_client().chat.completions.create(**params, timeout=remaining)
+        choice = response.choices[0]
+        return choice.message.content.strip(), choice.finish_reason
+    
+    return await upstream.acall(attempt, timeout=timeout)
+
+async def acall_openai_api(messages, model="gpt-4.5-preview", response_format=None, max_tokens=1000, temperature=0.3, use_cache=True, timeout=None, hedge=None, completion_info=None):
+    """
+    Async version of call_openai_api, built on AsyncOpenAI.
+    
+    Shares the response cache and in-flight deduplication with the synchronous API.
+    
+    Args:
+        messages (list): List of message dictionaries for the conversation
+        model (str): The OpenAI model to use
+        response_format (dict, optional): Format specification for the response
+        max_tokens (int): Maximum number of tokens in the response
+        temperature (float): Temperature parameter for response generation
+        use_cache (bool): Whether to use the cache for this request
+        timeout (float, optional): Latency budget in seconds, including retries (default LLM_TIMEOUT)
+        hedge (str, optional): Call site name; if given, a backup request is sent when
+            the first is slower than the site's recent latency percentile
+        completion_info (dict, optional): Receives the completion's finish_reason ("stop",
+            or "length" if it was cut off at max_tokens; "stop" for a cached response)
+    Returns:
+        str: The content of the response
+        
+    Raises:
+        Exception: If there's an error calling the API
+    """
+    try:
+        if use_cache:
+            cache_key = get_cache_key(messages, model, response_format, max_tokens, temperature)
+            cached_content = get_cached_response(cache_key)
+            if cached_content is not None:
+                print(f"Cache hit for request with key: {cache_key[:8]}...")
+                if completion_info is not None:
+                    completion_info["finish_reason"] = "stop"
+                return cached_content
+        
+        params = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        
+        if response_format:
+            params["response_format"] = response_format
+        
+        async def fetch():
+            if hedge:
+                return await hedger.arun(
+                    hedge,
+                    lambda remaining: acreate_completion(params, timeout=remaining),
+                    timeout=timeout if timeout is not None else upstream.default_timeout
+                )
+            return await acreate_completion(params, timeout=timeout)
+        
+        if not use_cache:
+            content, finish_reason = await fetch()
+        else:
+            async def fetch_and_cache():
+                completion = await fetch()
+                cache_completion(cache_key, completion)
+                return completion
+            
+            content, finish_reason = await single_flight.ado(cache_key, fetch_and_cache, lookup=get_cached_completion)
+        
+        if completion_info is not None:
+            completion_info["finish_reason"] = finish_reason
         return content
     except Exception as e:
         print(f"Error calling OpenAI API: {str(e)}")
         raise
 
-def get_json_response(messages, max_tokens=1000, temperature=0.3, use_cache=True):
+def get_json_response(messages, max_tokens=1000, temperature=0.3, use_cache=True, timeout=None, hedge=None):
     """
     Call the OpenAI API and get a JSON response.
     
@@ -105,6 +583,9 @@ def get_json_response(messages, max_tokens=1000, temperature=0.3, use_cache=True
         max_tokens (int): Maximum number of tokens in the response
         temperature (float): Temperature parameter for response generation
         use_cache (bool): Whether to use the cache for this request
+        timeout (float, optional): Latency budget in seconds, including retries (default LLM_TIMEOUT)
+        hedge (str, optional): Call site name; if given, a backup request is sent when
+            the first is slower than the site's recent latency percentile
     Returns:
         dict: The parsed JSON response
         
@@ -118,245 +599,48 @@ def get_json_response(messages, max_tokens=1000, temperature=0.3, use_cache=True
             response_format={"type": "json_object"},
             max_tokens=max_tokens,
             temperature=temperature,
-            use_cache=use_cache
+            use_cache=use_cache,
+            timeout=timeout,
+            hedge=hedge
         )
         
         # Log the full response for debugging
         print(f"Full JSON response from OpenAI: {content}")
         
-        # Try to parse the JSON response
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response: {str(e)}")
-            print(f"Raw content: {content}")
-            
-            # Attempt to sanitize and fix common JSON formatting issues
-            sanitized_content = sanitize_json(content)
-            print(f"Sanitized content: {sanitized_content[:100]}...")
-            
-            # Try parsing the sanitized content
-            try:
-                return json.loads(sanitized_content)
-            except json.JSONDecodeError:
-                # If still failing, try a more aggressive approach
-                print("Attempting more aggressive JSON repair...")
-                try:
-                    # Try to extract valid JSON using regex
-                    import re
-                    json_pattern = re.compile(r'(\{.*\})', re.DOTALL)
-                    match = json_pattern.search(content)
-                    if match:
-                        extracted_json = match.group(1)
-                        try:
-                            return json.loads(extracted_json)
-                        except json.JSONDecodeError:
-                            # If still failing, try to sanitize the extracted JSON
-                            sanitized_extracted = sanitize_json(extracted_json)
-                            return json.loads(sanitized_extracted)
-                    else:
-                        # If no valid JSON object is found, try to construct a minimal valid JSON
-                        # Extract all key-value pairs that look valid
-                        print("No valid JSON object found, attempting to construct minimal valid JSON...")
-                        return construct_minimal_json(content)
-                except Exception as repair_error:
-                    print(f"Error in aggressive JSON repair: {str(repair_error)}")
-                    # Return a minimal valid JSON as a last resort
-                    return {"error": "Failed to parse JSON response", "partial_content": content[:500]}
+        return parse_json_content(content)
     except Exception as e:
         print(f"Error getting JSON response: {str(e)}")
         raise
 
-def sanitize_json(content):
+def parse_json_content(content):
     """
-    Sanitize JSON content to fix common formatting issues.
+    Parse JSON content from the OpenAI API, repairing common formatting issues.
     
-    Args:
-        content (str): The JSON content to sanitize
-        
-    Returns:
-        str: The sanitized JSON content
-    """
-    import re
-    
-    # First, let's check if we have an incomplete JSON structure
-    # Count opening and closing braces to see if they match
-    open_braces = content.count('{')
-    close_braces = content.count('}')
-    open_brackets = content.count('[')
-    close_brackets = content.count(']')
-    
-    # If we have unbalanced braces or brackets, try to fix the structure
-    if open_braces > close_braces:
-        # Add missing closing braces
-        content += '}' * (open_braces - close_braces)
-    
-    if open_brackets > close_brackets:
-        # Add missing closing brackets
-        content += ']' * (open_brackets - close_brackets)
-    
-    # Replace single quotes with double quotes (common issue)
-    content = content.replace("'", '"')
-    
-    # Fix unquoted property names
-    content = re.sub(r'(\s*?)(\w+)(\s*?):', r'\1"\2"\3:', content)
-    
-    # Fix trailing commas in arrays and objects
-    content = re.sub(r',(\s*?[\]}])', r'\1', content)
-    
-    # Fix missing quotes around string values
-    # This is a simplified approach and might not catch all cases
-    content = re.sub(r':\s*([^"{}\[\],\d][^{}\[\],]*?)(\s*[,}])', r': "\1"\2', content)
-    
-    # Fix missing commas between objects in arrays
-    # This pattern looks for closing brace followed by opening brace with no comma in between
-    content = re.sub(r'}(\s*?){', r'},\1{', content)
-    
-    # Fix missing commas between properties
-    # This pattern looks for a closing quote of a value followed by a property name
-    content = re.sub(r'"(\s*?)"', r'",\1"', content)
-    
-    # Fix missing commas after numeric values
-    # This pattern looks for a number followed by a property name
-    content = re.sub(r'(\d)(\s*?){', r'\1,\2{', content)
-    
-    # Fix missing commas after numeric values before a property name
-    content = re.sub(r'(\d)(\s*?)"', r'\1,\2"', content)
-    
-    # Fix specific pattern in the observed error: "keyword": "value" "score": number
-    content = re.sub(r'"([^"]+)"(\s*?)"([^"]+)"', r'"\1",\2"\3"', content)
-    
-    # Fix unterminated strings by adding closing quotes
-    # Look for strings that start with a quote but don't end with one before a comma or brace
-    content = re.sub(r'"([^"]*?)(\s*?[,}])', r'"\1"\2', content)
-    
-    # Specifically handle unterminated strings at the end of the content
-    # This is a common issue with truncated API responses
-    if re.search(r'"[^"]*$', content):
-        # Add a closing quote to the unterminated string
-        content += '"'
-    
-    # Fix incomplete JSON objects at the end of the content
-    # If the content ends with a property name and value but no closing brace
-    if re.search(r'"[^"]+"\s*:\s*("[^"]*"|[\d.]+)\s*$', content):
-        content += '}'
-    
-    # If the content ends with a comma, add a closing brace
-    if content.rstrip().endswith(','):
-        content = content.rstrip()[:-1] + '}'
-    
-    # If the content ends with an open brace or bracket, close it
-    if content.rstrip().endswith('{'):
-        content += '}'
-    if content.rstrip().endswith('['):
-        content += ']'
-    
-    # Check for truncated JSON at the end
-    # If we have a partial object at the end, try to close it properly
-    if '"low_priority": [' in content and not '"low_priority": []' in content:
-        # Check if low_priority array is properly closed
-        low_priority_pos = content.find('"low_priority": [')
-        if low_priority_pos > 0:
-            # Count opening and closing brackets after low_priority
-            remaining_content = content[low_priority_pos:]
-            open_count = remaining_content.count('[')
-            close_count = remaining_content.count(']')
-            
-            if open_count > close_count:
-                # The low_priority array is not properly closed
-                # Find the last complete object in the array
-                last_complete_obj_pos = content.rfind('}', low_priority_pos)
-                if last_complete_obj_pos > 0:
-                    # Close the array and the main object
-                    content = content[:last_complete_obj_pos+1] + ']}'
-    
-    # Handle the specific case of an unterminated string in a keyword object
-    # This pattern looks for a keyword object with an unterminated string
-    unterminated_keyword_pattern = re.compile(r'{\s*"keyword":\s*"([^"}]*?)"\s*,\s*"score":\s*([\d.]+)\s*}')
-    content = re.sub(unterminated_keyword_pattern, r'{ "keyword": "\1", "score": \2 }', content)
-    
-    # Handle the specific case of an unterminated string at the end of a keyword array
-    # This is the exact issue we're seeing in the logs
-    if '"low_priority": [' in content:
-        # Find the position of the last complete keyword object in the low_priority array
-        low_priority_pos = content.find('"low_priority": [')
-        last_obj_start = content.rfind('{ "keyword":', low_priority_pos)
-        
-        if last_obj_start > 0:
-            # Check if this object is properly terminated
-            next_closing_brace = content.find('}', last_obj_start)
-            if next_closing_brace < 0:
-                # The last object is not properly terminated
-                # Find the last quote in the object
-                last_quote = content.rfind('"', last_obj_start)
-                if last_quote > 0:
-                    # Check if this is the start of a keyword value
-                    keyword_start = content.rfind('"keyword": "', last_obj_start, last_quote)
-                    if keyword_start > 0:
-                        # This is an unterminated keyword value
-                        # Add a closing quote, score, and closing braces
-                        content = content[:last_quote+1] + '", "score": 0.50 }]}'
-    
-    return content
-
-def construct_minimal_json(content):
-    """
-    Attempt to construct a minimal valid JSON from malformed content.
+    Malformed or truncated content is recovered in a single pass: open strings,
+    arrays and objects are closed and every complete element is kept.
     
     Args:
-        content (str): The malformed JSON content
+        content (str): The raw response content
         
     Returns:
-        dict: A minimal valid JSON object with extracted key-value pairs
-    """
-    import re
-    
-    # Initialize the result dictionary
-    result = {
-        "high_priority": [],
-        "medium_priority": [],
-        "low_priority": []
-    }
-    
-    # Try to extract keyword objects using regex
-    # Look for patterns like { "keyword": "value", "score": number }
-    keyword_pattern = re.compile(r'{\s*"keyword":\s*"([^"]+)"\s*,\s*"score":\s*([\d.]+)\s*}')
-    matches = keyword_pattern.findall(content)
-    
-    # Also look for patterns with missing commas
-    alt_pattern = re.compile(r'{\s*"keyword":\s*"([^"]+)"\s*"score":\s*([\d.]+)\s*}')
-    alt_matches = alt_pattern.findall(content)
-    
-    # Combine all matches
-    all_matches = matches + alt_matches
-    
-    # Determine which priority category each keyword belongs to
-    for keyword, score in all_matches:
-        score_float = float(score)
-        if score_float >= 0.9:
-            result["high_priority"].append({"keyword": keyword, "score": score_float})
-        elif score_float >= 0.6:
-            result["medium_priority"].append({"keyword": keyword, "score": score_float})
-        else:
-            result["low_priority"].append({"keyword": keyword, "score": score_float})
-    
-    # If we couldn't extract any keywords, create a minimal structure
-    if not any(result.values()):
-        # Try to extract any key-value pairs
-        key_value_pattern = re.compile(r'"([^"]+)":\s*"([^"]+)"')
-        kv_matches = key_value_pattern.findall(content)
+        dict: The parsed JSON, or an error structure if it cannot be repaired
+    """
+    # Try to parse the JSON response
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON response: {str(e)}")
+        print(f"Raw content: {content}")
         
-        # Add these to a fallback section
-        if kv_matches:
-            result["fallback_extraction"] = {k: v for k, v in kv_matches}
-        else:
-            # If all else fails, just return an error message
-            result["error"] = "Could not extract structured data from response"
-            result["raw_content"] = content[:500]  # Include first 500 chars of raw content
-    
-    return result
+        repaired = repair_json(content)
+        if isinstance(repaired, dict):
+            print(f"Repaired JSON response with keys: {list(repaired.keys())}")
+            return repaired
+        
+        # Return a minimal valid JSON as a last resort
+        return {"error": "Failed to parse JSON response", "partial_content": content[:500]}
 
-def get_text_response(messages, max_tokens=1000, temperature=0.3, use_cache=True):
+def get_text_response(messages, max_tokens=1000, temperature=0.3, use_cache=True, timeout=None, hedge=None, completion_info=None):
     """
     Call the OpenAI API and get a text response.
     
@@ -365,6 +649,10 @@ def get_text_response(messages, max_tokens=1000, temperature=0.3, use_cache=True
         max_tokens (int): Maximum number of tokens in the response
         temperature (float): Temperature parameter for response generation
         use_cache (bool): Whether to use the cache for this request
+        timeout (float, optional): Latency budget in seconds, including retries (default LLM_TIMEOUT)
+        hedge (str, optional): Call site name; if given, a backup request is sent when
+            the first is slower than the site's recent latency percentile
+        completion_info (dict, optional): Receives the completion's finish_reason (see call_openai_api)
     Returns:
         str: The text response
         
@@ -376,7 +664,73 @@ def get_text_response(messages, max_tokens=1000, temperature=0.3, use_cache=True
             messages=messages,
             max_tokens=max_tokens,
             temperature=temperature,
-            use_cache=use_cache
+            use_cache=use_cache,
+            timeout=timeout,
+            hedge=hedge,
+            completion_info=completion_info
+        )
+    except Exception as e:
+        print(f"Error getting text response: {str(e)}")
+        raise
+
+async def aget_json_response(messages, max_tokens=1000, temperature=0.3, use_cache=True, timeout=None, hedge=None):
+    """
+    Async version of get_json_response.
+    
+    Args:
+        messages (list): List of message dictionaries for the conversation
+        max_tokens (int): Maximum number of tokens in the response
+        temperature (float): Temperature parameter for response generation
+        use_cache (bool): Whether to use the cache for this request
+        timeout (float, optional): Latency budget in seconds, including retries (default LLM_TIMEOUT)
+        hedge (str, optional): Call site name; if given, a backup request is sent when
+            the first is slower than the site's recent latency percentile
+    Returns:
+        dict: The parsed JSON response
+    """
+    try:
+        content = await acall_openai_api(
+            messages=messages,
+            response_format={"type": "json_object"},
+            max_tokens=max_tokens,
+            temperature=temperature,
+            use_cache=use_cache,
+            timeout=timeout,
+            hedge=hedge
+        )
+        
+        print(f"Full JSON response from OpenAI: {content}")
+        
+        return parse_json_content(content)
+    except Exception as e:
+        print(f"Error getting JSON response: {str(e)}")
+        raise
+
+async def aget_text_response(messages, max_tokens=1000, temperature=0.3, use_cache=True, timeout=None, hedge=None, completion_info=None):
+    """
+    Async version of get_text_response.
+    
+    Args:
+        messages (list): List of message dictionaries for the conversation
+        max_tokens (int): Maximum number of tokens in the response
+        temperature (float): Temperature parameter for response generation
+        use_cache (bool): Whether to use the cache for this request
+        timeout (float, optional): Latency budget in seconds, including retries (default LLM_TIMEOUT)
+        hedge (str, optional): Call site name; if given, a backup request is sent when
+            the first is slower than the site's recent latency percentile
+        completion_info (dict, optional): Receives the completion's finish_reason (see call_openai_api)
+    Returns:
+        str: The text response
+    """
+    try:
+        return await acall_openai_api(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            use_cache=use_cache,
+            timeout=timeout,
+            hedge=hedge,
+            completion_info=completion_info
         )
     except Exception as e:
         print(f"Error getting text response: {str(e)}")
@@ -0,0 +1,331 @@
+"""
+Request Coalescing Module
+
+This module deduplicates identical in-flight requests ("single-flight").
+The first caller for a key does the work; concurrent callers with the same key
+wait for its result instead of repeating the upstream call.
+
+Within a process, waiters block on the leader's result directly. Across processes,
+the leader holds a lease row in a shared SQLite database and publishes its result
+through the shared response cache; other processes wait for the lease to be
+released and then read the cached result.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import threading
+from services.cache_service import get_connection
+
+class LeaderCancelled(Exception):
+    """
+    Raised by a call that was cancelled because its caller no longer needs the
+    result (e.g. a speculative fallback that lost). Waiters coalesced onto it
+    retry instead of failing with it.
+    """
+
+class _Flight:
+    """A single in-flight call that other threads and coroutines can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_done_callback(self, callback):
+        """Call callback(flight) when the call finishes (immediately if it already has)."""
+        with self._lock:
+            if not self.done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def finish(self):
+        with self._lock:
+            self.done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    async def wait_async(self):
+        """Wait for the call to finish without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake(flight):
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        self.add_done_callback(wake)
+        await future
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+    """
+
+    def __init__(self, lease_path=None, lease_ttl=120.0, poll_interval=0.05):
+        """
+        Args:
+            lease_path (str, optional): SQLite database used for cross-process leases.
+                If None, calls are only coalesced between threads of this process.
+            lease_ttl (float): Seconds after which a lease held by a crashed or hung
+                process is considered abandoned
+            poll_interval (float): Seconds between checks of another process's lease
+        """
+        self.lease_path = lease_path
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "leader_calls": 0,
+            "coalesced_threads": 0,
+            "coalesced_processes": 0,
+            "lease_timeouts": 0,
+            "cancelled_leader_retries": 0
+        }
+
+        if self.lease_path:
+            try:
+                get_connection(self.lease_path).execute("""
+                    CREATE TABLE IF NOT EXISTS inflight_requests (
+                        key TEXT PRIMARY KEY,
+                        owner TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+            except Exception as e:
+                print(f"Error creating in-flight lease table, coalescing within this process only: {str(e)}")
+                self.lease_path = None
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def do(self, key, fn, lookup=None):
+        """
+        Run fn() for key, or wait for an identical call that is already running.
+
+        Args:
+            key (str): Identifies identical requests (e.g. the response cache key)
+            fn (callable): Performs the upstream call and returns its result
+            lookup (callable, optional): lookup(key) returns the result published by
+                another process (e.g. from the shared cache), or None. Required for
+                cross-process coalescing.
+
+        Returns:
+            The result of fn(), possibly computed by another caller
+
+        Raises:
+            Exception: Whatever fn() raised in the leading thread
+        """
+        while True:
+            flight, is_leader = self._join(key)
+
+            if not is_leader:
+                # Another thread in this process is already making this call
+                flight.done.wait()
+                if self._abandoned(flight):
+                    continue
+                return self._follow(flight)
+
+            try:
+                flight.result = self._lead(key, fn, lookup)
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                self._land(key, flight)
+
+    async def ado(self, key, coroutine_fn, lookup=None):
+        """
+        Async version of do(): await coroutine_fn(), or wait for an identical call.
+
+        Async and synchronous callers share the same in-flight table, so a coroutine
+        can wait on a call started by a worker thread and vice versa. If the leading
+        coroutine is cancelled (e.g. it lost a hedge or a speculative race), its
+        waiters retry: one of them becomes the new leader.
+
+        Args:
+            key (str): Identifies identical requests (e.g. the response cache key)
+            coroutine_fn (callable): Returns an awaitable that performs the upstream call
+            lookup (callable, optional): lookup(key) returns the result published by
+                another process, or None
+
+        Returns:
+            The result of the call, possibly computed by another caller
+        """
+        while True:
+            flight, is_leader = self._join(key)
+
+            if not is_leader:
+                await flight.wait_async()
+                if self._abandoned(flight):
+                    continue
+                return self._follow(flight)
+
+            try:
+                flight.result = await self._alead(key, coroutine_fn, lookup)
+                return flight.result
+            except BaseException as e:
+                # Includes asyncio.CancelledError, which is not an Exception
+                flight.error = e
+                raise
+            finally:
+                self._land(key, flight)
+
+    def _join(self, key):
+        """Register interest in key; returns (flight, is_leader)."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _abandoned(self, flight):
+        """Whether the leader stopped without an outcome (cancelled or interrupted), so a waiter should retry."""
+        if isinstance(flight.error, Exception) and not isinstance(flight.error, LeaderCancelled):
+            return False
+        if flight.error is not None:
+            self._count("cancelled_leader_retries")
+        return flight.error is not None
+
+    def _follow(self, flight):
+        """Return (or raise) the leader's outcome to a waiter."""
+        self._count("coalesced_threads")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _land(self, key, flight):
+        """Remove a finished flight and wake its waiters."""
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.finish()
+
+    def _lead(self, key, fn, lookup):
+        """Run the call as this process's leader, coordinating with other processes."""
+        if not self.lease_path or lookup is None:
+            self._count("leader_calls")
+            return fn()
+
+        deadline = time.time() + self.lease_ttl
+        while True:
+            if self._acquire_lease(key):
+                try:
+                    # Another process may have finished between our cache miss and the lease
+                    result = lookup(key)
+                    if result is not None:
+                        self._count("coalesced_processes")
+                        return result
+                    self._count("leader_calls")
+                    return fn()
+                finally:
+                    self._release_lease(key)
+
+            # Another process holds the lease: wait for it to publish a result
+            while self._lease_held(key) and time.time() < deadline:
+                time.sleep(self.poll_interval)
+
+            result = lookup(key)
+            if result is not None:
+                self._count("coalesced_processes")
+                return result
+
+            if time.time() >= deadline:
+                # Give up waiting and make the call ourselves
+                self._count("lease_timeouts")
+                self._count("leader_calls")
+                return fn()
+
+            # The other process finished without publishing (e.g. it failed); try to lead
+
+    async def _alead(self, key, coroutine_fn, lookup):
+        """Async version of _lead(); waits for other processes without blocking the loop."""
+        if not self.lease_path or lookup is None:
+            self._count("leader_calls")
+            return await coroutine_fn()
+
+        deadline = time.time() + self.lease_ttl
+        while True:
+            if self._acquire_lease(key):
+                try:
+                    result = lookup(key)
+                    if result is not None:
+                        self._count("coalesced_processes")
+                        return result
+                    self._count("leader_calls")
+                    return await coroutine_fn()
+                finally:
+                    self._release_lease(key)
+
+            while self._lease_held(key) and time.time() < deadline:
+                await asyncio.sleep(self.poll_interval)
+
+            result = lookup(key)
+            if result is not None:
+                self._count("coalesced_processes")
+                return result
+
+            if time.time() >= deadline:
+                self._count("lease_timeouts")
+                self._count("leader_calls")
+                return await coroutine_fn()
+
+    def _acquire_lease(self, key):
+        connection = get_connection(self.lease_path)
+        now = time.time()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM inflight_requests WHERE key = ? AND expires_at < ?", (key, now))
+            inserted = connection.execute(
+                "INSERT OR IGNORE INTO inflight_requests (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, self.owner, now + self.lease_ttl)
+            ).rowcount
+            connection.execute("COMMIT")
+            return inserted == 1
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            print(f"Error acquiring in-flight lease, proceeding without it: {str(e)}")
+            return True
+
+    def _release_lease(self, key):
+        try:
+            get_connection(self.lease_path).execute(
+                "DELETE FROM inflight_requests WHERE key = ? AND owner = ?",
+                (key, self.owner)
+            )
+        except Exception as e:
+            print(f"Error releasing in-flight lease: {str(e)}")
+
+    def _lease_held(self, key):
+        try:
+            row = get_connection(self.lease_path).execute(
+                "SELECT 1 FROM inflight_requests WHERE key = ? AND expires_at >= ?",
+                (key, time.time())
+            ).fetchone()
+            return row is not None
+        except Exception as e:
+            print(f"Error checking in-flight lease: {str(e)}")
+            return False
+
+    def stats(self):
+        """
+        Get coalescing counters for this process.
+
+        Returns:
+            dict: Leader calls, coalesced waiters and the upstream calls they saved
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._flights)
+        stats["upstream_calls_saved"] = stats["coalesced_threads"] + stats["coalesced_processes"]
+        stats["cross_process"] = bool(self.lease_path)
+        return stats
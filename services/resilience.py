@@ -0,0 +1,342 @@
+"""
+Resilience Module
+
+This module protects the app from an unhealthy OpenAI API: it bounds the
+number of concurrent upstream calls, gives each call a latency budget, retries
+rate limits (429) and server errors (5xx) with jittered exponential backoff, and
+trips a circuit breaker that fails fast while upstream keeps failing.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+import openai
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+class UpstreamBusyError(Exception):
+    """Raised when no upstream slot frees up within the call's latency budget."""
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls flow normally. After failure_threshold consecutive upstream
+    failures it opens and rejects calls for reset_timeout seconds. It then lets a
+    single trial call through (half-open); success closes it, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            reset_timeout (float): Seconds to stay open before allowing a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.opened_count = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check whether a call may go upstream.
+
+        Raises:
+            CircuitOpenError: If the circuit is open (or a half-open trial is already running)
+        """
+        with self._lock:
+            if self.state == "closed":
+                return
+
+            remaining = self._opened_at + self.reset_timeout - time.time()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+
+            raise CircuitOpenError(
+                f"OpenAI API circuit breaker is open; retry in {max(remaining, 0):.1f}s"
+            )
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened_count += 1
+                    print(f"OpenAI API circuit breaker opened after {self._failures} consecutive failures")
+                self.state = "open"
+                self._opened_at = time.time()
+
+    def release(self):
+        """Give up a half-open trial without a verdict (e.g. a non-retryable client error)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+def classify_error(error):
+    """
+    Decide whether an OpenAI API error is worth retrying.
+
+    Args:
+        error (Exception): The exception raised by the client
+
+    Returns:
+        tuple: (kind, retry_after) where kind is "rate_limited", "server_error",
+            "timeout" or "connection_error" for retryable errors and None otherwise,
+            and retry_after is the server's requested delay in seconds, if any
+    """
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout", None
+    if isinstance(error, openai.APIConnectionError):
+        return "connection_error", None
+    if isinstance(error, openai.APIStatusError):
+        retry_after = None
+        try:
+            retry_after = float(error.response.headers.get("retry-after"))
+        except (TypeError, ValueError, AttributeError):
+            pass
+        if error.status_code == 429:
+            return "rate_limited", retry_after
+        if error.status_code >= 500:
+            return "server_error", retry_after
+    return None, None
+
+class UpstreamGuard:
+    """
+    Runs upstream calls under a concurrency limit, a latency budget, a retry
+    policy and a circuit breaker, and counts what happened.
+    """
+
+    def __init__(self, max_concurrency=16, default_timeout=60.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, breaker=None):
+        """
+        Args:
+            max_concurrency (int): Maximum upstream calls in flight in this process
+            default_timeout (float): Latency budget in seconds for calls that don't pass one
+            max_retries (int): Retries after the first attempt
+            backoff_base (float): Backoff ceiling in seconds for the first retry
+                (doubles with each retry; the actual delay is drawn uniformly below it)
+            backoff_max (float): Largest backoff ceiling in seconds
+            breaker (CircuitBreaker, optional): The circuit breaker to use
+        """
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {
+            "calls": 0,
+            "attempts": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "timeouts": 0,
+            "connection_errors": 0,
+            "circuit_rejections": 0,
+            "slot_timeouts": 0
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _track_in_flight(self, amount):
+        with self._lock:
+            self._in_flight += amount
+
+    def _backoff(self, attempt, retry_after):
+        """Full-jitter exponential backoff, or the server's Retry-After if it asked for one."""
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _start(self, timeout):
+        self._count("calls")
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self._count("circuit_rejections")
+            raise
+        return time.time() + (timeout if timeout is not None else self.default_timeout)
+
+    def _handle_error(self, error, attempt, deadline):
+        """
+        Record a failed attempt and decide what to do next.
+
+        Returns:
+            float: Seconds to wait before retrying
+
+        Raises:
+            Exception: The original error if it should not (or can no longer) be retried
+        """
+        kind, retry_after = classify_error(error)
+        if kind is None:
+            # A client error (bad request, auth, ...) says nothing about upstream health
+            self.breaker.release()
+            self._count("failures")
+            raise error
+
+        self._count({"rate_limited": "rate_limited", "server_error": "server_errors",
+                     "timeout": "timeouts", "connection_error": "connection_errors"}[kind])
+        self.breaker.record_failure()
+
+        delay = self._backoff(attempt, retry_after)
+        if attempt >= self.max_retries or time.time() + delay >= deadline or self.breaker.state == "open":
+            self._count("failures")
+            raise error
+
+        self._count("retries")
+        print(f"OpenAI API {kind.replace('_', ' ')}, retrying in {delay:.2f}s (attempt {attempt + 2})")
+        return delay
+
+    def _remaining(self, deadline):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            self.breaker.release()
+            self._count("timeouts")
+            self._count("failures")
+            raise TimeoutError("OpenAI API call exceeded its latency budget")
+        return remaining
+
+    def call(self, fn, timeout=None):
+        """
+        Call fn(remaining_seconds) with retries, within the latency budget.
+
+        Args:
+            fn (callable): Makes one upstream attempt; receives the seconds left
+                in the budget to use as its request timeout
+            timeout (float, optional): Latency budget in seconds for the whole call,
+                including waiting for a slot and retries
+
+        Returns:
+            The result of fn
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            UpstreamBusyError: If no slot frees up within the budget
+            Exception: The last error from fn once retries are exhausted
+        """
+        deadline = self._start(timeout)
+
+        if not self._slots.acquire(timeout=max(deadline - time.time(), 0)):
+            self._count("slot_timeouts")
+            self.breaker.release()
+            raise UpstreamBusyError("Too many OpenAI API calls in flight")
+
+        self._track_in_flight(1)
+        try:
+            attempt = 0
+            while True:
+                remaining = self._remaining(deadline)
+                self._count("attempts")
+                try:
+                    result = fn(remaining)
+                    self.breaker.record_success()
+                    self._count("successes")
+                    return result
+                except Exception as e:
+                    time.sleep(self._handle_error(e, attempt, deadline))
+                    attempt += 1
+        finally:
+            self._track_in_flight(-1)
+            self._slots.release()
+
+    async def acall(self, coroutine_fn, timeout=None):
+        """
+        Async version of call(): await coroutine_fn(remaining_seconds) with retries.
+
+        Async and synchronous calls share the same concurrency limit and breaker.
+        """
+        deadline = self._start(timeout)
+
+        # Wait for a slot without blocking the event loop
+        while not self._slots.acquire(blocking=False):
+            if time.time() >= deadline:
+                self._count("slot_timeouts")
+                self.breaker.release()
+                raise UpstreamBusyError("Too many OpenAI API calls in flight")
+            await asyncio.sleep(0.01)
+
+        self._track_in_flight(1)
+        try:
+            attempt = 0
+            while True:
+                remaining = self._remaining(deadline)
+                self._count("attempts")
+                try:
+                    result = await coroutine_fn(remaining)
+                    self.breaker.record_success()
+                    self._count("successes")
+                    return result
+                except Exception as e:
+                    await asyncio.sleep(self._handle_error(e, attempt, deadline))
+                    attempt += 1
+        finally:
+            self._track_in_flight(-1)
+            self._slots.release()
+
+    def stats(self):
+        """
+        Get upstream call counters for this process.
+
+        Returns:
+            dict: Call, retry and error counters plus breaker and concurrency state
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = self._in_flight
+        stats.update({
+            "max_concurrency": self.max_concurrency,
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.opened_count
+        })
+        return stats
+
+def create_upstream_guard():
+    """
+    Create an UpstreamGuard configured from environment variables.
+
+    Environment variables:
+        LLM_MAX_CONCURRENCY: Maximum concurrent OpenAI API calls per process (default 16)
+        LLM_TIMEOUT: Default latency budget in seconds (default 60)
+        LLM_MAX_RETRIES: Retries on 429/5xx/timeouts (default 3)
+        LLM_BACKOFF_BASE / LLM_BACKOFF_MAX: Backoff ceilings in seconds (default 0.5 / 8)
+        LLM_BREAKER_THRESHOLD: Consecutive failures that open the breaker (default 5)
+        LLM_BREAKER_RESET: Seconds the breaker stays open (default 30)
+
+    Returns:
+        UpstreamGuard: The configured guard
+    """
+    return UpstreamGuard(
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 16)),
+        default_timeout=float(os.getenv("LLM_TIMEOUT", 60)),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", 3)),
+        backoff_base=float(os.getenv("LLM_BACKOFF_BASE", 0.5)),
+        backoff_max=float(os.getenv("LLM_BACKOFF_MAX", 8)),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET", 30))
+        )
+    )
@@ -0,0 +1,301 @@
+"""
+Resume Index Module
+
+This module parses a master resume once and reuses the result across requests.
+The same resume is sent to /find-keywords-in-resume, /find-citations, /generate
+and /generate-competencies in a session; instead of re-sanitizing and re-scanning
+the raw string on every call, each code path asks for the ResumeIndex of that
+text, which is cached in memory by content hash.
+
+A ResumeIndex holds the prompt-ready normalized text, the resume split into
+bullets and sentences with character offsets, and an inverted index from
+lowercase tokens to the segments that contain them.
+"""
+
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from services.keyword.keyword_automaton import get_keyword_matcher, keyword_set_hash
+from utils.text_processing import sanitize_text
+
+# Bullet markers at the start of a line: -, *, •, ▪, ◦, ·, ‣, ●, >, or "1." / "a)"
+_BULLET = re.compile(r"^[ \t]*(?:[-*•▪◦·‣●>]|\d{1,2}[.)]|[a-zA-Z][.)](?=\s))[ \t]+")
+
+# Sentence ends: terminal punctuation followed by whitespace and an uppercase letter or digit
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+_WORD = re.compile(r"\w+")
+
+class Segment:
+    """A bullet, sentence or heading of the resume, with offsets into its text."""
+
+    __slots__ = ("id", "start", "end", "text", "kind")
+
+    def __init__(self, segment_id, start, end, text, kind):
+        self.id = segment_id
+        self.start = start
+        self.end = end
+        self.text = text
+        self.kind = kind
+
+    def to_dict(self):
+        return {"id": self.id, "start": self.start, "end": self.end, "text": self.text, "kind": self.kind}
+
+class ResumeIndex:
+    """
+    Parsed form of one resume text. Build it with get_resume_index(text) so it is shared.
+    """
+
+    # Keyword sets whose matches are remembered per index
+    MAX_MATCH_SETS = 32
+
+    def __init__(self, text):
+        """
+        Args:
+            text (str): The resume text
+        """
+        self.text = text or ""
+        self.content_hash = resume_hash(self.text)
+        self.normalized_text = sanitize_text(self.text)
+        self.segments = _segment(self.text)
+
+        # token -> ids of the segments containing it, in order
+        self.postings = {}
+        self.segment_tokens = []
+        for segment in self.segments:
+            tokens = [token.lower() for token in _WORD.findall(segment.text)]
+            self.segment_tokens.append(tokens)
+            for token in set(tokens):
+                self.postings.setdefault(token, []).append(segment.id)
+
+        self._matches = OrderedDict()
+        self._retriever = None
+        self._stemmed = None
+        self._lock = threading.Lock()
+
+    def matches(self, keywords):
+        """
+        Find every whole-word, case-insensitive occurrence of the keywords.
+
+        Args:
+            keywords (iterable): The keywords to look for
+
+        Returns:
+            list: (start, end, keyword) tuples with offsets into the resume text
+        """
+        keywords = [keyword for keyword in keywords if isinstance(keyword, str)]
+        key = keyword_set_hash(keywords)
+
+        with self._lock:
+            found = self._matches.get(key)
+            if found is not None:
+                self._matches.move_to_end(key)
+                return found
+
+        found = get_keyword_matcher(keywords).find_all(self.text)
+
+        with self._lock:
+            self._matches[key] = found
+            while len(self._matches) > self.MAX_MATCH_SETS:
+                self._matches.popitem(last=False)
+        return found
+
+    def retriever(self):
+        """
+        Get the BM25 retriever over this resume's segments, building it on first use.
+
+        Returns:
+            BM25Retriever: The retriever
+        """
+        if self._retriever is None:
+            from services.resume_retrieval import BM25Retriever
+            self._retriever = BM25Retriever([segment.text for segment in self.segments])
+        return self._retriever
+
+    def stemmed_tokens(self):
+        """
+        Get each segment's words as stems with offsets, building them on first use.
+
+        Returns:
+            list: For each segment, (stem, start, end) tuples with offsets into the resume
+                  text; stem is None for stopwords
+        """
+        if self._stemmed is None:
+            from services.resume_retrieval import stem
+            from services.keyword.keyword_utils import COMMON_WORDS
+            stemmed = []
+            for segment in self.segments:
+                tokens = []
+                for match in _WORD.finditer(segment.text):
+                    token = match.group().lower()
+                    tokens.append((None if token in COMMON_WORDS else stem(token),
+                                   segment.start + match.start(), segment.start + match.end()))
+                stemmed.append(tokens)
+            self._stemmed = stemmed
+        return self._stemmed
+
+    def found(self, keywords):
+        """
+        Find which of the keywords occur in the resume.
+
+        Args:
+            keywords (iterable): The keywords to look for
+
+        Returns:
+            set: The keywords with at least one whole-word occurrence
+        """
+        return {keyword for _, _, keyword in self.matches(keywords)}
+
+    def candidate_segments(self, keyword):
+        """
+        List the segments containing every word of a keyword, using the inverted index.
+
+        Args:
+            keyword (str): The keyword
+
+        Returns:
+            list: Segment ids in document order (empty if any word is missing)
+        """
+        words = {word.lower() for word in _WORD.findall(keyword)}
+        if not words:
+            return []
+        postings = sorted((self.postings.get(word, []) for word in words), key=len)
+        if not postings[0]:
+            return []
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return sorted(candidates)
+
+    def segment_at(self, offset):
+        """
+        Find the segment containing a character offset.
+
+        Args:
+            offset (int): Offset into the resume text
+
+        Returns:
+            Segment: The segment, or None if the offset falls between segments
+        """
+        low, high = 0, len(self.segments) - 1
+        while low <= high:
+            middle = (low + high) // 2
+            segment = self.segments[middle]
+            if offset < segment.start:
+                high = middle - 1
+            elif offset >= segment.end:
+                low = middle + 1
+            else:
+                return segment
+        return None
+
+def resume_hash(text):
+    """
+    Hash a resume's content.
+
+    Args:
+        text (str): The resume text
+
+    Returns:
+        str: Hex digest of the text
+    """
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def _segment(text):
+    """Split a resume into bullets, headings and sentences with offsets into text."""
+    segments = []
+    position = 0
+    for line in text.splitlines(keepends=True):
+        line_start = position
+        position += len(line)
+        content = line.rstrip("\r\n")
+        stripped = content.strip()
+        if not stripped:
+            continue
+
+        bullet = _BULLET.match(content)
+        if bullet:
+            start = line_start + bullet.end()
+            segments.append(Segment(len(segments), start, line_start + len(content.rstrip()), content[bullet.end():].rstrip(), "bullet"))
+            continue
+
+        # Short lines without terminal punctuation are headings (section titles, job titles, dates)
+        if len(stripped.split()) <= 6 and stripped[-1] not in ".!?":
+            start = line_start + (len(content) - len(content.lstrip()))
+            segments.append(Segment(len(segments), start, start + len(stripped), stripped, "heading"))
+            continue
+
+        piece_start = 0
+        for boundary in list(_SENTENCE_END.finditer(content)) + [None]:
+            piece_end = boundary.start() if boundary else len(content)
+            piece = content[piece_start:piece_end]
+            if piece.strip():
+                leading = len(piece) - len(piece.lstrip())
+                start = line_start + piece_start + leading
+                segments.append(Segment(len(segments), start, start + len(piece.strip()), piece.strip(), "sentence"))
+            if boundary:
+                piece_start = boundary.end()
+    return segments
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+# Parsed resumes kept in memory
+RESUME_INDEX_CACHE_SIZE = int(os.getenv("RESUME_INDEX_CACHE_SIZE", 64))
+
+def get_resume_index(text):
+    """
+    Get the parsed index for a resume, building it on first use.
+
+    Args:
+        text (str): The resume text
+
+    Returns:
+        ResumeIndex: The cached index
+    """
+    key = resume_hash(text)
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            _stats["hits"] += 1
+            return index
+        _stats["misses"] += 1
+
+    index = ResumeIndex(text)
+
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > RESUME_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+def cached_resume_text(content_hash):
+    """
+    Get the text of a resume whose index is in memory, without building one.
+
+    Args:
+        content_hash (str): The resume's content hash
+
+    Returns:
+        str: The resume text, or None if it isn't cached
+    """
+    with _indexes_lock:
+        index = _indexes.get(content_hash)
+        return None if index is None else index.text
+
+def get_resume_index_stats():
+    """
+    Report resume index cache counters.
+
+    Returns:
+        dict: Cached indexes, hits and misses
+    """
+    with _indexes_lock:
+        return {"size": len(_indexes), "max_size": RESUME_INDEX_CACHE_SIZE, **_stats}
@@ -0,0 +1,232 @@
+"""
+Resume Retrieval Module
+
+This module picks the resume segments most relevant to a set of queries
+(keywords, competencies or career profile sentences) with BM25, so citation
+prompts can carry a small evidence pool instead of the whole resume.
+
+Scores for all queries are computed at once as a matrix product of the
+segment-term BM25 weights and the query-term counts. The weights are built
+once per resume and kept on its ResumeIndex.
+"""
+
+import os
+import re
+import numpy as np
+from services.keyword.keyword_utils import COMMON_WORDS
+from services.resume_index import get_resume_index
+from utils.text_processing import sanitize_text
+
+# Send only retrieved evidence in citation prompts (on or off)
+CITATION_RETRIEVAL = os.getenv("CITATION_RETRIEVAL", "on").lower() != "off"
+
+# Segments kept per query
+RETRIEVAL_TOP_K = int(os.getenv("CITATION_RETRIEVAL_TOP_K", 3))
+
+# Resumes shorter than this many words are sent whole; retrieval saves little on them
+RETRIEVAL_MIN_WORDS = int(os.getenv("CITATION_RETRIEVAL_MIN_WORDS", 300))
+
+# If the evidence pool would cover more than this fraction of the resume, send it all
+RETRIEVAL_MAX_FRACTION = 0.8
+
+_WORD = re.compile(r"\w+")
+
+# Suffixes stripped so "managed", "manager" and "management" share a term
+_SUFFIXES = ("ations", "ation", "ating", "ated", "ates", "ments", "ment", "ings", "ing", "ers", "ies", "ied", "er", "ed", "es", "s")
+
+def stem(token):
+    """
+    Strip a common English suffix from a lowercase token.
+
+    Args:
+        token (str): The token
+
+    Returns:
+        str: The stem (unchanged if it would be shorter than 3 characters)
+    """
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+    # A final "e" too, so "manage" and "managed" share a stem with "management"
+    if token.endswith("e") and len(token) > 4:
+        token = token[:-1]
+    return token
+
+def query_terms(text):
+    """
+    Split a query or segment into stemmed terms, dropping stopwords.
+
+    Args:
+        text (str): The text
+
+    Returns:
+        list: Stemmed terms in order
+    """
+    return [stem(token) for token in (word.lower() for word in _WORD.findall(text)) if token not in COMMON_WORDS]
+
+class BM25Retriever:
+    """
+    BM25 over the segments of one resume.
+    """
+
+    def __init__(self, segments, k1=1.5, b=0.75):
+        """
+        Args:
+            segments (list): Segment texts
+            k1 (float): Term frequency saturation
+            b (float): Length normalization
+        """
+        documents = [query_terms(text) for text in segments]
+        self.vocabulary = {}
+        for terms in documents:
+            for term in terms:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+
+        tf = np.zeros((len(documents), max(len(self.vocabulary), 1)), dtype=np.float32)
+        for row, terms in enumerate(documents):
+            if terms:
+                np.add.at(tf[row], [self.vocabulary[term] for term in terms], 1)
+
+        lengths = tf.sum(axis=1)
+        average_length = float(lengths.mean()) if len(documents) and lengths.mean() > 0 else 1.0
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1 + (len(documents) - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        norm = k1 * (1 - b + b * lengths / average_length)
+        self.weights = idf * (tf * (k1 + 1)) / (tf + norm[:, None])
+
+    def scores(self, queries):
+        """
+        Score every segment against every query.
+
+        Args:
+            queries (list): Query strings
+
+        Returns:
+            numpy.ndarray: (segments, queries) BM25 scores
+        """
+        counts = np.zeros((self.weights.shape[1], len(queries)), dtype=np.float32)
+        for column, query in enumerate(queries):
+            for term in query_terms(query):
+                index = self.vocabulary.get(term)
+                if index is not None:
+                    counts[index, column] += 1
+        return self.weights @ counts
+
+    def top_k(self, queries, k):
+        """
+        Find the best-scoring segments for each query.
+
+        Args:
+            queries (list): Query strings
+            k (int): Segments kept per query
+
+        Returns:
+            list: For each query, segment positions with a positive score, best first
+        """
+        if not queries or not self.weights.shape[0]:
+            return [[] for _ in queries]
+
+        scores = self.scores(queries)
+        k = min(k, scores.shape[0])
+        # Partial sort per column, then order the k survivors
+        candidates = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for column in range(scores.shape[1]):
+            column_scores = scores[candidates[:, column], column]
+            order = candidates[np.argsort(-column_scores, kind="stable"), column]
+            results.append([int(row) for row in order if scores[row, column] > 0])
+        return results
+
+def select_evidence(index, queries, top_k=None):
+    """
+    Choose the resume segments to send as evidence for the queries.
+
+    Each retrieved segment brings the nearest heading before it (job title,
+    company or section name) for context.
+
+    Args:
+        index (ResumeIndex): The parsed resume
+        queries (list): Keywords, competencies or sentences to find evidence for
+        top_k (int, optional): Segments kept per query
+
+    Returns:
+        list: Segment ids in document order, or None if the whole resume should be sent
+    """
+    queries = [query for query in queries if isinstance(query, str) and query.strip()]
+    if not queries or len(index.normalized_text.split()) < RETRIEVAL_MIN_WORDS:
+        return None
+
+    selected = set()
+    for rows in index.retriever().top_k(queries, top_k or RETRIEVAL_TOP_K):
+        selected.update(rows)
+    if not selected:
+        return None
+
+    heading = None
+    with_context = set()
+    for segment in index.segments:
+        if segment.kind == "heading":
+            heading = segment.id
+        elif segment.id in selected and heading is not None:
+            with_context.add(heading)
+    selected |= with_context
+
+    if len(selected) > RETRIEVAL_MAX_FRACTION * len(index.segments):
+        return None
+    return sorted(selected)
+
+def evidence_text(resume_text, queries, top_k=None):
+    """
+    Build the sanitized resume text for a citation prompt: the retrieved
+    evidence when retrieval is on and worthwhile, otherwise the whole resume.
+
+    Args:
+        resume_text (str): The master resume text
+        queries (list): Keywords, competencies or sentences to find evidence for
+        top_k (int, optional): Segments kept per query
+
+    Returns:
+        str: Sanitized resume text or evidence excerpt
+    """
+    return select_evidence_text(resume_text, queries, top_k)[0]
+
+def select_evidence_text(resume_text, queries, top_k=None):
+    """
+    Like evidence_text, but also say whether the whole resume was kept.
+
+    A prompt that only saw an excerpt can't show that the resume lacks evidence
+    for a keyword (retrieval may have missed it), so callers use this to decide
+    whether a "not found" answer can be trusted.
+
+    Args:
+        resume_text (str): The master resume text
+        queries (list): Keywords, competencies or sentences to find evidence for
+        top_k (int, optional): Segments kept per query
+
+    Returns:
+        tuple: (text, whole_resume) - the sanitized text, and True if it is the whole resume
+    """
+    index = get_resume_index(resume_text)
+    if not CITATION_RETRIEVAL:
+        return index.normalized_text, True
+
+    segment_ids = select_evidence(index, queries, top_k)
+    if segment_ids is None:
+        return index.normalized_text, True
+    return sanitize_text("\n".join(index.segments[segment_id].text for segment_id in segment_ids)), False
+
+def split_queries(text):
+    """
+    Split a comma-separated competency list or a career profile into queries.
+
+    Args:
+        text (str): The competencies or profile
+
+    Returns:
+        list: One query per competency or sentence
+    """
+    if not text:
+        return []
+    return [piece.strip() for piece in re.split(r"[,;|\n•]+|(?<=[.!?])\s+", text) if piece.strip()]
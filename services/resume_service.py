@@ -5,63 +5,75 @@ This module handles career profile and competencies generation.
 """
 
 import json
-from services.openai_service import get_json_response, get_text_response
+import time
+import asyncio
+from concurrent.futures import as_completed
+from services.openai_service import get_json_response, get_text_response, aget_json_response, aget_text_response, stream_text_response
 from services.keyword_service import extract_keywords, highlight_keywords
+from services.keyword.keyword_highlighting import ahighlight_keywords
+from services.concurrency import run_concurrently, get_executor, timed
+from services.resume_retrieval import evidence_text, split_queries
+from services.evidence_resolver import resolve_locally, record_model_call
 from utils.text_processing import sanitize_text
 
-def generate_career_profile(job_description, master_resume, keywords=None, existing_citations=None, job_title=None, company_name=None, industry=None, keywords_data=None):
+def prioritize_keywords(keywords, keywords_data, purpose):
     """
-    Generate a tailored career profile based on job description and master resume.
+    Put keywords from the structured keywords data ahead of the other keywords.
+    
+    Args:
+        keywords (list): List of keywords
+        keywords_data (dict, optional): Structured keywords data with priorities
+        purpose (str): What the keywords are used for (for logging)
+        
+    Returns:
+        list: The keywords with prioritized keywords first
+    """
+    # Process structured keywords data if provided
+    prioritized_keywords = []
+    if keywords_data:
+        # Extract keywords from the structured data
+        for priority in ['high_priority', 'medium_priority', 'low_priority']:
+            if priority in keywords_data:
+                for item in keywords_data[priority]:
+                    if isinstance(item, dict) and 'keyword' in item:
+                        # Check if this is a user-added keyword
+                        if 'user_added' in item and item['user_added']:
+                            # Prioritize user-added keywords
+                            prioritized_keywords.append(item['keyword'])
+                        else:
+                            # Add regular extracted keywords
+                            prioritized_keywords.append(item['keyword'])
+                    elif isinstance(item, str):
+                        prioritized_keywords.append(item)
+        
+        # If we have prioritized keywords, use them
+        if prioritized_keywords:
+            print(f"Using {len(prioritized_keywords)} prioritized keywords for {purpose} generation")
+            keywords = prioritized_keywords + [k for k in keywords if k not in prioritized_keywords]
+    
+    return keywords
+
+def build_career_profile_messages(job_description, master_resume, job_title=None, company_name=None, industry=None):
+    """
+    Build the chat messages for generating a career profile.
     
     Args:
         job_description (str): The job description text
         master_resume (str): The master resume text
-        keywords (list, optional): List of keywords to include in the profile
-        existing_citations (dict, optional): Existing citations from keyword extraction
         job_title (str, optional): The job title
         company_name (str, optional): The company name
         industry (str, optional): The industry
-        keywords_data (dict, optional): Structured keywords data with priorities
         
     Returns:
-        tuple: (profile, marked_profile, keywords, citations) - The generated profile,
-               the profile with keywords highlighted, the keywords used, and citations
+        list: Message dictionaries for the OpenAI API
     """
-    try:
-        # Extract keywords if not provided
-        if not keywords:
-            _, keywords, _ = extract_keywords(job_description, master_resume, job_title, company_name)
-        
-        # Process structured keywords data if provided
-        prioritized_keywords = []
-        if keywords_data:
-            # Extract keywords from the structured data
-            for priority in ['high_priority', 'medium_priority', 'low_priority']:
-                if priority in keywords_data:
-                    for item in keywords_data[priority]:
-                        if isinstance(item, dict) and 'keyword' in item:
-                            # Check if this is a user-added keyword
-                            if 'user_added' in item and item['user_added']:
-                                # Prioritize user-added keywords
-                                prioritized_keywords.append(item['keyword'])
-                            else:
-                                # Add regular extracted keywords
-                                prioritized_keywords.append(item['keyword'])
-                        elif isinstance(item, str):
-                            prioritized_keywords.append(item)
-            
-            # If we have prioritized keywords, use them
-            if prioritized_keywords:
-                print(f"Using {len(prioritized_keywords)} prioritized keywords for career profile generation")
-                keywords = prioritized_keywords + [k for k in keywords if k not in prioritized_keywords]
-        
-        # Get job title, company name, and industry if provided
-        job_title_value = job_title if job_title else "the position"
-        company_name_value = company_name if company_name else "the company"
-        industry_value = industry if industry else ""
-        
-        # Prepare the prompt for OpenAI with improved instructions
-        prompt = f"""You are a resume-writing assistant specialized in crafting highly targeted, concise career profiles. 
+    # Get job title, company name, and industry if provided
+    job_title_value = job_title if job_title else "the position"
+    company_name_value = company_name if company_name else "the company"
+    industry_value = industry if industry else ""
+    
+    # Prepare the prompt for OpenAI with improved instructions
+    prompt = f"""You are a resume-writing assistant specialized in crafting highly targeted, concise career profiles. 
 Your task is to clearly demonstrate in one sentence why the candidate is the ideal match for the specific "{job_title_value}" role without summarizing the entire career.
 This concise sentence should follow the structured format:
 
@@ -127,25 +139,130 @@ Master Resume:
 
 Generate a concise career profile for the "{job_title_value}" role:"""
 
+    messages = [
+        {"role": "system", "content": "You are a professional resume writer specializing in concise career profiles."},
+        {"role": "user", "content": prompt}
+    ]
+    return messages
+
+def generate_career_profile(job_description, master_resume, keywords=None, existing_citations=None, job_title=None, company_name=None, industry=None, keywords_data=None, stage_timings=None):
+    """
+    Generate a tailored career profile based on job description and master resume.
+    
+    Stages that don't depend on each other run concurrently: keyword extraction
+    alongside profile generation, then highlighting alongside citation lookup.
+    
+    Args:
+        job_description (str): The job description text
+        master_resume (str): The master resume text
+        keywords (list, optional): List of keywords to include in the profile
+        existing_citations (dict, optional): Existing citations from keyword extraction
+        job_title (str, optional): The job title
+        company_name (str, optional): The company name
+        industry (str, optional): The industry
+        keywords_data (dict, optional): Structured keywords data with priorities
+        stage_timings (dict, optional): Receives the duration of each stage in seconds
+        
+    Returns:
+        tuple: (profile, marked_profile, keywords, citations) - The generated profile,
+               the profile with keywords highlighted, the keywords used, and citations
+    """
+    try:
+        start_time = time.time()
+        timings = stage_timings if stage_timings is not None else {}
+        
         # Call OpenAI API
-        messages = [
-            {"role": "system", "content": "You are a professional resume writer specializing in concise career profiles."},
-            {"role": "user", "content": prompt}
-        ]
+        messages = build_career_profile_messages(job_description, master_resume, job_title, company_name, industry)
+        
+        # Generate the profile, extracting keywords at the same time if not provided
+        first_stages = {"profile": lambda: get_text_response(messages, max_tokens=150, temperature=0.7, timeout=20)}
+        if not keywords:
+            first_stages["keywords"] = lambda: extract_keywords(job_description, master_resume, job_title, company_name)[1]
+        results = run_concurrently(first_stages, timings)
         
-        # Get the text response
-        profile = get_text_response(messages, max_tokens=150, temperature=0.7)
+        profile = results["profile"]
+        keywords = prioritize_keywords(results.get("keywords", keywords), keywords_data, "career profile")
         
-        # Get the marked up profile with highlighted keywords
-        marked_profile = highlight_keywords(profile, job_description)
+        # Highlighting and citations both depend only on the profile
+        second_stages = {"highlight": lambda: highlight_keywords(profile, job_description)}
         
         # Use existing citations if provided, otherwise find new ones
         if existing_citations:
             print("Using existing citations for career profile")
+        else:
+            print("Finding new citations for career profile")
+            second_stages["citations"] = lambda: find_profile_citations(profile, master_resume, job_title, company_name, industry)
+        results = run_concurrently(second_stages, timings)
+        
+        marked_profile = results["highlight"]
+        citations = results.get("citations", existing_citations)
+        
+        timings["total"] = round(time.time() - start_time, 3)
+        print(f"Career profile stage timings: {timings}")
+        
+        return profile, marked_profile, keywords[:20], citations
+    
+    except Exception as e:
+        print(f"Error generating career profile: {str(e)}")
+        raise
+
+async def atimed(timings, name, awaitable):
+    """
+    Await a stage and record how long it took.
+    
+    Args:
+        timings (dict): Receives the duration in seconds under name
+        name (str): The stage name
+        awaitable: The stage to await
+        
+    Returns:
+        The stage's result
+    """
+    start_time = time.time()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = round(time.time() - start_time, 3)
+
+async def agenerate_career_profile(job_description, master_resume, keywords=None, existing_citations=None, job_title=None, company_name=None, industry=None, keywords_data=None, stage_timings=None):
+    """
+    Async version of generate_career_profile.
+    
+    Returns:
+        tuple: (profile, marked_profile, keywords, citations)
+    """
+    try:
+        start_time = time.time()
+        timings = stage_timings if stage_timings is not None else {}
+        
+        messages = build_career_profile_messages(job_description, master_resume, job_title, company_name, industry)
+        profile_stage = atimed(timings, "profile", aget_text_response(messages, max_tokens=150, temperature=0.7, timeout=20))
+        
+        # Extract keywords if not provided (the keyword pipeline is synchronous, so run it in a thread)
+        if not keywords:
+            profile, extracted = await asyncio.gather(
+                profile_stage,
+                atimed(timings, "keywords", asyncio.to_thread(extract_keywords, job_description, master_resume, job_title, company_name))
+            )
+            keywords = extracted[1]
+        else:
+            profile = await profile_stage
+        
+        keywords = prioritize_keywords(keywords, keywords_data, "career profile")
+        
+        highlight_stage = atimed(timings, "highlight", ahighlight_keywords(profile, job_description))
+        if existing_citations:
+            print("Using existing citations for career profile")
+            marked_profile = await highlight_stage
             citations = existing_citations
         else:
             print("Finding new citations for career profile")
-            citations = find_profile_citations(profile, master_resume, job_title, company_name, industry)
+            marked_profile, citations = await asyncio.gather(
+                highlight_stage,
+                atimed(timings, "citations", afind_profile_citations(profile, master_resume, job_title, company_name, industry))
+            )
+        
+        timings["total"] = round(time.time() - start_time, 3)
         
         return profile, marked_profile, keywords[:20], citations
     
@@ -153,9 +270,66 @@ Generate a concise career profile for the "{job_title_value}" role:"""
         print(f"Error generating career profile: {str(e)}")
         raise
 
-def find_profile_citations(profile, master_resume, job_title=None, company_name=None, industry=None):
+def stream_career_profile(job_description, master_resume, keywords=None, existing_citations=None, job_title=None, company_name=None, industry=None, keywords_data=None):
     """
-    Find citations in the master resume for keywords in the career profile.
+    Generate a career profile, yielding events as each stage produces output.
+    
+    Profile tokens are yielded as they arrive from the model; the marked profile
+    and citations follow as separate events when their stages complete.
+    
+    Args:
+        Same as generate_career_profile
+        
+    Yields:
+        tuple: (event, data) where event is one of "token", "profile", "keywords",
+               "marked_profile", "citations" or "done" (data holds the stage timings)
+    """
+    start_time = time.time()
+    timings = {}
+    executor = get_executor()
+    
+    # Keyword extraction doesn't depend on the profile, so start it first
+    keywords_future = None
+    if not keywords:
+        keywords_future = executor.submit(timed, extract_keywords, job_description, master_resume, job_title, company_name)
+    
+    messages = build_career_profile_messages(job_description, master_resume, job_title, company_name, industry)
+    
+    parts = []
+    for delta in stream_text_response(messages, max_tokens=150, temperature=0.7, timeout=20):
+        if not parts:
+            timings["first_token"] = round(time.time() - start_time, 3)
+        parts.append(delta)
+        yield "token", delta
+    profile = "".join(parts).strip()
+    timings["profile"] = round(time.time() - start_time, 3)
+    yield "profile", profile
+    
+    # Highlighting and citations both depend only on the profile
+    futures = {executor.submit(timed, highlight_keywords, profile, job_description): "marked_profile"}
+    if existing_citations:
+        print("Using existing citations for career profile")
+        yield "citations", existing_citations
+    else:
+        print("Finding new citations for career profile")
+        futures[executor.submit(timed, find_profile_citations, profile, master_resume, job_title, company_name, industry)] = "citations"
+    
+    if keywords_future is not None:
+        (_, keywords, *_), timings["keywords"] = keywords_future.result()
+    keywords = prioritize_keywords(keywords, keywords_data, "career profile")
+    yield "keywords", keywords[:20]
+    
+    for future in as_completed(futures):
+        event = futures[future]
+        result, timings[event] = future.result()
+        yield event, result
+    
+    timings["total"] = round(time.time() - start_time, 3)
+    yield "done", timings
+
+def build_profile_citation_messages(profile, master_resume, job_title=None, company_name=None, industry=None):
+    """
+    Build the chat messages for finding citations for a career profile.
     
     Args:
         profile (str): The career profile text
@@ -165,21 +339,20 @@ def find_profile_citations(profile, master_resume, job_title=None, company_name=
         industry (str, optional): The industry
         
     Returns:
-        dict: Dictionary mapping competencies to citations
+        list: Message dictionaries for the OpenAI API
     """
-    try:
-        print("Finding citations for career profile...")
-        # Sanitize inputs
-        sanitized_profile = sanitize_text(profile)
-        sanitized_resume = sanitize_text(master_resume)
-        
-        # Get job title, company name, and industry if provided
-        job_title_value = job_title if job_title else "the position"
-        company_name_value = company_name if company_name else "the company"
-        industry_value = industry if industry else ""
-        
-        # Prepare the prompt for OpenAI with improved instructions
-        prompt = f"""
+    # Sanitize inputs
+    sanitized_profile = sanitize_text(profile)
+    # Only the resume segments most relevant to the profile's sentences go into the prompt
+    sanitized_resume = evidence_text(master_resume, split_queries(profile))
+    
+    # Get job title, company name, and industry if provided
+    job_title_value = job_title if job_title else "the position"
+    company_name_value = company_name if company_name else "the company"
+    industry_value = industry if industry else ""
+    
+    # Prepare the prompt for OpenAI with improved instructions
+    prompt = f"""
         I have a career profile for a "{job_title_value}" role at {company_name_value} and a master resume. I need you to thoroughly scan the ENTIRE resume to identify where the competencies and keywords 
         mentioned in the career profile are supported by evidence in the master resume.
         
@@ -230,16 +403,34 @@ def find_profile_citations(profile, master_resume, job_title=None, company_name=
         Master Resume:
         {sanitized_resume}
         """
+    
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes."},
+        {"role": "user", "content": prompt}
+    ]
+    return messages
+
+def find_profile_citations(profile, master_resume, job_title=None, company_name=None, industry=None):
+    """
+    Find citations in the master resume for keywords in the career profile.
+    
+    Args:
+        profile (str): The career profile text
+        master_resume (str): The master resume text
+        job_title (str, optional): The job title
+        company_name (str, optional): The company name
+        industry (str, optional): The industry
         
-        # Call OpenAI API
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes."},
-            {"role": "user", "content": prompt}
-        ]
+    Returns:
+        dict: Dictionary mapping competencies to citations
+    """
+    try:
+        print("Finding citations for career profile...")
+        messages = build_profile_citation_messages(profile, master_resume, job_title, company_name, industry)
         
         # Get the JSON response
         try:
-            citations_data = get_json_response(messages, max_tokens=800, temperature=0.3)
+            citations_data = get_json_response(messages, max_tokens=800, temperature=0.3, timeout=45)
             return citations_data
         except Exception as e:
             print(f"Error getting JSON response for citations: {str(e)}")
@@ -249,59 +440,48 @@ def find_profile_citations(profile, master_resume, job_title=None, company_name=
         print(f"Error finding profile citations: {str(e)}")
         return {}
 
-def generate_core_competencies(job_description, master_resume, keywords=None, existing_citations=None, job_title=None, company_name=None, industry=None, keywords_data=None):
+async def afind_profile_citations(profile, master_resume, job_title=None, company_name=None, industry=None):
     """
-    Generate core competencies based on job description and master resume.
+    Async version of find_profile_citations.
+    
+    Returns:
+        dict: Dictionary mapping competencies to citations
+    """
+    try:
+        print("Finding citations for career profile...")
+        messages = build_profile_citation_messages(profile, master_resume, job_title, company_name, industry)
+        
+        try:
+            return await aget_json_response(messages, max_tokens=800, temperature=0.3, timeout=45)
+        except Exception as e:
+            print(f"Error getting JSON response for citations: {str(e)}")
+            return {}
+    
+    except Exception as e:
+        print(f"Error finding profile citations: {str(e)}")
+        return {}
+
+def build_core_competencies_messages(job_description, master_resume, job_title=None, company_name=None, industry=None):
+    """
+    Build the chat messages for generating core competencies.
     
     Args:
         job_description (str): The job description text
         master_resume (str): The master resume text
-        keywords (list, optional): List of keywords to consider
-        existing_citations (dict, optional): Existing citations from keyword extraction
         job_title (str, optional): The job title
         company_name (str, optional): The company name
         industry (str, optional): The industry
-        keywords_data (dict, optional): Structured keywords data with priorities
         
     Returns:
-        tuple: (competencies, keywords, citations) - The generated competencies,
-               the keywords used, and citations for the competencies
+        list: Message dictionaries for the OpenAI API
     """
-    try:
-        # Extract keywords if not provided
-        if not keywords:
-            _, keywords, _ = extract_keywords(job_description, master_resume, job_title, company_name)
-        
-        # Process structured keywords data if provided
-        prioritized_keywords = []
-        if keywords_data:
-            # Extract keywords from the structured data
-            for priority in ['high_priority', 'medium_priority', 'low_priority']:
-                if priority in keywords_data:
-                    for item in keywords_data[priority]:
-                        if isinstance(item, dict) and 'keyword' in item:
-                            # Check if this is a user-added keyword
-                            if 'user_added' in item and item['user_added']:
-                                # Prioritize user-added keywords
-                                prioritized_keywords.append(item['keyword'])
-                            else:
-                                # Add regular extracted keywords
-                                prioritized_keywords.append(item['keyword'])
-                        elif isinstance(item, str):
-                            prioritized_keywords.append(item)
-            
-            # If we have prioritized keywords, use them
-            if prioritized_keywords:
-                print(f"Using {len(prioritized_keywords)} prioritized keywords for core competencies generation")
-                keywords = prioritized_keywords + [k for k in keywords if k not in prioritized_keywords]
-        
-        # Get job title, company name, and industry if provided
-        job_title_value = job_title if job_title else "the position"
-        company_name_value = company_name if company_name else "the company"
-        industry_value = industry if industry else ""
-        
-        # Prepare the prompt for OpenAI with improved instructions
-        prompt = f"""You are a resume-writing assistant specialized in identifying core competencies that match a job description and are supported by a candidate's resume.
+    # Get job title, company name, and industry if provided
+    job_title_value = job_title if job_title else "the position"
+    company_name_value = company_name if company_name else "the company"
+    industry_value = industry if industry else ""
+    
+    # Prepare the prompt for OpenAI with improved instructions
+    prompt = f"""You are a resume-writing assistant specialized in identifying core competencies that match a job description and are supported by a candidate's resume.
 
 Your task is to extract up to 15 core competencies from the job description that are also evident in the candidate's resume, with special focus on those most relevant for the "{job_title_value}" role at {company_name_value}. Format these as a comma-separated list.
 
@@ -351,14 +531,49 @@ Master Resume:
 
 Generate a comma-separated list of up to 15 core competencies specifically tailored for the "{job_title_value}" role at {company_name_value}:"""
 
+    messages = [
+        {"role": "system", "content": "You are a professional resume writer specializing in identifying core competencies."},
+        {"role": "user", "content": prompt}
+    ]
+    return messages
+
+def generate_core_competencies(job_description, master_resume, keywords=None, existing_citations=None, job_title=None, company_name=None, industry=None, keywords_data=None, stage_timings=None):
+    """
+    Generate core competencies based on job description and master resume.
+    
+    Keyword extraction (when keywords aren't provided) runs concurrently with
+    competencies generation, since the competencies prompt doesn't use them.
+    
+    Args:
+        job_description (str): The job description text
+        master_resume (str): The master resume text
+        keywords (list, optional): List of keywords to consider
+        existing_citations (dict, optional): Existing citations from keyword extraction
+        job_title (str, optional): The job title
+        company_name (str, optional): The company name
+        industry (str, optional): The industry
+        keywords_data (dict, optional): Structured keywords data with priorities
+        stage_timings (dict, optional): Receives the duration of each stage in seconds
+        
+    Returns:
+        tuple: (competencies, keywords, citations) - The generated competencies,
+               the keywords used, and citations for the competencies
+    """
+    try:
+        start_time = time.time()
+        timings = stage_timings if stage_timings is not None else {}
+        
         # Call OpenAI API
-        messages = [
-            {"role": "system", "content": "You are a professional resume writer specializing in identifying core competencies."},
-            {"role": "user", "content": prompt}
-        ]
+        messages = build_core_competencies_messages(job_description, master_resume, job_title, company_name, industry)
+        
+        # Generate the competencies, extracting keywords at the same time if not provided
+        first_stages = {"competencies": lambda: get_text_response(messages, max_tokens=150, temperature=0.7, timeout=20)}
+        if not keywords:
+            first_stages["keywords"] = lambda: extract_keywords(job_description, master_resume, job_title, company_name)[1]
+        results = run_concurrently(first_stages, timings)
         
-        # Get the text response
-        competencies = get_text_response(messages, max_tokens=150, temperature=0.7)
+        competencies = results["competencies"]
+        keywords = prioritize_keywords(results.get("keywords", keywords), keywords_data, "core competencies")
         
         # Use existing citations if provided, otherwise find new ones
         if existing_citations:
@@ -366,7 +581,12 @@ Generate a comma-separated list of up to 15 core competencies specifically tailo
             citations = existing_citations
         else:
             print("Finding new citations for core competencies")
-            citations = find_competencies_citations(competencies, master_resume, job_title, company_name, industry)
+            citations = run_concurrently({
+                "citations": lambda: find_competencies_citations(competencies, master_resume, job_title, company_name, industry)
+            }, timings)["citations"]
+        
+        timings["total"] = round(time.time() - start_time, 3)
+        print(f"Core competencies stage timings: {timings}")
         
         return competencies, keywords[:15], citations
     
@@ -374,9 +594,96 @@ Generate a comma-separated list of up to 15 core competencies specifically tailo
         print(f"Error generating core competencies: {str(e)}")
         raise
 
-def find_competencies_citations(competencies, master_resume, job_title=None, company_name=None, industry=None):
+async def agenerate_core_competencies(job_description, master_resume, keywords=None, existing_citations=None, job_title=None, company_name=None, industry=None, keywords_data=None, stage_timings=None):
     """
-    Find citations in the master resume for the competencies.
+    Async version of generate_core_competencies.
+    
+    Returns:
+        tuple: (competencies, keywords, citations)
+    """
+    try:
+        start_time = time.time()
+        timings = stage_timings if stage_timings is not None else {}
+        
+        messages = build_core_competencies_messages(job_description, master_resume, job_title, company_name, industry)
+        competencies_stage = atimed(timings, "competencies", aget_text_response(messages, max_tokens=150, temperature=0.7, timeout=20))
+        
+        # Extract keywords if not provided (the keyword pipeline is synchronous, so run it in a thread)
+        if not keywords:
+            competencies, extracted = await asyncio.gather(
+                competencies_stage,
+                atimed(timings, "keywords", asyncio.to_thread(extract_keywords, job_description, master_resume, job_title, company_name))
+            )
+            keywords = extracted[1]
+        else:
+            competencies = await competencies_stage
+        
+        keywords = prioritize_keywords(keywords, keywords_data, "core competencies")
+        
+        if existing_citations:
+            print("Using existing citations for core competencies")
+            citations = existing_citations
+        else:
+            print("Finding new citations for core competencies")
+            citations = await atimed(timings, "citations", afind_competencies_citations(competencies, master_resume, job_title, company_name, industry))
+        
+        timings["total"] = round(time.time() - start_time, 3)
+        
+        return competencies, keywords[:15], citations
+    
+    except Exception as e:
+        print(f"Error generating core competencies: {str(e)}")
+        raise
+
+def stream_core_competencies(job_description, master_resume, keywords=None, existing_citations=None, job_title=None, company_name=None, industry=None, keywords_data=None):
+    """
+    Generate core competencies, yielding events as each stage produces output.
+    
+    Args:
+        Same as generate_core_competencies
+        
+    Yields:
+        tuple: (event, data) where event is one of "token", "competencies", "keywords",
+               "citations" or "done" (data holds the stage timings)
+    """
+    start_time = time.time()
+    timings = {}
+    
+    keywords_future = None
+    if not keywords:
+        keywords_future = get_executor().submit(timed, extract_keywords, job_description, master_resume, job_title, company_name)
+    
+    messages = build_core_competencies_messages(job_description, master_resume, job_title, company_name, industry)
+    
+    parts = []
+    for delta in stream_text_response(messages, max_tokens=150, temperature=0.7, timeout=20):
+        if not parts:
+            timings["first_token"] = round(time.time() - start_time, 3)
+        parts.append(delta)
+        yield "token", delta
+    competencies = "".join(parts).strip()
+    timings["competencies"] = round(time.time() - start_time, 3)
+    yield "competencies", competencies
+    
+    if keywords_future is not None:
+        (_, keywords, *_), timings["keywords"] = keywords_future.result()
+    keywords = prioritize_keywords(keywords, keywords_data, "core competencies")
+    yield "keywords", keywords[:15]
+    
+    if existing_citations:
+        print("Using existing citations for core competencies")
+        citations = existing_citations
+    else:
+        print("Finding new citations for core competencies")
+        citations, timings["citations"] = timed(find_competencies_citations, competencies, master_resume, job_title, company_name, industry)
+    yield "citations", citations
+    
+    timings["total"] = round(time.time() - start_time, 3)
+    yield "done", timings
+
+def build_competencies_citation_messages(competencies, master_resume, job_title=None, company_name=None, industry=None):
+    """
+    Build the chat messages for finding citations for core competencies.
     
     Args:
         competencies (str): The competencies as a comma-separated list
@@ -386,21 +693,20 @@ def find_competencies_citations(competencies, master_resume, job_title=None, com
         industry (str, optional): The industry
         
     Returns:
-        dict: Dictionary mapping competencies to citations
+        list: Message dictionaries for the OpenAI API
     """
-    try:
-        print("Finding citations for competencies...")
-        # Sanitize inputs
-        sanitized_competencies = sanitize_text(competencies)
-        sanitized_resume = sanitize_text(master_resume)
-        
-        # Get job title, company name, and industry if provided
-        job_title_value = job_title if job_title else "the position"
-        company_name_value = company_name if company_name else "the company"
-        industry_value = industry if industry else ""
-        
-        # Prepare the prompt for OpenAI with improved instructions
-        prompt = f"""
+    # Sanitize inputs
+    sanitized_competencies = sanitize_text(competencies)
+    # Only the resume segments most relevant to each competency go into the prompt
+    sanitized_resume = evidence_text(master_resume, split_queries(competencies))
+    
+    # Get job title, company name, and industry if provided
+    job_title_value = job_title if job_title else "the position"
+    company_name_value = company_name if company_name else "the company"
+    industry_value = industry if industry else ""
+    
+    # Prepare the prompt for OpenAI with improved instructions
+    prompt = f"""
         I have a list of core competencies for a "{job_title_value}" role at {company_name_value} and a master resume. I need you to thoroughly scan the ENTIRE resume to identify where each competency 
         is supported by evidence in the master resume.
         
@@ -449,20 +755,86 @@ def find_competencies_citations(competencies, master_resume, job_title=None, com
         Master Resume:
         {sanitized_resume}
         """
+    
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes."},
+        {"role": "user", "content": prompt}
+    ]
+    return messages
+
+def resolve_competencies_locally(competencies, master_resume):
+    """
+    Cite the competencies the resume shows verbatim or inflected without the model.
+    
+    Args:
+        competencies (str): The competencies as a comma-separated list
+        master_resume (str): The master resume text
         
-        # Call OpenAI API
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant that finds evidence in resumes."},
-            {"role": "user", "content": prompt}
-        ]
+    Returns:
+        tuple: (local_citations, unresolved) - A dictionary mapping competencies to resume
+               excerpts, and the competencies that still need the model
+    """
+    resolved, unresolved = resolve_locally(master_resume, split_queries(competencies))
+    print(f"Resolved {len(resolved)} competencies locally, {len(unresolved)} left for the model")
+    return {competency: citation["citation"] for competency, citation in resolved.items()}, unresolved
+
+def find_competencies_citations(competencies, master_resume, job_title=None, company_name=None, industry=None):
+    """
+    Find citations in the master resume for the competencies.
+    
+    Args:
+        competencies (str): The competencies as a comma-separated list
+        master_resume (str): The master resume text
+        job_title (str, optional): The job title
+        company_name (str, optional): The company name
+        industry (str, optional): The industry
+        
+    Returns:
+        dict: Dictionary mapping competencies to citations
+    """
+    try:
+        print("Finding citations for competencies...")
+        local_citations, unresolved = resolve_competencies_locally(competencies, master_resume)
+        if not unresolved:
+            return local_citations
+        messages = build_competencies_citation_messages(", ".join(unresolved), master_resume, job_title, company_name, industry)
         
         # Get the JSON response
         try:
-            citations_data = get_json_response(messages, max_tokens=800, temperature=0.3)
-            return citations_data
+            start_time = time.time()
+            citations_data = get_json_response(messages, max_tokens=800, temperature=0.3, timeout=45)
+            record_model_call(time.time() - start_time)
+            return {**citations_data, **local_citations}
         except Exception as e:
             print(f"Error getting JSON response for competencies citations: {str(e)}")
-            return {}
+            return local_citations
+    
+    except Exception as e:
+        print(f"Error finding competencies citations: {str(e)}")
+        return {}
+
+async def afind_competencies_citations(competencies, master_resume, job_title=None, company_name=None, industry=None):
+    """
+    Async version of find_competencies_citations.
+    
+    Returns:
+        dict: Dictionary mapping competencies to citations
+    """
+    try:
+        print("Finding citations for competencies...")
+        local_citations, unresolved = resolve_competencies_locally(competencies, master_resume)
+        if not unresolved:
+            return local_citations
+        messages = build_competencies_citation_messages(", ".join(unresolved), master_resume, job_title, company_name, industry)
+        
+        try:
+            start_time = time.time()
+            citations_data = await aget_json_response(messages, max_tokens=800, temperature=0.3, timeout=45)
+            record_model_call(time.time() - start_time)
+            return {**citations_data, **local_citations}
+        except Exception as e:
+            print(f"Error getting JSON response for competencies citations: {str(e)}")
+            return local_citations
     
     except Exception as e:
         print(f"Error finding competencies citations: {str(e)}")
@@ -0,0 +1,439 @@
+"""
+Tailoring Pipeline Module
+
+This module runs a whole tailoring session (extract keywords, cite them in the
+resume, generate the career profile and core competencies, cite and highlight
+those) as one dependency graph, instead of the separate calls the frontend
+makes for each step.
+
+Each stage is a node with declared inputs: request fields or other nodes'
+outputs. A node starts as soon as its inputs are ready, so independent nodes
+(keyword extraction, profile generation, competencies generation) run
+concurrently. A node's output is memoized under the hash of its name and input
+values, so running the pipeline again after editing one input (a new job
+title, an edited keyword list or profile) only re-runs the nodes downstream of
+that input; the rest are answered from the memo.
+
+A node's output can also be supplied with the request (e.g. keywords the user
+edited), in which case the node isn't run and its dependents use that value.
+
+The profile and competencies are sampled (temperature 0.7), so a caller may
+ask to regenerate them: nodes named in regenerate skip the memo and run again,
+and their new output replaces the memoized one.
+"""
+
+import os
+import copy
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from services.cache_service import DATA_DIR, create_cache_backend
+from services.admission import DEFAULT_LANES, get_admission_controller
+from services.openai_service import get_text_response
+from services.keyword.keyword_extraction import extract_keywords_only
+from services.keyword.keyword_matching import find_keyword_citations
+from services.keyword.keyword_highlighting import (
+    highlight_keywords,
+    highlight_job_description,
+    highlight_keywords_in_resume,
+    annotate_job_description,
+    annotate_resume
+)
+from services.resume_service import (
+    prioritize_keywords,
+    build_career_profile_messages,
+    build_core_competencies_messages,
+    find_profile_citations,
+    find_competencies_citations
+)
+
+# Nodes running at once per pipeline run
+MAX_NODE_WORKERS = int(os.getenv("TAILOR_MAX_NODES", 6))
+
+def concurrent_runs():
+    """Pipeline runs expected at once: /tailor and tailor jobs both run in the generation lane."""
+    controller = get_admission_controller()
+    if controller is not None:
+        return controller.lanes["generation"].max_concurrency
+    return DEFAULT_LANES["generation"][1]
+
+# Inputs every request may set; missing ones default to ''
+PIPELINE_INPUTS = ("job_description", "master_resume", "job_title", "company_name", "industry", "format")
+
+class Node:
+    """
+    A pipeline stage: a function of named inputs.
+    """
+
+    def __init__(self, name, inputs, fn, memoize_if=None, version=1):
+        """
+        Args:
+            name (str): The node's output name
+            inputs (tuple): Names of the request fields and nodes it reads
+            fn (callable): Called with the inputs as keyword arguments
+            memoize_if (callable, optional): Whether an output may be memoized (e.g. not an error placeholder)
+            version (int): Bump when fn changes, so older memoized outputs are not used
+        """
+        self.name = name
+        self.inputs = inputs
+        self.fn = fn
+        self.memoize_if = memoize_if
+        self.version = version
+
+def value_hash(value):
+    """
+    Hash a JSON-serializable value (dictionary keys in sorted order).
+
+    Args:
+        value: The value
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def node_key(node, values):
+    """
+    Build a node's memo key from the hashes of its input values.
+
+    Args:
+        node (Node): The node
+        values (dict): Input name -> value, for at least the node's inputs
+
+    Returns:
+        str: The memo key
+    """
+    input_hashes = [(name, value_hash(values[name])) for name in node.inputs]
+    return f"tailor:{node.name}:v{node.version}:{value_hash(input_hashes)}"
+
+class Pipeline:
+    """
+    Runs nodes in dependency order, concurrently where possible, memoizing their outputs.
+    """
+
+    def __init__(self, nodes, memo=None, max_workers=None, max_runs=None):
+        """
+        Args:
+            nodes (list): The nodes; inputs not produced by a node are request fields
+            memo (CacheBackend, optional): Store for node outputs (None disables memoization)
+            max_workers (int, optional): Nodes running at once per run
+            max_runs (int, optional): Runs expected at once; the shared node pool has
+                                      room for max_workers nodes of each
+        """
+        self.nodes = {node.name: node for node in nodes}
+        self.memo = memo
+        self.max_workers = max(1, max_workers or MAX_NODE_WORKERS)
+        self.max_runs = max(1, max_runs or concurrent_runs())
+        # Nodes get their own pool: a stage-pool worker runs nested stages inline,
+        # which would serialize the concurrent citation batches inside a node.
+        # Each run limits itself to max_workers nodes, so one session's nodes don't
+        # queue behind another's.
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers * self.max_runs, thread_name_prefix="tailor-node")
+        self._lock = threading.Lock()
+        self._counters = {"runs": 0, "nodes_run": 0, "nodes_memoized": 0, "nodes_supplied": 0, "nodes_failed": 0}
+
+    def required_nodes(self, targets):
+        """
+        List the nodes needed for the targets, dependencies included.
+
+        Args:
+            targets (list): Node names
+
+        Returns:
+            set: Names of the targets and every node they depend on
+        """
+        needed = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name in needed or name not in self.nodes:
+                continue
+            needed.add(name)
+            pending.extend(self.nodes[name].inputs)
+        return needed
+
+    def stream(self, inputs, targets=None, regenerate=None):
+        """
+        Run the pipeline and yield each node's output as it becomes available.
+
+        Args:
+            inputs (dict): Request fields, plus any node outputs supplied by the caller
+            targets (list, optional): Nodes to compute (default: all)
+            regenerate (list, optional): Nodes to run again even if their output is memoized
+
+        Yields:
+            tuple: (name, value, error, source) - source is "supplied", "memo" or "run";
+                   value is None and error is the message if the node (or one it depends on) failed
+        """
+        values = dict(inputs)
+        regenerate = set(regenerate or ())
+        needed = self.required_nodes(targets or list(self.nodes))
+        waiting = {name for name in needed if name not in values}
+        failed = set()
+        running = {}
+        ready = []  # (name, key) of nodes to run once this run has a free worker
+        counts = {"nodes_run": 0, "nodes_memoized": 0, "nodes_supplied": len(needed) - len(waiting), "nodes_failed": 0}
+
+        for name in sorted(needed - waiting):
+            yield name, values[name], None, "supplied"
+
+        try:
+            while waiting or running:
+                # Start (or answer from the memo) every node whose inputs are all ready
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in sorted(waiting):
+                        node = self.nodes[name]
+                        missing = [input_name for input_name in node.inputs if input_name not in values]
+                        if any(input_name in failed for input_name in missing):
+                            waiting.discard(name)
+                            failed.add(name)
+                            counts["nodes_failed"] += 1
+                            progressed = True
+                            yield name, None, f"Skipped: {', '.join(i for i in missing if i in failed)} failed", "run"
+                            continue
+                        if any(input_name in self.nodes for input_name in missing):
+                            continue
+
+                        waiting.discard(name)
+                        progressed = True
+                        for input_name in missing:
+                            values[input_name] = ""
+                        key = node_key(node, values)
+                        cached = None if name in regenerate else self._memo_get(key)
+                        if cached is not None:
+                            values[name] = cached
+                            counts["nodes_memoized"] += 1
+                            yield name, cached, None, "memo"
+                        else:
+                            ready.append((name, key))
+
+                while ready and len(running) < self.max_workers:
+                    name, key = ready.pop(0)
+                    node = self.nodes[name]
+                    # Copies, since some stages add keys to the dictionaries they are given
+                    arguments = copy.deepcopy({input_name: values[input_name] for input_name in node.inputs})
+                    running[self._executor.submit(node.fn, **arguments)] = (name, key)
+
+                if not running:
+                    if waiting:
+                        raise RuntimeError(f"Pipeline nodes with circular inputs: {', '.join(sorted(waiting))}")
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in [future for future in running if future in done]:
+                    name, key = running.pop(future)
+                    node = self.nodes[name]
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        print(f"Error in tailoring node {name}: {str(e)}")
+                        failed.add(name)
+                        counts["nodes_failed"] += 1
+                        yield name, None, str(e), "run"
+                        continue
+
+                    values[name] = value
+                    counts["nodes_run"] += 1
+                    if node.memoize_if is None or node.memoize_if(value):
+                        self._memo_set(key, value)
+                    yield name, value, None, "run"
+        finally:
+            # The consumer stopped early: don't start nodes that are still queued
+            for future in running:
+                future.cancel()
+            with self._lock:
+                self._counters["runs"] += 1
+                for counter, count in counts.items():
+                    self._counters[counter] += count
+
+    def run(self, inputs, targets=None, stage_timings=None, regenerate=None):
+        """
+        Run the pipeline to completion.
+
+        Args:
+            inputs (dict): Request fields, plus any node outputs supplied by the caller
+            targets (list, optional): Nodes to compute (default: all)
+            stage_timings (dict, optional): Receives the seconds from the start of the run
+                                            until each node finished, as each one finishes
+            regenerate (list, optional): Nodes to run again even if their output is memoized
+
+        Returns:
+            tuple: (outputs, errors, report) - node name -> output, node name -> error message
+                   for failed nodes, and node name -> {"source", "seconds"} in completion order
+        """
+        outputs, errors, report = {}, {}, {}
+        start_time = time.time()
+        for name, value, error, source in self.stream(inputs, targets, regenerate):
+            report[name] = {"source": source, "seconds": round(time.time() - start_time, 3)}
+            if stage_timings is not None:
+                stage_timings[name] = report[name]["seconds"]
+            if error is None:
+                outputs[name] = value
+            else:
+                errors[name] = error
+        return outputs, errors, report
+
+    def _memo_get(self, key):
+        if self.memo is None:
+            return None
+        try:
+            value = self.memo.get(key)
+            return None if value is None else json.loads(value)
+        except Exception as e:
+            print(f"Error reading tailoring memo: {str(e)}")
+            return None
+
+    def _memo_set(self, key, value):
+        if self.memo is None:
+            return
+        try:
+            self.memo.set(key, json.dumps(value))
+        except Exception as e:
+            print(f"Error writing tailoring memo: {str(e)}")
+
+    def stats(self):
+        """
+        Report pipeline counters.
+
+        Returns:
+            dict: Runs, nodes run, answered from the memo, supplied by the caller and failed,
+                  and the memo's own counters
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        total = stats["nodes_run"] + stats["nodes_memoized"]
+        stats["memo_hit_rate"] = round(stats["nodes_memoized"] / total, 3) if total else 0.0
+        stats["memo"] = {"backend": "none"} if self.memo is None else self.memo.stats()
+        return stats
+
+# Nodes
+
+def extract_keywords_node(job_description, job_title, company_name, industry):
+    keywords_data, all_keywords = extract_keywords_only(job_description, job_title, company_name, industry)
+    return {"keywords_data": keywords_data, "keywords": all_keywords}
+
+def job_description_highlights_node(job_description, keywords, format):
+    if format == "spans":
+        return annotate_job_description(job_description, keywords["keywords_data"])
+    return highlight_job_description(job_description, keywords["keywords_data"])
+
+def keyword_citations_node(keywords, master_resume):
+    return find_keyword_citations(keywords["keywords"], master_resume)
+
+def found_keywords_node(keywords, citations):
+    found_keywords = {}
+    for priority_level in ["high_priority", "medium_priority", "low_priority", "fallback_extraction"]:
+        for keyword in citations.get(priority_level, {}):
+            if keyword != "error":
+                found_keywords[keyword] = True
+    for keyword in keywords["keywords"]:
+        found_keywords.setdefault(keyword, False)
+    return found_keywords
+
+def resume_highlights_node(master_resume, keywords, found_keywords, citations, format):
+    if format == "spans":
+        return annotate_resume(master_resume, found_keywords, keywords["keywords_data"], citations)
+    return highlight_keywords_in_resume(master_resume, found_keywords, keywords["keywords_data"], citations)
+
+def profile_node(job_description, master_resume, job_title, company_name, industry):
+    messages = build_career_profile_messages(job_description, master_resume, job_title, company_name, industry)
+    return get_text_response(messages, max_tokens=150, temperature=0.7, timeout=20)
+
+def competencies_node(job_description, master_resume, job_title, company_name, industry):
+    messages = build_core_competencies_messages(job_description, master_resume, job_title, company_name, industry)
+    return get_text_response(messages, max_tokens=150, temperature=0.7, timeout=20)
+
+def marked_profile_node(profile, job_description):
+    return highlight_keywords(profile, job_description)
+
+def profile_keywords_node(keywords):
+    return prioritize_keywords(keywords["keywords"], keywords["keywords_data"], "career profile")[:20]
+
+def competencies_keywords_node(keywords):
+    return prioritize_keywords(keywords["keywords"], keywords["keywords_data"], "core competencies")[:15]
+
+def citations_found(citations):
+    """Whether a keyword citation result is real rather than the error placeholder."""
+    return not citations.get("fallback_extraction", {}).get("error")
+
+TAILORING_NODES = [
+    Node("keywords", ("job_description", "job_title", "company_name", "industry"), extract_keywords_node),
+    Node("job_description_highlights", ("job_description", "keywords", "format"), job_description_highlights_node),
+    # A citation depends only on the resume and the keyword (see evidence_store)
+    Node("citations", ("keywords", "master_resume"), keyword_citations_node, memoize_if=citations_found),
+    Node("found_keywords", ("keywords", "citations"), found_keywords_node),
+    Node("resume_highlights", ("master_resume", "keywords", "found_keywords", "citations", "format"), resume_highlights_node),
+    Node("profile", ("job_description", "master_resume", "job_title", "company_name", "industry"), profile_node, memoize_if=bool),
+    Node("marked_profile", ("profile", "job_description"), marked_profile_node, memoize_if=bool),
+    Node("profile_keywords", ("keywords",), profile_keywords_node),
+    Node("profile_citations", ("profile", "master_resume", "job_title", "company_name", "industry"), find_profile_citations, memoize_if=bool),
+    Node("competencies", ("job_description", "master_resume", "job_title", "company_name", "industry"), competencies_node, memoize_if=bool),
+    Node("competencies_keywords", ("keywords",), competencies_keywords_node),
+    Node("competencies_citations", ("competencies", "master_resume", "job_title", "company_name", "industry"), find_competencies_citations, memoize_if=bool)
+]
+
+def create_pipeline_memo():
+    """
+    Create the store for memoized node outputs from environment variables.
+
+    Environment variables:
+        TAILOR_MEMO_BACKEND: "sqlite" (default), "memory" or "none"
+        TAILOR_MEMO_PATH: Path of the SQLite database file
+        TAILOR_MEMO_MAX_BYTES: Maximum total size of memoized outputs (default 64 MB)
+        TAILOR_MEMO_TTL: Seconds an output is kept, 0 for no expiry (default 7 days)
+
+    Returns:
+        CacheBackend: The memo store, or None if memoization is disabled
+    """
+    return create_cache_backend(
+        backend=os.getenv("TAILOR_MEMO_BACKEND", "sqlite"),
+        path=os.getenv("TAILOR_MEMO_PATH", os.path.join(DATA_DIR, "tailor_memo.sqlite3")),
+        max_bytes=int(os.getenv("TAILOR_MEMO_MAX_BYTES", 64 * 1024 * 1024)),
+        ttl=float(os.getenv("TAILOR_MEMO_TTL", 7 * 24 * 3600))
+    )
+
+_pipeline = Pipeline(TAILORING_NODES, create_pipeline_memo())
+
+def tailor(inputs, targets=None, stage_timings=None, regenerate=None):
+    """
+    Run the tailoring pipeline.
+
+    Args:
+        inputs (dict): job_description, master_resume, job_title, company_name, industry,
+                       format ("html" or "spans"), plus any node outputs to use as given
+                       (e.g. edited keywords or profile)
+        targets (list, optional): Nodes to compute (default: all)
+        stage_timings (dict, optional): Receives each node's finishing time as it finishes
+        regenerate (list, optional): Nodes to run again instead of answering from the memo
+                                     (e.g. ["profile"] for a new sample of the career profile)
+
+    Returns:
+        tuple: (outputs, errors, report) - see Pipeline.run
+    """
+    inputs = {**{name: "" for name in PIPELINE_INPUTS}, **inputs}
+    return _pipeline.run(inputs, targets, stage_timings, regenerate)
+
+def tailoring_node_names():
+    """
+    List the pipeline's nodes.
+
+    Returns:
+        list: Node names in declaration order
+    """
+    return list(_pipeline.nodes)
+
+def get_tailoring_stats():
+    """
+    Report tailoring pipeline counters.
+
+    Returns:
+        dict: Pipeline and memo counters
+    """
+    try:
+        return _pipeline.stats()
+    except Exception as e:
+        return {"error": str(e)}
@@ -5,6 +5,121 @@
  */
 
 const ApiService = {
+    // Form fields that can reference an uploaded document instead of carrying its text
+    documentRefFields: {
+        master_resume: 'resume_ref',
+        job_description: 'jd_ref'
+    },
+    
+    // Document text -> reference returned by /upload
+    documentRefs: new Map(),
+    
+    /**
+     * Upload the documents the server doesn't have yet and get their references
+     * 
+     * @param {Object} documents - Text field name (master_resume, job_description) -> text
+     * @returns {Promise} - Resolves to text field name -> reference (fields whose
+     *                      upload failed are left out, so their text is sent instead)
+     */
+    uploadDocuments: function(documents) {
+        const refs = {};
+        const formData = new FormData();
+        let pending = false;
+        
+        Object.entries(documents).forEach(([field, text]) => {
+            if (!text) {
+                return;
+            }
+            if (this.documentRefs.has(text)) {
+                refs[field] = this.documentRefs.get(text);
+            } else {
+                formData.append(field, text);
+                pending = true;
+            }
+        });
+        
+        if (!pending) {
+            return Promise.resolve(refs);
+        }
+        
+        return fetch('/upload', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                Object.entries(this.documentRefFields).forEach(([field, refField]) => {
+                    if (data[refField] && documents[field]) {
+                        this.documentRefs.set(documents[field], data[refField]);
+                        refs[field] = data[refField];
+                    }
+                });
+            }
+            return refs;
+        })
+        .catch(error => {
+            console.error('Error uploading documents, sending text instead:', error);
+            return refs;
+        });
+    },
+    
+    /**
+     * Post a form with its documents sent by reference where possible
+     * 
+     * If the server no longer has a referenced document it answers with
+     * unknown_ref before doing any work, and the form is sent again with the text.
+     * 
+     * @param {FormData} formData - The other form fields
+     * @param {Object} documents - Text field name -> text
+     * @param {Function} send - Posts a FormData and resolves to the JSON response (or null)
+     * @returns {Promise} - Resolves to what send resolves to
+     */
+    postWithDocuments: function(formData, documents, send) {
+        const build = refs => {
+            const body = new FormData();
+            for (const [key, value] of formData.entries()) {
+                body.append(key, value);
+            }
+            Object.entries(documents).forEach(([field, text]) => {
+                if (refs[field]) {
+                    body.append(this.documentRefFields[field], refs[field]);
+                } else {
+                    body.append(field, text);
+                }
+            });
+            return body;
+        };
+        
+        return this.uploadDocuments(documents).then(refs => send(build(refs)).then(data => {
+            if (data && data.unknown_ref) {
+                Object.values(refs).forEach(ref => {
+                    this.documentRefs.forEach((value, text) => {
+                        if (value === ref) {
+                            this.documentRefs.delete(text);
+                        }
+                    });
+                });
+                return send(build({}));
+            }
+            return data;
+        }));
+    },
+    
+    /**
+     * Post a form and parse the JSON response
+     * 
+     * @param {string} url - The endpoint
+     * @returns {Function} - Posts a FormData to url and resolves to the JSON response
+     */
+    postForm: function(url) {
+        return formData => fetch(url, {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => response.json());
+    },
+    
     /**
      * Extract keywords from job description only (no resume check)
      * 
@@ -18,7 +133,6 @@ const ApiService = {
         return new Promise((resolve, reject) => {
             // Create form data
             const formData = new FormData();
-            formData.append('job_description', jobDescription);
             formData.append('job_title', jobTitle);
             formData.append('company_name', companyName);
             formData.append('industry', industry);
@@ -26,11 +140,7 @@ const ApiService = {
             // Note: We're not sending the master resume to the backend for initial keyword extraction
             
             // Make the API call
-            fetch('/extract-keywords', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
+            this.postWithDocuments(formData, { job_description: jobDescription }, this.postForm('/extract-keywords'))
             .then(data => resolve(data))
             .catch(error => {
                 console.error('Error extracting keywords:', error);
@@ -53,18 +163,15 @@ const ApiService = {
         return new Promise((resolve, reject) => {
             // Create form data
             const formData = new FormData();
-            formData.append('master_resume', masterResume);
             formData.append('keywords', JSON.stringify(keywords));
             formData.append('job_title', jobTitle);
             formData.append('company_name', companyName);
             formData.append('industry', industry);
+            // Ask for span annotations; KeywordManager renders the highlights
+            formData.append('format', 'spans');
             
             // Make the API call
-            fetch('/find-keywords-in-resume', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
+            this.postWithDocuments(formData, { master_resume: masterResume }, this.postForm('/find-keywords-in-resume'))
             .then(data => resolve(data))
             .catch(error => {
                 console.error('Error finding keywords in resume:', error);
@@ -87,18 +194,13 @@ const ApiService = {
         return new Promise((resolve, reject) => {
             // Create form data
             const formData = new FormData();
-            formData.append('master_resume', masterResume);
             formData.append('keywords', JSON.stringify(keywords));
             formData.append('job_title', jobTitle);
             formData.append('company_name', companyName);
             formData.append('industry', industry);
             
             // Make the API call
-            fetch('/find-citations', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
+            this.postWithDocuments(formData, { master_resume: masterResume }, this.postForm('/find-citations'))
             .then(data => resolve(data))
             .catch(error => {
                 console.error('Error finding citations:', error);
@@ -124,8 +226,7 @@ const ApiService = {
         return new Promise((resolve, reject) => {
             // Create form data
             const formData = new FormData();
-            formData.append('job_description', jobDescription);
-            formData.append('master_resume', masterResume);
+            const documents = { job_description: jobDescription, master_resume: masterResume };
             formData.append('keywords', JSON.stringify(keywords));
             formData.append('citations_json', JSON.stringify(citations));
             formData.append('job_title', jobTitle);
@@ -138,11 +239,7 @@ const ApiService = {
             }
             
             // Make the API call
-            fetch('/generate', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
+            this.postWithDocuments(formData, documents, this.postForm('/generate'))
             .then(data => resolve(data))
             .catch(error => {
                 console.error('Error generating profile:', error);
@@ -168,8 +265,7 @@ const ApiService = {
         return new Promise((resolve, reject) => {
             // Create form data
             const formData = new FormData();
-            formData.append('job_description', jobDescription);
-            formData.append('master_resume', masterResume);
+            const documents = { job_description: jobDescription, master_resume: masterResume };
             formData.append('keywords', JSON.stringify(keywords));
             formData.append('citations_json', JSON.stringify(citations));
             formData.append('job_title', jobTitle);
@@ -182,11 +278,7 @@ const ApiService = {
             }
             
             // Make the API call
-            fetch('/generate-competencies', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
+            this.postWithDocuments(formData, documents, this.postForm('/generate-competencies'))
             .then(data => resolve(data))
             .catch(error => {
                 console.error('Error generating competencies:', error);
@@ -195,6 +287,201 @@ const ApiService = {
         });
     },
     
+    /**
+     * Post a form and read the Server-Sent Events response
+     * 
+     * @param {string} url - The streaming endpoint
+     * @param {FormData} formData - The form data to post
+     * @param {Function} handleEvent - Called with (event, data) for each event
+     * @param {Object} documents - Text field name -> text, sent by reference where possible (optional)
+     * @returns {Promise} - Resolves to null when the stream ends, or to the JSON
+     *                      body if the server answered without streaming (e.g. a validation error)
+     */
+    readEventStream: function(url, formData, handleEvent, documents = null) {
+        if (documents) {
+            return this.postWithDocuments(formData, documents, body => this.readEventStream(url, body, handleEvent));
+        }
+        
+        return fetch(url, {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => {
+            if (!response.ok || !response.body) {
+                return response.json();
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            const read = () => reader.read().then(({ done, value }) => {
+                if (done) {
+                    return null;
+                }
+                
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Messages are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const message = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    let event = 'message';
+                    const dataLines = [];
+                    message.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) {
+                            event = line.slice(6).trim();
+                        } else if (line.startsWith('data:')) {
+                            dataLines.push(line.slice(5).trim());
+                        }
+                    });
+                    
+                    if (dataLines.length) {
+                        handleEvent(event, JSON.parse(dataLines.join('\n')));
+                    }
+                }
+                
+                return read();
+            });
+            
+            return read();
+        });
+    },
+    
+    /**
+     * Post a generation form and assemble the streamed events into a response
+     * 
+     * Each event is passed to onEvent as it arrives. The returned promise resolves
+     * to the same shape as the non-streaming endpoint's JSON response.
+     * 
+     * @param {string} url - The streaming endpoint
+     * @param {FormData} formData - The form data to post
+     * @param {string} textField - The response field holding the generated text
+     * @param {Function} onEvent - Called with (event, data) for each event (optional)
+     * @param {Object} documents - Text field name -> text, sent by reference where possible (optional)
+     * @returns {Promise} - A promise that resolves to the assembled response
+     */
+    streamGeneration: function(url, formData, textField, onEvent = null, documents = null) {
+        const result = { success: true, [textField]: '', keywords: [], citations: {} };
+        
+        const handleEvent = (event, data) => {
+            if (onEvent) {
+                onEvent(event, data);
+            }
+            
+            if (event === 'token') {
+                result[textField] += data;
+            } else if (event === 'profile' || event === 'competencies') {
+                result[textField] = data;
+            } else if (event === 'done') {
+                result.timings = data;
+            } else if (event === 'error') {
+                result.success = false;
+                result.message = data.message;
+            } else {
+                result[event] = data;
+            }
+        };
+        
+        return this.readEventStream(url, formData, handleEvent, documents)
+            .then(data => data || result)
+            .catch(error => {
+                console.error(`Error streaming ${url}:`, error);
+                throw error;
+            });
+    },
+    
+    /**
+     * Extract keywords from job description, receiving each keyword as soon as it is written
+     * 
+     * @param {string} jobDescription - The job description text
+     * @param {string} jobTitle - The job title (optional)
+     * @param {string} companyName - The company name (optional)
+     * @param {string} industry - The industry (optional)
+     * @param {Function} onEvent - Called with (event, data) for 'preview', 'keyword' and
+     *                             'job_description_spans' events (optional)
+     * @returns {Promise} - A promise that resolves to the same shape as extractKeywords
+     */
+    extractKeywordsStream: function(jobDescription, jobTitle = '', companyName = '', industry = '', onEvent = null) {
+        const formData = new FormData();
+        formData.append('job_title', jobTitle);
+        formData.append('company_name', companyName);
+        formData.append('industry', industry);
+        // Ask for span annotations; KeywordManager renders the highlights
+        formData.append('format', 'spans');
+        
+        let result = { success: false, message: 'Keyword extraction ended unexpectedly' };
+        
+        const handleEvent = (event, data) => {
+            if (event === 'keywords') {
+                result = data;
+            } else if (event === 'error') {
+                result = { success: false, message: data.message };
+            } else if (onEvent) {
+                onEvent(event, data);
+            }
+        };
+        
+        return this.readEventStream('/extract-keywords-stream', formData, handleEvent, { job_description: jobDescription })
+            .then(data => data || result)
+            .catch(error => {
+                console.error('Error extracting keywords:', error);
+                throw error;
+            });
+    },
+    
+    /**
+     * Generate career profile, streaming the text as it is written
+     * 
+     * Takes the same arguments as generateProfile, plus an onEvent callback that
+     * receives 'token', 'profile', 'keywords', 'marked_profile', 'citations' and 'done' events.
+     * 
+     * @param {Function} onEvent - Called with (event, data) for each event (optional)
+     * @returns {Promise} - A promise that resolves to the same shape as generateProfile
+     */
+    generateProfileStream: function(jobDescription, masterResume, keywords = [], citations = {}, jobTitle = '', companyName = '', industry = '', keywordsData = null, onEvent = null) {
+        const formData = new FormData();
+        const documents = { job_description: jobDescription, master_resume: masterResume };
+        formData.append('keywords', JSON.stringify(keywords));
+        formData.append('citations_json', JSON.stringify(citations));
+        formData.append('job_title', jobTitle);
+        formData.append('company_name', companyName);
+        formData.append('industry', industry);
+        
+        if (keywordsData) {
+            formData.append('keywords_data', JSON.stringify(keywordsData));
+        }
+        
+        return this.streamGeneration('/generate-stream', formData, 'career_profile', onEvent, documents);
+    },
+    
+    /**
+     * Generate core competencies, streaming the text as it is written
+     * 
+     * Takes the same arguments as generateCompetencies, plus an onEvent callback that
+     * receives 'token', 'competencies', 'keywords', 'citations' and 'done' events.
+     * 
+     * @param {Function} onEvent - Called with (event, data) for each event (optional)
+     * @returns {Promise} - A promise that resolves to the same shape as generateCompetencies
+     */
+    generateCompetenciesStream: function(jobDescription, masterResume, keywords = [], citations = {}, jobTitle = '', companyName = '', industry = '', keywordsData = null, onEvent = null) {
+        const formData = new FormData();
+        const documents = { job_description: jobDescription, master_resume: masterResume };
+        formData.append('keywords', JSON.stringify(keywords));
+        formData.append('citations_json', JSON.stringify(citations));
+        formData.append('job_title', jobTitle);
+        formData.append('company_name', companyName);
+        formData.append('industry', industry);
+        
+        if (keywordsData) {
+            formData.append('keywords_data', JSON.stringify(keywordsData));
+        }
+        
+        return this.streamGeneration('/generate-competencies-stream', formData, 'competencies', onEvent, documents);
+    },
+    
     /**
      * Save career profile to a file
      * 
@@ -1891,12 +1891,17 @@ const KeywordManager = {
             `;
         }
         
-        // Call the API service to extract keywords
-        ApiService.extractKeywords(
+        // Call the API service to extract keywords, showing high-priority highlights as soon as they arrive
+        ApiService.extractKeywordsStream(
             jobDescriptionValue, 
-            masterResumeValue,
             jobTitleValue,
-            companyNameValue
+            companyNameValue,
+            '',
+            (event, data) => {
+                if (event === 'job_description_spans') {
+                    UiManager.displayHighlightedJobDescription(this.renderSpans(jobDescriptionValue, data));
+                }
+            }
         )
         .then(data => {
             // Reset button state for both possible buttons
@@ -1932,8 +1937,9 @@ const KeywordManager = {
                 }
                 
                 // Focus on displaying the highlighted job description first
-                if (data.highlighted_job_description) {
-                    UiManager.displayHighlightedJobDescription(data.highlighted_job_description);
+                if (data.job_description_spans) {
+                    window.jobDescriptionSpans = data.job_description_spans;
+                    UiManager.displayHighlightedJobDescription(this.renderSpans(jobDescriptionValue, data.job_description_spans));
                     
                     // Add a button to add keywords to the list
                     const highlightedJobDescriptionSection = document.getElementById('highlightedJobDescriptionSection');
@@ -2491,7 +2497,7 @@ const KeywordManager = {
                 });
                 
                 // Use our new highlightKeywordsInResume function to create a properly styled section
-                this.highlightKeywordsInResume(masterResumeValue, keywordCitations);
+                this.highlightKeywordsInResume(masterResumeValue, keywordCitations, data.resume_spans);
                 
                 // Show success message
                 UiManager.showSuccessMessage('Keywords found in resume!');
@@ -2553,13 +2559,55 @@ const KeywordManager = {
         });
     },
     
+    /**
+     * Render highlighted HTML from span annotations returned by the server
+     * 
+     * @param {string} text - The text the spans were computed against
+     * @param {Array} spans - Non-overlapping [start, end, keyword, priority, citationNumber]
+     *                        arrays ordered by start, with code point offsets into text
+     * @returns {string} - The escaped text with <mark> tags and <br> line breaks
+     */
+    renderSpans: function(text, spans) {
+        const escapeHtml = value => value
+            .replace(/&/g, '&amp;')
+            .replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;')
+            .replace(/'/g, '&#039;')
+            .replace(/\n/g, '<br>');
+        
+        // Offsets count code points, so index by code point rather than UTF-16 unit
+        const chars = Array.from(text);
+        const parts = [];
+        let lastEnd = 0;
+        
+        (spans || []).forEach(([start, end, keyword, priority, citationNumber]) => {
+            parts.push(escapeHtml(chars.slice(lastEnd, start).join('')));
+            
+            const matched = escapeHtml(chars.slice(start, end).join(''));
+            const priorityClass = priority ? ` class="${priority}-priority-keyword"` : '';
+            const title = escapeHtml(keyword);
+            if (citationNumber !== null && citationNumber !== undefined) {
+                parts.push(`<mark${priorityClass} title="${title}" data-citation="${citationNumber}">${matched}<sup>${citationNumber}</sup></mark>`);
+            } else {
+                parts.push(`<mark${priorityClass} title="${title}">${matched}</mark>`);
+            }
+            lastEnd = end;
+        });
+        
+        parts.push(escapeHtml(chars.slice(lastEnd).join('')));
+        return parts.join('');
+    },
+    
     /**
      * Highlight keywords in the master resume
      * 
      * @param {string} masterResumeValue - The master resume text
      * @param {Object} keywordCitations - Object with keyword:citation pairs
+     * @param {Array} spans - Span annotations from the server (optional); when given they
+     *                        are rendered directly instead of searching for each keyword
      */
-    highlightKeywordsInResume: function(masterResumeValue, keywordCitations) {
+    highlightKeywordsInResume: function(masterResumeValue, keywordCitations, spans = null) {
         console.log("Highlighting keywords in resume:", Object.keys(keywordCitations).length, "keywords");
         
         // Get the master resume textarea
@@ -2670,57 +2718,63 @@ const KeywordManager = {
         // Get the content container
         const content = document.getElementById('highlightedResumeContent');
         
-        // Create a copy of the master resume text
-        let highlightedText = masterResumeValue;
-        
-        // Sort keywords by length (longest first) to avoid highlighting issues
-        const sortedKeywords = Object.keys(keywordCitations).sort((a, b) => b.length - a.length);
-        
-        // Escape special characters in the text for HTML display
-        highlightedText = highlightedText
-            .replace(/&/g, '&amp;')
-            .replace(/</g, '&lt;')
-            .replace(/>/g, '&gt;')
-            .replace(/"/g, '&quot;')
-            .replace(/'/g, '&#039;');
-        
-        // Highlight each keyword
-        sortedKeywords.forEach(keyword => {
-            // Skip empty keywords
-            if (!keyword.trim()) return;
-            
-            // Create a regex to find the keyword with word boundaries
-            const regex = new RegExp(`\\b${keyword.replace(/[.*+?^${}()|[\]\\]/g, '\\$&')}\\b`, 'gi');
-            
-            // Replace the keyword with a marked version
-            highlightedText = highlightedText.replace(regex, match => {
-                // Determine the priority based on the citation
-                let priorityClass = '';
-                
-                // Check if the keyword has a citation in any priority bucket
-                if (window.citationsData && window.citationsData.keywords) {
-                    const citations = window.citationsData.keywords;
+        let highlightedText;
+        if (spans) {
+            // Render the server's spans when we have them
+            highlightedText = this.renderSpans(masterResumeValue, spans);
+        } else {
+            // Create a copy of the master resume text
+            highlightedText = masterResumeValue;
+        
+            // Sort keywords by length (longest first) to avoid highlighting issues
+            const sortedKeywords = Object.keys(keywordCitations).sort((a, b) => b.length - a.length);
+        
+            // Escape special characters in the text for HTML display
+            highlightedText = highlightedText
+                .replace(/&/g, '&amp;')
+                .replace(/</g, '&lt;')
+                .replace(/>/g, '&gt;')
+                .replace(/"/g, '&quot;')
+                .replace(/'/g, '&#039;');
+        
+            // Highlight each keyword
+            sortedKeywords.forEach(keyword => {
+                // Skip empty keywords
+                if (!keyword.trim()) return;
+            
+                // Create a regex to find the keyword with word boundaries
+                const regex = new RegExp(`\\b${keyword.replace(/[.*+?^${}()|[\]\\]/g, '\\$&')}\\b`, 'gi');
+            
+                // Replace the keyword with a marked version
+                highlightedText = highlightedText.replace(regex, match => {
+                    // Determine the priority based on the citation
+                    let priorityClass = '';
+                
+                    // Check if the keyword has a citation in any priority bucket
+                    if (window.citationsData && window.citationsData.keywords) {
+                        const citations = window.citationsData.keywords;
                     
-                    if (citations.high_priority && citations.high_priority[keyword]) {
-                        priorityClass = 'high-priority-keyword';
-                    } else if (citations.medium_priority && citations.medium_priority[keyword]) {
-                        priorityClass = 'medium-priority-keyword';
-                    } else if (citations.low_priority && citations.low_priority[keyword]) {
-                        priorityClass = 'low-priority-keyword';
+                        if (citations.high_priority && citations.high_priority[keyword]) {
+                            priorityClass = 'high-priority-keyword';
+                        } else if (citations.medium_priority && citations.medium_priority[keyword]) {
+                            priorityClass = 'medium-priority-keyword';
+                        } else if (citations.low_priority && citations.low_priority[keyword]) {
+                            priorityClass = 'low-priority-keyword';
+                        } else {
+                            priorityClass = 'medium-priority-keyword';
+                        }
                     } else {
+                        // Default to medium priority if no citations data
                         priorityClass = 'medium-priority-keyword';
                     }
-                } else {
-                    // Default to medium priority if no citations data
-                    priorityClass = 'medium-priority-keyword';
-                }
                 
-                return `<mark class="${priorityClass}" title="${keyword}">${match}</mark>`;
+                    return `<mark class="${priorityClass}" title="${keyword}">${match}</mark>`;
+                });
             });
-        });
         
-        // Convert newlines to <br> tags
-        highlightedText = highlightedText.replace(/\n/g, '<br>');
+            // Convert newlines to <br> tags
+            highlightedText = highlightedText.replace(/\n/g, '<br>');
+        }
         
         // Update the content
         content.innerHTML = highlightedText;
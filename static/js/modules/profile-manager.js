@@ -104,14 +104,22 @@ const ProfileManager = {
             <span>Generating...</span>
         `;
         
-        // Call the API service to generate career profile
-        ApiService.generateProfile(
+        // Call the API service to generate career profile, showing the text as it streams in
+        careerProfileTextarea.value = '';
+        ApiService.generateProfileStream(
             jobDescriptionValue, 
             masterResumeValue, 
             window.extractedKeywords || [], 
             window.citationsData?.keywords || {},
             jobTitleValue,
-            companyNameValue
+            companyNameValue,
+            '',
+            null,
+            (event, data) => {
+                if (event === 'token') {
+                    careerProfileTextarea.value += data;
+                }
+            }
         )
         .then(data => {
             // Reset button state
@@ -0,0 +1,297 @@
+"""
+Streaming JSON Utilities
+
+This module provides an incremental, tolerant JSON parser for model output.
+Text can be fed in as it arrives; values nested at a chosen depth are reported
+as soon as they are complete, and truncated output is closed off instead of
+failing.
+"""
+
+import re
+import json
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+# A bare word (number, literal or unquoted key) runs until a delimiter
+_BARE_WORD = re.compile(r"[^{}\[\]:,\"' \t\r\n]*")
+
+_LITERALS = {"true": True, "false": False, "null": None}
+
+# Accepts raw control characters inside strings, which models sometimes emit
+_DECODER = json.JSONDecoder(strict=False)
+
+class StreamingJSONParser:
+    """
+    Incremental JSON parser that tolerates the mistakes models make.
+
+    Accepted beyond strict JSON: prose or markdown fences before and after the
+    document, single-quoted strings, unquoted keys, bare-word values, raw control
+    characters inside strings, and missing or trailing commas.
+
+    Example:
+        parser = StreamingJSONParser(emit_depth=2)
+        for delta in stream:
+            for path, value in parser.feed(delta):
+                ...  # e.g. ("high_priority", 0), {"keyword": "Python", "score": 0.9}
+        document = parser.finish()
+    """
+
+    def __init__(self, emit_depth=2, keep_partial=False):
+        """
+        Args:
+            emit_depth (int): Report values whose path has this many components
+                (2 reports each element of each top-level array in an object);
+                None reports nothing
+            keep_partial (bool): At finish(), keep a number or literal cut off by
+                the end of the input if it parses as-is, instead of dropping it.
+                A cut-off string is always dropped: its fragment (e.g. "Pyth")
+                would pass for a real value
+        """
+        self.emit_depth = emit_depth
+        self.keep_partial = keep_partial
+        self.root = None
+        self.done = False
+        self._buffer = ""
+        self._started = False
+        # Each frame is [container, path, pending_key, expecting] where expecting is
+        # "key", "colon" or "value" for objects and always "value" for arrays
+        self._stack = []
+        self._events = []
+
+    def feed(self, text):
+        """
+        Parse the next chunk of text.
+
+        Args:
+            text (str): The next piece of the document
+
+        Returns:
+            list: (path, value) tuples for values at emit_depth completed by this chunk
+        """
+        if self.done or not text:
+            return []
+
+        self._buffer += text
+        self._parse()
+        events, self._events = self._events, []
+        return events
+
+    def finish(self):
+        """
+        Parse any remaining text and close unfinished containers.
+
+        A string cut off by the end of the input is dropped, as is a number or
+        literal (unless keep_partial is set) and a key without a value; containers
+        that were still open are kept with whatever they held.
+
+        Returns:
+            The parsed document (dict or list), or None if no document was found
+        """
+        if not self.done:
+            self._parse()
+            if self.keep_partial and self._stack:
+                self._add_partial(self._buffer)
+            while self._stack:
+                self._close()
+            self.done = True
+        self._events = []
+        return self.root
+
+    def _parse(self):
+        buffer = self._buffer
+        length = len(buffer)
+        position = 0
+
+        if not self._started:
+            # Skip any prose or markdown before the document
+            starts = [index for index in (buffer.find("{"), buffer.find("[")) if index >= 0]
+            if not starts:
+                self._buffer = ""
+                return
+            position = min(starts)
+            self._started = True
+
+        while position < length and not self.done:
+            char = buffer[position]
+
+            if char in " \t\r\n":
+                position = _WHITESPACE.match(buffer, position).end()
+            elif char == "{" or char == "[":
+                container = {} if char == "{" else []
+                self._stack.append([container, self._child_path(), None, "key" if char == "{" else "value"])
+                position += 1
+            elif char == "}" or char == "]":
+                if self._stack:
+                    self._close()
+                position += 1
+            elif char == ":":
+                frame = self._stack[-1]
+                if frame[3] == "colon":
+                    frame[3] = "value"
+                position += 1
+            elif char == ",":
+                frame = self._stack[-1]
+                if isinstance(frame[0], dict):
+                    # A key with no value before the comma is dropped
+                    frame[2] = None
+                    frame[3] = "key"
+                position += 1
+            elif char == '"' or char == "'":
+                end = self._find_string_end(buffer, position + 1, char)
+                if end < 0:
+                    break  # Wait for the rest of the string
+                self._add_string(self._decode_string(buffer[position + 1:end], char))
+                position = end + 1
+            else:
+                end = _BARE_WORD.match(buffer, position).end()
+                if end == length:
+                    # The word may continue in the next chunk; at the end of
+                    # the input it was cut off, so it is dropped
+                    break
+                self._add_word(buffer[position:end])
+                position = end
+
+        self._buffer = buffer[position:]
+
+    def _add_partial(self, text):
+        """Add the number or literal cut off at the end of the input, if it parses."""
+        if not text or text[0] == '"' or text[0] == "'":
+            return
+        word = text.strip()
+        if word in _LITERALS:
+            self._add_word(word)
+            return
+        try:
+            _DECODER.decode(word)
+        except json.JSONDecodeError:
+            return
+        self._add_word(word)
+
+    @staticmethod
+    def _find_string_end(buffer, start, quote):
+        """Find the closing quote, skipping escaped ones; -1 if not there yet."""
+        position = start
+        while True:
+            end = buffer.find(quote, position)
+            if end < 0:
+                return -1
+            backslashes = 0
+            index = end - 1
+            while index >= start and buffer[index] == "\\":
+                backslashes += 1
+                index -= 1
+            if backslashes % 2 == 0:
+                return end
+            position = end + 1
+
+    @staticmethod
+    def _decode_string(raw, quote):
+        if "\\" not in raw:
+            return raw
+        if quote == "'":
+            raw = raw.replace("\\'", "'").replace('"', '\\"')
+        try:
+            return _DECODER.decode(f'"{raw}"')
+        except json.JSONDecodeError:
+            # Invalid escape sequence; keep the text as written
+            return raw.replace('\\"', '"')
+
+    def _child_path(self):
+        """Path of the next value to be added to the innermost container."""
+        if not self._stack:
+            return ()
+        container, path, pending_key, _ = self._stack[-1]
+        if isinstance(container, list):
+            return path + (len(container),)
+        return path + (pending_key,)
+
+    def _add_string(self, value):
+        if self._stack:
+            frame = self._stack[-1]
+            if isinstance(frame[0], dict) and frame[3] == "key":
+                frame[2] = value
+                frame[3] = "colon"
+                return
+        self._add_value(value)
+
+    def _add_word(self, word):
+        if self._stack:
+            frame = self._stack[-1]
+            if isinstance(frame[0], dict) and frame[3] == "key":
+                # Unquoted key
+                frame[2] = word
+                frame[3] = "colon"
+                return
+
+        if word in _LITERALS:
+            value = _LITERALS[word]
+        else:
+            try:
+                value = _DECODER.decode(word)
+            except json.JSONDecodeError:
+                value = word
+        self._add_value(value)
+
+    def _add_value(self, value):
+        """Attach a completed value to the innermost container."""
+        if not self._stack:
+            return
+
+        container, path, pending_key, _ = frame = self._stack[-1]
+        if isinstance(container, list):
+            value_path = path + (len(container),)
+            container.append(value)
+        else:
+            if pending_key is None:
+                return  # A value without a key (e.g. a stray string) is ignored
+            value_path = path + (pending_key,)
+            container[pending_key] = value
+            frame[2] = None
+            frame[3] = "key"
+
+        if len(value_path) == self.emit_depth:
+            self._events.append((value_path, value))
+
+    def _close(self):
+        """Close the innermost container and attach it to its parent."""
+        container = self._stack.pop()[0]
+        if self._stack:
+            self._add_value(container)
+        else:
+            self.root = container
+            self.done = True
+
+def parse_json_stream(chunks, emit_depth=2):
+    """
+    Parse an iterable of text chunks, yielding values as they complete.
+
+    Args:
+        chunks (iterable): Pieces of a JSON document (e.g. streamed model output)
+        emit_depth (int): Depth of the values to yield (see StreamingJSONParser)
+
+    Yields:
+        tuple: (path, value) for each value at emit_depth, then ((), document)
+            once the input is exhausted
+    """
+    parser = StreamingJSONParser(emit_depth=emit_depth)
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            yield event
+    yield (), parser.finish()
+
+def repair_json(content):
+    """
+    Parse JSON that may be malformed or truncated, in a single linear pass.
+
+    Open arrays and objects are closed and every complete element is kept; a
+    string cut off mid-way is dropped rather than kept as a fragment. Valid text inside strings (including apostrophes) is never rewritten.
+
+    Args:
+        content (str): The raw text, possibly with prose around the document
+
+    Returns:
+        The parsed document (dict or list), or None if no document was found
+    """
+    parser = StreamingJSONParser(emit_depth=None, keep_partial=True)
+    parser.feed(content)
+    return parser.finish()